@@ -0,0 +1,263 @@
+"""
+Колонковий експорт вкладок звіту (Реклама / Студенти / Вчителі) для BI:
+format=parquet|arrow|csv у /api/export-meta-excel та /api/download-excel.
+
+- parquet - pyarrow.parquet (zstd), типізовані колонки
+- arrow   - Arrow IPC file (.arrow, читається pyarrow/polars/pandas без копіювання)
+- csv     - stdlib csv, працює і без pyarrow
+
+pyarrow - опціональна залежність і важкий імпорт, тому підвантажується лише
+під час експорту (не на старті app.main). Без нього parquet/arrow недоступні
+(PyArrowUnavailable), csv - доступний завжди.
+
+Рядки проходять один раз: транспонуються в колонки, тип колонки визначається
+за значеннями (int64 / float64 / bool / timestamp / date / string), масиви
+телефонів зберігаються рядком через перенос - як у XLSX. Кілька вкладок
+пакуються в ZIP (один файл на вкладку).
+
+csv_chunks / ndjson_chunks - потоковий варіант для /api/export/{tab}.csv|.ndjson:
+рядки серіалізуються пачками по STREAM_CHUNK_ROWS, у пам'яті лише поточна пачка.
+"""
+import csv
+import datetime
+import importlib.util
+import io
+import json
+import os
+import tempfile
+import zipfile
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from .json_response import dumps
+
+XLSX = "xlsx"
+COLUMNAR_FORMATS = ("parquet", "arrow", "csv")
+EXPORT_FORMATS = (XLSX,) + COLUMNAR_FORMATS
+
+MEDIA_TYPES = {
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.file",
+    "csv": "text/csv; charset=utf-8",
+    "zip": "application/zip",
+}
+
+PARQUET_COMPRESSION = os.getenv("EXPORT_PARQUET_COMPRESSION", "zstd")
+ROW_GROUP_SIZE = int(os.getenv("EXPORT_ROW_GROUP_SIZE", "65536"))
+STREAM_CHUNK_ROWS = int(os.getenv("EXPORT_STREAM_CHUNK_ROWS", "500"))
+
+# Вкладка: (назва файлу без розширення, колонки, рядки-послідовності у порядку колонок)
+Table = Tuple[str, List[str], Iterable[Sequence[Any]]]
+
+
+class PyArrowUnavailable(RuntimeError):
+    """parquet/arrow запитано, але pyarrow не встановлено."""
+
+
+def pyarrow_available() -> bool:
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError as e:
+        raise PyArrowUnavailable("pyarrow is not installed") from e
+    return pyarrow
+
+
+def dict_rows(rows: Iterable[Dict[str, Any]], columns: Sequence[str]) -> Iterable[List[Any]]:
+    """Рядки-словники → списки значень у порядку columns."""
+    return ([row.get(column) for column in columns] for row in rows)
+
+
+def columns_of(rows: Sequence[Dict[str, Any]]) -> List[str]:
+    """Об'єднання ключів рядків у порядку першої появи (для вкладок без фіксованого порядку)."""
+    columns: Dict[str, None] = {}
+    for row in rows:
+        columns.update(dict.fromkeys(row))
+    return list(columns)
+
+
+def _cell(value: Any) -> Any:
+    """Значення комірки: масиви телефонів - рядком через перенос, словники - JSON."""
+    if isinstance(value, (list, tuple)):
+        return "\n".join(str(item) for item in value)
+    if isinstance(value, dict):
+        return json.dumps(value, ensure_ascii=False, default=str)
+    return value
+
+
+def infer_kind(values: Sequence[Any]) -> str:
+    """Тип колонки за значеннями (None ігнорується): int64, float64, bool, timestamp, date або string."""
+    kinds = set()
+    for value in values:
+        if value is None:
+            continue
+        if isinstance(value, bool):
+            kinds.add("bool")
+        elif isinstance(value, int):
+            kinds.add("int64")
+        elif isinstance(value, float):
+            kinds.add("float64")
+        elif isinstance(value, datetime.datetime):
+            kinds.add("timestamp")
+        elif isinstance(value, datetime.date):
+            kinds.add("date")
+        else:
+            return "string"
+        if len(kinds) > 1 and kinds != {"int64", "float64"}:
+            return "string"
+    if kinds == {"int64", "float64"}:
+        return "float64"
+    return kinds.pop() if kinds else "string"
+
+
+def coerce_numeric(values: Sequence[Any], kind: str) -> Optional[List[Any]]:
+    """
+    Рядкові числа (Meta API повертає "123", "1.5") → int/float.
+    None, якщо хоча б одне значення не є числом - колонка лишається рядковою.
+    """
+    cast = int if kind == "int64" else float
+    result = []
+    for value in values:
+        if value is None or value == "":
+            result.append(None)
+            continue
+        try:
+            result.append(cast(float(value)) if cast is int else cast(value))
+        except (TypeError, ValueError):
+            return None
+    return result
+
+
+def _arrow_column(pa, values: List[Any], dtype_hint: Optional[str]):
+    if dtype_hint in ("int64", "float64"):
+        coerced = coerce_numeric(values, dtype_hint)
+        if coerced is not None:
+            return pa.array(coerced, type=getattr(pa, dtype_hint)())
+    kind = infer_kind(values)
+    if kind == "string":
+        return pa.array([None if value is None else str(value) for value in values], type=pa.string())
+    arrow_type = {
+        "int64": pa.int64(),
+        "float64": pa.float64(),
+        "bool": pa.bool_(),
+        "timestamp": pa.timestamp("us"),
+        "date": pa.date32(),
+    }[kind]
+    return pa.array(values, type=arrow_type)
+
+
+def _transpose(columns: Sequence[str], rows: Iterable[Sequence[Any]]) -> List[List[Any]]:
+    data: List[List[Any]] = [[] for _ in columns]
+    width = len(columns)
+    for row in rows:
+        for position in range(width):
+            data[position].append(_cell(row[position]) if position < len(row) else None)
+    return data
+
+
+def _write_arrow_table(path: str, fmt: str, columns: List[str], rows, dtypes: Dict[str, str]):
+    pa = _pyarrow()
+    data = _transpose(columns, rows)
+    table = pa.table({
+        column: _arrow_column(pa, values, dtypes.get(column))
+        for column, values in zip(columns, data)
+    })
+    if fmt == "parquet":
+        pa.parquet.write_table(table, path, compression=PARQUET_COMPRESSION, row_group_size=ROW_GROUP_SIZE)
+    else:
+        with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=ROW_GROUP_SIZE)
+
+
+def csv_chunks(rows: Iterable[Sequence[Any]], chunk_rows: int = STREAM_CHUNK_ROWS) -> Iterator[bytes]:
+    """Рядки → CSV (UTF-8) пачками по chunk_rows рядків; заголовок - звичайний перший рядок."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    pending = 0
+    for row in rows:
+        writer.writerow([_cell(value) for value in row])
+        pending += 1
+        if pending >= chunk_rows:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    if pending:
+        yield buffer.getvalue().encode("utf-8")
+
+
+def ndjson_chunks(columns: Sequence[str], rows: Iterable[Sequence[Any]],
+                  chunk_rows: int = STREAM_CHUNK_ROWS) -> Iterator[bytes]:
+    """Рядки → NDJSON (об'єкт {колонка: значення} на рядок) пачками; масиви лишаються масивами."""
+    lines: List[bytes] = []
+    for row in rows:
+        lines.append(dumps(dict(zip(columns, row))))
+        if len(lines) >= chunk_rows:
+            yield b"\n".join(lines) + b"\n"
+            lines = []
+    if lines:
+        yield b"\n".join(lines) + b"\n"
+
+
+def _write_csv_table(path: str, columns: List[str], rows):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow([_cell(value) for value in row])
+
+
+def write_table(path: str, fmt: str, columns: List[str], rows: Iterable[Sequence[Any]],
+                dtypes: Optional[Dict[str, str]] = None):
+    """
+    Записує одну вкладку у файл path.
+
+    Args:
+        fmt: parquet | arrow | csv
+        dtypes: підказки типів для рядкових чисел ({"spend": "float64", "clicks": "int64"})
+
+    Raises:
+        PyArrowUnavailable: parquet/arrow без pyarrow
+    """
+    if fmt == "csv":
+        _write_csv_table(path, columns, rows)
+    else:
+        _write_arrow_table(path, fmt, columns, rows, dtypes or {})
+
+
+def export_tables(tables: Sequence[Table], fmt: str, basename: str,
+                  dtypes: Optional[Dict[str, str]] = None) -> Tuple[str, str, str]:
+    """
+    Записує вкладки у тимчасовий файл: одна вкладка - файл формату fmt,
+    кілька - ZIP з файлом на вкладку.
+
+    Returns:
+        (шлях до тимчасового файлу, ім'я файлу для завантаження, media type)
+    """
+    if fmt not in COLUMNAR_FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    if fmt != "csv":
+        _pyarrow()
+
+    if len(tables) == 1:
+        name, columns, rows = tables[0]
+        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=f"_{name}.{fmt}")
+        temp_file.close()
+        write_table(temp_file.name, fmt, columns, rows, dtypes)
+        return temp_file.name, f"{basename}.{fmt}", MEDIA_TYPES[fmt]
+
+    archive = tempfile.NamedTemporaryFile(delete=False, suffix=f"_{basename}.zip")
+    archive.close()
+    # parquet/arrow вже стиснені всередині - у ZIP без повторного стиснення
+    compression = zipfile.ZIP_DEFLATED if fmt == "csv" else zipfile.ZIP_STORED
+    with zipfile.ZipFile(archive.name, "w", compression=compression) as zf:
+        for name, columns, rows in tables:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                path = os.path.join(tmp_dir, f"{name}.{fmt}")
+                write_table(path, fmt, columns, rows, dtypes)
+                zf.write(path, arcname=f"{name}.{fmt}")
+    return archive.name, f"{basename}.zip", MEDIA_TYPES["zip"]
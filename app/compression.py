@@ -0,0 +1,205 @@
+"""
+Стиснення відповідей та умовні GET (ETag / If-None-Match → 304).
+
+CompressionMiddleware - ASGI middleware для повністю сформованих відповідей
+(JSON звіти /api/meta-data, /api/students-with-journey, /api/search-history/{id}...):
+
+- ETag = хеш вмісту (blake2b) нестисненого тіла, для GET/HEAD з кодом 200;
+  якщо If-None-Match збігається - 304 без тіла
+- brotli (якщо встановлено пакет brotli) або gzip згідно з Accept-Encoding,
+  лише для тіл не менших за COMPRESSION_MIN_SIZE і текстових content-type
+
+Потокові відповіді (без Content-Length: NDJSON логів, експорт) та вже стиснені
+(Content-Encoding) проходять без змін; ETag, встановлений endpoint'ом, не замінюється.
+"""
+import gzip
+import hashlib
+import os
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:  # pragma: no cover - залежить від оточення
+    brotli = None
+    BROTLI_AVAILABLE = False
+
+
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "image/svg+xml")
+
+
+def etag_for(body: bytes) -> str:
+    """Слабкий ETag з хешу вмісту (однаковий для всіх Content-Encoding)."""
+    return f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Слабке порівняння If-None-Match (список через кому або *) з ETag."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def _accepted_encodings(accept_encoding: str) -> Dict[str, float]:
+    encodings = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            encodings[name.strip().lower()] = quality
+    return encodings
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """'br', 'gzip' або None (identity) для заголовка Accept-Encoding."""
+    if not accept_encoding:
+        return None
+    encodings = _accepted_encodings(accept_encoding)
+    wildcard = encodings.get("*", 0.0)
+    if BROTLI_AVAILABLE and encodings.get("br", wildcard) > 0:
+        return "br"
+    if encodings.get("gzip", wildcard) > 0:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str, gzip_level: int = 6, brotli_quality: int = 4) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=brotli_quality)
+    # mtime=0: однаковий вміст - однакові байти (стабільні розміри для кешів)
+    return gzip.compress(body, compresslevel=gzip_level, mtime=0)
+
+
+def _is_compressible(content_type: str) -> bool:
+    return any(content_type.startswith(prefix) for prefix in COMPRESSIBLE_TYPES)
+
+
+Headers = List[Tuple[bytes, bytes]]
+
+
+def _get_header(headers: Headers, name: bytes) -> Optional[str]:
+    for key, value in headers:
+        if key.lower() == name:
+            return value.decode("latin-1")
+    return None
+
+
+def _without(headers: Headers, *names: bytes) -> Headers:
+    return [(key, value) for key, value in headers if key.lower() not in names]
+
+
+class CompressionMiddleware:
+    """ASGI middleware: ETag/304 та gzip/brotli стиснення буферизованих відповідей."""
+
+    def __init__(
+        self,
+        app,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+        etag: bool = True,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.etag = etag
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = {key.decode("latin-1").lower(): value.decode("latin-1") for key, value in scope["headers"]}
+        method = scope["method"]
+        start_message = None
+        chunks: List[bytes] = []
+        passthrough = False
+
+        async def wrapped_send(message):
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                start_message = message
+                headers = message.get("headers", [])
+                if (
+                    _get_header(headers, b"content-length") is None
+                    or _get_header(headers, b"content-encoding") is not None
+                ):
+                    passthrough = True
+                    await send(message)
+                return
+
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+            await self._send_buffered(start_message, b"".join(chunks), method, request_headers, send)
+
+        await self.app(scope, receive, wrapped_send)
+
+    async def _send_buffered(self, start_message, body: bytes, method: str, request_headers, send):
+        status = start_message["status"]
+        headers: Headers = list(start_message.get("headers", []))
+        content_type = _get_header(headers, b"content-type") or ""
+        compressible = _is_compressible(content_type)
+
+        if self.etag and compressible and status == 200 and method in ("GET", "HEAD"):
+            etag = _get_header(headers, b"etag")
+            if etag is None:
+                etag = etag_for(body)
+                headers.append((b"etag", etag.encode("latin-1")))
+            if etag_matches(request_headers.get("if-none-match"), etag):
+                headers = _without(headers, b"content-length", b"content-type")
+                await send({"type": "http.response.start", "status": 304, "headers": headers})
+                await send({"type": "http.response.body", "body": b""})
+                return
+
+        if compressible and len(body) >= self.minimum_size:
+            encoding = negotiate_encoding(request_headers.get("accept-encoding"))
+            if encoding:
+                body = compress(body, encoding, self.gzip_level, self.brotli_quality)
+                headers = _without(headers, b"content-length")
+                headers += [
+                    (b"content-encoding", encoding.encode("latin-1")),
+                    (b"content-length", str(len(body)).encode("latin-1")),
+                ]
+            vary = _get_header(headers, b"vary")
+            if vary is None:
+                headers.append((b"vary", b"Accept-Encoding"))
+            elif "accept-encoding" not in vary.lower():
+                headers = _without(headers, b"vary") + [(b"vary", f"{vary}, Accept-Encoding".encode("latin-1"))]
+
+        await send({**start_message, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+
+def compression_options_from_env() -> Dict[str, int]:
+    """Налаштування CompressionMiddleware з оточення (COMPRESSION_*)."""
+    return {
+        "minimum_size": int(os.getenv("COMPRESSION_MIN_SIZE", "1024")),
+        "gzip_level": int(os.getenv("COMPRESSION_GZIP_LEVEL", "6")),
+        "brotli_quality": int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4")),
+        "etag": os.getenv("RESPONSE_ETAG_ENABLED", "true").lower() == "true",
+    }
@@ -31,6 +31,9 @@ SECRET_KEYS = {
     "ALFACRM_API_KEY",
 }
 
+# Incremented on every config change; used to invalidate cached reports
+_config_version = 0
+
 
 def _mask(value: str) -> Tuple[bool, str]:
     if not value:
@@ -50,11 +53,17 @@ def get_config_masked() -> Dict[str, Dict[str, str]]:
     return out
 
 
+def get_config_version() -> int:
+    return _config_version
+
+
 def set_config(values: Dict[str, str]):
+    global _config_version
     # Filter only allowed keys
     updates = {k: v for k, v in values.items() if k in ALLOWED_KEYS and v is not None}
     if not updates:
         return
+    _config_version += 1
     # Update in-memory env
     for k, v in updates.items():
         os.environ[k] = str(v)
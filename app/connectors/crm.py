@@ -13,11 +13,13 @@ from tenacity import (
 
 # Import helper function from google_sheets module
 from .google_sheets import _extract_field
+from app.metrics import instrument_upstream
 
 logger = logging.getLogger(__name__)
 
 CRM_TIMEOUT = int(os.getenv("CRM_API_TIMEOUT", "15"))
 CRM_MAX_RETRIES = int(os.getenv("CRM_API_MAX_RETRIES", "2"))
+NETHUNT_API_URL = os.getenv("NETHUNT_API_URL", "https://api.nethunt.com/api/v1").rstrip("/")
 
 
 def _get_branch_ids() -> List[int]:
@@ -461,12 +463,13 @@ def _build_nethunt_funnel_path(status: str, stage: str) -> List[str]:
     retry=retry_if_exception_type((requests.exceptions.Timeout, requests.exceptions.ConnectionError)),
     before_sleep=before_sleep_log(logger, logging.WARNING)
 )
+@instrument_upstream("nethunt_folders")
 def nethunt_list_folders() -> List[Dict[str, Any]]:
     auth = os.getenv("NETHUNT_BASIC_AUTH")
     if not auth:
         raise RuntimeError("NETHUNT_BASIC_AUTH is not set")
     try:
-        resp = requests.get("https://api.nethunt.com/api/v1/folders", headers={"Authorization": auth}, timeout=CRM_TIMEOUT)
+        resp = requests.get(f"{NETHUNT_API_URL}/folders", headers={"Authorization": auth}, timeout=CRM_TIMEOUT)
         resp.raise_for_status()
         return resp.json()
     except requests.exceptions.HTTPError as e:
@@ -483,11 +486,12 @@ def nethunt_list_folders() -> List[Dict[str, Any]]:
     retry=retry_if_exception_type((requests.exceptions.Timeout, requests.exceptions.ConnectionError)),
     before_sleep=before_sleep_log(logger, logging.WARNING)
 )
+@instrument_upstream("nethunt_folder_fields")
 def nethunt_folder_fields(folder_id: str) -> Dict[str, Any]:
     auth = os.getenv("NETHUNT_BASIC_AUTH")
     if not auth:
         raise RuntimeError("NETHUNT_BASIC_AUTH is not set")
-    url = f"https://api.nethunt.com/api/v1/folders/{folder_id}/fields"
+    url = f"{NETHUNT_API_URL}/folders/{folder_id}/fields"
     try:
         resp = requests.get(url, headers={"Authorization": auth}, timeout=CRM_TIMEOUT)
         resp.raise_for_status()
@@ -503,12 +507,13 @@ def nethunt_folder_fields(folder_id: str) -> Dict[str, Any]:
     retry=retry_if_exception_type((requests.exceptions.Timeout, requests.exceptions.ConnectionError)),
     before_sleep=before_sleep_log(logger, logging.WARNING)
 )
+@instrument_upstream("nethunt_records")
 def nethunt_list_records(folder_id: str, limit: int = 500) -> List[Dict[str, Any]]:
     """List records from a NetHunt folder (simple pagination)."""
     auth = os.getenv("NETHUNT_BASIC_AUTH")
     if not auth:
         raise RuntimeError("NETHUNT_BASIC_AUTH is not set")
-    url = f"https://api.nethunt.com/api/v1/folders/{folder_id}/records"
+    url = f"{NETHUNT_API_URL}/folders/{folder_id}/records"
     params = {"limit": min(max(limit, 1), 1000)}
     try:
         resp = requests.get(url, headers={"Authorization": auth}, params=params, timeout=CRM_TIMEOUT)
@@ -530,6 +535,7 @@ def nethunt_list_records(folder_id: str, limit: int = 500) -> List[Dict[str, Any
     retry=retry_if_exception_type((requests.exceptions.Timeout, requests.exceptions.ConnectionError)),
     before_sleep=before_sleep_log(logger, logging.WARNING)
 )
+@instrument_upstream("alfacrm_auth")
 def alfacrm_auth_get_token() -> str:
     base_url = os.getenv("ALFACRM_BASE_URL")
     email = os.getenv("ALFACRM_EMAIL")
@@ -556,6 +562,7 @@ def alfacrm_auth_get_token() -> str:
     retry=retry_if_exception_type((requests.exceptions.Timeout, requests.exceptions.ConnectionError)),
     before_sleep=before_sleep_log(logger, logging.WARNING)
 )
+@instrument_upstream("alfacrm_company_index")
 def alfacrm_list_companies() -> Dict[str, Any]:
     token = alfacrm_auth_get_token()
     base_url = os.getenv("ALFACRM_BASE_URL")
@@ -575,6 +582,7 @@ def alfacrm_list_companies() -> Dict[str, Any]:
     retry=retry_if_exception_type((requests.exceptions.Timeout, requests.exceptions.ConnectionError)),
     before_sleep=before_sleep_log(logger, logging.WARNING)
 )
+@instrument_upstream("alfacrm_customer_index")
 def alfacrm_list_students(page: int = 1, page_size: int = 200) -> Dict[str, Any]:
     """Fetch students list from AlfaCRM. Uses customer/index with branch_ids filter."""
     token = alfacrm_auth_get_token()
@@ -601,6 +609,7 @@ def alfacrm_list_students(page: int = 1, page_size: int = 200) -> Dict[str, Any]
     retry=retry_if_exception_type((requests.exceptions.Timeout, requests.exceptions.ConnectionError)),
     before_sleep=before_sleep_log(logger, logging.WARNING)
 )
+@instrument_upstream("alfacrm_customer_index")
 def alfacrm_list_all_leads(page: int = 1, page_size: int = 500, is_study: int = 0) -> Dict[str, Any]:
     """
     Fetch ALL leads from AlfaCRM (active + archived).
@@ -1,13 +1,14 @@
 import os
 import logging
 from typing import List, Dict, Any
-from openpyxl import Workbook, load_workbook
-from openpyxl.utils import get_column_letter
 
 logger = logging.getLogger(__name__)
 
 
 def _ensure_book(path: str):
+    # openpyxl імпортується при першому експорті, а не на старті застосунку
+    from openpyxl import Workbook, load_workbook
+
     if os.path.exists(path):
         try:
             wb = load_workbook(path)
@@ -26,6 +27,8 @@ def _ensure_book(path: str):
 
 def _write_table(path: str, sheet_name: str, headers: List[str], rows: List[List[Any]]):
     """Create/overwrite a sheet completely (legacy helper)."""
+    from openpyxl.utils import get_column_letter
+
     try:
         wb = _ensure_book(path)
         if sheet_name in wb.sheetnames:
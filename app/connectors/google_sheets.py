@@ -1,17 +1,18 @@
 import os
+import sys
 import logging
 from typing import List, Dict, Any
 
-import gspread
-from google.oauth2.service_account import Credentials
 from tenacity import (
     retry,
     stop_after_attempt,
     wait_exponential,
-    retry_if_exception_type,
+    retry_if_exception,
     before_sleep_log
 )
 
+from app.metrics import instrument_upstream
+
 logger = logging.getLogger(__name__)
 
 GSHEETS_MAX_RETRIES = int(os.getenv("GSHEETS_MAX_RETRIES", "3"))
@@ -23,7 +24,17 @@ SCOPES = [
 ]
 
 
+def _is_api_error(exc: BaseException) -> bool:
+    # gspread імпортується лише в get_client (≈150 мс на старті застосунку);
+    # якщо його немає в sys.modules, помилка точно не з gspread
+    gspread = sys.modules.get("gspread")
+    return gspread is not None and isinstance(exc, gspread.exceptions.APIError)
+
+
 def get_client():
+    import gspread
+    from google.oauth2.service_account import Credentials
+
     creds_path = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
     if not creds_path or not os.path.exists(creds_path):
         logger.error(f"GOOGLE_APPLICATION_CREDENTIALS not found: {creds_path}")
@@ -41,10 +52,13 @@ def get_client():
 @retry(
     stop=stop_after_attempt(GSHEETS_MAX_RETRIES),
     wait=wait_exponential(multiplier=1, min=2, max=20),
-    retry=retry_if_exception_type((gspread.exceptions.APIError,)),
+    retry=retry_if_exception(_is_api_error),
     before_sleep=before_sleep_log(logger, logging.WARNING)
 )
+@instrument_upstream("google_sheets")
 def _upsert_worksheet(gc, sheet_id: str, title: str, headers: List[str]):
+    import gspread
+
     try:
         sh = gc.open_by_key(sheet_id)
         logger.debug(f"Opened spreadsheet {sheet_id}")
@@ -75,9 +89,10 @@ def _upsert_worksheet(gc, sheet_id: str, title: str, headers: List[str]):
 @retry(
     stop=stop_after_attempt(GSHEETS_MAX_RETRIES),
     wait=wait_exponential(multiplier=1, min=2, max=20),
-    retry=retry_if_exception_type((gspread.exceptions.APIError,)),
+    retry=retry_if_exception(_is_api_error),
     before_sleep=before_sleep_log(logger, logging.WARNING)
 )
+@instrument_upstream("google_sheets")
 def write_insights(gc, sheet_id: str, insights: List[Dict[str, Any]]):
     headers = [
         "date_start",
@@ -125,9 +140,10 @@ def write_insights(gc, sheet_id: str, insights: List[Dict[str, Any]]):
 @retry(
     stop=stop_after_attempt(GSHEETS_MAX_RETRIES),
     wait=wait_exponential(multiplier=1, min=2, max=20),
-    retry=retry_if_exception_type((gspread.exceptions.APIError,)),
+    retry=retry_if_exception(_is_api_error),
     before_sleep=before_sleep_log(logger, logging.WARNING)
 )
+@instrument_upstream("google_sheets")
 def write_leads(gc, sheet_id: str, leads: List[Dict[str, Any]]):
     headers = [
         "id",
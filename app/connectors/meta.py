@@ -1,6 +1,8 @@
 import os
+import json
+import time
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 import requests
 from tenacity import (
@@ -11,29 +13,110 @@ from tenacity import (
     before_sleep_log
 )
 
+from app.metrics import upstream_call
+
 logger = logging.getLogger(__name__)
 
 
-GRAPH_URL = "https://graph.facebook.com/v19.0"
+# GRAPH_URL можна перевизначити для локальних fake серверів (loadtest/)
+GRAPH_URL = os.getenv("GRAPH_URL", "https://graph.facebook.com/v19.0").rstrip("/")
 
 DEFAULT_TIMEOUT = int(os.getenv("META_API_TIMEOUT", "30"))
 MAX_RETRIES = int(os.getenv("META_API_MAX_RETRIES", "3"))
 
 
+class GraphRateGovernor:
+    """Tracks Graph API rate-limit usage reported in response headers.
+
+    Meta returns the current usage (percent of the quota) in
+    X-App-Usage, X-Ad-Account-Usage and X-Business-Use-Case-Usage.
+    Background work (pre-warm scheduler) checks usage_percent()/blocked_for()
+    and defers itself instead of competing with interactive requests.
+    """
+
+    USAGE_HEADERS = ("x-app-usage", "x-ad-account-usage", "x-business-use-case-usage")
+
+    def __init__(self):
+        self._usage = 0.0
+        self._blocked_until = 0.0
+        self._updated_at = 0.0
+
+    def record(self, headers) -> None:
+        """Update usage from response headers (requests/httpx headers or dict)."""
+        usage_values = []
+        regain_minutes = 0
+        for name in self.USAGE_HEADERS:
+            raw = headers.get(name) if headers else None
+            if not raw:
+                continue
+            try:
+                payload = json.loads(raw)
+            except (TypeError, ValueError):
+                continue
+            # X-Business-Use-Case-Usage: {"<business_id>": [{"call_count": .., ...}]}
+            entries = []
+            if name == "x-business-use-case-usage" and isinstance(payload, dict):
+                for items in payload.values():
+                    entries.extend(items if isinstance(items, list) else [items])
+            else:
+                entries.append(payload)
+            for entry in entries:
+                if not isinstance(entry, dict):
+                    continue
+                for key in ("call_count", "total_cputime", "total_time", "acc_id_util_pct"):
+                    if isinstance(entry.get(key), (int, float)):
+                        usage_values.append(float(entry[key]))
+                regain = entry.get("estimated_time_to_regain_access")
+                if isinstance(regain, (int, float)):
+                    regain_minutes = max(regain_minutes, regain)
+
+        if usage_values:
+            self._usage = max(usage_values)
+            self._updated_at = time.monotonic()
+        if regain_minutes:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + regain_minutes * 60)
+
+    def record_throttled(self, retry_after: Optional[float] = None) -> None:
+        """Mark the quota as exhausted after a 429 / rate-limit error."""
+        self._usage = 100.0
+        self._updated_at = time.monotonic()
+        self._blocked_until = max(self._blocked_until, time.monotonic() + (retry_after or 60))
+
+    def usage_percent(self, max_age: float = 600) -> float:
+        """Last reported usage; readings older than max_age seconds are treated as 0."""
+        if time.monotonic() - self._updated_at > max_age:
+            return 0.0
+        return self._usage
+
+    def blocked_for(self) -> float:
+        """Seconds until Meta lifts throttling (0 if not throttled)."""
+        return max(0.0, self._blocked_until - time.monotonic())
+
+    def allows_background_work(self, max_usage_percent: float) -> bool:
+        return self.blocked_for() == 0 and self.usage_percent() < max_usage_percent
+
+
+graph_governor = GraphRateGovernor()
+
+
 @retry(
     stop=stop_after_attempt(MAX_RETRIES),
     wait=wait_exponential(multiplier=1, min=2, max=30),
     retry=retry_if_exception_type((requests.exceptions.Timeout, requests.exceptions.ConnectionError)),
     before_sleep=before_sleep_log(logger, logging.WARNING)
 )
-def _make_meta_request(url: str, params: dict, timeout: int = DEFAULT_TIMEOUT) -> dict:
+def _make_meta_request(url: str, params: dict, timeout: int = DEFAULT_TIMEOUT, upstream: str = "meta_graph") -> dict:
     try:
-        resp = requests.get(url, params=params, timeout=timeout)
-        resp.raise_for_status()
-        return resp.json()
+        # Метрика на кожен HTTP запит (сторінку, спробу), а не на всю пагінацію
+        with upstream_call(upstream):
+            resp = requests.get(url, params=params, timeout=timeout)
+            graph_governor.record(resp.headers)
+            resp.raise_for_status()
+            return resp.json()
     except requests.exceptions.HTTPError as e:
         if e.response.status_code == 429:
             logger.warning(f"Meta API rate limit hit: {e}")
+            graph_governor.record_throttled()
             raise
         elif e.response.status_code >= 500:
             logger.error(f"Meta API server error: {e.response.status_code} - {e.response.text}")
@@ -52,9 +135,18 @@ def _make_meta_request(url: str, params: dict, timeout: int = DEFAULT_TIMEOUT) -
         raise
 
 
-def fetch_insights(ad_account_id: str, access_token: str, date_from: str, date_to: str, level: str = "campaign") -> List[Dict[str, Any]]:
+def fetch_insights(
+    ad_account_id: str,
+    access_token: str,
+    date_from: str,
+    date_to: str,
+    level: str = "campaign",
+    time_increment: Optional[int] = None
+) -> List[Dict[str, Any]]:
     """Fetch basic insights for campaigns within a date range.
 
+    time_increment=1 returns one row per object per day (date_start == date_stop).
+
     Returns a list of dicts with campaign metrics.
     """
     url = f"{GRAPH_URL}/{ad_account_id}/insights"
@@ -84,6 +176,8 @@ def fetch_insights(ad_account_id: str, access_token: str, date_from: str, date_t
         ]),
         "limit": 500,
     }
+    if time_increment:
+        params["time_increment"] = time_increment
 
     results: List[Dict[str, Any]] = []
     page_count = 0
@@ -91,7 +185,7 @@ def fetch_insights(ad_account_id: str, access_token: str, date_from: str, date_t
         while True:
             page_count += 1
             logger.info(f"Fetching Meta insights page {page_count} for account {ad_account_id}")
-            data = _make_meta_request(url, params)
+            data = _make_meta_request(url, params, upstream="meta_insights")
             results.extend(data.get("data", []))
             paging = data.get("paging", {})
             next_url = paging.get("next")
@@ -192,7 +286,7 @@ def fetch_adset_targeting(adset_ids: List[str], access_token: str) -> Dict[str,
                 "access_token": access_token,
                 "fields": "targeting"
             }
-            data = _make_meta_request(url, params)
+            data = _make_meta_request(url, params, upstream="meta_adset_targeting")
             targeting = data.get("targeting", {})
 
             # Извлекаем локации
@@ -244,7 +338,7 @@ def fetch_ad_creatives(ad_ids: List[str], access_token: str, ad_account_id: str
                 "access_token": access_token,
                 "fields": "creative{name,title,body,image_hash,image_url,video_id,thumbnail_url,object_story_spec}"
             }
-            data = _make_meta_request(url, params)
+            data = _make_meta_request(url, params, upstream="meta_creatives")
             creative_data = data.get("creative", {})
 
             # Extract text from object_story_spec if available
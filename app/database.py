@@ -1,11 +1,20 @@
 """
 Database connection and session management for eCademy.
 
-Provides SQLAlchemy engine and session factory for SQLite database.
+Provides SQLAlchemy engine and session factory for SQLite (local development)
+or PostgreSQL (Railway).
+
+Sessions are synchronous. In the web process, endpoints that only touch the
+database are declared with plain ``def`` so FastAPI runs them in its
+threadpool, and async code (pipeline, /api/meta-data, /api/events SSE,
+schedulers, job enqueue) runs its queries through ``asyncio.to_thread``.
+DatabaseProgressStore writes go through its own writer thread. The job
+worker (``python -m app.worker``) runs its short queue queries (claim,
+complete) inline on its own loop.
 """
 
 import os
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, Session
 from contextlib import contextmanager
 from .models import Base
@@ -18,24 +27,50 @@ logger = logging.getLogger(__name__)
 postgres_url = os.getenv("POSTGRES_DATABASE_URL")
 database_url = os.getenv("DATABASE_URL")
 
+# PostgreSQL pool: size + overflow per process must fit max_connections across all replicas/workers
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))  # seconds to wait for a free connection
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # recycle before server-side idle timeouts
+
+# SQLite: how long a writer waits for the lock instead of failing with "database is locked"
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+
+def _create_postgres_engine(url: str):
+    return create_engine(
+        url,
+        pool_pre_ping=True,  # Перевірка з'єднання перед використанням
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        echo=False,  # Set to True for SQL query logging during development
+    )
+
+
+def _set_sqlite_pragma(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    # WAL: readers never block behind the pipeline writer (and vice versa);
+    # also required for progress/rate limit shared between processes
+    cursor.execute("PRAGMA journal_mode=WAL")
+    # NORMAL is durable in WAL mode except for the last transactions on power loss,
+    # and avoids an fsync on every commit
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.close()
+
+
 if postgres_url:
     # Використовуємо PostgreSQL з Railway
     DB_PATH = postgres_url
     logger.info(f"Using PostgreSQL database: {postgres_url.split('@')[0]}@***")
-    engine = create_engine(
-        DB_PATH,
-        pool_pre_ping=True,  # Перевірка з'єднання перед використанням
-        echo=False,  # Set to True for SQL query logging during development
-    )
+    engine = _create_postgres_engine(DB_PATH)
 elif database_url and database_url.startswith("postgresql"):
     # Використовуємо PostgreSQL з DATABASE_URL
     DB_PATH = database_url
     logger.info(f"Using PostgreSQL database from DATABASE_URL: {database_url.split('@')[0]}@***")
-    engine = create_engine(
-        DB_PATH,
-        pool_pre_ping=True,
-        echo=False,
-    )
+    engine = _create_postgres_engine(DB_PATH)
 else:
     # Fallback до SQLite для локальної розробки
     DB_DIR = os.getenv("DATABASE_DIR", "/app/data" if os.path.exists("/app/data") else ".")
@@ -47,14 +82,19 @@ else:
         connect_args={"check_same_thread": False},  # Needed for SQLite
         echo=False,
     )
+    event.listen(engine, "connect", _set_sqlite_pragma)
 
 # Session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
 def init_db():
-    """Initialize database tables."""
+    """Initialize database tables and indexes."""
     Base.metadata.create_all(bind=engine)
+    # create_all skips tables that already exist, including indexes added to them later
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
 
 
 @contextmanager
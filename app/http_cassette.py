@@ -0,0 +1,384 @@
+"""
+Запис та відтворення HTTP відповідей upstream API (Graph, AlfaCRM, NetHunt).
+
+Працює на рівні транспорту, тому конектори не змінюються:
+- requests: requests.adapters.HTTPAdapter.send
+- httpx: HTTPTransport.handle_request / AsyncHTTPTransport.handle_async_request
+
+Касета - gzip JSON Lines, один рядок на взаємодію. Перед записом з неї
+прибираються токени (access_token, api_key, Authorization, X-ALFACRM-TOKEN),
+телефони та email. Телефони/email замінюються детерміновано (однаковий
+номер → однаковий псевдонім), тому зіставлення лідів Meta з CRM при
+відтворенні дає ті самі результати.
+
+    HTTP_CASSETTE=cassettes/report.jsonl.gz HTTP_CASSETTE_MODE=record uvicorn app.main:app
+    HTTP_CASSETTE=cassettes/report.jsonl.gz HTTP_CASSETTE_MODE=replay HTTP_REPLAY_SPEED=max ...
+
+    with http_cassette.cassette("report.jsonl.gz", mode="replay", speed="original"):
+        await build_meta_report(...)
+
+HTTP_REPLAY_SPEED: original - із записаною тривалістю запитів, max - без
+затримок, число - прискорення (2 = вдвічі швидше).
+"""
+import asyncio
+import atexit
+import base64
+import gzip
+import hashlib
+import http.client
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+logger = logging.getLogger(__name__)
+
+REDACTED = "REDACTED"
+
+SECRET_PARAMS = {"access_token", "token", "api_key", "apikey", "appsecret_proof", "client_secret"}
+SECRET_JSON_KEYS = {"token", "access_token", "api_key", "password"}
+
+# Заголовки відповіді, які потрібні при відтворенні (решта, зокрема cookies, не зберігається);
+# тіло зберігається вже розпакованим
+KEPT_RESPONSE_HEADERS = {
+    "content-type", "x-app-usage", "x-ad-account-usage", "x-business-use-case-usage",
+    "retry-after", "etag", "cache-control", "last-modified",
+}
+
+# Українські номери у будь-якому форматі: +380501234567, 0501234567, +38 (050) 123-45-67
+PHONE_RE = re.compile(r"(?<![\w])(?:\+?0?38)?[\s\-()]*0(?:[\s\-()]*\d){9}(?!\d)")
+EMAIL_RE = re.compile(r"[A-Za-z0-9._%+\-]+@[A-Za-z0-9.\-]+\.[A-Za-z]{2,}")
+# Токени в рядках (наприклад paging.next з access_token=...)
+TOKEN_IN_TEXT_RE = re.compile(r"((?:access_token|api_key|token)=)[^&\"'\s]+")
+
+
+class CassetteMiss(RuntimeError):
+    """У касеті немає відповіді на запит (режим replay)."""
+
+
+def _pseudonym(value: str, length: int) -> str:
+    digest = hashlib.sha256(f"cassette:{value}".encode()).hexdigest()
+    return str(int(digest, 16) % 10 ** length).zfill(length)
+
+
+def _scrub_phone(match: re.Match) -> str:
+    text = match.group(0)
+    digits = [c for c in text if c.isdigit()]
+    fake = iter(_pseudonym("".join(digits[-9:]), 9))
+    # Замінюємо останні 9 цифр, зберігаючи префікс та роздільники
+    to_replace = 9
+    chars = list(text)
+    for i in range(len(chars) - 1, -1, -1):
+        if to_replace and chars[i].isdigit():
+            chars[i] = "#"
+            to_replace -= 1
+    return "".join(next(fake) if c == "#" else c for c in chars)
+
+
+def _scrub_email(match: re.Match) -> str:
+    return f"user{_pseudonym(match.group(0).lower(), 8)}@example.com"
+
+
+def scrub_text(text: str) -> str:
+    text = TOKEN_IN_TEXT_RE.sub(lambda m: m.group(1) + REDACTED, text)
+    text = EMAIL_RE.sub(_scrub_email, text)
+    return PHONE_RE.sub(_scrub_phone, text)
+
+
+def _scrub_json(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {
+            key: REDACTED if key.lower() in SECRET_JSON_KEYS else _scrub_json(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [_scrub_json(item) for item in value]
+    if isinstance(value, str):
+        return scrub_text(value)
+    return value
+
+
+def scrub_url(url: str) -> str:
+    parts = urlsplit(url)
+    query = [
+        (key, REDACTED if key.lower() in SECRET_PARAMS else scrub_text(value))
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+    ]
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), ""))
+
+
+def scrub_body(body: bytes, content_type: str = "") -> Tuple[Optional[str], Optional[str]]:
+    """(text, base64) - JSON/текст очищується, бінарні дані (картинки) зберігаються як є."""
+    if not body:
+        return "", None
+    if "image/" in content_type or "octet-stream" in content_type:
+        return None, base64.b64encode(body).decode()
+    try:
+        text = body.decode("utf-8")
+    except UnicodeDecodeError:
+        return None, base64.b64encode(body).decode()
+    try:
+        return json.dumps(_scrub_json(json.loads(text)), ensure_ascii=False), None
+    except ValueError:
+        return scrub_text(text), None
+
+
+def request_key(method: str, url: str, body: bytes = b"", content_type: str = "") -> str:
+    """Ключ зіставлення запиту: метод + очищений URL + очищене тіло (токени не впливають)."""
+    text, encoded = scrub_body(body, content_type)
+    return f"{method.upper()} {scrub_url(url)} {hashlib.sha256((text or encoded or '').encode()).hexdigest()[:16]}"
+
+
+class Cassette:
+    def __init__(self, path: str, mode: str, speed: str = "original"):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.speed = speed
+        self._lock = threading.Lock()
+        self._recorded: List[Dict[str, Any]] = []
+        self._replay: Dict[str, Deque[Dict[str, Any]]] = defaultdict(deque)
+        self._last: Dict[str, Dict[str, Any]] = {}
+        if mode == "replay":
+            self._load()
+
+    # --- запис ---
+
+    def record(self, method: str, url: str, request_body: bytes, request_type: str,
+               status: int, headers: Dict[str, str], body: bytes, elapsed: float) -> None:
+        headers = {k.lower(): v for k, v in headers.items()}
+        text, encoded = scrub_body(body, headers.get("content-type", ""))
+        interaction = {
+            "key": request_key(method, url, request_body, request_type),
+            "method": method.upper(),
+            "url": scrub_url(url),
+            "status": status,
+            "headers": {k: v for k, v in headers.items() if k in KEPT_RESPONSE_HEADERS},
+            "body": text,
+            "body_b64": encoded,
+            "elapsed": round(elapsed, 4),
+        }
+        with self._lock:
+            self._recorded.append(interaction)
+
+    def save(self) -> int:
+        with self._lock:
+            interactions, self._recorded = self._recorded, []
+        if not interactions:
+            return 0
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        # Дописуємо (gzip підтримує кілька members в одному файлі)
+        with gzip.open(self.path, "at", encoding="utf-8") as f:
+            for interaction in interactions:
+                f.write(json.dumps(interaction, ensure_ascii=False) + "\n")
+        logger.info(f"Cassette {self.path}: saved {len(interactions)} interactions")
+        return len(interactions)
+
+    # --- відтворення ---
+
+    def _load(self) -> None:
+        count = 0
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    interaction = json.loads(line)
+                    self._replay[interaction["key"]].append(interaction)
+                    count += 1
+        logger.info(f"Cassette {self.path}: loaded {count} interactions")
+
+    def match(self, method: str, url: str, body: bytes = b"", content_type: str = "") -> Dict[str, Any]:
+        """Відповіді на однакові запити віддаються в порядку запису; останню повторюємо."""
+        key = request_key(method, url, body, content_type)
+        with self._lock:
+            queue = self._replay.get(key)
+            if queue:
+                self._last[key] = queue.popleft()
+            interaction = self._last.get(key)
+        if interaction is None:
+            raise CassetteMiss(f"No recorded response for {method.upper()} {scrub_url(url)}")
+        return interaction
+
+    def delay(self, interaction: Dict[str, Any]) -> float:
+        if self.speed == "max":
+            return 0.0
+        factor = 1.0 if self.speed == "original" else float(self.speed)
+        return interaction.get("elapsed", 0.0) / factor
+
+    @staticmethod
+    def body_of(interaction: Dict[str, Any]) -> bytes:
+        if interaction.get("body_b64"):
+            return base64.b64decode(interaction["body_b64"])
+        return (interaction.get("body") or "").encode("utf-8")
+
+
+_active: Optional[Cassette] = None
+_originals: Dict[str, Any] = {}
+
+
+# ============================================================================
+# requests
+# ============================================================================
+
+
+def _requests_send(adapter: HTTPAdapter, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+    cassette = _active
+    body = request.body or b""
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    content_type = request.headers.get("Content-Type", "")
+
+    if cassette is None:
+        return _originals["requests"](adapter, request, **kwargs)
+
+    if cassette.mode == "record":
+        started = time.perf_counter()
+        response = _originals["requests"](adapter, request, **kwargs)
+        cassette.record(request.method, request.url, body, content_type, response.status_code,
+                        dict(response.headers), response.content, time.perf_counter() - started)
+        return response
+
+    interaction = cassette.match(request.method, request.url, body, content_type)
+    time.sleep(cassette.delay(interaction))
+    response = requests.Response()
+    response.status_code = interaction["status"]
+    response.reason = http.client.responses.get(interaction["status"], "")
+    response.headers = CaseInsensitiveDict(interaction["headers"])
+    response._content = Cassette.body_of(interaction)
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+    response.url = request.url
+    response.request = request
+    response.elapsed = timedelta(seconds=interaction.get("elapsed", 0.0))
+    response.connection = adapter
+    return response
+
+
+# ============================================================================
+# httpx
+# ============================================================================
+
+
+def _httpx_replay(cassette: Cassette, request: httpx.Request) -> Tuple[httpx.Response, float]:
+    interaction = cassette.match(
+        request.method, str(request.url), request.content, request.headers.get("content-type", "")
+    )
+    response = httpx.Response(
+        interaction["status"],
+        headers=interaction["headers"],
+        content=Cassette.body_of(interaction),
+        request=request,
+    )
+    return response, cassette.delay(interaction)
+
+
+def _httpx_record(cassette: Cassette, request: httpx.Request, response: httpx.Response, body: bytes, elapsed: float):
+    cassette.record(request.method, str(request.url), request.content, request.headers.get("content-type", ""),
+                    response.status_code, dict(response.headers), body, elapsed)
+    # Тіло вже прочитане і розпаковане - віддаємо клієнту без content-encoding
+    headers = [(k, v) for k, v in response.headers.items() if k.lower() not in ("content-encoding", "content-length", "transfer-encoding")]
+    return httpx.Response(response.status_code, headers=headers, content=body, request=request,
+                          extensions=response.extensions)
+
+
+def _httpx_handle(transport: httpx.HTTPTransport, request: httpx.Request) -> httpx.Response:
+    cassette = _active
+    if cassette is None:
+        return _originals["httpx"](transport, request)
+    if cassette.mode == "replay":
+        response, delay = _httpx_replay(cassette, request)
+        time.sleep(delay)
+        return response
+    started = time.perf_counter()
+    response = _originals["httpx"](transport, request)
+    body = response.read()
+    response.close()
+    return _httpx_record(cassette, request, response, body, time.perf_counter() - started)
+
+
+async def _httpx_handle_async(transport: httpx.AsyncHTTPTransport, request: httpx.Request) -> httpx.Response:
+    cassette = _active
+    if cassette is None:
+        return await _originals["httpx_async"](transport, request)
+    if cassette.mode == "replay":
+        response, delay = _httpx_replay(cassette, request)
+        if delay:
+            await asyncio.sleep(delay)
+        return response
+    started = time.perf_counter()
+    response = await _originals["httpx_async"](transport, request)
+    body = await response.aread()
+    await response.aclose()
+    return _httpx_record(cassette, request, response, body, time.perf_counter() - started)
+
+
+# ============================================================================
+# Керування
+# ============================================================================
+
+
+def _patch() -> None:
+    if _originals:
+        return
+    _originals["requests"] = HTTPAdapter.send
+    _originals["httpx"] = httpx.HTTPTransport.handle_request
+    _originals["httpx_async"] = httpx.AsyncHTTPTransport.handle_async_request
+    HTTPAdapter.send = _requests_send
+    httpx.HTTPTransport.handle_request = _httpx_handle
+    httpx.AsyncHTTPTransport.handle_async_request = _httpx_handle_async
+
+
+def _unpatch() -> None:
+    if not _originals:
+        return
+    HTTPAdapter.send = _originals.pop("requests")
+    httpx.HTTPTransport.handle_request = _originals.pop("httpx")
+    httpx.AsyncHTTPTransport.handle_async_request = _originals.pop("httpx_async")
+
+
+def start(path: str, mode: str, speed: str = "original") -> Cassette:
+    global _active
+    stop()
+    _active = Cassette(path, mode, speed)
+    _patch()
+    logger.warning(f"HTTP cassette {mode}: {path} (speed={speed})")
+    return _active
+
+
+def stop() -> None:
+    global _active
+    cassette, _active = _active, None
+    _unpatch()
+    if cassette is not None and cassette.mode == "record":
+        cassette.save()
+
+
+@contextmanager
+def cassette(path: str, mode: str = "replay", speed: str = "original") -> Iterator[Cassette]:
+    active = start(path, mode, speed)
+    try:
+        yield active
+    finally:
+        stop()
+
+
+def install_from_env() -> Optional[Cassette]:
+    """HTTP_CASSETTE + HTTP_CASSETTE_MODE=record|replay; без них нічого не робить."""
+    path = os.getenv("HTTP_CASSETTE")
+    mode = os.getenv("HTTP_CASSETTE_MODE", "").lower()
+    if not path or mode not in ("record", "replay"):
+        return None
+    active = start(path, mode, os.getenv("HTTP_REPLAY_SPEED", "original"))
+    atexit.register(stop)
+    return active
@@ -0,0 +1,268 @@
+"""
+Дисковий LRU кеш зображень креативів для /api/proxy-image.
+
+- content-addressed: файл зберігається під sha256 свого вмісту (blobs/ab/abcd...),
+  тому однакові креативи з різними підписаними URL займають місце один раз;
+  sha256 вмісту також використовується як ETag
+- індекс url → blob зберігається поруч (index/<sha256(key)>.json) і
+  відновлюється після перезапуску
+- розмір кешу обмежений IMAGE_CACHE_MAX_MB, найстаріші за доступом blob'и
+  видаляються (LRU)
+
+Мережа тут не використовується - лише спільний httpx клієнт (get_http_client),
+завантаження потоково пишеться через writer() під час віддачі клієнту.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CachedImage:
+    path: str
+    content_type: str
+    etag: str
+    size: int
+
+
+class ImageCache:
+    """Content-addressed кеш на диску з обмеженням розміру та LRU витісненням."""
+
+    def __init__(self, root: str, max_bytes: int = 200 * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._blob_dir = os.path.join(root, "blobs")
+        self._index_dir = os.path.join(root, "index")
+        os.makedirs(self._blob_dir, exist_ok=True)
+        os.makedirs(self._index_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        # key_hash -> {"blob": sha256, "content_type": ...}
+        self._index: Dict[str, Dict[str, str]] = {}
+        # blob -> size, від найдавнішого доступу до найновішого
+        self._blobs: "OrderedDict[str, int]" = OrderedDict()
+        self._refs: Dict[str, Set[str]] = {}
+        self._total_bytes = 0
+        self._stats: Dict[str, int] = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        self._load()
+
+    @staticmethod
+    def _key_hash(key: str) -> str:
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def _blob_path(self, blob: str) -> str:
+        return os.path.join(self._blob_dir, blob[:2], blob)
+
+    def _index_path(self, key_hash: str) -> str:
+        return os.path.join(self._index_dir, f"{key_hash}.json")
+
+    def _load(self):
+        """Відновлює індекс з диска; порядок LRU - за mtime blob'ів (оновлюється при hit)."""
+        blobs = []
+        for sub in os.listdir(self._blob_dir):
+            sub_dir = os.path.join(self._blob_dir, sub)
+            if not os.path.isdir(sub_dir):
+                continue
+            for name in os.listdir(sub_dir):
+                stat = os.stat(os.path.join(sub_dir, name))
+                blobs.append((stat.st_mtime, name, stat.st_size))
+        for _, name, size in sorted(blobs):
+            self._blobs[name] = size
+            self._total_bytes += size
+
+        for name in os.listdir(self._index_dir):
+            if not name.endswith(".json"):
+                continue
+            key_hash = name[:-5]
+            try:
+                with open(os.path.join(self._index_dir, name), encoding="utf-8") as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if entry.get("blob") in self._blobs:
+                self._index[key_hash] = entry
+                self._refs.setdefault(entry["blob"], set()).add(key_hash)
+            else:
+                self._remove_file(os.path.join(self._index_dir, name))
+
+        if self._blobs:
+            logger.info(f"[IMAGE_CACHE] Завантажено {len(self._blobs)} зображень ({self._total_bytes // 1024} KB)")
+
+    def get(self, key: str) -> Optional[CachedImage]:
+        key_hash = self._key_hash(key)
+        with self._lock:
+            entry = self._index.get(key_hash)
+            if entry is None or entry["blob"] not in self._blobs:
+                self._stats["misses"] += 1
+                return None
+            blob = entry["blob"]
+            self._blobs.move_to_end(blob)
+            self._stats["hits"] += 1
+            size = self._blobs[blob]
+        path = self._blob_path(blob)
+        try:
+            os.utime(path)
+        except OSError:
+            # blob видалено ззовні - вважаємо промахом
+            with self._lock:
+                self._drop_blob(blob)
+            return None
+        return CachedImage(path=path, content_type=entry["content_type"], etag=blob, size=size)
+
+    def writer(self, key: str, content_type: str) -> "_CacheWriter":
+        """Потоковий запис: write(chunk) під час віддачі, commit() після останнього chunk'а."""
+        return _CacheWriter(self, key, content_type)
+
+    def put(self, key: str, data: bytes, content_type: str) -> Optional[CachedImage]:
+        writer = self.writer(key, content_type)
+        writer.write(data)
+        return writer.commit()
+
+    def _store(self, key: str, content_type: str, tmp_path: str, blob: str, size: int) -> Optional[CachedImage]:
+        if size > self.max_bytes:
+            self._remove_file(tmp_path)
+            return None
+
+        key_hash = self._key_hash(key)
+        path = self._blob_path(blob)
+        entry = {"blob": blob, "content_type": content_type, "key": key[:500]}
+
+        with self._lock:
+            if blob in self._blobs:
+                self._remove_file(tmp_path)
+                self._blobs.move_to_end(blob)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp_path, path)
+                self._blobs[blob] = size
+                self._total_bytes += size
+
+            previous = self._index.get(key_hash)
+            if previous and previous["blob"] != blob:
+                self._refs.get(previous["blob"], set()).discard(key_hash)
+            self._index[key_hash] = entry
+            self._refs.setdefault(blob, set()).add(key_hash)
+            self._stats["stores"] += 1
+
+            with open(self._index_path(key_hash), "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+
+            self._evict()
+
+        return CachedImage(path=path, content_type=content_type, etag=blob, size=size)
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes and self._blobs:
+            blob = next(iter(self._blobs))
+            self._drop_blob(blob)
+            self._stats["evictions"] += 1
+
+    def _drop_blob(self, blob: str):
+        size = self._blobs.pop(blob, None)
+        if size is not None:
+            self._total_bytes -= size
+        self._remove_file(self._blob_path(blob))
+        for key_hash in self._refs.pop(blob, set()):
+            if self._index.get(key_hash, {}).get("blob") == blob:
+                del self._index[key_hash]
+                self._remove_file(self._index_path(key_hash))
+
+    @staticmethod
+    def _remove_file(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "entries": len(self._index),
+                "blobs": len(self._blobs),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hit_ratio": round(self._stats["hits"] / lookups, 3) if lookups else 0.0,
+            }
+
+
+class _CacheWriter:
+    """Пише chunk'и у тимчасовий файл і рахує sha256; blob з'являється лише після commit()."""
+
+    def __init__(self, cache: ImageCache, key: str, content_type: str):
+        self._cache = cache
+        self._key = key
+        self._content_type = content_type
+        self._hash = hashlib.sha256()
+        self._size = 0
+        fd, self._tmp_path = tempfile.mkstemp(dir=cache.root, suffix=".part")
+        self._file = os.fdopen(fd, "wb")
+
+    def write(self, chunk: bytes):
+        if self._file is None:
+            return
+        self._file.write(chunk)
+        self._hash.update(chunk)
+        self._size += len(chunk)
+        if self._size > self._cache.max_bytes:
+            # Не влізе в кеш - далі просто стрімимо без запису
+            self.abort()
+
+    def commit(self) -> Optional[CachedImage]:
+        if self._file is None:
+            return None
+        self._file.close()
+        self._file = None
+        return self._cache._store(self._key, self._content_type, self._tmp_path, self._hash.hexdigest(), self._size)
+
+    def abort(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        ImageCache._remove_file(self._tmp_path)
+
+
+def create_image_cache() -> ImageCache:
+    """IMAGE_CACHE_DIR (за замовчуванням поруч з БД) та IMAGE_CACHE_MAX_MB."""
+    default_dir = os.path.join(os.getenv("DATABASE_DIR", "/app/data" if os.path.exists("/app/data") else "."), "image_cache")
+    return ImageCache(
+        root=os.getenv("IMAGE_CACHE_DIR", default_dir),
+        max_bytes=int(os.getenv("IMAGE_CACHE_MAX_MB", "200")) * 1024 * 1024,
+    )
+
+
+# ============================================================================
+# СПІЛЬНИЙ HTTP КЛІЄНТ
+# ============================================================================
+
+_http_client = None
+
+
+def get_http_client():
+    """Один httpx.AsyncClient з пулом з'єднань на весь процес (keep-alive до CDN)."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        import httpx
+
+        _http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(10.0, connect=5.0),
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+            follow_redirects=True,
+        )
+    return _http_client
+
+
+async def close_http_client():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
@@ -0,0 +1,76 @@
+"""
+Зменшення креативів для /api/proxy-image?w=&h= та вибір формату за Accept.
+
+Pillow - опціональна залежність: без неї (PIL_AVAILABLE=False) endpoint
+віддає оригінал без змін. Сам Pillow імпортується при першому зменшенні,
+а не на старті додатку.
+"""
+import importlib.util
+import io
+import logging
+import os
+from typing import Optional, Tuple
+
+PIL_AVAILABLE = importlib.util.find_spec("PIL") is not None
+
+logger = logging.getLogger(__name__)
+
+
+MAX_DIMENSION = int(os.getenv("IMAGE_RESIZE_MAX_DIMENSION", "1600"))
+JPEG_QUALITY = int(os.getenv("IMAGE_RESIZE_JPEG_QUALITY", "82"))
+WEBP_QUALITY = int(os.getenv("IMAGE_RESIZE_WEBP_QUALITY", "80"))
+
+FORMAT_CONTENT_TYPES = {"webp": "image/webp", "jpeg": "image/jpeg"}
+
+
+def negotiate_format(accept: Optional[str]) -> str:
+    """WebP, якщо браузер його приймає (Accept: image/webp), інакше JPEG."""
+    if accept and "image/webp" in accept.lower():
+        return "webp"
+    return "jpeg"
+
+
+def clamp_size(width: Optional[int], height: Optional[int]) -> Tuple[Optional[int], Optional[int]]:
+    """Обмежує розміри [1, MAX_DIMENSION], щоб не плодити варіанти та не збільшувати зображення."""
+    def clamp(value):
+        if value is None or value <= 0:
+            return None
+        return min(value, MAX_DIMENSION)
+    return clamp(width), clamp(height)
+
+
+def variant_key(url: str, width: Optional[int], height: Optional[int], fmt: str) -> str:
+    """Ключ варіанта в ImageCache (зберігається поруч з оригіналом під ключем url)."""
+    return f"{url}#w={width or ''}&h={height or ''}&fmt={fmt}"
+
+
+def resize_image(data: bytes, width: Optional[int], height: Optional[int], fmt: str) -> bytes:
+    """
+    Вписує зображення в width×height зі збереженням пропорцій (без збільшення).
+
+    Raises:
+        RuntimeError: Pillow не встановлено
+        OSError: дані не є зображенням, яке Pillow може прочитати
+    """
+    if not PIL_AVAILABLE:
+        raise RuntimeError("Pillow is not installed")
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((width or MAX_DIMENSION, height or MAX_DIMENSION))
+
+        output = io.BytesIO()
+        if fmt == "webp":
+            if image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+            image.save(output, format="WEBP", quality=WEBP_QUALITY, method=4)
+        else:
+            if image.mode != "RGB":
+                # JPEG не має прозорості - кладемо на білий фон
+                rgba = image.convert("RGBA")
+                background = Image.new("RGB", rgba.size, (255, 255, 255))
+                background.paste(rgba, mask=rgba.getchannel("A"))
+                image = background
+            image.save(output, format="JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+        return output.getvalue()
@@ -0,0 +1,336 @@
+"""
+Durable job queue on top of the application database (SQLite/PostgreSQL).
+
+Web процес лише ставить задачі в чергу (enqueue), а окремі worker процеси
+(python -m app.worker) забирають їх з лізингом:
+
+- claim: задача переходить у running з lease_expires_at; ліміт одночасних
+  задач кожного типу перевіряється під блокуванням типу (PostgreSQL -
+  advisory lock, SQLite - серіалізовані записи)
+- heartbeat: worker періодично подовжує lease
+- complete / fail: fail з вичерпаними спробами → failed, інакше назад у
+  queued з експоненційним backoff (run_after)
+- reclaim_expired: задачі з простроченим lease (worker впав, деплой)
+  повертаються в чергу
+
+Статус задачі дублюється в PipelineRun (queued → running → success/error),
+тому історія запусків у UI показує і задачі з черги.
+"""
+import json
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import func, select, text
+from sqlalchemy.orm import Session
+
+from .models import Job, PipelineRun
+
+logger = logging.getLogger(__name__)
+
+
+JOB_TYPE_PIPELINE = "pipeline"
+JOB_TYPE_ANALYTICS = "analytics"
+
+ACTIVE_STATUSES = ("queued", "running")
+
+RETRY_BASE_SECONDS = int(os.getenv("JOB_RETRY_BASE_SECONDS", "30"))
+RETRY_MAX_SECONDS = int(os.getenv("JOB_RETRY_MAX_SECONDS", "900"))
+
+# Простір ключів pg_advisory_xact_lock(namespace, hashtext(job_type)) для claim_next
+CLAIM_LOCK_NAMESPACE = 0x4A4F42
+
+
+def is_enabled() -> bool:
+    """Черга вмикається через JOB_QUEUE_ENABLED (інакше - BackgroundTasks у web процесі)."""
+    return os.getenv("JOB_QUEUE_ENABLED", "false").lower() == "true"
+
+
+def parse_concurrency(config: str, default: int = 1) -> Dict[str, int]:
+    """Розбирає ліміти одночасних задач: "pipeline=1,analytics=2"."""
+    limits = {JOB_TYPE_PIPELINE: default, JOB_TYPE_ANALYTICS: default}
+    for item in config.split(","):
+        if "=" not in item:
+            continue
+        job_type, limit = item.split("=", 1)
+        try:
+            limits[job_type.strip()] = max(1, int(limit))
+        except ValueError:
+            logger.warning(f"[QUEUE] Невірний ліміт конкурентності: '{item}'")
+    return limits
+
+
+def retry_delay(attempts: int) -> int:
+    """Backoff перед наступною спробою: base * 2^(attempts-1), не більше max."""
+    return min(RETRY_BASE_SECONDS * 2 ** max(attempts - 1, 0), RETRY_MAX_SECONDS)
+
+
+def _sync_run(db: Session, job_id: str, status: str, error: Optional[str] = None):
+    """Оновлює статус відповідного PipelineRun (якщо він є)."""
+    run = db.query(PipelineRun).filter(PipelineRun.job_id == job_id).first()
+    if not run:
+        return
+    run.status = status
+    if error is not None:
+        run.error_message = error
+    if status in ("success", "error"):
+        run.end_time = datetime.utcnow()
+
+
+# ============================================================================
+# WEB: ПОСТАНОВКА В ЧЕРГУ
+# ============================================================================
+
+
+def enqueue(
+    db: Session,
+    job_type: str,
+    payload: Dict[str, Any],
+    dedupe_key: Optional[str] = None,
+    max_attempts: int = 3,
+    job_id: Optional[str] = None
+) -> Tuple[Job, bool]:
+    """
+    Ставить задачу в чергу.
+
+    Якщо вказано dedupe_key і така задача вже в черзі або виконується -
+    повертає її замість створення нової.
+
+    Returns:
+        (job, created)
+    """
+    if dedupe_key:
+        existing = (
+            db.query(Job)
+            .filter(Job.job_type == job_type, Job.dedupe_key == dedupe_key, Job.status.in_(ACTIVE_STATUSES))
+            .order_by(Job.id)
+            .first()
+        )
+        if existing:
+            return existing, False
+
+    job = Job(
+        job_id=job_id or str(uuid.uuid4()),
+        job_type=job_type,
+        payload_json=json.dumps(payload, ensure_ascii=False),
+        dedupe_key=dedupe_key,
+        status="queued",
+        max_attempts=max_attempts,
+        run_after=datetime.utcnow(),
+    )
+    db.add(job)
+
+    start_date = payload.get("start_date") or payload.get("date_start")
+    end_date = payload.get("end_date") or payload.get("date_stop")
+    if start_date and end_date:
+        db.add(PipelineRun(
+            job_id=job.job_id,
+            start_date=start_date,
+            end_date=end_date,
+            sheet_id=payload.get("sheet_id"),
+            storage_backend=os.getenv("STORAGE_BACKEND", "sheets"),
+            status="queued",
+        ))
+
+    db.commit()
+    db.refresh(job)
+    logger.info(f"[QUEUE] Поставлено {job_type} {job.job_id}")
+    return job, True
+
+
+def get_job(db: Session, job_id: str) -> Optional[Job]:
+    return db.query(Job).filter(Job.job_id == job_id).first()
+
+
+def queue_depth(db: Session) -> Dict[str, Dict[str, int]]:
+    """Кількість задач по типах і статусах: {"pipeline": {"queued": 2, "running": 1}}."""
+    rows = (
+        db.query(Job.job_type, Job.status, func.count(Job.id))
+        .filter(Job.status.in_(ACTIVE_STATUSES))
+        .group_by(Job.job_type, Job.status)
+        .all()
+    )
+    depth: Dict[str, Dict[str, int]] = {}
+    for job_type, status, count in rows:
+        depth.setdefault(job_type, {})[status] = count
+    return depth
+
+
+# ============================================================================
+# WORKER: ЛІЗИНГ ТА СТАТУСИ
+# ============================================================================
+
+
+def _lock_job_type(db: Session, job_type: str):
+    """
+    Серіалізує claim_next одного типу до кінця транзакції.
+
+    PostgreSQL: транзакційний advisory lock - без нього під READ COMMITTED два
+    worker'и беруть різні задачі одночасно, обидва бачать running == 0 і
+    перевищують ліміт. SQLite серіалізує записи сам, блокування не потрібне.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(
+            text("SELECT pg_advisory_xact_lock(:namespace, hashtext(:job_type))"),
+            {"namespace": CLAIM_LOCK_NAMESPACE, "job_type": job_type},
+        )
+
+
+def _candidate_stmt(job_type: str, now: datetime):
+    """Найстаріша готова задача типу; рядки, вже заблоковані іншим claim, пропускаються."""
+    return (
+        select(Job.id)
+        .where(Job.status == "queued", Job.job_type == job_type, Job.run_after <= now)
+        .order_by(Job.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    )
+
+
+def claim_next(
+    db: Session,
+    worker_id: str,
+    job_types: Iterable[str],
+    concurrency: Dict[str, int],
+    lease_seconds: int
+) -> Optional[Job]:
+    """
+    Забирає найстарішу готову задачу одного з типів, якщо ліміт типу не вичерпано.
+
+    Підрахунок running і UPDATE виконуються в одній транзакції під блокуванням
+    типу (_lock_job_type), тому наступний claim цього типу бачить уже
+    зафіксовану задачу і ліміт не перевищується ні на SQLite, ні на PostgreSQL.
+    """
+    now = datetime.utcnow()
+    for job_type in job_types:
+        limit = concurrency.get(job_type, 1)
+        _lock_job_type(db, job_type)
+        candidate = db.execute(_candidate_stmt(job_type, now)).first()
+        if not candidate:
+            db.commit()  # знімає блокування типу
+            continue
+
+        running = (
+            select(func.count(Job.id))
+            .where(Job.job_type == job_type, Job.status == "running", Job.lease_expires_at > now)
+            .scalar_subquery()
+        )
+        updated = (
+            db.query(Job)
+            .filter(Job.id == candidate.id, Job.status == "queued", running < limit)
+            .update({
+                Job.status: "running",
+                Job.lease_owner: worker_id,
+                Job.lease_expires_at: now + timedelta(seconds=lease_seconds),
+                Job.heartbeat_at: now,
+                Job.started_at: now,
+                Job.attempts: Job.attempts + 1,
+            }, synchronize_session=False)
+        )
+        db.commit()
+        if not updated:
+            continue
+
+        job = db.query(Job).filter(Job.id == candidate.id).first()
+        _sync_run(db, job.job_id, "running")
+        db.commit()
+        logger.info(f"[QUEUE] {worker_id} взяв {job.job_type} {job.job_id} (спроба {job.attempts}/{job.max_attempts})")
+        return job
+    return None
+
+
+def heartbeat(db: Session, job_id: str, worker_id: str, lease_seconds: int) -> bool:
+    """Подовжує lease. False - задачу забрали (lease прострочено і її взяв інший worker)."""
+    now = datetime.utcnow()
+    updated = (
+        db.query(Job)
+        .filter(Job.job_id == job_id, Job.lease_owner == worker_id, Job.status == "running")
+        .update({
+            Job.heartbeat_at: now,
+            Job.lease_expires_at: now + timedelta(seconds=lease_seconds),
+        }, synchronize_session=False)
+    )
+    db.commit()
+    return bool(updated)
+
+
+def _lease_lost(job_id: str, worker_id: str, action: str):
+    logger.warning(
+        f"[QUEUE] {worker_id} не може {action} {job_id}: lease втрачено "
+        f"(прострочено і задачу повернуто в чергу або взяв інший worker)"
+    )
+
+
+def complete(db: Session, job_id: str, worker_id: str) -> bool:
+    """Задача виконана. False - lease втрачено, статус не змінено."""
+    job = db.query(Job).filter(Job.job_id == job_id, Job.lease_owner == worker_id).first()
+    if not job:
+        _lease_lost(job_id, worker_id, "завершити")
+        return False
+    job.status = "succeeded"
+    job.finished_at = datetime.utcnow()
+    job.lease_owner = None
+    job.lease_expires_at = None
+    _sync_run(db, job_id, "success")
+    db.commit()
+    return True
+
+
+def fail(db: Session, job_id: str, worker_id: str, error: str) -> bool:
+    """Помилка задачі: повтор з backoff або failed, якщо спроби вичерпано. False - lease втрачено."""
+    job = db.query(Job).filter(Job.job_id == job_id, Job.lease_owner == worker_id).first()
+    if not job:
+        _lease_lost(job_id, worker_id, "позначити помилку")
+        return False
+    _retry_or_fail(db, job, error)
+    db.commit()
+    return True
+
+
+def release(db: Session, job_id: str, worker_id: str):
+    """Повертає задачу в чергу без витрати спроби (worker зупиняється)."""
+    job = db.query(Job).filter(Job.job_id == job_id, Job.lease_owner == worker_id, Job.status == "running").first()
+    if not job:
+        return
+    job.status = "queued"
+    job.attempts = max(job.attempts - 1, 0)
+    job.run_after = datetime.utcnow()
+    job.lease_owner = None
+    job.lease_expires_at = None
+    _sync_run(db, job_id, "queued")
+    db.commit()
+
+
+def reclaim_expired(db: Session) -> int:
+    """Повертає в чергу задачі, worker яких перестав надсилати heartbeat."""
+    now = datetime.utcnow()
+    expired = (
+        db.query(Job)
+        .filter(Job.status == "running", Job.lease_expires_at < now)
+        .all()
+    )
+    for job in expired:
+        logger.warning(f"[QUEUE] Lease прострочено: {job.job_type} {job.job_id} (worker {job.lease_owner})")
+        _retry_or_fail(db, job, f"Lease expired (worker {job.lease_owner})")
+    if expired:
+        db.commit()
+    return len(expired)
+
+
+def _retry_or_fail(db: Session, job: Job, error: str):
+    job.last_error = error
+    job.lease_owner = None
+    job.lease_expires_at = None
+    if job.attempts >= job.max_attempts:
+        job.status = "failed"
+        job.finished_at = datetime.utcnow()
+        _sync_run(db, job.job_id, "error", error)
+        logger.error(f"[QUEUE] {job.job_type} {job.job_id} остаточно завершилась з помилкою: {error}")
+    else:
+        delay = retry_delay(job.attempts)
+        job.status = "queued"
+        job.run_after = datetime.utcnow() + timedelta(seconds=delay)
+        _sync_run(db, job.job_id, "queued", f"Спроба {job.attempts}: {error}")
+        logger.warning(f"[QUEUE] {job.job_type} {job.job_id} буде повторена через {delay}s: {error}")
@@ -0,0 +1,44 @@
+"""
+Швидка JSON серіалізація великих відповідей (/api/meta-data, історія пошуків, journey).
+
+orjson - опціональна залежність: без неї (ORJSON_AVAILABLE=False) використовується
+stdlib json з тими ж налаштуваннями, що й у starlette.JSONResponse.
+
+FastAPI проганяє dict, повернутий з endpoint'а, через jsonable_encoder (повний обхід
+усіх вкладених словників) і лише потім серіалізує. Endpoint'и з великими звітами
+повертають FastJSONResponse напряму - дані, які вже є JSON-сумісними (dict/list/str/
+числа/datetime), серіалізуються за один прохід.
+"""
+import json
+from typing import Any
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:  # pragma: no cover - залежить від оточення
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+
+def _default(value: Any) -> Any:
+    # Типи, яких orjson не знає (Decimal, set, pydantic моделі...) - як у FastAPI
+    return jsonable_encoder(value)
+
+
+def dumps(content: Any) -> bytes:
+    """JSON у bytes (UTF-8, без пробілів). Ключі-не рядки (int) перетворюються на рядки."""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        content, default=_default, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse через orjson (або stdlib json без нього)."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -2,10 +2,12 @@ import asyncio
 import os
 import uuid
 import json
+import hashlib
 import logging
+import time
 from datetime import datetime
-from typing import Dict, Any, List
-import openpyxl
+from typing import Callable, Dict, Any, List, Optional, Tuple
+from urllib.parse import urlsplit
 
 # Configure logging
 logging.basicConfig(
@@ -14,8 +16,8 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-from fastapi import FastAPI, BackgroundTasks, Request, Depends
-from fastapi.responses import HTMLResponse, StreamingResponse, JSONResponse
+from fastapi import FastAPI, BackgroundTasks, Request, Response
+from fastapi.responses import HTMLResponse, StreamingResponse, JSONResponse, FileResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
@@ -24,40 +26,104 @@ from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 from dotenv import load_dotenv
 
-from .progress import ProgressStore
+from .progress import create_progress_store
+from .report_cache import ReportCache
+from .singleflight import SingleFlight
+from .image_cache import ImageCache, create_image_cache, get_http_client, close_http_client
+from . import image_resize
+from . import metrics
+from .timing import StageTimer, server_timing_header
+from .json_response import FastJSONResponse
+from .compression import CompressionMiddleware, compression_options_from_env
+from . import columnar_export
+from . import job_queue
+from .scheduler import create_prewarm_scheduler
+from . import retention
 from .connectors import meta as meta_conn
 from .connectors import google_sheets as gs_conn
 from .connectors import excel as excel_conn
 from .mapping import load_mapping
 from .connectors import crm as crm_tools
-from .config_store import get_config_masked, set_config
+from .config_store import get_config_masked, set_config, get_config_version
 from .connectors import crm as crm_conn
 from .middleware.auth import verify_api_key
-from .database import init_db, get_db_session
-from .models import PipelineRun, RunLog, CampaignAnalysisHistory, SearchHistory
+from .database import init_db, get_db
+from .models import PipelineRun, RunLog, RunLogArchive, CampaignAnalysisHistory, SearchHistory
 from .analytics_processor import AnalyticsProcessor
 from .services import nethunt_tracking
 from .services import alfacrm_tracking
 from .services import meta_leads
 from .services import campaign_formatter
 from .services import teachers_formatter
-from sqlalchemy.orm import Session
+from .services import status_snapshots
+from .services import campaign_facts
+from .services import phone_payload
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session, undefer
 
 
 load_dotenv()
 
-app = FastAPI(title="Ads → Sheets → CRM")
+# HTTP_CASSETTE / HTTP_CASSETTE_MODE - запис або відтворення відповідей upstream API;
+# модуль імпортується лише тоді, коли касету задано (не сповільнює старт)
+if os.getenv("HTTP_CASSETTE"):
+    from . import http_cassette
+    http_cassette.install_from_env()
+
+app = FastAPI(title="Ads → Sheets → CRM", default_response_class=FastJSONResponse)
 
 # Initialize database on startup
 @app.on_event("startup")
 def startup_event():
     init_db()
 
+
+# Pre-warm стандартних вікон звітів (yesterday, last_7_days, month_to_date, last_month)
+@app.on_event("startup")
+async def start_prewarm_scheduler():
+    if os.getenv("PREWARM_ENABLED", "true").lower() == "true":
+        prewarm_scheduler.start()
+
+
+@app.on_event("shutdown")
+async def stop_prewarm_scheduler():
+    await prewarm_scheduler.stop()
+
+
+# Retention: стиснення старих логів/результатів пошуку, VACUUM/ANALYZE (RETENTION_*)
+@app.on_event("startup")
+async def start_retention_scheduler():
+    if os.getenv("RETENTION_ENABLED", "true").lower() == "true":
+        retention_scheduler.start()
+
+
+@app.on_event("shutdown")
+async def stop_retention_scheduler():
+    await retention_scheduler.stop()
+
+
+@app.on_event("shutdown")
+async def close_image_http_client():
+    await close_http_client()
+
 # Security: Rate limiting
-limiter = Limiter(key_func=get_remote_address)
+RATE_LIMIT_STORAGE_URI = os.getenv("RATE_LIMIT_STORAGE_URI", "memory://")
+if RATE_LIMIT_STORAGE_URI.startswith("database://"):
+    from . import rate_limit_storage  # noqa: F401 - реєструє схему database:// для slowapi
+
+limiter = Limiter(
+    key_func=get_remote_address,
+    storage_uri=RATE_LIMIT_STORAGE_URI,
+    # false - тільки для локального навантажувального тестування (loadtest/)
+    enabled=os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true",
+)
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
+# Стиснення (gzip/brotli) та ETag/304 для повних відповідей; додається першим,
+# тож стискає тіло, сформоване endpoint'ом, до решти middleware
+app.add_middleware(CompressionMiddleware, **compression_options_from_env())
+
 # Security: CORS protection
 # TODO: Replace with your actual frontend domain in production
 ALLOWED_ORIGINS = os.getenv("ALLOWED_ORIGINS", "http://localhost:5173,http://localhost:8000,https://nasty-berries-stare.loca.lt,https://ecademy-api.loca.lt,https://*.railway.app").split(",")
@@ -67,7 +133,8 @@ app.add_middleware(
     allow_origins=ALLOWED_ORIGINS,
     allow_credentials=True,
     allow_methods=["GET", "POST", "DELETE"],
-    allow_headers=["Content-Type", "Authorization"],
+    allow_headers=["Content-Type", "Authorization", "If-None-Match"],
+    expose_headers=["ETag", "X-Cache"],
 )
 
 # Security: Trusted host protection
@@ -92,11 +159,66 @@ async def add_security_headers(request: Request, call_next):
         "default-src 'self'; "
         "script-src 'self' 'unsafe-inline'; "
         "style-src 'self' 'unsafe-inline'; "
-        "img-src 'self' data: https://*.fbcdn.net https://graph.facebook.com"
+        "img-src 'self' data: " + " ".join(f"https://{host}" for host in IMAGE_PROXY_ALLOWED_HOSTS)
     )
     return response
 
-progress = ProgressStore()
+
+# Метрики: латентність запитів по маршрутах (шаблон шляху, а не конкретний URL)
+HTTP_REQUESTS = metrics.counter(
+    "http_requests_total", "HTTP requests by route and status", ("method", "route", "status")
+)
+HTTP_REQUEST_LATENCY = metrics.histogram(
+    "http_request_duration_seconds", "HTTP request latency until response headers", ("method", "route")
+)
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = getattr(request.scope.get("route"), "path", None) or "unmatched"
+        HTTP_REQUEST_LATENCY.observe(time.perf_counter() - started, method=request.method, route=route)
+        HTTP_REQUESTS.inc(method=request.method, route=route, status=str(status))
+
+progress = create_progress_store()
+
+# Stale-while-revalidate кеш для /api/meta-data
+meta_report_cache = ReportCache(
+    fresh_ttl=int(os.getenv("META_REPORT_CACHE_TTL", "300")),
+    stale_ttl=int(os.getenv("META_REPORT_CACHE_STALE_TTL", "3600")),
+    max_entries=int(os.getenv("META_REPORT_CACHE_MAX_ENTRIES", "32")),
+)
+
+# Single-flight: одночасні однакові запити чекають на одне обчислення
+meta_data_flight = SingleFlight("meta-data")
+export_meta_excel_flight = SingleFlight("export-meta-excel")
+start_job_flight = SingleFlight("start-job")
+image_resize_flight = SingleFlight("image-resize")
+
+# Дисковий кеш зображень креативів (/api/proxy-image), створюється при першому запиті
+image_cache: Optional[ImageCache] = None
+IMAGE_BROWSER_MAX_AGE = int(os.getenv("IMAGE_CACHE_BROWSER_MAX_AGE", "86400"))
+IMAGE_CHUNK_SIZE = 64 * 1024
+# /api/proxy-image ходить лише на Facebook CDN - ті самі хости, що дозволяє CSP img-src
+IMAGE_PROXY_ALLOWED_HOSTS = ("*.fbcdn.net", "graph.facebook.com")
+IMAGE_PROXY_MAX_BYTES = int(os.getenv("IMAGE_PROXY_MAX_MB", "10")) * 1024 * 1024
+IMAGE_PROXY_MAX_REDIRECTS = 5
+
+
+def _get_image_cache() -> ImageCache:
+    global image_cache
+    if image_cache is None:
+        image_cache = create_image_cache()
+    return image_cache
+
+# TTL прогрітих планувальником звітів (прогрів вночі → HIT зранку)
+PREWARM_CACHE_TTL = int(os.getenv("PREWARM_CACHE_TTL", "43200"))
 
 # Define paths for static files
 WEB_DIST = os.path.join(os.path.dirname(os.path.dirname(__file__)), "web", "dist")
@@ -334,63 +456,88 @@ TEACHERS_COLUMN_NAMES = {
 }
 
 
-def get_or_create_analysis_record(db: Session, campaign_id: str, period: str) -> Dict[str, str]:
+def get_or_create_analysis_records(
+    db: Session,
+    keys: List[Tuple[str, str]],
+    record: bool = True
+) -> Dict[Tuple[str, str], Dict[str, str]]:
     """
-    Отримати або створити запис історії аналізу кампанії з правильним відстеженням дат.
+    Отримати або створити записи історії аналізу для всіх кампаній звіту одним запитом.
 
-    Логіка:
+    Логіка (для кожної пари campaign_id + period):
     - Перший аналіз: first_analysis_date = сьогодні, last_analysis_date = None
     - Повторний аналіз: first_analysis_date = залишаємо стару, last_analysis_date = сьогодні
 
+    record=False (pre-warm, фонове оновлення кешу): лише читає наявні дати,
+    нічого не записує - аналізом вважається тільки запит користувача.
+
+    Один SELECT та один commit на звіт замість запиту на кожне оголошення;
+    викликається через asyncio.to_thread, щоб не блокувати event loop.
+
     Args:
         db: SQLAlchemy session
-        campaign_id: ID кампанії з Facebook
-        period: Період аналізу у форматі "YYYY-MM-DD - YYYY-MM-DD"
+        keys: пари (campaign_id, period), period у форматі "YYYY-MM-DD - YYYY-MM-DD"
+        record: Записувати аналіз в історію
 
     Returns:
-        dict з ключами:
-            - first_analysis_date: дата першого аналізу (YYYY-MM-DD)
-            - last_analysis_date: дата останнього аналізу (YYYY-MM-DD) або "-"
+        {(campaign_id, period): {"first_analysis_date": ..., "last_analysis_date": ... або "-"}}
     """
     current_date = datetime.now().strftime("%Y-%m-%d")
-
-    # Шукаємо існуючий запис
-    record = db.query(CampaignAnalysisHistory).filter_by(
-        campaign_id=campaign_id,
-        period=period
-    ).first()
-
-    if not record:
-        # Перший аналіз для цієї кампанії + періоду
-        record = CampaignAnalysisHistory(
-            campaign_id=campaign_id,
-            period=period,
-            first_analysis_date=current_date,
-            last_analysis_date=None,
-            analysis_count=1
+    unique_keys = set(keys)
+    if not unique_keys:
+        return {}
+
+    existing = {
+        (record.campaign_id, record.period): record
+        for record in db.query(CampaignAnalysisHistory).filter(
+            CampaignAnalysisHistory.campaign_id.in_({campaign_id for campaign_id, _ in unique_keys}),
+            CampaignAnalysisHistory.period.in_({period for _, period in unique_keys})
         )
-        db.add(record)
-        db.commit()
-
-        logger.info(f"Created first analysis record: campaign={campaign_id}, period={period}, date={current_date}")
+    }
 
+    if not record:
         return {
-            "first_analysis_date": current_date,
-            "last_analysis_date": "-"
+            key: {
+                "first_analysis_date": existing[key].first_analysis_date if key in existing else "-",
+                "last_analysis_date": (existing[key].last_analysis_date if key in existing else None) or "-",
+            }
+            for key in unique_keys
         }
-    else:
-        # Повторний аналіз - оновлюємо дату останнього аналізу
-        record.last_analysis_date = current_date
-        record.analysis_count += 1
-        record.updated_at = datetime.utcnow()
-        db.commit()
 
-        logger.info(f"Updated analysis record: campaign={campaign_id}, period={period}, count={record.analysis_count}, last={current_date}")
+    result = {}
+    for campaign_id, period in unique_keys:
+        history = existing.get((campaign_id, period))
+        if history is None:
+            # Перший аналіз для цієї кампанії + періоду
+            db.add(CampaignAnalysisHistory(
+                campaign_id=campaign_id,
+                period=period,
+                first_analysis_date=current_date,
+                last_analysis_date=None,
+                analysis_count=1
+            ))
+            result[(campaign_id, period)] = {"first_analysis_date": current_date, "last_analysis_date": "-"}
+        else:
+            # Повторний аналіз - оновлюємо дату останнього аналізу
+            history.last_analysis_date = current_date
+            history.analysis_count += 1
+            history.updated_at = datetime.utcnow()
+            result[(campaign_id, period)] = {
+                "first_analysis_date": history.first_analysis_date,
+                "last_analysis_date": current_date
+            }
+    db.commit()
 
-        return {
-            "first_analysis_date": record.first_analysis_date,
-            "last_analysis_date": current_date
-        }
+    created = sum(1 for key in unique_keys if key not in existing)
+    logger.info(f"Analysis records: {created} created, {len(unique_keys) - created} updated (date={current_date})")
+    return result
+
+
+def _enqueue_job(job_type: str, params: Dict[str, Any], dedupe_key: str) -> Tuple[str, bool]:
+    """Ставить задачу в чергу (JOB_QUEUE_ENABLED=true). Повертає (job_id, created)."""
+    with get_db() as db:
+        job, created = job_queue.enqueue(db, job_type, params, dedupe_key=dedupe_key)
+        return job.job_id, created
 
 
 async def run_analytics_task(job_id: str, params: Dict[str, Any]):
@@ -486,14 +633,21 @@ async def run_analytics(
     except ValueError:
         return JSONResponse({"error": "Невірний формат дати, використовуйте YYYY-MM-DD"}, status_code=400)
 
-    job_id = str(uuid.uuid4())
-    progress.init(job_id, title=f"Analytics: {campaign_type}")
-
     params = {
         "campaign_type": campaign_type,
         "date_start": date_start,
         "date_stop": date_stop,
     }
+
+    if job_queue.is_enabled():
+        # Виконується окремим worker процесом (python -m app.worker)
+        job_id, created = await asyncio.to_thread(
+            _enqueue_job, job_queue.JOB_TYPE_ANALYTICS, params, f"{campaign_type}:{date_start}:{date_stop}"
+        )
+        return {"job_id": job_id} if created else {"job_id": job_id, "coalesced": True}
+
+    job_id = str(uuid.uuid4())
+    progress.init(job_id, title=f"Analytics: {campaign_type}")
     background_tasks.add_task(run_analytics_task, job_id, params)
     return {"job_id": job_id}
 
@@ -503,7 +657,6 @@ async def run_analytics(
 async def start_job(
     request: Request,
     payload: Dict[str, Any],
-    background_tasks: BackgroundTasks,
 ):
     # payload expects: start_date, end_date (YYYY-MM-DD), sheet_id (optional)
     start_date = payload.get("start_date")
@@ -523,25 +676,64 @@ async def start_job(
     if backend == "sheets" and not sheet_id:
         return JSONResponse({"error": "Відсутній Google Sheet ID"}, status_code=400)
 
-    job_id = str(uuid.uuid4())
-    progress.init(job_id, title="Pipeline run")
-
     params = {
         "start_date": start_date,
         "end_date": end_date,
         "sheet_id": sheet_id,
     }
-    background_tasks.add_task(run_pipeline, job_id, params)
+
+    if job_queue.is_enabled():
+        # Виконується окремим worker процесом; однакова задача в черзі не дублюється
+        job_id, created = await asyncio.to_thread(
+            _enqueue_job, job_queue.JOB_TYPE_PIPELINE, params, f"{start_date}:{end_date}:{sheet_id}:{backend}"
+        )
+        return {"job_id": job_id} if created else {"job_id": job_id, "coalesced": True}
+
+    # Якщо pipeline з тими ж параметрами вже виконується - повертаємо його job_id
+    job_id = str(uuid.uuid4())
+    flight_key = (start_date, end_date, sheet_id, backend)
+    task, shared = start_job_flight.start(
+        flight_key, lambda: run_pipeline(job_id, params), name=job_id
+    )
+    if shared:
+        return {"job_id": task.get_name(), "coalesced": True}
+
+    progress.init(job_id, title="Pipeline run")
     return {"job_id": job_id}
 
 
+def _queued_job_state(job_id: str):
+    """Стан задачі з черги у форматі ProgressStore (логи - з RunLog)."""
+    with get_db() as db:
+        job = job_queue.get_job(db, job_id)
+        if not job:
+            return None
+        status = {"succeeded": "done", "failed": "error"}.get(job.status, job.status)
+        logs = []
+        run = db.query(PipelineRun).filter(PipelineRun.job_id == job_id).first()
+        if run:
+            logs = [log.message for log in db.query(RunLog).filter(RunLog.run_id == run.id).order_by(RunLog.id).all()]
+        if job.status == "failed" and job.last_error:
+            logs.append(f"ERROR: {job.last_error}")
+        return {
+            "title": job.job_type,
+            "percent": 100 if status == "done" else 0,
+            "status": status,
+            "logs": logs,
+        }
+
+
 @app.get("/api/events/{job_id}")
 async def events(job_id: str):
     async def event_stream():
         last_index = 0
         while True:
             await asyncio.sleep(0.5)
-            state = progress.get(job_id)
+            # PROGRESS_BACKEND=database та черга читають БД - не в event loop
+            state = await asyncio.to_thread(progress.get, job_id)
+            if not state and job_queue.is_enabled():
+                # Задача виконується worker процесом - стан беремо з БД
+                state = await asyncio.to_thread(_queued_job_state, job_id)
             if not state:
                 # job unknown → end stream
                 break
@@ -561,6 +753,35 @@ async def events(job_id: str):
     return StreamingResponse(event_stream(), media_type="text/event-stream")
 
 
+@app.get("/api/jobs/{job_id}")
+@limiter.limit("60/minute")
+def get_job_status(request: Request, job_id: str):
+    """Стан задачі в черзі (JOB_QUEUE_ENABLED=true): статус, спроби, остання помилка."""
+    try:
+        with get_db() as db:
+            job = job_queue.get_job(db, job_id)
+            if not job:
+                return JSONResponse({"error": "Задачу не знайдено"}, status_code=404)
+
+            return {
+                "job_id": job.job_id,
+                "job_type": job.job_type,
+                "status": job.status,
+                "attempts": job.attempts,
+                "max_attempts": job.max_attempts,
+                "run_after": job.run_after.isoformat() if job.run_after else None,
+                "last_error": job.last_error,
+                "lease_owner": job.lease_owner,
+                "heartbeat_at": job.heartbeat_at.isoformat() if job.heartbeat_at else None,
+                "created_at": job.created_at.isoformat() if job.created_at else None,
+                "started_at": job.started_at.isoformat() if job.started_at else None,
+                "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+            }
+    except Exception as e:
+        logger.error(f"Error fetching job {job_id}: {e}")
+        return JSONResponse({"error": f"Помилка бази даних: {str(e)}"}, status_code=500)
+
+
 @app.get("/api/inspect/excel-headers")
 async def inspect_excel_headers():
     from .connectors import excel as ex
@@ -615,28 +836,218 @@ async def health_check():
     return {"status": "healthy", "service": "ecademy-api"}
 
 
+def _cached_image_response(cached, request: Request, headers: Dict[str, str]) -> Response:
+    etag = f'"{cached.etag}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={**headers, "ETag": etag})
+    return FileResponse(
+        cached.path,
+        media_type=cached.content_type,
+        headers={**headers, "ETag": etag, "X-Cache": "HIT"}
+    )
+
+
+class ImageProxyError(Exception):
+    """Зображення не можна проксувати; status_code - код відповіді клієнту."""
+
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _is_allowed_image_url(url: str) -> bool:
+    """https URL на хості з IMAGE_PROXY_ALLOWED_HOSTS ("*.domain" - піддомени domain)."""
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    if parts.scheme != "https" or not host:
+        return False
+    for allowed in IMAGE_PROXY_ALLOWED_HOSTS:
+        if allowed.startswith("*.") and host.endswith(allowed[1:]):
+            return True
+        if host == allowed:
+            return True
+    return False
+
+
+async def _open_image_upstream(url: str):
+    """
+    GET зображення з upstream (stream=True), відповідь треба закрити (aclose).
+
+    Redirect'и проходимо вручну: кожна адреса перевіряється на allowlist ДО
+    запиту, тому redirect з CDN не виведе проксі на внутрішній хост.
+    Оголошений Content-Length більше IMAGE_PROXY_MAX_BYTES відхиляється одразу.
+    """
+    client = get_http_client()
+    request = client.build_request("GET", url)
+    for _ in range(IMAGE_PROXY_MAX_REDIRECTS + 1):
+        if not _is_allowed_image_url(str(request.url)):
+            raise ImageProxyError("Image host is not allowed", 400)
+        response = await client.send(request, stream=True, follow_redirects=False)
+        if response.next_request is None:
+            break
+        await response.aclose()
+        request = response.next_request
+    else:
+        raise ImageProxyError("Too many redirects", 502)
+
+    content_length = response.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > IMAGE_PROXY_MAX_BYTES:
+        await response.aclose()
+        raise ImageProxyError("Image is too large", 502)
+    return response
+
+
+def _check_image_size(size: int):
+    if size > IMAGE_PROXY_MAX_BYTES:
+        raise ImageProxyError("Image is too large", 502)
+
+
+async def _read_image_limited(response) -> bytes:
+    """Тіло відповіді upstream, не більше IMAGE_PROXY_MAX_BYTES."""
+    chunks = []
+    size = 0
+    async for chunk in response.aiter_bytes(IMAGE_CHUNK_SIZE):
+        size += len(chunk)
+        _check_image_size(size)
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+async def _render_image_variant(url: str, key: str, width: Optional[int], height: Optional[int], fmt: str) -> Dict[str, Any]:
+    """Оригінал (з кешу або CDN) → зменшений варіант у кеші. Виконується один раз на ключ."""
+    cache = _get_image_cache()
+    original = cache.get(url)
+    if original:
+        data = await asyncio.to_thread(_read_bytes, original.path)
+        content_type = original.content_type
+    else:
+        response = await _open_image_upstream(url)
+        try:
+            if response.status_code != 200:
+                return {"status": response.status_code, "error": f"Failed to fetch image: {response.status_code}"}
+            data = await _read_image_limited(response)
+        finally:
+            await response.aclose()
+        content_type = response.headers.get("content-type", "image/jpeg")
+        cache.put(url, data, content_type)
+
+    try:
+        resized = await asyncio.to_thread(image_resize.resize_image, data, width, height, fmt)
+    except Exception as e:
+        # Не зображення або формат, який Pillow не читає - віддаємо оригінал
+        logger.warning(f"[IMAGE] Не вдалося змінити розмір {url[:100]}: {e}")
+        return {"status": 200, "content": data, "content_type": content_type, "etag": None}
+
+    stored = cache.put(key, resized, image_resize.FORMAT_CONTENT_TYPES[fmt])
+    return {
+        "status": 200,
+        "content": resized,
+        "content_type": image_resize.FORMAT_CONTENT_TYPES[fmt],
+        "etag": stored.etag if stored else None,
+    }
+
+
+def _read_bytes(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
 @app.get("/api/proxy-image")
-async def proxy_image(url: str):
+async def proxy_image(url: str, request: Request, w: Optional[int] = None, h: Optional[int] = None):
     """
     Proxy endpoint для загрузки изображений креативов.
     Обходит CORS ограничения Meta API.
+
+    Зображення кешуються на диску (LRU, ETag = sha256 вмісту), тому
+    повторні завантаження вкладки ADS не йдуть на Facebook CDN.
+    При промаху відповідь стрімиться з upstream і одночасно пишеться в кеш.
+
+    ?w=&h= - зменшена копія (вписується в w×h) у WebP або JPEG залежно від
+    Accept; варіанти кешуються поруч з оригіналом. Без Pillow - оригінал.
+
+    Upstream - лише хости Facebook CDN (IMAGE_PROXY_ALLOWED_HOSTS, також після
+    redirect'ів, інакше 400), оригінал - не більше IMAGE_PROXY_MAX_MB (інакше 502).
     """
-    import httpx
+    if not _is_allowed_image_url(url):
+        return JSONResponse({"error": "Image host is not allowed"}, status_code=400)
+
+    cache = _get_image_cache()
+    cache_headers = {"Cache-Control": f"public, max-age={IMAGE_BROWSER_MAX_AGE}"}
+
+    width, height = image_resize.clamp_size(w, h)
+    if (width or height) and image_resize.PIL_AVAILABLE:
+        fmt = image_resize.negotiate_format(request.headers.get("accept"))
+        key = image_resize.variant_key(url, width, height, fmt)
+        variant_headers = {**cache_headers, "Vary": "Accept"}
+
+        cached = cache.get(key)
+        if cached:
+            return _cached_image_response(cached, request, variant_headers)
+
+        try:
+            result, _ = await image_resize_flight.do(
+                key, lambda: _render_image_variant(url, key, width, height, fmt)
+            )
+        except ImageProxyError as e:
+            return JSONResponse({"error": str(e)}, status_code=e.status_code)
+        except Exception as e:
+            logger.error(f"Error proxying image: {e}")
+            return JSONResponse({"error": str(e)}, status_code=500)
+
+        if result["status"] != 200:
+            return JSONResponse({"error": result["error"]}, status_code=result["status"])
+        if result["etag"]:
+            variant_headers["ETag"] = f'"{result["etag"]}"'
+        return Response(
+            result["content"],
+            media_type=result["content_type"],
+            headers={**variant_headers, "X-Cache": "MISS"}
+        )
+
+    cached = cache.get(url)
+    if cached:
+        return _cached_image_response(cached, request, cache_headers)
 
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, timeout=10.0)
-            if response.status_code == 200:
-                return StreamingResponse(
-                    iter([response.content]),
-                    media_type=response.headers.get("content-type", "image/jpeg")
-                )
-            else:
-                return JSONResponse({"error": f"Failed to fetch image: {response.status_code}"}, status_code=response.status_code)
+        upstream = await _open_image_upstream(url)
+    except ImageProxyError as e:
+        return JSONResponse({"error": str(e)}, status_code=e.status_code)
     except Exception as e:
         logger.error(f"Error proxying image: {e}")
         return JSONResponse({"error": str(e)}, status_code=500)
 
+    if upstream.status_code != 200:
+        await upstream.aclose()
+        return JSONResponse({"error": f"Failed to fetch image: {upstream.status_code}"}, status_code=upstream.status_code)
+
+    content_type = upstream.headers.get("content-type", "image/jpeg")
+    writer = cache.writer(url, content_type)
+
+    async def stream_and_cache():
+        completed = False
+        size = 0
+        try:
+            async for chunk in upstream.aiter_bytes(IMAGE_CHUNK_SIZE):
+                # Без Content-Length розмір видно лише під час читання - обриваємо потік
+                size += len(chunk)
+                _check_image_size(size)
+                writer.write(chunk)
+                yield chunk
+            completed = True
+        finally:
+            await upstream.aclose()
+            # Обірване завантаження не потрапляє в кеш
+            if completed:
+                writer.commit()
+            else:
+                writer.abort()
+
+    return StreamingResponse(
+        stream_and_cache(),
+        media_type=content_type,
+        headers={**cache_headers, "X-Cache": "MISS"}
+    )
+
 
 @app.get("/api/config")
 @limiter.limit("10/minute")
@@ -687,13 +1098,48 @@ async def update_config(
     return {"status": "ok"}
 
 
+def _parse_keyset_cursor(before_time: Optional[str], before_id: Optional[int]) -> Tuple[Optional[datetime], Optional[int]]:
+    """before_time (ISO) + before_id з next_cursor попередньої сторінки; ValueError при невірному форматі."""
+    if before_time is None:
+        return None, before_id
+    if before_id is None:
+        raise ValueError("before_time потребує before_id")
+    return datetime.fromisoformat(before_time), before_id
+
+
+def _apply_keyset(query, time_column, id_column, before_time: Optional[datetime], before_id: Optional[int]):
+    """
+    Keyset пагінація (новіші першими): WHERE (time, id) < (before_time, before_id)
+    ORDER BY time DESC, id DESC - вартість сторінки не залежить від її номера,
+    на відміну від OFFSET.
+    """
+    if before_time is not None:
+        query = query.filter(or_(
+            time_column < before_time,
+            and_(time_column == before_time, id_column < before_id)
+        ))
+    elif before_id is not None:
+        query = query.filter(id_column < before_id)
+    return query.order_by(time_column.desc(), id_column.desc())
+
+
+def _next_cursor(rows: List[Any], limit: int, time_attr: str) -> Optional[Dict[str, Any]]:
+    if len(rows) < limit:
+        return None
+    last = rows[-1]
+    last_time = getattr(last, time_attr)
+    return {"before_time": last_time.isoformat() if last_time else None, "before_id": last.id}
+
+
 @app.get("/api/runs")
 @limiter.limit("30/minute")
-async def get_runs(
+def get_runs(
     request: Request,
     status: str = None,
     limit: int = 50,
-    offset: int = 0
+    offset: int = 0,
+    before_time: str = None,
+    before_id: int = None
 ):
     """
     Get pipeline run history with optional filtering.
@@ -701,8 +1147,14 @@ async def get_runs(
     Query params:
     - status: Filter by status (success, error, running)
     - limit: Maximum number of results (default: 50, max: 100)
-    - offset: Pagination offset (default: 0)
+    - before_time, before_id: Keyset cursor - next_cursor from the previous page
+    - offset: Legacy pagination offset (ignored when a cursor is given)
     """
+    try:
+        cursor_time, cursor_id = _parse_keyset_cursor(before_time, before_id)
+    except ValueError as e:
+        return JSONResponse({"error": f"Невірний курсор: {e}"}, status_code=400)
+
     try:
         # Limit maximum results
         limit = min(limit, 100)
@@ -714,11 +1166,12 @@ async def get_runs(
             if status:
                 query = query.filter(PipelineRun.status == status)
 
-            # Order by most recent first
-            query = query.order_by(PipelineRun.start_time.desc())
+            # Most recent first; (status, start_time, id) index serves both filter and order
+            query = _apply_keyset(query, PipelineRun.start_time, PipelineRun.id, cursor_time, cursor_id)
 
-            # Apply pagination
-            runs = query.offset(offset).limit(limit).all()
+            if cursor_time is None and cursor_id is None and offset:
+                query = query.offset(offset)
+            runs = query.limit(limit).all()
 
             # Convert to dict
             result = []
@@ -739,15 +1192,100 @@ async def get_runs(
                     "error_message": run.error_message
                 })
 
-            return {"runs": result, "count": len(result)}
+            return {"runs": result, "count": len(result), "next_cursor": _next_cursor(runs, limit, "start_time")}
+    except Exception as e:
+        return JSONResponse({"error": f"Помилка бази даних: {str(e)}"}, status_code=500)
+
+
+STAGE_TIMINGS_LOG_LEVEL = "timing"
+
+
+@app.get("/api/runs/stage-timings")
+@limiter.limit("30/minute")
+def get_runs_stage_timings(request: Request, limit: int = 50):
+    """
+    Тривалість етапів pipeline (мс) по останніх запусках - видно, який етап домінує.
+
+    Query params:
+    - limit: Кількість запусків (default: 50, max: 500)
+    """
+    try:
+        limit = min(limit, 500)
+        with get_db() as db:
+            rows = (
+                db.query(RunLog, PipelineRun)
+                .join(PipelineRun, RunLog.run_id == PipelineRun.id)
+                .filter(RunLog.level == STAGE_TIMINGS_LOG_LEVEL)
+                .order_by(RunLog.id.desc())
+                .limit(limit)
+                .all()
+            )
+
+            runs = []
+            totals: Dict[str, float] = {}
+            for log, run in rows:
+                try:
+                    timings = json.loads(log.message)
+                except ValueError:
+                    continue
+                for stage, ms in timings.items():
+                    totals[stage] = totals.get(stage, 0.0) + ms
+                runs.append({
+                    "run_id": run.id,
+                    "start_time": run.start_time.isoformat() if run.start_time else None,
+                    "status": run.status,
+                    "start_date": run.start_date,
+                    "end_date": run.end_date,
+                    "timings": timings,
+                })
+
+            averages = {stage: round(ms / len(runs), 1) for stage, ms in totals.items()} if runs else {}
+            return {"runs": runs, "count": len(runs), "average_ms": averages}
     except Exception as e:
         return JSONResponse({"error": f"Помилка бази даних: {str(e)}"}, status_code=500)
 
 
+# Скільки логів /api/runs/{run_id} віддає разом з деталями; решта - через /api/runs/{run_id}/logs
+RUN_DETAILS_LOG_LIMIT = int(os.getenv("RUN_DETAILS_LOG_LIMIT", "1000"))
+RUN_LOGS_MAX_PAGE = 5000
+# Рядків, які server-side cursor читає з бази за раз у режимі NDJSON
+RUN_LOGS_STREAM_BATCH = 1000
+
+
+def _run_log_dict(log: RunLog) -> Dict[str, Any]:
+    return {
+        "id": log.id,
+        "timestamp": log.timestamp.isoformat() if log.timestamp else None,
+        "level": log.level,
+        "message": log.message
+    }
+
+
+def _run_logs_query(db: Session, run_id: int, after_id: int, level: Optional[str]):
+    query = db.query(RunLog).filter(RunLog.run_id == run_id, RunLog.id > after_id)
+    if level:
+        query = query.filter(RunLog.level == level)
+    return query.order_by(RunLog.id)
+
+
+def _archived_run_logs(db: Session, run_id: int, level: Optional[str]) -> List[Dict[str, Any]]:
+    """Логи, стиснені retention (старші за живі рядки run_logs, без id)."""
+    return [
+        {"id": None, **entry}
+        for entry in retention.load_archived_logs(db, run_id)
+        if not level or entry["level"] == level
+    ]
+
+
 @app.get("/api/runs/{run_id}")
 @limiter.limit("30/minute")
-async def get_run_details(request: Request, run_id: int):
-    """Get detailed information about a specific run including logs."""
+def get_run_details(request: Request, run_id: int):
+    """
+    Get detailed information about a specific run with the first RUN_DETAILS_LOG_LIMIT logs.
+
+    logs_next_after_id is set when there are more logs - fetch them from
+    /api/runs/{run_id}/logs?after_id=...
+    """
     try:
         with get_db() as db:
             run = db.query(PipelineRun).filter(PipelineRun.id == run_id).first()
@@ -755,8 +1293,11 @@ async def get_run_details(request: Request, run_id: int):
             if not run:
                 return JSONResponse({"error": "Запуск не знайдено"}, status_code=404)
 
-            # Get logs for this run
-            logs = db.query(RunLog).filter(RunLog.run_id == run_id).order_by(RunLog.timestamp).all()
+            # Old runs: logs compacted by retention into run_log_archives come first
+            archived_logs = _archived_run_logs(db, run_id, None)
+            rows = _run_logs_query(db, run_id, 0, None).limit(RUN_DETAILS_LOG_LIMIT + 1).all()
+            has_more = len(rows) > RUN_DETAILS_LOG_LIMIT
+            rows = rows[:RUN_DETAILS_LOG_LIMIT]
 
             return {
                 "run": {
@@ -774,23 +1315,78 @@ async def get_run_details(request: Request, run_id: int):
                     "teachers_count": run.teachers_count,
                     "error_message": run.error_message
                 },
-                "logs": [
-                    {
-                        "id": log.id,
-                        "timestamp": log.timestamp.isoformat() if log.timestamp else None,
-                        "level": log.level,
-                        "message": log.message
-                    }
-                    for log in logs
-                ]
+                "logs": archived_logs + [_run_log_dict(log) for log in rows],
+                "logs_archived": bool(archived_logs),
+                "logs_next_after_id": rows[-1].id if has_more else None
             }
     except Exception as e:
         return JSONResponse({"error": f"Помилка бази даних: {str(e)}"}, status_code=500)
 
 
+@app.get("/api/runs/{run_id}/logs")
+@limiter.limit("120/minute")
+def get_run_logs(
+    request: Request,
+    run_id: int,
+    after_id: int = 0,
+    limit: int = 500,
+    level: str = None,
+    format: str = "json"
+):
+    """
+    Логи запуску сторінками по id (для перегляду та tail великих запусків).
+
+    Query params:
+    - after_id: повернути логи з id > after_id (next_after_id попередньої сторінки;
+      для tail запуску, що триває - останній отриманий id)
+    - limit: розмір сторінки (default: 500, max: 5000)
+    - level: фільтр за рівнем (info, warning, error, timing)
+    - format: json - сторінка; ndjson - потік усіх логів після after_id, рядок JSON
+      на лог (limit ігнорується), читається з бази server-side курсором
+
+    Архівні логі (retention) не мають id і віддаються лише з першою сторінкою (after_id=0).
+    """
+    if format not in ("json", "ndjson"):
+        return JSONResponse({"error": "format має бути 'json' або 'ndjson'"}, status_code=400)
+
+    try:
+        with get_db() as db:
+            if not db.query(PipelineRun.id).filter(PipelineRun.id == run_id).first():
+                return JSONResponse({"error": "Запуск не знайдено"}, status_code=404)
+
+            if format == "json":
+                limit = max(1, min(limit, RUN_LOGS_MAX_PAGE))
+                archived_logs = _archived_run_logs(db, run_id, level) if after_id == 0 else []
+                rows = _run_logs_query(db, run_id, after_id, level).limit(limit + 1).all()
+                has_more = len(rows) > limit
+                rows = rows[:limit]
+                return {
+                    "run_id": run_id,
+                    "logs": archived_logs + [_run_log_dict(log) for log in rows],
+                    "count": len(archived_logs) + len(rows),
+                    "next_after_id": rows[-1].id if has_more else None,
+                    # Для tail: наступний запит з after_id=last_id поверне нові логи
+                    "last_id": rows[-1].id if rows else after_id
+                }
+    except Exception as e:
+        return JSONResponse({"error": f"Помилка бази даних: {str(e)}"}, status_code=500)
+
+    def ndjson_lines():
+        # Синхронний генератор - Starlette ітерує його в threadpool, не блокуючи event loop
+        with get_db() as db:
+            if after_id == 0:
+                for entry in _archived_run_logs(db, run_id, level):
+                    yield json.dumps(entry, ensure_ascii=False) + "\n"
+            # yield_per вмикає stream_results: рядки читаються пачками, а не всі одразу
+            for log in _run_logs_query(db, run_id, after_id, level).yield_per(RUN_LOGS_STREAM_BATCH):
+                yield json.dumps(_run_log_dict(log), ensure_ascii=False) + "\n"
+
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+
 @app.delete("/api/runs/{run_id}")
 @limiter.limit("10/minute")
-async def delete_run(request: Request, run_id: int):
+def delete_run(request: Request, run_id: int):
     """Delete a pipeline run and its logs."""
     try:
         with get_db() as db:
@@ -801,6 +1397,7 @@ async def delete_run(request: Request, run_id: int):
 
             # Delete associated logs first
             db.query(RunLog).filter(RunLog.run_id == run_id).delete()
+            db.query(RunLogArchive).filter(RunLogArchive.run_id == run_id).delete()
 
             # Delete the run
             db.delete(run)
@@ -1023,7 +1620,7 @@ def calculate_students_formulas(students: List[Dict[str, Any]]) -> List[Dict[str
 
 @app.post("/api/save-run-history")
 @limiter.limit("30/minute")
-async def save_run_history(request: Request, payload: Dict[str, Any]):
+def save_run_history(request: Request, payload: Dict[str, Any]):
     """
     Зберігає історію запуску в базу даних.
 
@@ -1072,7 +1669,7 @@ async def save_run_history(request: Request, payload: Dict[str, Any]):
 
 @app.post("/api/save-search-results")
 @limiter.limit("30/minute")
-async def save_search_results(request: Request, payload: Dict[str, Any]):
+def save_search_results(request: Request, payload: Dict[str, Any]):
     """
     Зберігає результати пошуку з усіх 3 вкладок (РЕКЛАМА, СТУДЕНТИ, ВЧИТЕЛИ).
 
@@ -1118,24 +1715,39 @@ async def save_search_results(request: Request, payload: Dict[str, Any]):
 
 @app.get("/api/search-history")
 @limiter.limit("30/minute")
-async def get_search_history(request: Request, limit: int = 100, tab_type: str = None):
+def get_search_history(
+    request: Request,
+    limit: int = 100,
+    tab_type: str = None,
+    before_time: str = None,
+    before_id: int = None
+):
     """
-    Отримує історію пошуків.
+    Отримує історію пошуків (без results_json - лише метадані).
 
     Query params:
-        limit: максимальна кількість записів (default: 100)
+        limit: максимальна кількість записів (default: 100, max: 500)
         tab_type: фільтр по типу вкладки ('ads', 'students', 'teachers')
+        before_time, before_id: курсор наступної сторінки (next_cursor з попередньої відповіді)
     """
     try:
+        cursor_time, cursor_id = _parse_keyset_cursor(before_time, before_id)
+    except ValueError as e:
+        return JSONResponse({"error": f"Невірний курсор: {e}"}, status_code=400)
+
+    try:
+        limit = min(limit, 500)
+
         with get_db() as db:
-            query = db.query(SearchHistory).order_by(SearchHistory.created_at.desc())
+            query = db.query(SearchHistory)
 
             if tab_type:
                 query = query.filter(SearchHistory.tab_type == tab_type)
 
+            query = _apply_keyset(query, SearchHistory.created_at, SearchHistory.id, cursor_time, cursor_id)
             results = query.limit(limit).all()
 
-            return {
+            return FastJSONResponse({
                 "success": True,
                 "count": len(results),
                 "history": [
@@ -1148,8 +1760,9 @@ async def get_search_history(request: Request, limit: int = 100, tab_type: str =
                         "created_at": r.created_at.isoformat() if r.created_at else None
                     }
                     for r in results
-                ]
-            }
+                ],
+                "next_cursor": _next_cursor(results, limit, "created_at")
+            })
     except Exception as e:
         logger.error(f"Помилка отримання історії пошуків: {e}")
         return JSONResponse({"error": f"Помилка: {str(e)}"}, status_code=500)
@@ -1157,7 +1770,7 @@ async def get_search_history(request: Request, limit: int = 100, tab_type: str =
 
 @app.get("/api/search-history/{search_id}")
 @limiter.limit("30/minute")
-async def get_search_results(request: Request, search_id: int):
+def get_search_results(request: Request, search_id: int):
     """
     Отримує конкретні результати пошуку по ID.
     """
@@ -1165,14 +1778,23 @@ async def get_search_results(request: Request, search_id: int):
         import json
 
         with get_db() as db:
-            search_record = db.query(SearchHistory).filter(SearchHistory.id == search_id).first()
+            search_record = (
+                db.query(SearchHistory)
+                .options(undefer(SearchHistory.results_json))
+                .filter(SearchHistory.id == search_id)
+                .first()
+            )
 
             if not search_record:
                 return JSONResponse({"error": "Запис не знайдено"}, status_code=404)
 
-            results_data = json.loads(search_record.results_json) if search_record.results_json else []
+            if search_record.results_json:
+                results_data = json.loads(search_record.results_json)
+            else:
+                # Старі пошуки: results_json перенесено retention у search_history_archives
+                results_data = retention.load_archived_results(db, search_id) or []
 
-            return {
+            return FastJSONResponse({
                 "success": True,
                 "id": search_record.id,
                 "start_date": search_record.start_date,
@@ -1181,26 +1803,269 @@ async def get_search_results(request: Request, search_id: int):
                 "results_count": search_record.results_count,
                 "results": results_data,
                 "created_at": search_record.created_at.isoformat() if search_record.created_at else None
-            }
+            })
     except Exception as e:
         logger.error(f"Помилка отримання результатів пошуку: {e}")
         return JSONResponse({"error": f"Помилка: {str(e)}"}, status_code=500)
 
 
+def _read_campaign_keywords() -> Tuple[List[str], List[str]]:
+    """Повертає (keywords_teachers, keywords_students) для фільтрації кампаній."""
+    # Читаємо ключові слова для фільтрації кампаній (динамічно з оновленого os.environ)
+    # ВАЖЛИВО: Читаємо КОЖЕН РАЗ з os.environ, а не кешуємо при запуску,
+    # щоб зміни через UI (вкладка Налаштування) одразу застосовувалися
+    keywords_teachers_raw = os.environ.get("CAMPAIGN_KEYWORDS_TEACHERS", "")
+    keywords_students_raw = os.environ.get("CAMPAIGN_KEYWORDS_STUDENTS", "")
+
+    if keywords_teachers_raw:
+        keywords_teachers = [k.strip().lower() for k in keywords_teachers_raw.split(",") if k.strip()]
+    else:
+        keywords_teachers = ["teacher", "vchitel"]
+
+    if keywords_students_raw:
+        keywords_students = [k.strip().lower() for k in keywords_students_raw.split(",") if k.strip()]
+    else:
+        keywords_students = ["student", "shkolnik"]
+
+    logger.info(f"[KEYWORDS] Teachers raw value: '{keywords_teachers_raw}' (length={len(keywords_teachers_raw)})")
+    logger.info(f"[KEYWORDS] Teachers parsed: {keywords_teachers}")
+    logger.info(f"[KEYWORDS] Students raw value: '{keywords_students_raw}' (length={len(keywords_students_raw)})")
+    logger.info(f"[KEYWORDS] Students parsed: {keywords_students}")
+
+    # Діагностична перевірка
+    if not keywords_students:
+        logger.warning(f"[KEYWORDS] ⚠️ STUDENTS KEYWORDS IS EMPTY! Raw value was: '{keywords_students_raw}'")
+
+    return keywords_teachers, keywords_students
+
+
+def _meta_report_cache_key(
+    start_date: str,
+    end_date: str,
+    keywords_teachers: List[str],
+    keywords_students: List[str]
+) -> tuple:
+    return (
+        start_date,
+        end_date,
+        tuple(sorted(keywords_teachers)),
+        tuple(sorted(keywords_students)),
+        get_config_version(),
+    )
+
+
+def _index_for_leads(
+    campaigns: Dict[str, Dict[str, Any]],
+    index: Dict[str, Dict[str, Any]],
+    extract_lead_contacts: Callable[[Dict[str, Any]], Tuple[Optional[str], Optional[str]]],
+) -> Dict[str, Dict[str, Any]]:
+    """Записи індексу CRM лише для телефонів/email лідів кампаній."""
+    matched = {}
+    for campaign in campaigns.values():
+        for lead in campaign.get("leads", []):
+            for contact in extract_lead_contacts(lead):
+                if contact and contact in index:
+                    matched[contact] = index[contact]
+    return matched
+
+
+class LeadPhoneSource:
+    """
+    Вхідні дані витягування телефонів лідів (passed/current) для одного звіту.
+
+    Телефони рахуються лише на запит - для однієї кампанії (drill-down) або
+    для всіх (клієнти payload_version 1/2) - і запам'ятовуються.
+
+    Джерело живе в записі кешу звітів разом зі звітом, тому тримає лише те, що
+    потрібно для витягування: ліди кампаній та записи CRM, які з ними збігаються
+    (а не повні індекси AlfaCRM/NetHunt та історії всіх записів).
+    """
+
+    def __init__(
+        self,
+        analysis_date: str,
+        student_campaigns: Dict[str, Dict[str, Any]],
+        student_index: Dict[str, Dict[str, Any]],
+        teacher_campaigns: Dict[str, Dict[str, Any]],
+        teacher_index: Dict[str, Dict[str, Any]],
+        teacher_status_histories: Dict[str, List[Dict[str, Any]]],
+    ):
+        self.analysis_date = analysis_date
+        self.student_campaigns = {cid: {"leads": c.get("leads", [])} for cid, c in student_campaigns.items()}
+        self.teacher_campaigns = {cid: {"leads": c.get("leads", [])} for cid, c in teacher_campaigns.items()}
+        # Порожній індекс (CRM недоступна) - телефонів немає зовсім, а не "Не розібраний"
+        self.has_student_index = bool(student_index)
+        self.has_teacher_index = bool(teacher_index)
+        self.student_index = {
+            contact: {"lead_status_id": record.get("lead_status_id")}
+            for contact, record in _index_for_leads(
+                student_campaigns, student_index, alfacrm_tracking.extract_lead_contacts
+            ).items()
+        }
+        self.teacher_index = _index_for_leads(teacher_campaigns, teacher_index, nethunt_tracking.extract_lead_contacts)
+        record_ids = {record.get("id") for record in self.teacher_index.values()}
+        self.teacher_status_histories = {
+            record_id: history for record_id, history in teacher_status_histories.items() if record_id in record_ids
+        }
+        self._phones: Dict[Tuple[str, str], Dict[str, Any]] = {}
+
+    def campaign_phones(self, tab: str, campaign_id: str) -> Optional[Dict[str, Any]]:
+        """Телефони кампанії у payload_version=2 або None, якщо даних для неї немає."""
+        key = (tab, campaign_id)
+        if key not in self._phones:
+            self._phones[key] = self._extract(tab, campaign_id)
+        return self._phones[key]
+
+    def _extract(self, tab: str, campaign_id: str) -> Optional[Dict[str, Any]]:
+        if tab == "students":
+            campaign = self.student_campaigns.get(campaign_id)
+            if campaign is None or not self.has_student_index:
+                return None
+            result = _extract_lead_phones_with_status_students(
+                {campaign_id: campaign}, self.student_index, self.analysis_date
+            )
+        else:
+            campaign = self.teacher_campaigns.get(campaign_id)
+            # Без історії змін статусів береться поточний статус запису NetHunt
+            if campaign is None or not self.has_teacher_index:
+                return None
+            result = _extract_lead_phones_with_status_teachers(
+                {campaign_id: campaign}, self.teacher_index, self.teacher_status_histories, self.analysis_date
+            )
+        return result.get(campaign_id)
+
+    def all_phones(self) -> Dict[str, Dict[str, Any]]:
+        """lead_phones звіту для всіх кампаній (як раніше рахував build_meta_report)."""
+        lead_phones: Dict[str, Dict[str, Any]] = {"students": {}, "teachers": {}}
+        for tab, campaigns in (("students", self.student_campaigns), ("teachers", self.teacher_campaigns)):
+            for campaign_id in campaigns:
+                phones = self.campaign_phones(tab, campaign_id)
+                if phones is not None:
+                    lead_phones[tab][campaign_id] = phones
+        return lead_phones
+
+
+async def _compute_meta_report(
+    cache_key: tuple,
+    meta_token: str,
+    ad_account_id: str,
+    start_date: str,
+    end_date: str,
+    keywords_teachers: List[str],
+    keywords_students: List[str],
+    record_analysis: bool = True
+) -> Dict[str, Any]:
+    """
+    Рахує звіт /api/meta-data; однакові одночасні обчислення об'єднуються (single-flight).
+
+    record_analysis=False для pre-warm та фонового оновлення кешу - вони не
+    пишуть історію аналізу кампаній.
+    """
+    async def build():
+        timer = StageTimer()
+        with get_db() as db:
+            result = await build_meta_report(
+                db, meta_token, ad_account_id, start_date, end_date,
+                keywords_teachers, keywords_students, timer=timer, defer_lead_phones=True,
+                record_analysis=record_analysis
+            )
+        # "_lead_source" лишається в записі кешу разом зі звітом (витісняються
+        # разом) і не серіалізується - див. _public_report
+        result["metadata"] = {"timings": timer.durations_ms(remainder="formatting")}
+        return result
+
+    result, _ = await meta_data_flight.do(cache_key, build)
+    return result
+
+
+async def _get_meta_report(
+    meta_token: str,
+    ad_account_id: str,
+    start_date: str,
+    end_date: str,
+    bypass: bool = False
+) -> Tuple[Dict[str, Any], str]:
+    """Звіт за період з кешу або обчислений: (report, cache_status)."""
+    keywords_teachers, keywords_students = _read_campaign_keywords()
+    cache_key = _meta_report_cache_key(start_date, end_date, keywords_teachers, keywords_students)
+
+    async def compute():
+        return await _compute_meta_report(
+            cache_key, meta_token, ad_account_id, start_date, end_date,
+            keywords_teachers, keywords_students
+        )
+
+    async def refresh():
+        return await _compute_meta_report(
+            cache_key, meta_token, ad_account_id, start_date, end_date,
+            keywords_teachers, keywords_students, record_analysis=False
+        )
+
+    return await meta_report_cache.get_or_compute(cache_key, compute, bypass=bypass, refresh=refresh)
+
+
+def _public_report(report: Dict[str, Any]) -> Dict[str, Any]:
+    """Звіт з кешу без приватних полів ("_lead_source") - для відповіді клієнту."""
+    return {key: value for key, value in report.items() if not key.startswith("_")}
+
+
+async def prewarm_meta_report(start_date: str, end_date: str) -> Dict[str, int]:
+    """
+    Рахує звіт /api/meta-data для вікна планувальника та кладе його в кеш
+    з подовженим TTL (PREWARM_CACHE_TTL), щоб ранкові запити були HIT.
+    """
+    meta_token = os.getenv("META_ACCESS_TOKEN")
+    ad_account_id = os.getenv("META_AD_ACCOUNT_ID")
+    if not meta_token or not ad_account_id:
+        raise RuntimeError("META_ACCESS_TOKEN або META_AD_ACCOUNT_ID не налаштовані")
+
+    keywords_teachers, keywords_students = _read_campaign_keywords()
+    cache_key = _meta_report_cache_key(start_date, end_date, keywords_teachers, keywords_students)
+    result = await _compute_meta_report(
+        cache_key, meta_token, ad_account_id, start_date, end_date,
+        keywords_teachers, keywords_students, record_analysis=False
+    )
+    meta_report_cache.set(cache_key, result, fresh_ttl=PREWARM_CACHE_TTL)
+
+    return {
+        "insights_count": len(result.get("ads", [])),
+        "students_count": len(result.get("students", [])),
+        "teachers_count": len(result.get("teachers", [])),
+    }
+
+
+prewarm_scheduler = create_prewarm_scheduler(prewarm_meta_report)
+retention_scheduler = retention.create_retention_scheduler()
+
+
 @app.get("/api/meta-data")
 @limiter.limit("30/minute")
 async def get_meta_data(
     request: Request,
     start_date: str = None,
     end_date: str = None,
-    db: Session = Depends(get_db_session)
+    refresh: bool = False,
+    timings: bool = False,
+    payload_version: int = phone_payload.PAYLOAD_VERSION_FULL
 ):
     """
     Получить данные из Meta API для всех 3 вкладок за один запрос.
 
+    Результат кешується (stale-while-revalidate) за ключем
+    (start_date, end_date, ключові слова, версія конфігурації).
+
     Query params:
     - start_date: Начало периода (YYYY-MM-DD)
     - end_date: Конец периода (YYYY-MM-DD)
+    - refresh: 1 - ігнорувати кеш і отримати живі дані
+      (так само діє заголовок Cache-Control: no-cache)
+    - timings: 1 - додати metadata.timings (мс по етапах обчислення звіту)
+    - payload_version: 1 - масиви телефонів (за замовчуванням, застаріла - заголовок
+      Deprecation), 2 - компактна форма: таблиця телефонів кампанії + індекси статусів,
+      3 - лише кількості, телефони через /api/campaigns/{campaign_id}/leads
+      (див. services/phone_payload.py)
+
+    Заголовок Server-Timing містить тривалість етапів (для MISS/BYPASS) та total.
 
     Returns:
         {
@@ -1209,6 +2074,7 @@ async def get_meta_data(
             "teachers": [...]  # Данные для вкладки ВЧИТЕЛІ
         }
     """
+    request_timer = StageTimer()
     try:
         meta_token = os.getenv("META_ACCESS_TOKEN")
         ad_account_id = os.getenv("META_AD_ACCOUNT_ID")
@@ -1219,33 +2085,241 @@ async def get_meta_data(
         if not start_date or not end_date:
             return JSONResponse({"error": "start_date та end_date обов'язкові"}, status_code=400)
 
-        # Читаємо ключові слова для фільтрації кампаній (динамічно з оновленого os.environ)
-        # ВАЖЛИВО: Читаємо КОЖЕН РАЗ з os.environ, а не кешуємо при запуску,
-        # щоб зміни через UI (вкладка Налаштування) одразу застосовувалися
-        keywords_teachers_raw = os.environ.get("CAMPAIGN_KEYWORDS_TEACHERS", "")
-        keywords_students_raw = os.environ.get("CAMPAIGN_KEYWORDS_STUDENTS", "")
+        if payload_version not in phone_payload.SUPPORTED_PAYLOAD_VERSIONS:
+            return JSONResponse({"error": f"Непідтримувана payload_version: {payload_version}"}, status_code=400)
 
-        if keywords_teachers_raw:
-            keywords_teachers = [k.strip().lower() for k in keywords_teachers_raw.split(",") if k.strip()]
+        cache_control = request.headers.get("cache-control", "").lower()
+        bypass = refresh or "no-cache" in cache_control or "no-store" in cache_control
+
+        result, cache_status = await _get_meta_report(
+            meta_token, ad_account_id, start_date, end_date, bypass=bypass
+        )
+        headers = {"X-Cache": cache_status}
+        logger.info(f"[CACHE] /api/meta-data {start_date} - {end_date}: {cache_status}")
+
+        # Етапи обчислення показуємо лише якщо звіт рахувався в цьому запиті
+        report_timings = (result.get("metadata") or {}).get("timings", {})
+        server_timings = {k: v for k, v in report_timings.items() if k != "total"} if cache_status in ("MISS", "BYPASS") else {}
+        server_timings["total"] = request_timer.durations_ms()["total"]
+        headers["Server-Timing"] = server_timing_header(server_timings, cache=cache_status)
+
+        # Кеш зберігає компактну версію 2 без lead_phones; телефони рахуються лише
+        # для клієнтів версій 1/2, версія 3 - кількості (телефони через drill-down)
+        lead_source = result.get("_lead_source")
+        result = _public_report(result)
+        if payload_version == phone_payload.PAYLOAD_VERSION_COUNTS:
+            result = phone_payload.counts_report(result)
         else:
-            keywords_teachers = ["teacher", "vchitel"]
+            if result.get("lead_phones") is None:
+                lead_phones = await asyncio.to_thread(lead_source.all_phones) if lead_source else {}
+                result = {**result, "lead_phones": lead_phones}
+            if payload_version == phone_payload.PAYLOAD_VERSION_FULL:
+                result = phone_payload.expand_report(result)
+                headers["Deprecation"] = "true"
+
+        # Звіт вже JSON-сумісний: серіалізуємо напряму, без jsonable_encoder
+        if not timings:
+            return FastJSONResponse({key: value for key, value in result.items() if key != "metadata"}, headers=headers)
+        return FastJSONResponse(result, headers=headers)
 
-        if keywords_students_raw:
-            keywords_students = [k.strip().lower() for k in keywords_students_raw.split(",") if k.strip()]
+    except Exception as e:
+        logger.error(f"Error fetching Meta data: {e}")
+        return JSONResponse({"error": f"Помилка отримання даних: {str(e)}"}, status_code=500)
+
+
+def _find_report_campaign(report: Dict[str, Any], campaign_id: str) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+    """(вкладка, рядок звіту) кампанії; id приймається з префіксом campaign_ і без нього."""
+    raw_id = campaign_id[len("campaign_"):] if campaign_id.startswith("campaign_") else campaign_id
+    candidates = {campaign_id, raw_id, f"campaign_{raw_id}"}
+    for tab in ("students", "teachers"):
+        for row in report.get(tab, []):
+            if str(row.get("campaign_id")) in candidates:
+                return tab, row
+    return None, None
+
+
+@app.get("/api/campaigns/{campaign_id}/leads")
+@limiter.limit("60/minute")
+async def get_campaign_leads(
+    request: Request,
+    campaign_id: str,
+    status: str = None,
+    period: str = None,
+    start_date: str = None,
+    end_date: str = None,
+    payload_version: int = phone_payload.PAYLOAD_VERSION_FULL
+):
+    """
+    Телефони лідів однієї кампанії (drill-down для /api/meta-data?payload_version=3).
+
+    Дані беруться зі звіту за період у кеші (або звіт рахується, як у /api/meta-data);
+    телефони з passed/current витягуються лише для цієї кампанії і запам'ятовуються.
+
+    Query params:
+    - status: лише один статус (за замовчуванням - всі)
+    - period: "YYYY-MM-DD - YYYY-MM-DD" (поле period звіту) або start_date + end_date
+    - payload_version: 1 - {статус: [{"phone", "status"}]}, 2 - таблиця телефонів + індекси
+
+    Returns:
+        {
+            "campaign_id": "...",
+            "tab": "students" | "teachers",
+            "period": "...",
+            "status_phones": {"Чекає оплату": ["+380...", ...]},   # колонки рядка студентів
+            "lead_phones": {"Нові": [{"phone": "+380...", "status": "current"}]}
+        }
+    """
+    if period:
+        start_date, _, end_date = (part.strip() for part in period.partition(" - "))
+    if not start_date or not end_date:
+        return JSONResponse({"error": "period або start_date та end_date обов'язкові"}, status_code=400)
+    if payload_version not in (phone_payload.PAYLOAD_VERSION_FULL, phone_payload.PAYLOAD_VERSION_COMPACT):
+        return JSONResponse({"error": f"Непідтримувана payload_version: {payload_version}"}, status_code=400)
+
+    meta_token = os.getenv("META_ACCESS_TOKEN")
+    ad_account_id = os.getenv("META_AD_ACCOUNT_ID")
+    if not meta_token or not ad_account_id:
+        return JSONResponse({"error": "META credentials не налаштовані"}, status_code=400)
+
+    try:
+        report, cache_status = await _get_meta_report(meta_token, ad_account_id, start_date, end_date)
+    except Exception as e:
+        logger.error(f"Error fetching Meta data for drill-down: {e}")
+        return JSONResponse({"error": f"Помилка отримання даних: {str(e)}"}, status_code=500)
+
+    tab, row = _find_report_campaign(report, campaign_id)
+    if tab is None:
+        return JSONResponse({"error": "Кампанію не знайдено у звіті за період"}, status_code=404)
+
+    status_phones = phone_payload.student_row_phones(row) if tab == "students" else {}
+
+    # lead_phones і LeadPhoneSource індексовані сирим id кампанії Meta (як get_leads_for_period)
+    lead_key = str(row.get("campaign_id"))
+    compact = None
+    if report.get("lead_phones") is not None:
+        compact = report["lead_phones"].get(tab, {}).get(lead_key)
+    elif report.get("_lead_source") is not None:
+        compact = await asyncio.to_thread(report["_lead_source"].campaign_phones, tab, lead_key)
+    compact = compact or {"phones": [], "statuses": {}}
+
+    if status:
+        status_phones = {status: status_phones.get(status, [])}
+        compact = {"phones": compact["phones"], "statuses": {
+            name: entry for name, entry in compact["statuses"].items() if name == status
+        }}
+
+    return FastJSONResponse({
+        "campaign_id": row.get("campaign_id"),
+        "campaign_name": row.get("campaign_name"),
+        "tab": tab,
+        "period": f"{start_date} - {end_date}",
+        "payload_version": payload_version,
+        "status_phones": status_phones,
+        "lead_phones": (
+            compact if payload_version == phone_payload.PAYLOAD_VERSION_COMPACT
+            else phone_payload.expand_campaign_phones(compact)
+        ),
+    }, headers={"X-Cache": cache_status})
+
+
+# Порядок колонок потокового експорту за замовчуванням (вчителі - ключі рядків звіту)
+STREAM_EXPORT_COLUMNS = {"ads": ADS_EXPORT_ORDER, "students": STUDENTS_EXPORT_ORDER, "teachers": None}
+STREAM_EXPORT_MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+
+
+@app.get("/api/export/{tab}.{export_format}")
+@limiter.limit("10/minute")
+async def stream_export(
+    request: Request,
+    tab: str,
+    export_format: str,
+    start_date: str = None,
+    end_date: str = None,
+    columns: str = None
+):
+    """
+    Потоковий експорт рядків вкладки звіту /api/meta-data без стилів:
+    /api/export/{ads|students|teachers}.{csv|ndjson}
+
+    Query params:
+    - start_date, end_date: період (як у /api/meta-data, звіт береться з того ж кешу)
+    - columns: проекція через кому (за замовчуванням - порядок колонок XLSX експорту);
+      колонки, яких немає в рядку, порожні
+
+    Рядки серіалізуються пачками (EXPORT_STREAM_CHUNK_ROWS) під час відправки -
+    повний CSV/NDJSON у пам'яті не збирається. Потік починається лише після
+    того, як звіт пораховано: помилка звіту - 500, а не "успішний" порожній
+    файл. Масиви телефонів у CSV - рядок через перенос, у NDJSON - масиви.
+    """
+    if tab not in STREAM_EXPORT_COLUMNS:
+        return JSONResponse({"error": f"Невідома вкладка: {tab}. Дозволені: ads, students, teachers"}, status_code=404)
+    if export_format not in STREAM_EXPORT_MEDIA_TYPES:
+        return JSONResponse({"error": "Формат має бути csv або ndjson"}, status_code=400)
+    if not start_date or not end_date:
+        return JSONResponse({"error": "start_date та end_date обов'язкові"}, status_code=400)
+
+    meta_token = os.getenv("META_ACCESS_TOKEN")
+    ad_account_id = os.getenv("META_AD_ACCOUNT_ID")
+    if not meta_token or not ad_account_id:
+        return JSONResponse({"error": "META credentials не налаштовані"}, status_code=400)
+
+    projection = [column.strip() for column in columns.split(",") if column.strip()] if columns else None
+    export_columns = projection or STREAM_EXPORT_COLUMNS[tab]
+
+    try:
+        report, cache_status = await _get_meta_report(meta_token, ad_account_id, start_date, end_date)
+    except Exception as e:
+        logger.error(f"Error building report for {tab}.{export_format} export: {e}")
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+    rows = report.get(tab, [])
+    row_columns = export_columns or columnar_export.columns_of(rows)
+
+    def export_chunks():
+        values = columnar_export.dict_rows(
+            (phone_payload.expand_student_row(row) for row in rows) if tab == "students" else rows,
+            row_columns
+        )
+        if export_format == "csv":
+            yield next(columnar_export.csv_chunks([row_columns]))
+            yield from columnar_export.csv_chunks(values)
         else:
-            keywords_students = ["student", "shkolnik"]
+            yield from columnar_export.ndjson_chunks(row_columns, values)
+
+    filename = f"{tab}_{start_date}_{end_date}.{export_format}"
+    return StreamingResponse(
+        export_chunks(),
+        media_type=STREAM_EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', "X-Cache": cache_status}
+    )
 
-        logger.info(f"[KEYWORDS] Teachers raw value: '{keywords_teachers_raw}' (length={len(keywords_teachers_raw)})")
-        logger.info(f"[KEYWORDS] Teachers parsed: {keywords_teachers}")
-        logger.info(f"[KEYWORDS] Students raw value: '{keywords_students_raw}' (length={len(keywords_students_raw)})")
-        logger.info(f"[KEYWORDS] Students parsed: {keywords_students}")
 
-        # Діагностична перевірка
-        if not keywords_students:
-            logger.warning(f"[KEYWORDS] ⚠️ STUDENTS KEYWORDS IS EMPTY! Raw value was: '{keywords_students_raw}'")
+async def build_meta_report(
+    db: Session,
+    meta_token: str,
+    ad_account_id: str,
+    start_date: str,
+    end_date: str,
+    keywords_teachers: List[str],
+    keywords_students: List[str],
+    timer: Optional[StageTimer] = None,
+    defer_lead_phones: bool = False,
+    record_analysis: bool = True
+) -> Dict[str, Any]:
+    """
+    Формує звіт для всіх 3 вкладок (РЕКЛАМА, СТУДЕНТИ, ВЧИТЕЛІ) з Meta API та CRM.
+
+    Використовується /api/meta-data (через кеш звітів).
+    timer збирає тривалість етапів (insights, creatives, meta_leads, CRM трекінг...).
+    defer_lead_phones: не витягувати lead_phones - звіт містить "lead_phones": None
+    та "_lead_source" (LeadPhoneSource) для витягування на запит.
+    record_analysis: записувати дати аналізу кампаній (False - лише читати).
+    """
+    timer = timer or StageTimer()
 
-        # 1) Получаем данные из Meta API (один раз для всех вкладок)
-        logger.info(f"Fetching Meta data for period {start_date} - {end_date}")
+    # 1) Получаем данные из Meta API (один раз для всех вкладок)
+    logger.info(f"Fetching Meta data for period {start_date} - {end_date}")
+    with timer.stage("insights"):
         insights = meta_conn.fetch_insights(
             ad_account_id=ad_account_id,
             access_token=meta_token,
@@ -1254,91 +2328,94 @@ async def get_meta_data(
             level="ad"
         )
 
-        logger.info(f"Received {len(insights)} insights from Meta API for period {start_date} - {end_date}")
+    logger.info(f"Received {len(insights)} insights from Meta API for period {start_date} - {end_date}")
 
-        # 2) Получаем креативы (тексты и изображения)
-        ad_ids = [insight.get("ad_id") for insight in insights if insight.get("ad_id")]
+    # 2) Получаем креативы (тексты и изображения)
+    ad_ids = [insight.get("ad_id") for insight in insights if insight.get("ad_id")]
+    with timer.stage("creatives"):
         creatives = meta_conn.fetch_ad_creatives(ad_ids, meta_token, ad_account_id) if ad_ids else {}
 
-        # 2.1) Получаем таргетинг (локации) для adsets
-        adset_ids = list(set([insight.get("adset_id") for insight in insights if insight.get("adset_id")]))
+    # 2.1) Получаем таргетинг (локации) для adsets
+    adset_ids = list(set([insight.get("adset_id") for insight in insights if insight.get("adset_id")]))
+    with timer.stage("targeting"):
         targeting = meta_conn.fetch_adset_targeting(adset_ids, meta_token) if adset_ids else {}
 
-        # 3) Обогащаем insights креативами и таргетингом
-        for insight in insights:
-            # Добавляем креативы
-            ad_id = insight.get("ad_id")
-            if ad_id and ad_id in creatives:
-                creative_data = creatives[ad_id]
-                insight["creative_title"] = creative_data.get("title", "")
-                insight["creative_body"] = creative_data.get("body", "")
-                insight["image_url"] = creative_data.get("image_url", "")
-                insight["video_id"] = creative_data.get("video_id", "")
-
-                # Debug logging для першого креативу
-                if len(insights) > 0 and insight == insights[0]:
-                    logger.info(f"DEBUG first creative: ad_id={ad_id}, image_url={creative_data.get('image_url')}, thumbnail={creative_data.get('thumbnail_url')}")
-
-            # Добавляем таргетинг (локации)
-            adset_id = insight.get("adset_id")
-            if adset_id and adset_id in targeting:
-                insight["location"] = targeting[adset_id].get("location", "")
-
-            # Извлекаем количество лидов из actions
-            actions = insight.get("actions", [])
-            leads_count = 0
-            for action in actions:
-                if action.get("action_type") == "lead":
-                    leads_count = int(action.get("value", 0))
-                    break
-            insight["leads_count_fb"] = leads_count
-
-        # ДОДАНО 2025-10-23: Створюємо lookup insights по campaign_id для студентів
-        # Агрегуємо ad-level insights → campaign-level для використання в student_campaigns
-        insights_by_campaign = {}
-        for insight in insights:
-            campaign_id = insight.get("campaign_id")
-            if not campaign_id:
-                continue
+    # 3) Обогащаем insights креативами и таргетингом
+    for insight in insights:
+        # Добавляем креативы
+        ad_id = insight.get("ad_id")
+        if ad_id and ad_id in creatives:
+            creative_data = creatives[ad_id]
+            insight["creative_title"] = creative_data.get("title", "")
+            insight["creative_body"] = creative_data.get("body", "")
+            insight["image_url"] = creative_data.get("image_url", "")
+            insight["video_id"] = creative_data.get("video_id", "")
+
+            # Debug logging для першого креативу
+            if len(insights) > 0 and insight == insights[0]:
+                logger.info(f"DEBUG first creative: ad_id={ad_id}, image_url={creative_data.get('image_url')}, thumbnail={creative_data.get('thumbnail_url')}")
+
+        # Добавляем таргетинг (локации)
+        adset_id = insight.get("adset_id")
+        if adset_id and adset_id in targeting:
+            insight["location"] = targeting[adset_id].get("location", "")
+
+        # Извлекаем количество лидов из actions
+        actions = insight.get("actions", [])
+        leads_count = 0
+        for action in actions:
+            if action.get("action_type") == "lead":
+                leads_count = int(action.get("value", 0))
+                break
+        insight["leads_count_fb"] = leads_count
+
+    # ДОДАНО 2025-10-23: Створюємо lookup insights по campaign_id для студентів
+    # Агрегуємо ad-level insights → campaign-level для використання в student_campaigns
+    insights_by_campaign = {}
+    for insight in insights:
+        campaign_id = insight.get("campaign_id")
+        if not campaign_id:
+            continue
 
-            # Ініціалізуємо запис для кампанії якщо ще немає
-            if campaign_id not in insights_by_campaign:
-                insights_by_campaign[campaign_id] = {
-                    "spend": 0.0,
-                    "location": "",
-                    "cpc": 0.0,
-                    "clicks": 0
-                }
+        # Ініціалізуємо запис для кампанії якщо ще немає
+        if campaign_id not in insights_by_campaign:
+            insights_by_campaign[campaign_id] = {
+                "spend": 0.0,
+                "location": "",
+                "cpc": 0.0,
+                "clicks": 0
+            }
 
-            # Агрегуємо spend (сума по всім ads кампанії)
-            insights_by_campaign[campaign_id]["spend"] += float(insight.get("spend", 0))
+        # Агрегуємо spend (сума по всім ads кампанії)
+        insights_by_campaign[campaign_id]["spend"] += float(insight.get("spend", 0))
 
-            # Location - беремо перший непустий
-            if not insights_by_campaign[campaign_id]["location"] and insight.get("location"):
-                insights_by_campaign[campaign_id]["location"] = insight.get("location")
+        # Location - беремо перший непустий
+        if not insights_by_campaign[campaign_id]["location"] and insight.get("location"):
+            insights_by_campaign[campaign_id]["location"] = insight.get("location")
 
-            # Для CPC потрібно: total_spend / total_clicks
-            insights_by_campaign[campaign_id]["clicks"] += int(insight.get("clicks", 0))
+        # Для CPC потрібно: total_spend / total_clicks
+        insights_by_campaign[campaign_id]["clicks"] += int(insight.get("clicks", 0))
 
-        # Розраховуємо CPC для кожної кампанії
-        for campaign_id, data in insights_by_campaign.items():
-            if data["clicks"] > 0:
-                data["cpc"] = round(data["spend"] / data["clicks"], 2)
-            else:
-                data["cpc"] = 0.0
+    # Розраховуємо CPC для кожної кампанії
+    for campaign_id, data in insights_by_campaign.items():
+        if data["clicks"] > 0:
+            data["cpc"] = round(data["spend"] / data["clicks"], 2)
+        else:
+            data["cpc"] = 0.0
 
-        logger.info(f"Created insights lookup for {len(insights_by_campaign)} campaigns")
+    logger.info(f"Created insights lookup for {len(insights_by_campaign)} campaigns")
 
-        # 4) Формируем данные для вкладки РЕКЛАМА з інтеграцією AlfaCRM tracking
-        ads_data = []
+    # 4) Формируем данные для вкладки РЕКЛАМА з інтеграцією AlfaCRM tracking
+    ads_data = []
 
-        # Получаем tracking данные для всех кампаний
-        ads_tracking = {}
-        try:
-            meta_page_id = os.getenv("META_PAGE_ID")
-            meta_page_token = os.getenv("META_PAGE_ACCESS_TOKEN")
+    # Получаем tracking данные для всех кампаний
+    ads_tracking = {}
+    try:
+        meta_page_id = os.getenv("META_PAGE_ID")
+        meta_page_token = os.getenv("META_PAGE_ACCESS_TOKEN")
 
-            if meta_page_id and meta_page_token:
+        if meta_page_id and meta_page_token:
+            with timer.stage("meta_leads"):
                 all_campaigns_ads = await meta_leads.get_leads_for_period(
                     page_id=meta_page_id,
                     page_token=meta_page_token,
@@ -1346,127 +2423,137 @@ async def get_meta_data(
                     end_date=end_date
                 )
 
-                # Трекинг через AlfaCRM для расчета метрик по лидам
+            # Трекинг через AlfaCRM для расчета метрик по лидам
+            with timer.stage("alfacrm_tracking"):
                 ads_tracking = await alfacrm_tracking.track_leads_by_campaigns(
                     campaigns_data=all_campaigns_ads,
                     page_size=500
                 )
-                logger.info(f"Loaded ads tracking for {len(ads_tracking)} campaigns")
-                if ads_tracking:
-                    logger.info(f"ads_tracking keys sample: {list(ads_tracking.keys())[:3]}")
-                    first_key = next(iter(ads_tracking))
-                    logger.info(f"First campaign structure: {list(ads_tracking[first_key].keys())}")
-            else:
-                logger.warning("META_PAGE_ID або META_PAGE_ACCESS_TOKEN не налаштовані")
-        except Exception as e:
-            logger.error(f"Failed to load ads tracking: {e}")
-
-        for insight in insights:
-            campaign_id = insight.get("campaign_id", "")
-
-            # Получаем статистику воронки для кампании
-            # Ключ в ads_tracking это "campaign_123", НЕ просто "123"
-            tracking_key = f"campaign_{campaign_id}"
-            campaign_tracking = ads_tracking.get(tracking_key, {})
-            funnel_stats = campaign_tracking.get("funnel_stats", {})
-
-            # Debug logging
-            if not funnel_stats:
-                logger.warning(f"No funnel_stats for campaign {campaign_id} (campaign_{campaign_id})")
-            else:
-                logger.info(f"Campaign {campaign_id}: funnel_stats keys = {list(funnel_stats.keys())}")
-
-            # Базовые показатели
-            leads_count = int(funnel_stats.get("Кількість лідів", 0)) if funnel_stats.get("Кількість лідів") else 0
-            spend = float(insight.get("spend", 0))
-
-            # Целевые/нецелевые лиды (по аналогии со students_data)
-            contact_established = funnel_stats.get("Вст контакт зацікавлений", 0)
-            not_processed = funnel_stats.get("Не розібраний", 0)
-
-            # Недозвоны (все варианты из обеих воронок)
-            no_answer = (
-                funnel_stats.get("Недодзвон", 0) +
-                funnel_stats.get("Недозвон 2", 0) +
-                funnel_stats.get("Недозвон 3", 0) +
-                funnel_stats.get("Недозвон", 0) +
-                funnel_stats.get("недозвон 3", 0)
-            )
-
-            # Целевые/нецелевые
-            target_leads = contact_established
-            non_target_leads = not_processed + no_answer
-            in_progress = funnel_stats.get("Розмовляли, чекаємо відповідь", 0)
-
-            # Расчет процентов
-            percent_target = round((target_leads / leads_count * 100), 2) if leads_count > 0 else 0
-            percent_non_target = round((non_target_leads / leads_count * 100), 2) if leads_count > 0 else 0
-            percent_no_answer = round((no_answer / leads_count * 100), 2) if leads_count > 0 else 0
-            percent_in_progress = round((in_progress / leads_count * 100), 2) if leads_count > 0 else 0
-
-            # CPL (Cost Per Lead) и Price Per Lead
-            cpl = round((spend / leads_count), 2) if leads_count > 0 else 0
-            price_per_lead = cpl  # Дублирование согласно требованиям
-            price_per_target_lead = round((spend / target_leads), 2) if target_leads > 0 else 0
-
-            # Отримуємо дати аналізу для кампанії (перший/повторний аналіз)
-            period = f"{insight.get('date_start', '')} - {insight.get('date_stop', '')}"
-            analysis_dates = get_or_create_analysis_record(db, campaign_id, period)
+            logger.info(f"Loaded ads tracking for {len(ads_tracking)} campaigns")
+            if ads_tracking:
+                logger.info(f"ads_tracking keys sample: {list(ads_tracking.keys())[:3]}")
+                first_key = next(iter(ads_tracking))
+                logger.info(f"First campaign structure: {list(ads_tracking[first_key].keys())}")
+        else:
+            logger.warning("META_PAGE_ID або META_PAGE_ACCESS_TOKEN не налаштовані")
+    except Exception as e:
+        logger.error(f"Failed to load ads tracking: {e}")
+
+    # Дати першого/повторного аналізу для всіх кампаній звіту (один запит у потоці)
+    analysis_records = await asyncio.to_thread(
+        get_or_create_analysis_records,
+        db,
+        [(insight.get("campaign_id", ""), f"{insight.get('date_start', '')} - {insight.get('date_stop', '')}") for insight in insights],
+        record_analysis
+    )
 
-            ads_data.append({
-                "campaign_name": insight.get("campaign_name", ""),
-                "campaign_id": campaign_id,
-                "period": period,
-                "first_analysis_date": analysis_dates["first_analysis_date"],
-                "last_analysis_date": analysis_dates["last_analysis_date"],
-                "date_start": insight.get("date_start", ""),
-                "date_stop": insight.get("date_stop", ""),
-                "date_update": datetime.now().strftime("%Y-%m-%d"),
-                "ad_name": insight.get("ad_name", ""),
-                "creative_image": insight.get("image_url") or insight.get("thumbnail_url", ""),
-                "creative_text": insight.get("creative_body", ""),
-                "image_url": insight.get("image_url", ""),
-                "thumbnail_url": insight.get("thumbnail_url", ""),
-                "location": insight.get("location", ""),  # НОВЕ: Локація з Facebook
-                "ctr": insight.get("ctr", 0),
-                "cpl": cpl,
-                "cpm": insight.get("cpm", 0),
-                "spend": spend,
-                "leads_count": insight.get("leads_count_fb", 0),  # НОВЕ: Кількість лідів з Facebook
-                "leads_target": target_leads,
-                "leads_non_target": non_target_leads,
-                "leads_no_answer": no_answer,
-                "leads_in_progress": in_progress,
-                "percent_target": percent_target,
-                "percent_non_target": percent_non_target,
-                "percent_no_answer": percent_no_answer,
-                "percent_in_progress": percent_in_progress,
-                "price_per_lead": price_per_lead,
-                "price_per_target_lead": price_per_target_lead,
-                "recommendation": ""
-            })
+    for insight in insights:
+        campaign_id = insight.get("campaign_id", "")
 
-        # 5) Формируем данные для вкладки СТУДЕНТИ з інтеграцією AlfaCRM tracking
-        students_data = []
+        # Получаем статистику воронки для кампании
+        # Ключ в ads_tracking это "campaign_123", НЕ просто "123"
+        tracking_key = f"campaign_{campaign_id}"
+        campaign_tracking = ads_tracking.get(tracking_key, {})
+        funnel_stats = campaign_tracking.get("funnel_stats", {})
 
-        # Отримуємо трекінг даних для студентів з AlfaCRM
-        students_tracking = {}
-        student_campaigns = {}
-        student_index = {}
+        # Debug logging
+        if not funnel_stats:
+            logger.warning(f"No funnel_stats for campaign {campaign_id} (campaign_{campaign_id})")
+        else:
+            logger.info(f"Campaign {campaign_id}: funnel_stats keys = {list(funnel_stats.keys())}")
+
+        # Базовые показатели
+        leads_count = int(funnel_stats.get("Кількість лідів", 0)) if funnel_stats.get("Кількість лідів") else 0
+        spend = float(insight.get("spend", 0))
+
+        # Целевые/нецелевые лиды (по аналогии со students_data)
+        contact_established = funnel_stats.get("Вст контакт зацікавлений", 0)
+        not_processed = funnel_stats.get("Не розібраний", 0)
+
+        # Недозвоны (все варианты из обеих воронок)
+        no_answer = (
+            funnel_stats.get("Недодзвон", 0) +
+            funnel_stats.get("Недозвон 2", 0) +
+            funnel_stats.get("Недозвон 3", 0) +
+            funnel_stats.get("Недозвон", 0) +
+            funnel_stats.get("недозвон 3", 0)
+        )
 
-        # Змінні для збору метаданих фільтрації
-        all_campaigns_count = 0
-        student_campaigns_count = 0
-        teacher_campaigns_count_var = 0
+        # Целевые/нецелевые
+        target_leads = contact_established
+        non_target_leads = not_processed + no_answer
+        in_progress = funnel_stats.get("Розмовляли, чекаємо відповідь", 0)
+
+        # Расчет процентов
+        percent_target = round((target_leads / leads_count * 100), 2) if leads_count > 0 else 0
+        percent_non_target = round((non_target_leads / leads_count * 100), 2) if leads_count > 0 else 0
+        percent_no_answer = round((no_answer / leads_count * 100), 2) if leads_count > 0 else 0
+        percent_in_progress = round((in_progress / leads_count * 100), 2) if leads_count > 0 else 0
+
+        # CPL (Cost Per Lead) и Price Per Lead
+        cpl = round((spend / leads_count), 2) if leads_count > 0 else 0
+        price_per_lead = cpl  # Дублирование согласно требованиям
+        price_per_target_lead = round((spend / target_leads), 2) if target_leads > 0 else 0
+
+        # Отримуємо дати аналізу для кампанії (перший/повторний аналіз)
+        period = f"{insight.get('date_start', '')} - {insight.get('date_stop', '')}"
+        analysis_dates = analysis_records[(campaign_id, period)]
+
+        ads_data.append({
+            "campaign_name": insight.get("campaign_name", ""),
+            "campaign_id": campaign_id,
+            "period": period,
+            "first_analysis_date": analysis_dates["first_analysis_date"],
+            "last_analysis_date": analysis_dates["last_analysis_date"],
+            "date_start": insight.get("date_start", ""),
+            "date_stop": insight.get("date_stop", ""),
+            "date_update": datetime.now().strftime("%Y-%m-%d"),
+            "ad_name": insight.get("ad_name", ""),
+            "creative_image": insight.get("image_url") or insight.get("thumbnail_url", ""),
+            "creative_text": insight.get("creative_body", ""),
+            "image_url": insight.get("image_url", ""),
+            "thumbnail_url": insight.get("thumbnail_url", ""),
+            "location": insight.get("location", ""),  # НОВЕ: Локація з Facebook
+            "ctr": insight.get("ctr", 0),
+            "cpl": cpl,
+            "cpm": insight.get("cpm", 0),
+            "spend": spend,
+            "leads_count": insight.get("leads_count_fb", 0),  # НОВЕ: Кількість лідів з Facebook
+            "leads_target": target_leads,
+            "leads_non_target": non_target_leads,
+            "leads_no_answer": no_answer,
+            "leads_in_progress": in_progress,
+            "percent_target": percent_target,
+            "percent_non_target": percent_non_target,
+            "percent_no_answer": percent_no_answer,
+            "percent_in_progress": percent_in_progress,
+            "price_per_lead": price_per_lead,
+            "price_per_target_lead": price_per_target_lead,
+            "recommendation": ""
+        })
+
+    # 5) Формируем данные для вкладки СТУДЕНТИ з інтеграцією AlfaCRM tracking
+    students_data = []
+
+    # Отримуємо трекінг даних для студентів з AlfaCRM
+    students_tracking = {}
+    student_campaigns = {}
+    student_index = {}
+
+    # Змінні для збору метаданих фільтрації
+    all_campaigns_count = 0
+    student_campaigns_count = 0
+    teacher_campaigns_count_var = 0
 
-        try:
-            meta_page_id = os.getenv("META_PAGE_ID")
-            meta_page_token = os.getenv("META_PAGE_ACCESS_TOKEN")
+    try:
+        meta_page_id = os.getenv("META_PAGE_ID")
+        meta_page_token = os.getenv("META_PAGE_ACCESS_TOKEN")
 
-            if meta_page_id and meta_page_token:
-                # Фільтруємо лідів тільки для кампаній студентів
-                # (keywords_students вже прочитані на початку функції)
+        if meta_page_id and meta_page_token:
+            # Фільтруємо лідів тільки для кампаній студентів
+            # (keywords_students вже прочитані на початку функції)
 
+            with timer.stage("meta_leads"):
                 all_campaigns = await meta_leads.get_leads_for_period(
                     page_id=meta_page_id,
                     page_token=meta_page_token,
@@ -1474,204 +2561,213 @@ async def get_meta_data(
                     end_date=end_date
                 )
 
-                # Зберігаємо загальну кількість для метаданих
-                all_campaigns_count = len(all_campaigns)
-
-                # INFO: Показати ВСІ назви кампаній ДО фільтрації
-                logger.info(f"[STUDENTS] Before filtering: Total {len(all_campaigns)} campaigns from Meta API")
-                logger.info(f"[STUDENTS] Keywords used for filtering: {keywords_students}")
-                if all_campaigns:
-                    sample_all = list(all_campaigns.values())[:10]
-                    for idx, camp in enumerate(sample_all, 1):
-                        camp_name = camp.get("campaign_name", "NO_NAME")
-                        camp_name_lower = camp_name.lower()
-                        logger.info(f"[STUDENTS]   {idx}. Campaign: '{camp_name}' (lowercase: '{camp_name_lower}')")
-
-                # Фільтруємо тільки кампанії студентів
-                student_campaigns = {
-                    cid: cdata for cid, cdata in all_campaigns.items()
-                    if any(kw.strip() in cdata.get("campaign_name", "").lower() for kw in keywords_students)
-                }
-
-                # Зберігаємо кількість для метаданих
-                student_campaigns_count = len(student_campaigns)
+            # Зберігаємо загальну кількість для метаданих
+            all_campaigns_count = len(all_campaigns)
+
+            # INFO: Показати ВСІ назви кампаній ДО фільтрації
+            logger.info(f"[STUDENTS] Before filtering: Total {len(all_campaigns)} campaigns from Meta API")
+            logger.info(f"[STUDENTS] Keywords used for filtering: {keywords_students}")
+            if all_campaigns:
+                sample_all = list(all_campaigns.values())[:10]
+                for idx, camp in enumerate(sample_all, 1):
+                    camp_name = camp.get("campaign_name", "NO_NAME")
+                    camp_name_lower = camp_name.lower()
+                    logger.info(f"[STUDENTS]   {idx}. Campaign: '{camp_name}' (lowercase: '{camp_name_lower}')")
+
+            # Фільтруємо тільки кампанії студентів
+            student_campaigns = {
+                cid: cdata for cid, cdata in all_campaigns.items()
+                if any(kw.strip() in cdata.get("campaign_name", "").lower() for kw in keywords_students)
+            }
 
-                logger.info(f"[STUDENTS] After filtering: {len(student_campaigns)} student campaigns out of {len(all_campaigns)} total")
+            # Зберігаємо кількість для метаданих
+            student_campaigns_count = len(student_campaigns)
 
-                # INFO: Показати назви відфільтрованих кампаній (перші 5)
-                if student_campaigns:
-                    sample_campaigns = list(student_campaigns.values())[:5]
-                    for sc in sample_campaigns:
-                        logger.info(f"[STUDENTS]   ✓ Matched campaign: {sc.get('campaign_name')}")
-                else:
-                    logger.warning(f"[STUDENTS]   No student campaigns found! Check if keywords match any campaign names.")
+            logger.info(f"[STUDENTS] After filtering: {len(student_campaigns)} student campaigns out of {len(all_campaigns)} total")
 
-                # Трекінг через AlfaCRM з inference підходом
-                # Функція сама завантажить студентів і відфільтрує тільки релевантних
-                students_tracking = await alfacrm_tracking.track_leads_by_campaigns(
-                    campaigns_data=student_campaigns,
-                    page_size=500
-                )
-                logger.info(f"Loaded student tracking for {len(students_tracking)} campaigns")
+            # INFO: Показати назви відфільтрованих кампаній (перші 5)
+            if student_campaigns:
+                sample_campaigns = list(student_campaigns.values())[:5]
+                for sc in sample_campaigns:
+                    logger.info(f"[STUDENTS]   ✓ Matched campaign: {sc.get('campaign_name')}")
             else:
-                logger.warning("META_PAGE_ID або META_PAGE_ACCESS_TOKEN не налаштовані - пропускаємо трекінг студентів")
-        except Exception as e:
-            logger.error(f"Failed to load student tracking: {e}")
-
-        # Ітеруємо по відфільтрованим student_campaigns (не залежить від insights)
-        # ВИПРАВЛЕНО 2025-10-16: insights може бути порожнім через rate limit,
-        # але student_campaigns завжди є (отримуємо через leadgen_forms API)
-        students_data_debug_counter = 0  # Лічильник для DEBUG виводу
-        for campaign_id, campaign_data in student_campaigns.items():
-            campaign_name = campaign_data.get("campaign_name", "")
-
-            # Отримуємо статистику воронки для цієї кампанії
-            campaign_tracking = students_tracking.get(campaign_id, {})
-            funnel_stats = campaign_tracking.get("funnel_stats", {})
-            # НОВОЕ 2025-10-24: Получаем массивы телефонов вместо счетчиков
-            phone_arrays = campaign_tracking.get("phone_arrays", {})
-
-            # Базові показники
-            leads_count = int(funnel_stats.get("Кількість лідів", 0)) if funnel_stats.get("Кількість лідів") else 0
-            # Кількість лідів з Facebook (з leadgen_forms API)
-            leads_count_fb = len(campaign_data.get("leads", []))
-
-            # ВИПРАВЛЕНО 2025-10-23: Отримуємо budget, location, CPC з Meta Insights API
-            campaign_insights = insights_by_campaign.get(campaign_id, {})
-            budget = float(campaign_insights.get("spend", 0.0))
-            location = campaign_insights.get("location", "")
-
-            # DEBUG: Показати дані першої кампанії для діагностики
-            students_data_debug_counter += 1
-            if students_data_debug_counter <= 3:
-                logger.info(f"[DEBUG STUDENTS LOOP {students_data_debug_counter}] Campaign: '{campaign_name}'")
-                logger.info(f"[DEBUG STUDENTS LOOP {students_data_debug_counter}]   leads_count_fb (from leadforms): {leads_count_fb}")
-                logger.info(f"[DEBUG STUDENTS LOOP {students_data_debug_counter}]   leads_count (from AlfaCRM): {leads_count}")
-                logger.info(f"[DEBUG STUDENTS LOOP {students_data_debug_counter}]   funnel_stats keys: {list(funnel_stats.keys())[:5]}")  # Перші 5 ключів
-                logger.info(f"[DEBUG STUDENTS LOOP {students_data_debug_counter}]   campaign_tracking has data: {bool(campaign_tracking)}")
-
-            # 10 АГРЕГОВАНИХ СТАТУСІВ ALFACRM (синхронізовано з alfacrm_tracking.py)
-            # ИЗМЕНЕНО 2025-10-24: Извлекаем массивы телефонов вместо счетчиков
-            phone_not_processed = phone_arrays.get("Не розібраний", [])
-            phone_no_answer = phone_arrays.get("Недозвон (не ЦА)", [])
-            phone_contact = phone_arrays.get("Встановлено контакт (ЦА)", [])
-            phone_in_progress_agg = phone_arrays.get("В опрацюванні (ЦА)", [])
-            phone_trial_scheduled = phone_arrays.get("Призначено пробне (ЦА)", [])
-            phone_trial_completed = phone_arrays.get("Проведено пробне (ЦА)", [])
-            phone_waiting_payment = phone_arrays.get("Чекає оплату", [])
-            phone_purchased = phone_arrays.get("Отримана оплата (ЦА)", [])
-            phone_archived = phone_arrays.get("Архів (ЦА)", [])  # Всі архівні ліди за період (custom_ads_comp == 'архів')
-            phone_archived_non_target = phone_arrays.get("Архів (не ЦА)", [])  # = 0 до рішення замовника про класифікацію
-            phone_leads_count = phone_arrays.get("leads_count", [])
-
-            # Рассчитываем counts для процентов и цен
-            status_not_processed = len(phone_not_processed)
-            status_no_answer = len(phone_no_answer)
-            status_contact = len(phone_contact)
-            status_in_progress_agg = len(phone_in_progress_agg)
-            status_trial_scheduled = len(phone_trial_scheduled)
-            status_trial_completed = len(phone_trial_completed)
-            status_waiting_payment = len(phone_waiting_payment)
-            status_purchased = len(phone_purchased)
-            status_archived = len(phone_archived)
-            status_archived_non_target = len(phone_archived_non_target)
-
-            # Цільові/нецільові
-            # S = J + K + N + O + P (згідно зі специфікацією рядок 31)
-            target_leads = (
-                status_contact +              # J - Встановлено контакт (ЦА)
-                status_in_progress_agg +      # K - В опрацюванні (ЦА)
-                status_waiting_payment +      # N - Чекає оплату
-                status_purchased +            # O - Отримана оплата (ЦА)
-                status_archived               # P - Архів (ЦА)
-            )
-            non_target_leads = status_no_answer + status_archived_non_target  # T = Q + R (Недозвон (не ЦА) + Архів (не ЦА))
-
-            # Розрахунок відсотків
-            percent_target = round((target_leads / leads_count * 100), 2) if leads_count > 0 else 0
-            percent_non_target = round((non_target_leads / leads_count * 100), 2) if leads_count > 0 else 0
-            percent_contact = round((status_contact / leads_count * 100), 2) if leads_count > 0 else 0
-            percent_conversion = round((status_purchased / leads_count * 100), 2) if leads_count > 0 else 0  # Y: % конверсія = O/G (Купили / Кількість лідів)
-            percent_no_answer = round((status_no_answer / leads_count * 100), 2) if leads_count > 0 else 0
-
-            # Розрахунок для пробних уроків
-            percent_trial_scheduled = round((status_trial_scheduled / leads_count * 100), 2) if leads_count > 0 else 0
-            percent_trial_completed = round((status_trial_completed / leads_count * 100), 2) if leads_count > 0 else 0
-            percent_trial_conversion = round((status_trial_completed / status_trial_scheduled * 100), 2) if status_trial_scheduled > 0 else 0
-            conversion_trial_to_sale = round((status_purchased / status_trial_completed * 100), 2) if status_trial_completed > 0 else 0
-
-            # Ціна за ліда
-            price_per_lead = round((budget / leads_count), 2) if leads_count > 0 else 0
-            price_per_target_lead = round((budget / target_leads), 2) if target_leads > 0 else 0
-
-            # ВИПРАВЛЕНО 2025-10-23: CPC отримується з Meta Insights API
-            cpc = float(campaign_insights.get("cpc", 0.0))
-
-            students_data.append({
-                "campaign_name": campaign_name,
-                "campaign_link": f"https://facebook.com/ads/manager/campaigns/edit/{campaign_id}",
-                "analysis_date": datetime.now().strftime("%Y-%m-%d"),
-                "period": f"{start_date} - {end_date}",
-                "budget": budget,
-                "location": location,  # ВИПРАВЛЕНО 2025-10-23: Локація з Meta Insights API
-                "leads_count": phone_leads_count,  # ИЗМЕНЕНО 2025-10-24: Массив телефонов вместо count
-                "target_leads": target_leads,
-                "non_target_leads": non_target_leads,
-                "percent_target": percent_target,
-                "percent_non_target": percent_non_target,
-                "percent_contact": percent_contact,
-                "percent_in_progress": round((status_in_progress_agg / leads_count * 100), 2) if leads_count > 0 else 0,  # X = K / G (В опрацюванні (ЦА) / Кількість лідів) - спец. строка 38
-                "percent_conversion": percent_conversion,
-                "percent_archive": round(((funnel_stats.get("Архів (ЦА)", 0) + funnel_stats.get("Архів (не ЦА)", 0)) / leads_count * 100), 2) if leads_count > 0 else 0,
-                "percent_no_answer": percent_no_answer,
-                "price_per_lead": price_per_lead,
-                "price_per_target_lead": price_per_target_lead,
-                "notes": "",
-                "percent_trial_scheduled": percent_trial_scheduled,
-                "percent_trial_completed": percent_trial_completed,
-                "percent_trial_conversion": percent_trial_conversion,
-                "conversion_trial_to_sale": conversion_trial_to_sale,
-                "cpc": cpc,  # AI: CPC (Cost Per Click) - TODO: з Meta Insights API
-                # 10 СТАТУСІВ ALFACRM згідно специфікації (колонки I-R)
-                # ИЗМЕНЕНО 2025-10-24: Массивы телефонов вместо integer counts
-                "Не розібраний": phone_not_processed,
-                "Недозвон (не ЦА)": phone_no_answer,
-                "Встановлено контакт (ЦА)": phone_contact,
-                "В опрацюванні (ЦА)": phone_in_progress_agg,
-                "Призначено пробне (ЦА)": phone_trial_scheduled,
-                "Проведено пробне (ЦА)": phone_trial_completed,
-                "Чекає оплату": phone_waiting_payment,
-                "Отримана оплата (ЦА)": phone_purchased,
-                "Архів (ЦА)": phone_archived,
-                "Архів (не ЦА)": phone_archived_non_target
-            })
-
-        # INFO: Перевірка фінального розміру масиву students_data ПІСЛЯ циклу
-        logger.info(f"[STUDENTS FINAL] Total students_data records: {len(students_data)}")
-        if students_data:
-            logger.info(f"[STUDENTS FINAL] Sample first student: campaign={students_data[0].get('campaign_name')}, leads_count={students_data[0].get('leads_count')}")
+                logger.warning(f"[STUDENTS]   No student campaigns found! Check if keywords match any campaign names.")
+
+            # Трекінг через AlfaCRM з inference підходом
+            # Індекс студентів (лише релевантні контакти) потрібен і для телефонів лідів;
+            # AlfaCRM API та снапшоти статусів блокуючі - завантажуємо в окремому потоці
+            with timer.stage("alfacrm_tracking"):
+                loaded_index = await asyncio.to_thread(alfacrm_tracking.load_student_index, student_campaigns, 500)
+                if loaded_index is not None:
+                    student_index = loaded_index
+                    students_tracking = await alfacrm_tracking.track_leads_by_campaigns(
+                        campaigns_data=student_campaigns,
+                        student_index=student_index
+                    )
+            logger.info(f"Loaded student tracking for {len(students_tracking)} campaigns")
         else:
-            logger.warning(f"[STUDENTS FINAL] students_data is EMPTY!")
+            logger.warning("META_PAGE_ID або META_PAGE_ACCESS_TOKEN не налаштовані - пропускаємо трекінг студентів")
+    except Exception as e:
+        logger.error(f"Failed to load student tracking: {e}")
+
+    # Ітеруємо по відфільтрованим student_campaigns (не залежить від insights)
+    # ВИПРАВЛЕНО 2025-10-16: insights може бути порожнім через rate limit,
+    # але student_campaigns завжди є (отримуємо через leadgen_forms API)
+    students_data_debug_counter = 0  # Лічильник для DEBUG виводу
+    for campaign_id, campaign_data in student_campaigns.items():
+        campaign_name = campaign_data.get("campaign_name", "")
+
+        # Отримуємо статистику воронки для цієї кампанії
+        campaign_tracking = students_tracking.get(campaign_id, {})
+        funnel_stats = campaign_tracking.get("funnel_stats", {})
+        # Телефони по статусах у версії 2: таблиця телефонів + індекси (phone_payload)
+        phone_indexes = campaign_tracking.get("phone_indexes", {})
+        campaign_phones = phone_indexes.get("phones", [])
+        phone_arrays = phone_indexes.get("statuses", {})
+
+        # Базові показники
+        leads_count = int(funnel_stats.get("Кількість лідів", 0)) if funnel_stats.get("Кількість лідів") else 0
+        # Кількість лідів з Facebook (з leadgen_forms API)
+        leads_count_fb = len(campaign_data.get("leads", []))
+
+        # ВИПРАВЛЕНО 2025-10-23: Отримуємо budget, location, CPC з Meta Insights API
+        campaign_insights = insights_by_campaign.get(campaign_id, {})
+        budget = float(campaign_insights.get("spend", 0.0))
+        location = campaign_insights.get("location", "")
+
+        # DEBUG: Показати дані першої кампанії для діагностики
+        students_data_debug_counter += 1
+        if students_data_debug_counter <= 3:
+            logger.info(f"[DEBUG STUDENTS LOOP {students_data_debug_counter}] Campaign: '{campaign_name}'")
+            logger.info(f"[DEBUG STUDENTS LOOP {students_data_debug_counter}]   leads_count_fb (from leadforms): {leads_count_fb}")
+            logger.info(f"[DEBUG STUDENTS LOOP {students_data_debug_counter}]   leads_count (from AlfaCRM): {leads_count}")
+            logger.info(f"[DEBUG STUDENTS LOOP {students_data_debug_counter}]   funnel_stats keys: {list(funnel_stats.keys())[:5]}")  # Перші 5 ключів
+            logger.info(f"[DEBUG STUDENTS LOOP {students_data_debug_counter}]   campaign_tracking has data: {bool(campaign_tracking)}")
+
+        # 10 АГРЕГОВАНИХ СТАТУСІВ ALFACRM (синхронізовано з alfacrm_tracking.py)
+        # ИЗМЕНЕНО 2025-10-24: Извлекаем массивы телефонов вместо счетчиков
+        phone_not_processed = phone_arrays.get("Не розібраний", [])
+        phone_no_answer = phone_arrays.get("Недозвон (не ЦА)", [])
+        phone_contact = phone_arrays.get("Встановлено контакт (ЦА)", [])
+        phone_in_progress_agg = phone_arrays.get("В опрацюванні (ЦА)", [])
+        phone_trial_scheduled = phone_arrays.get("Призначено пробне (ЦА)", [])
+        phone_trial_completed = phone_arrays.get("Проведено пробне (ЦА)", [])
+        phone_waiting_payment = phone_arrays.get("Чекає оплату", [])
+        phone_purchased = phone_arrays.get("Отримана оплата (ЦА)", [])
+        phone_archived = phone_arrays.get("Архів (ЦА)", [])  # Всі архівні ліди за період (custom_ads_comp == 'архів')
+        phone_archived_non_target = phone_arrays.get("Архів (не ЦА)", [])  # = 0 до рішення замовника про класифікацію
+
+        # Рассчитываем counts для процентов и цен
+        status_not_processed = len(phone_not_processed)
+        status_no_answer = len(phone_no_answer)
+        status_contact = len(phone_contact)
+        status_in_progress_agg = len(phone_in_progress_agg)
+        status_trial_scheduled = len(phone_trial_scheduled)
+        status_trial_completed = len(phone_trial_completed)
+        status_waiting_payment = len(phone_waiting_payment)
+        status_purchased = len(phone_purchased)
+        status_archived = len(phone_archived)
+        status_archived_non_target = len(phone_archived_non_target)
+
+        # Цільові/нецільові
+        # S = J + K + N + O + P (згідно зі специфікацією рядок 31)
+        target_leads = (
+            status_contact +              # J - Встановлено контакт (ЦА)
+            status_in_progress_agg +      # K - В опрацюванні (ЦА)
+            status_waiting_payment +      # N - Чекає оплату
+            status_purchased +            # O - Отримана оплата (ЦА)
+            status_archived               # P - Архів (ЦА)
+        )
+        non_target_leads = status_no_answer + status_archived_non_target  # T = Q + R (Недозвон (не ЦА) + Архів (не ЦА))
+
+        # Розрахунок відсотків
+        percent_target = round((target_leads / leads_count * 100), 2) if leads_count > 0 else 0
+        percent_non_target = round((non_target_leads / leads_count * 100), 2) if leads_count > 0 else 0
+        percent_contact = round((status_contact / leads_count * 100), 2) if leads_count > 0 else 0
+        percent_conversion = round((status_purchased / leads_count * 100), 2) if leads_count > 0 else 0  # Y: % конверсія = O/G (Купили / Кількість лідів)
+        percent_no_answer = round((status_no_answer / leads_count * 100), 2) if leads_count > 0 else 0
+
+        # Розрахунок для пробних уроків
+        percent_trial_scheduled = round((status_trial_scheduled / leads_count * 100), 2) if leads_count > 0 else 0
+        percent_trial_completed = round((status_trial_completed / leads_count * 100), 2) if leads_count > 0 else 0
+        percent_trial_conversion = round((status_trial_completed / status_trial_scheduled * 100), 2) if status_trial_scheduled > 0 else 0
+        conversion_trial_to_sale = round((status_purchased / status_trial_completed * 100), 2) if status_trial_completed > 0 else 0
+
+        # Ціна за ліда
+        price_per_lead = round((budget / leads_count), 2) if leads_count > 0 else 0
+        price_per_target_lead = round((budget / target_leads), 2) if target_leads > 0 else 0
+
+        # ВИПРАВЛЕНО 2025-10-23: CPC отримується з Meta Insights API
+        cpc = float(campaign_insights.get("cpc", 0.0))
+
+        students_data.append({
+            "campaign_id": campaign_id,  # ключ кампанії для /api/campaigns/{id}/leads
+            "campaign_name": campaign_name,
+            "campaign_link": f"https://facebook.com/ads/manager/campaigns/edit/{campaign_id}",
+            "analysis_date": datetime.now().strftime("%Y-%m-%d"),
+            "period": f"{start_date} - {end_date}",
+            "budget": budget,
+            "location": location,  # ВИПРАВЛЕНО 2025-10-23: Локація з Meta Insights API
+            "phones": campaign_phones,  # Таблиця телефонів кампанії; у версії 1 стає leads_count
+            "leads_count": len(campaign_phones),
+            "target_leads": target_leads,
+            "non_target_leads": non_target_leads,
+            "percent_target": percent_target,
+            "percent_non_target": percent_non_target,
+            "percent_contact": percent_contact,
+            "percent_in_progress": round((status_in_progress_agg / leads_count * 100), 2) if leads_count > 0 else 0,  # X = K / G (В опрацюванні (ЦА) / Кількість лідів) - спец. строка 38
+            "percent_conversion": percent_conversion,
+            "percent_archive": round(((funnel_stats.get("Архів (ЦА)", 0) + funnel_stats.get("Архів (не ЦА)", 0)) / leads_count * 100), 2) if leads_count > 0 else 0,
+            "percent_no_answer": percent_no_answer,
+            "price_per_lead": price_per_lead,
+            "price_per_target_lead": price_per_target_lead,
+            "notes": "",
+            "percent_trial_scheduled": percent_trial_scheduled,
+            "percent_trial_completed": percent_trial_completed,
+            "percent_trial_conversion": percent_trial_conversion,
+            "conversion_trial_to_sale": conversion_trial_to_sale,
+            "cpc": cpc,  # AI: CPC (Cost Per Click) - TODO: з Meta Insights API
+            # 10 СТАТУСІВ ALFACRM згідно специфікації (колонки I-R)
+            # Індекси в "phones" (версія 1 - масиви телефонів, див. phone_payload.expand_report)
+            "Не розібраний": phone_not_processed,
+            "Недозвон (не ЦА)": phone_no_answer,
+            "Встановлено контакт (ЦА)": phone_contact,
+            "В опрацюванні (ЦА)": phone_in_progress_agg,
+            "Призначено пробне (ЦА)": phone_trial_scheduled,
+            "Проведено пробне (ЦА)": phone_trial_completed,
+            "Чекає оплату": phone_waiting_payment,
+            "Отримана оплата (ЦА)": phone_purchased,
+            "Архів (ЦА)": phone_archived,
+            "Архів (не ЦА)": phone_archived_non_target
+        })
+
+    # INFO: Перевірка фінального розміру масиву students_data ПІСЛЯ циклу
+    logger.info(f"[STUDENTS FINAL] Total students_data records: {len(students_data)}")
+    if students_data:
+        logger.info(f"[STUDENTS FINAL] Sample first student: campaign={students_data[0].get('campaign_name')}, leads_count={students_data[0].get('leads_count')}")
+    else:
+        logger.warning(f"[STUDENTS FINAL] students_data is EMPTY!")
 
-        # 6) Формируем данные для вкладки ВЧИТЕЛІ з інтеграцією NetHunt tracking
-        teachers_data = []
-        teachers_excel_rows = []
+    # 6) Формируем данные для вкладки ВЧИТЕЛІ з інтеграцією NetHunt tracking
+    teachers_data = []
+    teachers_excel_rows = []
 
-        # Отримуємо трекінг даних для вчителів з NetHunt
-        teachers_tracking = {}
-        teacher_campaigns = {}
-        teacher_index = {}
-        teacher_status_histories = {}
+    # Отримуємо трекінг даних для вчителів з NetHunt
+    teachers_tracking = {}
+    teacher_campaigns = {}
+    teacher_index = {}
+    teacher_status_histories = {}
 
-        try:
-            meta_page_id = os.getenv("META_PAGE_ID")
-            meta_page_token = os.getenv("META_PAGE_ACCESS_TOKEN")
-            nh_folder = os.getenv("NETHUNT_FOLDER_ID")
+    try:
+        meta_page_id = os.getenv("META_PAGE_ID")
+        meta_page_token = os.getenv("META_PAGE_ACCESS_TOKEN")
+        nh_folder = os.getenv("NETHUNT_FOLDER_ID")
 
-            if meta_page_id and meta_page_token and nh_folder:
-                # Фільтруємо лідів тільки для кампаній вчителів
-                # (keywords_teachers вже прочитані на початку функції)
+        if meta_page_id and meta_page_token and nh_folder:
+            # Фільтруємо лідів тільки для кампаній вчителів
+            # (keywords_teachers вже прочитані на початку функції)
 
+            with timer.stage("meta_leads"):
                 all_campaigns = await meta_leads.get_leads_for_period(
                     page_id=meta_page_id,
                     page_token=meta_page_token,
@@ -1679,184 +2775,196 @@ async def get_meta_data(
                     end_date=end_date
                 )
 
-                # INFO: Показати ВСІ назви кампаній ДО фільтрації (для вчителів)
-                logger.info(f"[TEACHERS] Before filtering: Total {len(all_campaigns)} campaigns from Meta API")
-                logger.info(f"[TEACHERS] Keywords used for filtering: {keywords_teachers}")
-                if all_campaigns:
-                    sample_all_teachers = list(all_campaigns.values())[:10]
-                    for idx, camp in enumerate(sample_all_teachers, 1):
-                        camp_name = camp.get("campaign_name", "NO_NAME")
-                        camp_name_lower = camp_name.lower()
-                        logger.info(f"[TEACHERS]   {idx}. Campaign: '{camp_name}' (lowercase: '{camp_name_lower}')")
-
-                # Фільтруємо тільки кампанії вчителів
-                teacher_campaigns = {
-                    cid: cdata for cid, cdata in all_campaigns.items()
-                    if any(kw.strip() in cdata.get("campaign_name", "").lower() for kw in keywords_teachers)
-                }
+            # INFO: Показати ВСІ назви кампаній ДО фільтрації (для вчителів)
+            logger.info(f"[TEACHERS] Before filtering: Total {len(all_campaigns)} campaigns from Meta API")
+            logger.info(f"[TEACHERS] Keywords used for filtering: {keywords_teachers}")
+            if all_campaigns:
+                sample_all_teachers = list(all_campaigns.values())[:10]
+                for idx, camp in enumerate(sample_all_teachers, 1):
+                    camp_name = camp.get("campaign_name", "NO_NAME")
+                    camp_name_lower = camp_name.lower()
+                    logger.info(f"[TEACHERS]   {idx}. Campaign: '{camp_name}' (lowercase: '{camp_name_lower}')")
+
+            # Фільтруємо тільки кампанії вчителів
+            teacher_campaigns = {
+                cid: cdata for cid, cdata in all_campaigns.items()
+                if any(kw.strip() in cdata.get("campaign_name", "").lower() for kw in keywords_teachers)
+            }
 
-                # Зберігаємо кількість для метаданих
-                teacher_campaigns_count_var = len(teacher_campaigns)
+            # Зберігаємо кількість для метаданих
+            teacher_campaigns_count_var = len(teacher_campaigns)
 
-                logger.info(f"[TEACHERS] After filtering: {len(teacher_campaigns)} teacher campaigns out of {len(all_campaigns)} total")
-                if teacher_campaigns:
-                    sample_teachers = list(teacher_campaigns.values())[:5]
-                    for tc in sample_teachers:
-                        logger.info(f"[TEACHERS]   ✓ Matched campaign: {tc.get('campaign_name')}")
-                else:
-                    logger.warning(f"[TEACHERS]   No teacher campaigns found! Check if keywords match any campaign names.")
+            logger.info(f"[TEACHERS] After filtering: {len(teacher_campaigns)} teacher campaigns out of {len(all_campaigns)} total")
+            if teacher_campaigns:
+                sample_teachers = list(teacher_campaigns.values())[:5]
+                for tc in sample_teachers:
+                    logger.info(f"[TEACHERS]   ✓ Matched campaign: {tc.get('campaign_name')}")
+            else:
+                logger.warning(f"[TEACHERS]   No teacher campaigns found! Check if keywords match any campaign names.")
 
-                # Трекінг через NetHunt з inference підходом (БЕЗ історії)
+            # Трекінг через NetHunt з inference підходом (БЕЗ історії)
+            with timer.stage("nethunt_tracking"):
+                teacher_index = await asyncio.to_thread(nethunt_tracking.load_teacher_index, teacher_campaigns, nh_folder)
                 teachers_tracking = await nethunt_tracking.track_leads_by_campaigns(
                     campaigns_data=teacher_campaigns,
-                    folder_id=nh_folder
+                    teacher_index=teacher_index
                 )
-                logger.info(f"Loaded teacher tracking for {len(teachers_tracking)} campaigns")
-
-                # Форматування для Excel експорту (49 колонок A-AX)
-                teachers_excel_rows = teachers_formatter.transform_enriched_teachers_to_excel_rows(
-                    enriched_campaigns=teachers_tracking,
-                    analysis_date=datetime.now().strftime("%d.%m.%Y"),
-                    date_range=f"{start_date} - {end_date}",
-                    facebook_ads_url=f"https://facebook.com/ads/manager/account/{settings.META_AD_ACCOUNT_ID.replace('act_', '')}"
-                )
-                logger.info(f"Formatted {len(teachers_excel_rows)} teacher rows for Excel export")
-            else:
-                logger.warning("META_PAGE_ID, META_PAGE_ACCESS_TOKEN або NETHUNT_FOLDER_ID не налаштовані")
-        except Exception as e:
-            logger.error(f"Failed to load teacher tracking: {e}")
+            logger.info(f"Loaded teacher tracking for {len(teachers_tracking)} campaigns")
+
+            # Форматування для Excel експорту (49 колонок A-AX)
+            teachers_excel_rows = teachers_formatter.transform_enriched_teachers_to_excel_rows(
+                enriched_campaigns=teachers_tracking,
+                analysis_date=datetime.now().strftime("%d.%m.%Y"),
+                date_range=f"{start_date} - {end_date}",
+                facebook_ads_url=f"https://facebook.com/ads/manager/account/{settings.META_AD_ACCOUNT_ID.replace('act_', '')}"
+            )
+            logger.info(f"Formatted {len(teachers_excel_rows)} teacher rows for Excel export")
+        else:
+            logger.warning("META_PAGE_ID, META_PAGE_ACCESS_TOKEN або NETHUNT_FOLDER_ID не налаштовані")
+    except Exception as e:
+        logger.error(f"Failed to load teacher tracking: {e}")
 
-        for insight in insights:
-            campaign_name = insight.get("campaign_name", "").lower()
-            campaign_id = insight.get("campaign_id", "")
-            # (keywords_teachers вже прочитані на початку функції)
+    for insight in insights:
+        campaign_name = insight.get("campaign_name", "").lower()
+        campaign_id = insight.get("campaign_id", "")
+        # (keywords_teachers вже прочитані на початку функції)
 
-            # Проверяем является ли кампания для викладачів
-            is_teacher_campaign = any(keyword.strip() in campaign_name for keyword in keywords_teachers)
-
-            if is_teacher_campaign:
-                # Отримуємо статистику воронки для цієї кампанії (inference підхід)
-                campaign_tracking = teachers_tracking.get(f"campaign_{campaign_id}", {})
-                funnel_stats = campaign_tracking.get("funnel_stats", {})
-
-                # Базові показники з Meta API
-                total_matched = campaign_tracking.get("total_matched_leads", 0)
-                leads_count = int(insight.get("leads_count_fb", 0))  # З Facebook
-                budget = float(insight.get("spend", 0))
-
-                # Формуємо базовий словник тільки з Meta даними
-                # Всі метрики і розрахунки будуть в teachers_formatter
-                teacher_record = {
-                    "campaign_name": insight.get("campaign_name", ""),
-                    "campaign_id": campaign_id,
-                    "campaign_link": f"https://facebook.com/ads/manager/campaigns/edit/{campaign_id}",
-                    "analysis_date": datetime.now().strftime("%Y-%m-%d"),
-                    "period": f"{start_date} - {end_date}",
-                    "budget": budget,
-                    "location": insight.get("location", ""),
-                    "leads_count": leads_count,
-                    "total_matched_leads": total_matched,
-                    "match_rate": campaign_tracking.get("match_rate", 0.0),
-                    "campaign_status": "active"
-                }
+        # Проверяем является ли кампания для викладачів
+        is_teacher_campaign = any(keyword.strip() in campaign_name for keyword in keywords_teachers)
 
-                # Додаємо ВСІ 26 статусів NetHunt з funnel_stats (inference підхід)
-                # Статуси автоматично додаються з реальних даних NetHunt
-                for status_name, status_count in funnel_stats.items():
-                    teacher_record[status_name] = status_count
+        if is_teacher_campaign:
+            # Отримуємо статистику воронки для цієї кампанії (inference підхід)
+            campaign_tracking = teachers_tracking.get(f"campaign_{campaign_id}", {})
+            funnel_stats = campaign_tracking.get("funnel_stats", {})
 
-                teachers_data.append(teacher_record)
+            # Базові показники з Meta API
+            total_matched = campaign_tracking.get("total_matched_leads", 0)
+            leads_count = int(insight.get("leads_count_fb", 0))  # З Facebook
+            budget = float(insight.get("spend", 0))
 
-        # Додаємо metadata для кольорової маркіровки стовпців в UI
-        column_metadata = _get_column_metadata()
+            # Формуємо базовий словник тільки з Meta даними
+            # Всі метрики і розрахунки будуть в teachers_formatter
+            teacher_record = {
+                "campaign_name": insight.get("campaign_name", ""),
+                "campaign_id": campaign_id,
+                "campaign_link": f"https://facebook.com/ads/manager/campaigns/edit/{campaign_id}",
+                "analysis_date": datetime.now().strftime("%Y-%m-%d"),
+                "period": f"{start_date} - {end_date}",
+                "budget": budget,
+                "location": insight.get("location", ""),
+                "leads_count": leads_count,
+                "total_matched_leads": total_matched,
+                "match_rate": campaign_tracking.get("match_rate", 0.0),
+                "campaign_status": "active"
+            }
 
-        # Витягуємо телефони лідів з інформацією про passed/current статуси
-        lead_phones_students = {}
-        lead_phones_teachers = {}
+            # Додаємо ВСІ 26 статусів NetHunt з funnel_stats (inference підхід)
+            # Статуси автоматично додаються з реальних даних NetHunt
+            for status_name, status_count in funnel_stats.items():
+                teacher_record[status_name] = status_count
+
+            teachers_data.append(teacher_record)
+
+    # Додаємо metadata для кольорової маркіровки стовпців в UI
+    column_metadata = _get_column_metadata()
+
+    # Витягуємо телефони лідів з інформацією про passed/current статуси
+    lead_phones_students = {}
+    lead_phones_teachers = {}
+    analysis_date = datetime.now().strftime("%Y-%m-%d")
+    lead_source = None
+    if defer_lead_phones:
+        # Телефони рахуються на запит (drill-down або клієнти з повним payload)
+        lead_source = LeadPhoneSource(
+            analysis_date, student_campaigns, student_index,
+            teacher_campaigns, teacher_index, teacher_status_histories
+        )
 
-        try:
-            # Студенти: витягуємо телефони з AlfaCRM inference підходом
-            if student_campaigns and student_index:
+    try:
+        # Студенти: витягуємо телефони з AlfaCRM inference підходом
+        if student_campaigns and student_index and lead_source is None:
+            with timer.stage("lead_phones"):
                 lead_phones_students = _extract_lead_phones_with_status_students(
                     campaigns_data=student_campaigns,
                     student_index=student_index,
-                    analysis_date=datetime.now().strftime("%Y-%m-%d")
+                    analysis_date=analysis_date
                 )
-                logger.info(f"Extracted phone data for {len(lead_phones_students)} student campaigns")
-        except Exception as e:
-            logger.error(f"Failed to extract student phone data: {e}")
+            logger.info(f"Extracted phone data for {len(lead_phones_students)} student campaigns")
+    except Exception as e:
+        logger.error(f"Failed to extract student phone data: {e}")
 
-        try:
-            # Вчителі: витягуємо телефони з NetHunt real history
-            if teacher_campaigns and teacher_index and teacher_status_histories:
+    try:
+        # Вчителі: витягуємо телефони з NetHunt real history
+        if teacher_campaigns and teacher_index and lead_source is None:
+            with timer.stage("lead_phones"):
                 lead_phones_teachers = _extract_lead_phones_with_status_teachers(
                     campaigns_data=teacher_campaigns,
                     teacher_index=teacher_index,
                     status_histories=teacher_status_histories,
-                    analysis_date=datetime.now().strftime("%Y-%m-%d")
+                    analysis_date=analysis_date
                 )
-                logger.info(f"Extracted phone data for {len(lead_phones_teachers)} teacher campaigns")
-        except Exception as e:
-            logger.error(f"Failed to extract teacher phone data: {e}")
-
-        # DEBUG: Фінальна перевірка даних перед поверненням
-        logger.info(f"[DEBUG FINAL RESPONSE] ads count: {len(ads_data)}")
-        logger.info(f"[DEBUG FINAL RESPONSE] students count: {len(students_data)}")
-        logger.info(f"[DEBUG FINAL RESPONSE] teachers count: {len(teachers_data)}")
-        if students_data:
-            logger.info(f"[DEBUG FINAL RESPONSE] First student campaign: {students_data[0].get('campaign_name')}")
-
-        # Формуємо повідомлення для фільтрів
-        students_filter_message = None
-        if student_campaigns_count == 0 and all_campaigns_count > 0:
-            if not keywords_students or keywords_students == [""]:
-                students_filter_message = "Не налаштовані ключові слова для студентських кампаній. Будь ласка, додайте їх в Налаштуваннях."
-            else:
-                students_filter_message = f"Не знайдено жодної кампанії зі словами: {', '.join(keywords_students)}. Перевірте правильність ключових слів в Налаштуваннях."
-
-        teachers_filter_message = None
-        if teacher_campaigns_count_var == 0 and all_campaigns_count > 0:
-            if not keywords_teachers or keywords_teachers == [""]:
-                teachers_filter_message = "Не налаштовані ключові слова для викладацьких кампаній. Будь ласка, додайте їх в Налаштуваннях."
-            else:
-                teachers_filter_message = f"Не знайдено жодної кампанії зі словами: {', '.join(keywords_teachers)}. Перевірте правильність ключових слів в Налаштуваннях."
+            logger.info(f"Extracted phone data for {len(lead_phones_teachers)} teacher campaigns")
+    except Exception as e:
+        logger.error(f"Failed to extract teacher phone data: {e}")
+
+    # DEBUG: Фінальна перевірка даних перед поверненням
+    logger.info(f"[DEBUG FINAL RESPONSE] ads count: {len(ads_data)}")
+    logger.info(f"[DEBUG FINAL RESPONSE] students count: {len(students_data)}")
+    logger.info(f"[DEBUG FINAL RESPONSE] teachers count: {len(teachers_data)}")
+    if students_data:
+        logger.info(f"[DEBUG FINAL RESPONSE] First student campaign: {students_data[0].get('campaign_name')}")
+
+    # Формуємо повідомлення для фільтрів
+    students_filter_message = None
+    if student_campaigns_count == 0 and all_campaigns_count > 0:
+        if not keywords_students or keywords_students == [""]:
+            students_filter_message = "Не налаштовані ключові слова для студентських кампаній. Будь ласка, додайте їх в Налаштуваннях."
+        else:
+            students_filter_message = f"Не знайдено жодної кампанії зі словами: {', '.join(keywords_students)}. Перевірте правильність ключових слів в Налаштуваннях."
 
-        return {
-            "ads": ads_data,
-            "students": students_data,
-            "teachers": teachers_data,
-            "column_metadata": column_metadata,
-            "lead_phones": {
-                "students": lead_phones_students,
-                "teachers": lead_phones_teachers
-            },
-            "filter_info": {
-                "total_campaigns": all_campaigns_count,
-                "students": {
-                    "keywords": keywords_students,
-                    "matched_campaigns": student_campaigns_count,
-                    "message": students_filter_message
-                },
-                "teachers": {
-                    "keywords": keywords_teachers,
-                    "matched_campaigns": teacher_campaigns_count_var,
-                    "message": teachers_filter_message
-                }
+    teachers_filter_message = None
+    if teacher_campaigns_count_var == 0 and all_campaigns_count > 0:
+        if not keywords_teachers or keywords_teachers == [""]:
+            teachers_filter_message = "Не налаштовані ключові слова для викладацьких кампаній. Будь ласка, додайте їх в Налаштуваннях."
+        else:
+            teachers_filter_message = f"Не знайдено жодної кампанії зі словами: {', '.join(keywords_teachers)}. Перевірте правильність ключових слів в Налаштуваннях."
+
+    report = {
+        "payload_version": phone_payload.PAYLOAD_VERSION_COMPACT,
+        "ads": ads_data,
+        "students": students_data,
+        "teachers": teachers_data,
+        "column_metadata": column_metadata,
+        "lead_phones": None if lead_source is not None else {
+            "students": lead_phones_students,
+            "teachers": lead_phones_teachers
+        },
+        "filter_info": {
+            "total_campaigns": all_campaigns_count,
+            "students": {
+                "keywords": keywords_students,
+                "matched_campaigns": student_campaigns_count,
+                "message": students_filter_message
             },
-            "fetched_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "period": f"{start_date} - {end_date}"
-        }
-
-    except Exception as e:
-        logger.error(f"Error fetching Meta data: {e}")
-        return JSONResponse({"error": f"Помилка отримання даних: {str(e)}"}, status_code=500)
+            "teachers": {
+                "keywords": keywords_teachers,
+                "matched_campaigns": teacher_campaigns_count_var,
+                "message": teachers_filter_message
+            }
+        },
+        "fetched_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "period": f"{start_date} - {end_date}"
+    }
+    if lead_source is not None:
+        report["_lead_source"] = lead_source
+    return report
 
 
 def _extract_lead_phones_with_status_students(
     campaigns_data: Dict[str, Dict[str, Any]],
     student_index: Dict[str, Dict[str, Any]],
     analysis_date: str
-) -> Dict[str, Dict[str, List[Dict[str, str]]]]:
+) -> Dict[str, Dict[str, Any]]:
     """
     Витягує телефони студентів з інформацією про їх статус (passed/current).
 
@@ -1866,13 +2974,12 @@ def _extract_lead_phones_with_status_students(
         analysis_date: Дата аналізу для визначення passed/current
 
     Returns:
+        Версія 2 (phone_payload): телефон зберігається в таблиці кампанії один раз,
+        статуси - індекси та бітова маска current
         {
             "campaign_123": {
-                "Не розібраний": [
-                    {"phone": "+380...", "status": "passed"},
-                    {"phone": "+380...", "status": "current"}
-                ],
-                ...
+                "phones": ["+380...", ...],
+                "statuses": {"Не розібраний": {"idx": [0, 1], "current": "Ag=="}, ...}
             }
         }
     """
@@ -1886,8 +2993,8 @@ def _extract_lead_phones_with_status_students(
         if not campaign_leads:
             continue
 
-        # Словник для зберігання лідів по статусах
-        status_phones = {}
+        # Телефони лідів по статусах (таблиця телефонів + індекси)
+        status_phones = phone_payload.StatusPhoneBuilder()
 
         for lead in campaign_leads:
             phone, email = extract_lead_contacts(lead)
@@ -1904,12 +3011,7 @@ def _extract_lead_phones_with_status_students(
             if not student:
                 # Лід не знайдено в CRM - вважаємо "Не розібраний" і current
                 status_name = "Не розібраний"
-                if status_name not in status_phones:
-                    status_phones[status_name] = []
-                status_phones[status_name].append({
-                    "phone": phone or email,
-                    "status": "current"
-                })
+                status_phones.add(status_name, phone or email, is_current=True)
                 continue
 
             # Визначаємо поточний статус студента
@@ -1929,18 +3031,10 @@ def _extract_lead_phones_with_status_students(
                 if not status_name:
                     continue
 
-                if status_name not in status_phones:
-                    status_phones[status_name] = []
-
                 # Визначаємо passed або current
-                is_current = (status_id == current_status_id)
+                status_phones.add(status_name, phone or email, is_current=(status_id == current_status_id))
 
-                status_phones[status_name].append({
-                    "phone": phone or email,
-                    "status": "current" if is_current else "passed"
-                })
-
-        result[campaign_id] = status_phones
+        result[campaign_id] = status_phones.build()
 
     return result
 
@@ -1950,7 +3044,7 @@ def _extract_lead_phones_with_status_teachers(
     teacher_index: Dict[str, Dict[str, Any]],
     status_histories: Dict[str, List[Dict[str, Any]]],
     analysis_date: str
-) -> Dict[str, Dict[str, List[Dict[str, str]]]]:
+) -> Dict[str, Dict[str, Any]]:
     """
     Витягує телефони вчителів з інформацією про їх статус (passed/current).
 
@@ -1963,13 +3057,11 @@ def _extract_lead_phones_with_status_teachers(
         analysis_date: Дата аналізу для визначення passed/current
 
     Returns:
+        Версія 2 (phone_payload), як у _extract_lead_phones_with_status_students
         {
             "campaign_123": {
-                "Нові": [
-                    {"phone": "+380...", "status": "passed"},
-                    {"phone": "+380...", "status": "current"}
-                ],
-                ...
+                "phones": ["+380...", ...],
+                "statuses": {"Нові": {"idx": [0, 1], "current": "Ag=="}, ...}
             }
         }
     """
@@ -1982,8 +3074,8 @@ def _extract_lead_phones_with_status_teachers(
         if not campaign_leads:
             continue
 
-        # Словник для зберігання лідів по статусах
-        status_phones = {}
+        # Телефони лідів по статусах (таблиця телефонів + індекси)
+        status_phones = phone_payload.StatusPhoneBuilder()
 
         for lead in campaign_leads:
             phone, email = extract_lead_contacts(lead)
@@ -2000,12 +3092,7 @@ def _extract_lead_phones_with_status_teachers(
             if not teacher_record:
                 # Лід не знайдено в CRM - вважаємо "Нові" і current
                 status_name = "Нові"
-                if status_name not in status_phones:
-                    status_phones[status_name] = []
-                status_phones[status_name].append({
-                    "phone": phone or email,
-                    "status": "current"
-                })
+                status_phones.add(status_name, phone or email, is_current=True)
                 continue
 
             # Отримуємо реальну історію статусів з NetHunt
@@ -2018,12 +3105,7 @@ def _extract_lead_phones_with_status_teachers(
                 status_name = extract_status_from_record(teacher_record)
                 column_name = map_nethunt_status_to_column(status_name)
 
-                if column_name not in status_phones:
-                    status_phones[column_name] = []
-                status_phones[column_name].append({
-                    "phone": phone or email,
-                    "status": "current"
-                })
+                status_phones.add(column_name, phone or email, is_current=True)
                 continue
 
             # Визначаємо останній статус (поточний)
@@ -2041,18 +3123,10 @@ def _extract_lead_phones_with_status_teachers(
 
             # Додаємо телефон в КОЖЕН статус через який пройшов лід
             for status_col in unique_statuses:
-                if status_col not in status_phones:
-                    status_phones[status_col] = []
-
                 # Визначаємо passed або current
-                is_current = (status_col == current_column)
-
-                status_phones[status_col].append({
-                    "phone": phone or email,
-                    "status": "current" if is_current else "passed"
-                })
+                status_phones.add(status_col, phone or email, is_current=(status_col == current_column))
 
-        result[campaign_id] = status_phones
+        result[campaign_id] = status_phones.build()
 
     return result
 
@@ -2228,9 +3302,21 @@ def _apply_column_color_coding(ws, headers, data_type="students"):
         cell.alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
 
 
+def _export_format_error(export_format: str) -> Optional[JSONResponse]:
+    """400 для невідомого format, 501 для parquet/arrow без pyarrow."""
+    if export_format not in columnar_export.EXPORT_FORMATS:
+        return JSONResponse(
+            {"error": f"Невірний формат. Дозволені: {', '.join(columnar_export.EXPORT_FORMATS)}. Отримано: '{export_format}'"},
+            status_code=400
+        )
+    if export_format in ("parquet", "arrow") and not columnar_export.pyarrow_available():
+        return JSONResponse({"error": f"Формат {export_format} потребує pyarrow"}, status_code=501)
+    return None
+
+
 @app.post("/api/export-meta-excel")
 @limiter.limit("10/minute")
-async def export_meta_excel(request: Request, payload: Dict[str, Any]):
+async def export_meta_excel(request: Request, payload: Dict[str, Any], format: str = columnar_export.XLSX):
     """
     Експорт даних з всіх 3 вкладок (Реклама, Студенти, Вчителі) в один Excel файл.
     З цветовою маркіровкою стовпців:
@@ -2238,147 +3324,46 @@ async def export_meta_excel(request: Request, payload: Dict[str, Any]):
     - Розовий = Дані з CRM
     - Зелений = Формули та розрахунки
 
+    Query params:
+    - format: xlsx (за замовчуванням) | parquet | arrow | csv - колонкові формати
+      віддаються ZIP архівом з файлом на вкладку (ads, students, teachers)
+
     Body:
         {
+            "payload_version": 2,  # необов'язково: 2 - телефони студентів у компактній формі
             "ads": [...],
             "students": [...],
             "teachers": [...]
         }
     """
     from fastapi.responses import FileResponse
-    import tempfile
-    from openpyxl import Workbook
-    from openpyxl.styles import Font, PatternFill, Alignment
-    from datetime import datetime
-
-    try:
-        ads_data = payload.get("ads", [])
-        students_data = payload.get("students", [])
-        teachers_data = payload.get("teachers", [])
-
-        wb = Workbook()
-
-        # Лист 1: Реклама
-        ws_ads = wb.active
-        ws_ads.title = "Реклама"
 
-        if ads_data:
-            # ИСПРАВЛЕНО: Используем ADS_EXPORT_ORDER для правильного порядка колонок
-            ads_headers_en = ADS_EXPORT_ORDER
-            ads_headers_uk = [ADS_COLUMN_NAMES.get(h, h) for h in ads_headers_en]
-            ws_ads.append(ads_headers_uk)
+    error = _export_format_error(format)
+    if error:
+        return error
 
-            # Застосовуємо цветову маркіровку (використовуємо англійські назви для логіки)
-            _apply_column_color_coding(ws_ads, ads_headers_en, data_type="ads")
+    try:
+        # Excel пише телефони рядками - компактні рядки версії 2 розгортаємо
+        payload = phone_payload.expand_report(payload)
 
-            # ИСПРАВЛЕНО: Обходим колонки в правильном порядке ADS_EXPORT_ORDER
-            for row_data in ads_data:
-                formatted_row = []
-                for key in ads_headers_en:
-                    value = row_data.get(key)
-                    formatted_row.append(value)
-                ws_ads.append(formatted_row)
-
-        # Лист 2: Студенти
-        ws_students = wb.create_sheet("Студенти")
-        if students_data:
-            # ИСПРАВЛЕНО: Используем STUDENTS_EXPORT_ORDER для правильного порядка колонок
-            students_headers_en = STUDENTS_EXPORT_ORDER
-            students_headers_uk = [STUDENTS_COLUMN_NAMES.get(h, h) for h in students_headers_en]
-            ws_students.append(students_headers_uk)
-
-            # Застосовуємо цветову маркіровку (використовуємо англійські назви для логіки)
-            _apply_column_color_coding(ws_students, students_headers_en, data_type="students")
-
-            # ИЗМЕНЕНО 2025-10-24: Обработка массивов телефонов
-            # Список полей с массивами телефонов
-            phone_array_fields = {
-                "leads_count",
-                "Не розібраний",
-                "Недозвон (не ЦА)",
-                "Встановлено контакт (ЦА)",
-                "Вст контакт зацікавлений (ЦА)",  # Додано нову назву
-                "В опрацюванні (ЦА)",
-                "Призначено пробне (ЦА)",
-                "Проведено пробне (ЦА)",
-                "Чекає оплату",
-                "Отримана оплата (ЦА)",
-                "Архів (ЦА)",
-                "Архів (не ЦА)"
-            }
+        # Однаковий payload від кількох користувачів одночасно - один файл
+        flight_key = hashlib.sha256(
+            json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+        ).hexdigest()
 
-            for row_idx, row_data in enumerate(students_data, start=2):  # start=2 т.к. row 1 = заголовки
-                # ИСПРАВЛЕНО: Обходим колонки в правильном порядке STUDENTS_EXPORT_ORDER
-                formatted_row = []
-                for key in students_headers_en:
-                    value = row_data.get(key)  # Получаем значение по ключу
-                    if key in phone_array_fields and isinstance(value, list):
-                        # Форматируем массив телефонов как строку с переносами
-                        formatted_value = "\n".join(value) if value else ""
-                        formatted_row.append(formatted_value)
-                    else:
-                        formatted_row.append(value)
-
-                ws_students.append(formatted_row)
-
-                # Применяем wrap_text к ячейкам с телефонами
-                for col_idx, key in enumerate(students_headers_en, start=1):
-                    if key in phone_array_fields:
-                        cell = ws_students.cell(row=row_idx, column=col_idx)
-                        cell.alignment = Alignment(wrap_text=True, vertical="top")
-
-        # Лист 3: Вчителі (49 колонок A-AX)
-        ws_teachers = wb.create_sheet("Вчителі")
-        if teachers_excel_rows:
-            # Порядок колонок A-AX згідно з 49-колонковою специфікацією
-            teachers_columns_order = [
-                "Назва реклами", "Посилання на рекламну компанію", "Дата аналізу", "Період аналізу",
-                "Витрачений бюджет в $", "Місце знаходження", "Кількість лідів",
-                "Перевірка лідів автоматичний",
-                "Не розібрані ліди", "Взяті в роботу", "Контакт (ЦА)", "НЕ дозвон (не ЦА)",
-                "Співбесіда (ЦА)", "СП проведено (ЦА)", "Не з'явився на СП",
-                "Завуч затвердив кандидата (в процесі опрацювання) ЦА",
-                "Завуч не затвердив кандидата (відмовився) ЦА",
-                "Переговори (в процесі опрацювання) ЦА", "Стажування ЦА", "Не має учнів ЦА", "Вчитель ЦА",
-                "Втрачений (відмовився) ЦА", "Резерв стажування (в процесі опрацювання) ЦА",
-                "Резерв дзвінок (в процесі опрацювання) ЦА", "Офбординг (відмовився) ЦА",
-                "Звільнився (відмовився) ЦА", "Втрачений не цільовий (не цільовий) НЕ ЦА",
-                "Втрачений недозвон (не цільовий) НЕ ЦА", "Втрачений не актуально (не цільовий) НЕ ЦА",
-                "Втрачений мала зп (відмовився) ЦА", "Втрачений назавжди (не цільовий) НЕ ЦА",
-                "Втрачений перевірити Вайбер (не цільовий) НЕ ЦА", "Втрачений ігнорує (відмовився) ЦА",
-                "Кількість прийшов на співбесіду", "Кількість які не потрапили в Бот ТГ",
-                "Кількість відмовився загалом", "Кількість в процесі опрацювання загалом",
-                "Кількість на етапі Стажування", "Кількість цільових лідів", "Кількість не цільових лідів",
-                "Конверсія відмов %", "Конверсія в опрацюванні %", "Конверсія з ліда у СП %",
-                "Конверсія з ліда у стажера %", "Конверсія з прийшов на співбесіду в стажування %",
-                "% цільових лідів", "% не цільових лідів",
-                "Ціна в $ за ліда", "Ціна в $ за цільового ліда",
-                "Статус рекламної кампанії"
-            ]
-
-            ws_teachers.append(teachers_columns_order)
-
-            for col_idx in range(1, len(teachers_columns_order) + 1):
-                cell = ws_teachers.cell(row=1, column=col_idx)
-                cell.font = Font(bold=True, color="FFFFFF")
-                cell.fill = PatternFill(start_color="FFC000", end_color="FFC000", fill_type="solid")
-                cell.alignment = Alignment(horizontal="center", vertical="center")
-
-            for row_data in teachers_excel_rows:
-                formatted_row = [row_data.get(col, "") for col in teachers_columns_order]
-                ws_teachers.append(formatted_row)
-
-        # Зберігаємо у тимчасовий файл
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=f"_meta_data_{timestamp}.xlsx")
-        wb.save(temp_file.name)
-        temp_file.close()
+        if format != columnar_export.XLSX:
+            (path, filename, media_type), _ = await export_meta_excel_flight.do(
+                f"{format}:{flight_key}", lambda: asyncio.to_thread(_write_meta_columnar, payload, format)
+            )
+            return FileResponse(path=path, filename=filename, media_type=media_type)
 
-        logger.info(f"Excel file created: {temp_file.name}")
+        (path, filename), _ = await export_meta_excel_flight.do(
+            flight_key, lambda: asyncio.to_thread(_write_meta_excel, payload)
+        )
 
         return FileResponse(
-            path=temp_file.name,
-            filename=f"ecademy_meta_data_{timestamp}.xlsx",
+            path=path,
+            filename=filename,
             media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
         )
 
@@ -2387,6 +3372,171 @@ async def export_meta_excel(request: Request, payload: Dict[str, Any]):
         return JSONResponse({"error": f"Помилка експорту: {str(e)}"}, status_code=500)
 
 
+def _write_meta_columnar(payload: Dict[str, Any], export_format: str) -> Tuple[str, str, str]:
+    """
+    Будує parquet/arrow/csv експорт для export_meta_excel (виконується в окремому потоці).
+    Колонки - ключі рядків (ADS_EXPORT_ORDER, STUDENTS_EXPORT_ORDER, ключі вчителів).
+
+    Returns:
+        (шлях до тимчасового файлу, ім'я файлу для завантаження, media type)
+    """
+    ads_data = payload.get("ads", [])
+    students_data = payload.get("students", [])
+    teachers_data = payload.get("teachers", [])
+    teachers_columns = columnar_export.columns_of(teachers_data)
+
+    tables = [
+        ("ads", ADS_EXPORT_ORDER, columnar_export.dict_rows(ads_data, ADS_EXPORT_ORDER)),
+        ("students", STUDENTS_EXPORT_ORDER, columnar_export.dict_rows(students_data, STUDENTS_EXPORT_ORDER)),
+        ("teachers", teachers_columns, columnar_export.dict_rows(teachers_data, teachers_columns)),
+    ]
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    path, filename, media_type = columnar_export.export_tables(
+        tables, export_format, f"ecademy_meta_data_{timestamp}"
+    )
+    logger.info(f"{export_format} export created: {path}")
+    return path, filename, media_type
+
+
+def _write_meta_excel(payload: Dict[str, Any]) -> Tuple[str, str]:
+    """
+    Будує Excel файл для export_meta_excel (виконується в окремому потоці).
+
+    Returns:
+        (шлях до тимчасового файлу, ім'я файлу для завантаження)
+    """
+    import tempfile
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, PatternFill, Alignment
+    from datetime import datetime
+
+    ads_data = payload.get("ads", [])
+    students_data = payload.get("students", [])
+    teachers_data = payload.get("teachers", [])
+
+    wb = Workbook()
+
+    # Лист 1: Реклама
+    ws_ads = wb.active
+    ws_ads.title = "Реклама"
+
+    if ads_data:
+        # ИСПРАВЛЕНО: Используем ADS_EXPORT_ORDER для правильного порядка колонок
+        ads_headers_en = ADS_EXPORT_ORDER
+        ads_headers_uk = [ADS_COLUMN_NAMES.get(h, h) for h in ads_headers_en]
+        ws_ads.append(ads_headers_uk)
+
+        # Застосовуємо цветову маркіровку (використовуємо англійські назви для логіки)
+        _apply_column_color_coding(ws_ads, ads_headers_en, data_type="ads")
+
+        # ИСПРАВЛЕНО: Обходим колонки в правильном порядке ADS_EXPORT_ORDER
+        for row_data in ads_data:
+            formatted_row = []
+            for key in ads_headers_en:
+                value = row_data.get(key)
+                formatted_row.append(value)
+            ws_ads.append(formatted_row)
+
+    # Лист 2: Студенти
+    ws_students = wb.create_sheet("Студенти")
+    if students_data:
+        # ИСПРАВЛЕНО: Используем STUDENTS_EXPORT_ORDER для правильного порядка колонок
+        students_headers_en = STUDENTS_EXPORT_ORDER
+        students_headers_uk = [STUDENTS_COLUMN_NAMES.get(h, h) for h in students_headers_en]
+        ws_students.append(students_headers_uk)
+
+        # Застосовуємо цветову маркіровку (використовуємо англійські назви для логіки)
+        _apply_column_color_coding(ws_students, students_headers_en, data_type="students")
+
+        # ИЗМЕНЕНО 2025-10-24: Обработка массивов телефонов
+        # Список полей с массивами телефонов
+        phone_array_fields = {
+            "leads_count",
+            "Не розібраний",
+            "Недозвон (не ЦА)",
+            "Встановлено контакт (ЦА)",
+            "Вст контакт зацікавлений (ЦА)",  # Додано нову назву
+            "В опрацюванні (ЦА)",
+            "Призначено пробне (ЦА)",
+            "Проведено пробне (ЦА)",
+            "Чекає оплату",
+            "Отримана оплата (ЦА)",
+            "Архів (ЦА)",
+            "Архів (не ЦА)"
+        }
+
+        for row_idx, row_data in enumerate(students_data, start=2):  # start=2 т.к. row 1 = заголовки
+            # ИСПРАВЛЕНО: Обходим колонки в правильном порядке STUDENTS_EXPORT_ORDER
+            formatted_row = []
+            for key in students_headers_en:
+                value = row_data.get(key)  # Получаем значение по ключу
+                if key in phone_array_fields and isinstance(value, list):
+                    # Форматируем массив телефонов как строку с переносами
+                    formatted_value = "\n".join(value) if value else ""
+                    formatted_row.append(formatted_value)
+                else:
+                    formatted_row.append(value)
+
+            ws_students.append(formatted_row)
+
+            # Применяем wrap_text к ячейкам с телефонами
+            for col_idx, key in enumerate(students_headers_en, start=1):
+                if key in phone_array_fields:
+                    cell = ws_students.cell(row=row_idx, column=col_idx)
+                    cell.alignment = Alignment(wrap_text=True, vertical="top")
+
+    # Лист 3: Вчителі (49 колонок A-AX)
+    ws_teachers = wb.create_sheet("Вчителі")
+    if teachers_excel_rows:
+        # Порядок колонок A-AX згідно з 49-колонковою специфікацією
+        teachers_columns_order = [
+            "Назва реклами", "Посилання на рекламну компанію", "Дата аналізу", "Період аналізу",
+            "Витрачений бюджет в $", "Місце знаходження", "Кількість лідів",
+            "Перевірка лідів автоматичний",
+            "Не розібрані ліди", "Взяті в роботу", "Контакт (ЦА)", "НЕ дозвон (не ЦА)",
+            "Співбесіда (ЦА)", "СП проведено (ЦА)", "Не з'явився на СП",
+            "Завуч затвердив кандидата (в процесі опрацювання) ЦА",
+            "Завуч не затвердив кандидата (відмовився) ЦА",
+            "Переговори (в процесі опрацювання) ЦА", "Стажування ЦА", "Не має учнів ЦА", "Вчитель ЦА",
+            "Втрачений (відмовився) ЦА", "Резерв стажування (в процесі опрацювання) ЦА",
+            "Резерв дзвінок (в процесі опрацювання) ЦА", "Офбординг (відмовився) ЦА",
+            "Звільнився (відмовився) ЦА", "Втрачений не цільовий (не цільовий) НЕ ЦА",
+            "Втрачений недозвон (не цільовий) НЕ ЦА", "Втрачений не актуально (не цільовий) НЕ ЦА",
+            "Втрачений мала зп (відмовився) ЦА", "Втрачений назавжди (не цільовий) НЕ ЦА",
+            "Втрачений перевірити Вайбер (не цільовий) НЕ ЦА", "Втрачений ігнорує (відмовився) ЦА",
+            "Кількість прийшов на співбесіду", "Кількість які не потрапили в Бот ТГ",
+            "Кількість відмовився загалом", "Кількість в процесі опрацювання загалом",
+            "Кількість на етапі Стажування", "Кількість цільових лідів", "Кількість не цільових лідів",
+            "Конверсія відмов %", "Конверсія в опрацюванні %", "Конверсія з ліда у СП %",
+            "Конверсія з ліда у стажера %", "Конверсія з прийшов на співбесіду в стажування %",
+            "% цільових лідів", "% не цільових лідів",
+            "Ціна в $ за ліда", "Ціна в $ за цільового ліда",
+            "Статус рекламної кампанії"
+        ]
+
+        ws_teachers.append(teachers_columns_order)
+
+        for col_idx in range(1, len(teachers_columns_order) + 1):
+            cell = ws_teachers.cell(row=1, column=col_idx)
+            cell.font = Font(bold=True, color="FFFFFF")
+            cell.fill = PatternFill(start_color="FFC000", end_color="FFC000", fill_type="solid")
+            cell.alignment = Alignment(horizontal="center", vertical="center")
+
+        for row_data in teachers_excel_rows:
+            formatted_row = [row_data.get(col, "") for col in teachers_columns_order]
+            ws_teachers.append(formatted_row)
+
+    # Зберігаємо у тимчасовий файл
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=f"_meta_data_{timestamp}.xlsx")
+    wb.save(temp_file.name)
+    temp_file.close()
+
+    logger.info(f"Excel file created: {temp_file.name}")
+
+    return temp_file.name, f"ecademy_meta_data_{timestamp}.xlsx"
+
+
 @app.get("/api/students")
 @limiter.limit("30/minute")
 async def get_students(request: Request, start_date: str = None, end_date: str = None, enrich: bool = True):
@@ -2578,9 +3728,74 @@ def _add_ads_charts(ws):
         logger.warning(f"Не вдалося створити bar chart для CTR/CPC: {e}")
 
 
+# Meta API повертає числа рядками - типи колонок для колонкового експорту
+ADS_INSIGHTS_DTYPES = {
+    "impressions": "int64",
+    "clicks": "int64",
+    "spend": "float64",
+    "cpc": "float64",
+    "cpm": "float64",
+    "ctr": "float64",
+}
+
+
+def _write_download_columnar(data_type: str, export_format: str, start_date, end_date) -> Tuple[str, str, str]:
+    """
+    Колонковий варіант download_excel (виконується в окремому потоці): ті самі
+    дані, що й в XLSX, без стилів і графіків.
+
+    Raises:
+        FileNotFoundError: файл або аркуш студентів не знайдено
+        RuntimeError: META credentials не налаштовані
+    """
+    if data_type == "students":
+        from openpyxl import load_workbook
+
+        excel_path = os.getenv("EXCEL_STUDENTS_PATH")
+        if not excel_path or not os.path.exists(excel_path):
+            raise FileNotFoundError("Файл студентів не знайдено")
+
+        mapping = load_mapping()
+        sheet_name = mapping.get("students", {}).get("sheet_name", "Students")
+        source_wb = load_workbook(excel_path, read_only=True, data_only=True)
+        try:
+            if sheet_name not in source_wb.sheetnames:
+                raise FileNotFoundError(f"Аркуш '{sheet_name}' не знайдено")
+            rows = source_wb[sheet_name].iter_rows(values_only=True)
+            header = next(rows, None) or ()
+            columns = [str(h) if h is not None else "" for h in header]
+            return columnar_export.export_tables(
+                [("students", columns, rows)], export_format, f"students_export_{start_date}_{end_date}"
+            )
+        finally:
+            source_wb.close()
+
+    meta_token = os.getenv("META_ACCESS_TOKEN")
+    ad_account_id = os.getenv("META_AD_ACCOUNT_ID")
+    if not meta_token or not ad_account_id:
+        raise RuntimeError("META credentials не налаштовані")
+
+    insights = meta_conn.fetch_insights(
+        ad_account_id=ad_account_id,
+        access_token=meta_token,
+        date_from=start_date,
+        date_to=end_date,
+        level="ad"
+    )
+    headers = ["date_start", "date_stop", "campaign_id", "campaign_name",
+               "adset_id", "adset_name", "ad_id", "ad_name",
+               "impressions", "clicks", "spend", "cpc", "cpm", "ctr"]
+    return columnar_export.export_tables(
+        [("ads", headers, columnar_export.dict_rows(insights, headers))],
+        export_format,
+        f"ads_export_{start_date}_{end_date}",
+        dtypes=ADS_INSIGHTS_DTYPES,
+    )
+
+
 @app.post("/api/download-excel")
 @limiter.limit("5/minute")
-async def download_excel(request: Request, payload: Dict[str, Any]):
+async def download_excel(request: Request, payload: Dict[str, Any], format: str = columnar_export.XLSX):
     """
     Експорт даних у Excel з підтримкою різних типів даних.
 
@@ -2588,10 +3803,13 @@ async def download_excel(request: Request, payload: Dict[str, Any]):
         data_type: "ads" | "students" | "teachers"
         start_date: YYYY-MM-DD
         end_date: YYYY-MM-DD
+
+    Query params:
+    - format: xlsx (за замовчуванням) | parquet | arrow | csv
     """
     from fastapi.responses import FileResponse
     import tempfile
-    from openpyxl import Workbook
+    from openpyxl import Workbook, load_workbook
     from openpyxl.styles import Font, PatternFill, Alignment
     from openpyxl.utils import get_column_letter
     from openpyxl.chart import BarChart, LineChart, PieChart, Reference
@@ -2608,6 +3826,23 @@ async def download_excel(request: Request, payload: Dict[str, Any]):
             status_code=400
         )
 
+    error = _export_format_error(format)
+    if error:
+        return error
+
+    if format != columnar_export.XLSX:
+        try:
+            path, filename, media_type = await asyncio.to_thread(
+                _write_download_columnar, data_type, format, start_date, end_date
+            )
+        except FileNotFoundError as e:
+            return JSONResponse({"error": str(e)}, status_code=404)
+        except RuntimeError as e:
+            return JSONResponse({"error": str(e)}, status_code=400)
+        except Exception as e:
+            return JSONResponse({"error": str(e)}, status_code=500)
+        return FileResponse(path, media_type=media_type, filename=filename)
+
     try:
         wb = Workbook()
         ws = wb.active
@@ -2624,7 +3859,7 @@ async def download_excel(request: Request, payload: Dict[str, Any]):
             mapping = load_mapping()
             sheet_name = mapping.get("students", {}).get("sheet_name", "Students")
 
-            source_wb = openpyxl.load_workbook(excel_path, data_only=True)
+            source_wb = load_workbook(excel_path, data_only=True)
             if sheet_name not in source_wb.sheetnames:
                 return JSONResponse({"error": f"Аркуш '{sheet_name}' не знайдено"}, status_code=404)
 
@@ -2741,35 +3976,83 @@ async def download_excel(request: Request, payload: Dict[str, Any]):
         return JSONResponse({"error": str(e)}, status_code=500)
 
 
-async def run_pipeline(job_id: str, params: Dict[str, Any]):
-    # Create database record for this run
+def _start_pipeline_run(job_id: str, params: Dict[str, Any]) -> int:
+    """Створює (або перевикористовує) запис PipelineRun зі статусом running. Повертає id."""
     with get_db() as db:
-        db_run = PipelineRun(
-            job_id=job_id,
-            start_date=params["start_date"],
-            end_date=params["end_date"],
-            sheet_id=params.get("sheet_id"),
-            storage_backend=os.getenv("STORAGE_BACKEND", "sheets"),
-            status="running"
-        )
-        db.add(db_run)
+        # Задачі з черги вже мають запис (queued) - перевикористовуємо його, в т.ч. при повторних спробах
+        db_run = db.query(PipelineRun).filter(PipelineRun.job_id == job_id).first()
+        if db_run:
+            db_run.status = "running"
+            db_run.end_time = None
+            db_run.error_message = None
+        else:
+            db_run = PipelineRun(
+                job_id=job_id,
+                start_date=params["start_date"],
+                end_date=params["end_date"],
+                sheet_id=params.get("sheet_id"),
+                storage_backend=os.getenv("STORAGE_BACKEND", "sheets"),
+                status="running"
+            )
+            db.add(db_run)
         db.commit()
         db.refresh(db_run)
-        run_id = db_run.id
+        return db_run.id
+
+
+def _finish_pipeline_run(run_id: int, status: str, **fields):
+    """Записує підсумок запуску (status, end_time та лічильники або error_message)."""
+    with get_db() as db:
+        db_run = db.query(PipelineRun).filter(PipelineRun.id == run_id).first()
+        if db_run:
+            db_run.status = status
+            db_run.end_time = datetime.utcnow()
+            for name, value in fields.items():
+                setattr(db_run, name, value)
+            db.commit()
+
+
+def _store_campaign_facts(
+    daily_insights: List[Dict[str, Any]],
+    funnel_campaigns: Dict[str, Dict[str, Any]],
+    start_date: str,
+    end_date: str,
+    keywords_students: List[str],
+    keywords_teachers: List[str]
+) -> int:
+    """Денні факти, воронка та rollup кампаній за період (одна сесія). Повертає кількість фактів."""
+    with get_db() as db:
+        facts_count = campaign_facts.store_daily_metrics(
+            db, daily_insights, start_date, end_date,
+            keywords_students=keywords_students, keywords_teachers=keywords_teachers
+        )
+        campaign_facts.store_daily_funnel(db, funnel_campaigns, start_date, end_date)
+        campaign_facts.rebuild_rollups(db, start_date, end_date)
+    return facts_count
+
+
+async def run_pipeline(job_id: str, params: Dict[str, Any]):
+    # Запити до БД - у потоці, щоб не блокувати event loop (SSE, /health)
+    run_id = await asyncio.to_thread(_start_pipeline_run, job_id, params)
 
-    def log_to_db(message: str, level: str = "info"):
+    def write_log(message: str, level: str):
+        with get_db() as db:
+            db.add(RunLog(run_id=run_id, message=message, level=level))
+            db.commit()
+
+    async def log_to_db(message: str, level: str = "info"):
         """Helper to save log messages to database."""
         try:
-            with get_db() as db:
-                log_entry = RunLog(run_id=run_id, message=message, level=level)
-                db.add(log_entry)
-                db.commit()
+            await asyncio.to_thread(write_log, message, level)
         except Exception as e:
             print(f"Помилка запису логу в БД: {e}")
 
+    # Тривалість етапів пишеться в RunLog (level=timing, JSON у message)
+    timer = StageTimer()
+
     try:
         progress.update(job_id, 2, "Перевірка облікових даних")
-        log_to_db("Початок виконання pipeline")
+        await log_to_db("Початок виконання pipeline")
 
         # Meta credentials
         meta_token = os.getenv("META_ACCESS_TOKEN")
@@ -2804,19 +4087,21 @@ async def run_pipeline(job_id: str, params: Dict[str, Any]):
 
         # 1) Fetch Ads insights
         progress.update(job_id, 10, "Отримання статистики Meta Ads (рівень оголошень)")
-        insights = meta_conn.fetch_insights(
-            ad_account_id=ad_account_id,
-            access_token=meta_token,
-            date_from=params["start_date"],
-            date_to=params["end_date"],
-            level="ad",
-        )
+        with timer.stage("insights"):
+            insights = meta_conn.fetch_insights(
+                ad_account_id=ad_account_id,
+                access_token=meta_token,
+                date_from=params["start_date"],
+                date_to=params["end_date"],
+                level="ad",
+            )
 
         # 1.5) Fetch creative details (texts and images)
         progress.update(job_id, 20, "Завантаження креативів та текстів оголошень")
         ad_ids = [insight.get("ad_id") for insight in insights if insight.get("ad_id")]
         logger.info(f"Fetching creatives for {len(ad_ids)} ads")
-        creatives = meta_conn.fetch_ad_creatives(ad_ids, meta_token)
+        with timer.stage("creatives"):
+            creatives = meta_conn.fetch_ad_creatives(ad_ids, meta_token)
 
         # Merge creatives with insights
         for insight in insights:
@@ -2830,6 +4115,9 @@ async def run_pipeline(job_id: str, params: Dict[str, Any]):
 
         progress.log(job_id, f"Завантажено {len(creatives)} креативів")
 
+        # Збагачені кампанії з денною воронкою CRM (для campaign_daily_facts)
+        funnel_campaigns: Dict[str, Dict[str, Any]] = {}
+
         # 2) Fetch Leads
         progress.update(job_id, 30, "Підготовка даних CRM (студенти: AlfaCRM, викладачі: NetHunt)")
         # Fetch teachers from NetHunt
@@ -2837,7 +4125,8 @@ async def run_pipeline(job_id: str, params: Dict[str, Any]):
         nh_folder = os.getenv("NETHUNT_FOLDER_ID")
         if nh_folder:
             try:
-                raw_records = crm_tools.nethunt_list_records(nh_folder, limit=1000)
+                with timer.stage("nethunt_records"):
+                    raw_records = crm_tools.nethunt_list_records(nh_folder, limit=1000)
                 # Flatten NetHunt records: keep id, createdAt, updatedAt and fields
                 for r in raw_records:
                     flat = {}
@@ -2872,12 +4161,13 @@ async def run_pipeline(job_id: str, params: Dict[str, Any]):
                         # Фільтруємо лідів тільки для кампаній вчителів
                         # (keywords_teachers вже прочитані на початку функції)
 
-                        all_campaigns = await meta_leads.get_leads_for_period(
-                            page_id=meta_page_id,
-                            page_token=meta_page_token,
-                            start_date=params["start_date"],
-                            end_date=params["end_date"]
-                        )
+                        with timer.stage("meta_leads"):
+                            all_campaigns = await meta_leads.get_leads_for_period(
+                                page_id=meta_page_id,
+                                page_token=meta_page_token,
+                                start_date=params["start_date"],
+                                end_date=params["end_date"]
+                            )
 
                         # Фільтруємо тільки кампанії вчителів
                         teacher_campaigns = {
@@ -2888,10 +4178,13 @@ async def run_pipeline(job_id: str, params: Dict[str, Any]):
                         progress.log(job_id, f"Отримано {len(teacher_campaigns)} кампаній вчителів з {sum(len(c['leads']) for c in teacher_campaigns.values())} лідів")
 
                         # Трекінг через NetHunt з реальною історією
-                        enriched_campaigns = await nethunt_tracking.track_leads_by_campaigns(
-                            campaigns_data=teacher_campaigns,
-                            folder_id=nh_folder
-                        )
+                        with timer.stage("nethunt_tracking"):
+                            enriched_campaigns = await nethunt_tracking.track_leads_by_campaigns(
+                                campaigns_data=teacher_campaigns,
+                                folder_id=nh_folder,
+                                daily=True
+                            )
+                        funnel_campaigns.update(enriched_campaigns)
                         progress.log(job_id, f"Обраховано воронку для {len(enriched_campaigns)} кампаній викладачів")
                     else:
                         progress.log(job_id, "META_PAGE_ID або META_PAGE_ACCESS_TOKEN не налаштовані - пропускаємо трекінг викладачів")
@@ -2912,7 +4205,8 @@ async def run_pipeline(job_id: str, params: Dict[str, Any]):
                 page = 1
                 total = 0
                 while True:
-                    data = crm_tools.alfacrm_list_students(page=page, page_size=200)
+                    with timer.stage("alfacrm_students"):
+                        data = crm_tools.alfacrm_list_students(page=page, page_size=200)
                     # Expect data like {items:[...], total: N} or similar
                     items = data.get("items") or data.get("data") or data.get("list") or []
                     if not isinstance(items, list):
@@ -2949,12 +4243,13 @@ async def run_pipeline(job_id: str, params: Dict[str, Any]):
                         # Фільтруємо лідів тільки для кампаній студентів
                         # (keywords_students вже прочитані на початку функції)
 
-                        all_campaigns = await meta_leads.get_leads_for_period(
-                            page_id=meta_page_id,
-                            page_token=meta_page_token,
-                            start_date=params["start_date"],
-                            end_date=params["end_date"]
-                        )
+                        with timer.stage("meta_leads"):
+                            all_campaigns = await meta_leads.get_leads_for_period(
+                                page_id=meta_page_id,
+                                page_token=meta_page_token,
+                                start_date=params["start_date"],
+                                end_date=params["end_date"]
+                            )
 
                         # Фільтруємо тільки кампанії студентів
                         student_campaigns = {
@@ -2965,10 +4260,13 @@ async def run_pipeline(job_id: str, params: Dict[str, Any]):
                         progress.log(job_id, f"Отримано {len(student_campaigns)} кампаній студентів з {sum(len(c['leads']) for c in student_campaigns.values())} лідів")
 
                         # Трекінг через AlfaCRM з inference підходом
-                        enriched_campaigns = await alfacrm_tracking.track_leads_by_campaigns(
-                            campaigns_data=student_campaigns,
-                            page_size=500
-                        )
+                        with timer.stage("alfacrm_tracking"):
+                            enriched_campaigns = await alfacrm_tracking.track_leads_by_campaigns(
+                                campaigns_data=student_campaigns,
+                                page_size=500,
+                                daily=True
+                            )
+                        funnel_campaigns.update(enriched_campaigns)
                         progress.log(job_id, f"Обраховано воронку для {len(enriched_campaigns)} кампаній студентів")
 
                         # Преобразовать enriched_campaigns в формат для Excel
@@ -3004,73 +4302,87 @@ async def run_pipeline(job_id: str, params: Dict[str, Any]):
         # 3) Check CRM statuses
         progress.update(job_id, 45, "Отримано дані CRM")
 
+        # 3.5) Денні факти кампаній + тижневі/місячні rollup
+        if os.getenv("CAMPAIGN_FACTS_ENABLED", "true").lower() == "true":
+            progress.update(job_id, 50, "Запис денних фактів кампаній")
+            try:
+                with timer.stage("campaign_insights"):
+                    daily_insights = meta_conn.fetch_insights(
+                        ad_account_id=ad_account_id,
+                        access_token=meta_token,
+                        date_from=params["start_date"],
+                        date_to=params["end_date"],
+                        level="campaign",
+                        time_increment=1,
+                    )
+                with timer.stage("campaign_facts"):
+                    facts_count = await asyncio.to_thread(
+                        _store_campaign_facts, daily_insights, funnel_campaigns,
+                        params["start_date"], params["end_date"], keywords_students, keywords_teachers
+                    )
+                progress.log(job_id, f"Записано денних фактів кампаній: {facts_count}")
+            except Exception as e:
+                progress.log(job_id, f"Попередження: не вдалося записати денні факти кампаній: {e}")
+
         # 4) Write to Google Sheets
         progress.update(job_id, 70, "Запис даних у цільове сховище")
         mapping = load_mapping()
-        if backend == "sheets" and gs_client:
-            gs_conn.write_insights(gs_client, sheet_id, insights)
-            # If needed, write students/teachers to different tabs/sheets in Sheets (not configured yet)
-        else:
-            excel_creatives = os.getenv("EXCEL_CREATIVES_PATH")
-            excel_students = os.getenv("EXCEL_STUDENTS_PATH")
-            excel_teachers = os.getenv("EXCEL_TEACHERS_PATH")
-            if excel_creatives:
-                cr_map = mapping.get("creatives", {})
-                excel_conn.write_creatives(
-                    excel_creatives,
-                    insights,
-                    mapping=cr_map.get("fields"),
-                    sheet_name=cr_map.get("sheet_name", "Creatives"),
-                )
-                progress.log(job_id, f"Записано креативів: {len(insights)} рядків")
+        with timer.stage("storage_write"):
+            if backend == "sheets" and gs_client:
+                gs_conn.write_insights(gs_client, sheet_id, insights)
+                # If needed, write students/teachers to different tabs/sheets in Sheets (not configured yet)
             else:
-                progress.log(job_id, "EXCEL_CREATIVES_PATH не встановлено; креативи пропущені")
-            if excel_students:
-                st_map = mapping.get("students", {})
-                excel_conn.write_students(
-                    excel_students,
-                    students,
-                    mapping=st_map.get("fields"),
-                    sheet_name=st_map.get("sheet_name", "Students"),
-                )
-                progress.log(job_id, f"Записано студентів: {len(students)} рядків")
-            if excel_teachers:
-                tc_map = mapping.get("teachers", {})
-                excel_conn.write_teachers(
-                    excel_teachers,
-                    teachers,
-                    mapping=tc_map.get("fields"),
-                    sheet_name=tc_map.get("sheet_name", "Teachers"),
-                )
-                progress.log(job_id, f"Записано викладачів: {len(teachers)} рядків")
+                excel_creatives = os.getenv("EXCEL_CREATIVES_PATH")
+                excel_students = os.getenv("EXCEL_STUDENTS_PATH")
+                excel_teachers = os.getenv("EXCEL_TEACHERS_PATH")
+                if excel_creatives:
+                    cr_map = mapping.get("creatives", {})
+                    excel_conn.write_creatives(
+                        excel_creatives,
+                        insights,
+                        mapping=cr_map.get("fields"),
+                        sheet_name=cr_map.get("sheet_name", "Creatives"),
+                    )
+                    progress.log(job_id, f"Записано креативів: {len(insights)} рядків")
+                else:
+                    progress.log(job_id, "EXCEL_CREATIVES_PATH не встановлено; креативи пропущені")
+                if excel_students:
+                    st_map = mapping.get("students", {})
+                    excel_conn.write_students(
+                        excel_students,
+                        students,
+                        mapping=st_map.get("fields"),
+                        sheet_name=st_map.get("sheet_name", "Students"),
+                    )
+                    progress.log(job_id, f"Записано студентів: {len(students)} рядків")
+                if excel_teachers:
+                    tc_map = mapping.get("teachers", {})
+                    excel_conn.write_teachers(
+                        excel_teachers,
+                        teachers,
+                        mapping=tc_map.get("fields"),
+                        sheet_name=tc_map.get("sheet_name", "Teachers"),
+                    )
+                    progress.log(job_id, f"Записано викладачів: {len(teachers)} рядків")
 
         progress.update(job_id, 100, "done")
-        log_to_db("Pipeline завершено успішно")
+        await log_to_db(json.dumps(timer.durations_ms(remainder="processing")), level=STAGE_TIMINGS_LOG_LEVEL)
+        await log_to_db("Pipeline завершено успішно")
 
         # Update database record with results
-        with get_db() as db:
-            db_run = db.query(PipelineRun).filter(PipelineRun.id == run_id).first()
-            if db_run:
-                db_run.status = "success"
-                db_run.end_time = datetime.utcnow()
-                db_run.insights_count = len(insights)
-                db_run.students_count = len(students)
-                db_run.teachers_count = len(teachers)
-                db.commit()
+        await asyncio.to_thread(
+            _finish_pipeline_run, run_id, "success",
+            insights_count=len(insights), students_count=len(students), teachers_count=len(teachers)
+        )
 
     except Exception as e:
         progress.log(job_id, f"ERROR: {e}")
         progress.set_status(job_id, "error")
-        log_to_db(f"ERROR: {e}", level="error")
+        await log_to_db(json.dumps(timer.durations_ms(remainder="processing")), level=STAGE_TIMINGS_LOG_LEVEL)
+        await log_to_db(f"ERROR: {e}", level="error")
 
         # Update database record with error
-        with get_db() as db:
-            db_run = db.query(PipelineRun).filter(PipelineRun.id == run_id).first()
-            if db_run:
-                db_run.status = "error"
-                db_run.end_time = datetime.utcnow()
-                db_run.error_message = str(e)
-                db.commit()
+        await asyncio.to_thread(_finish_pipeline_run, run_id, "error", error_message=str(e))
 
 
 @app.get("/api/students-with-journey")
@@ -3158,20 +4470,215 @@ async def get_students_with_journey(
 
         logger.info(f"Returning {len(enriched_students)} enriched students with journey data")
 
-        return {
+        return FastJSONResponse({
             "students": enriched_students,
             "count": len(enriched_students),
             "enrichment_info": {
                 "total_statuses_tracked": 38,
                 "funnels": ["main", "secondary"]
             }
-        }
+        })
 
     except Exception as e:
         logger.error(f"Error fetching students with journey: {e}")
         return JSONResponse({"error": f"Помилка отримання даних: {str(e)}"}, status_code=500)
 
 
+@app.get("/api/status-snapshots/funnel")
+@limiter.limit("30/minute")
+def get_status_snapshot_funnel(
+    request: Request,
+    source: str = "alfacrm",
+    start_date: str = None,
+    end_date: str = None
+):
+    """
+    Воронка за реальною історією статусів (status_snapshots).
+
+    Для кожного етапу рахує записи, які хоча б раз перебували в ньому протягом періоду.
+
+    Query params:
+    - source: 'alfacrm' (студенти) або 'nethunt' (вчителі)
+    - start_date: Початок періоду (YYYY-MM-DD)
+    - end_date: Кінець періоду (YYYY-MM-DD)
+    """
+    if source not in (status_snapshots.SOURCE_ALFACRM, status_snapshots.SOURCE_NETHUNT):
+        return JSONResponse({"error": "source має бути 'alfacrm' або 'nethunt'"}, status_code=400)
+
+    if not start_date or not end_date:
+        return JSONResponse({"error": "start_date та end_date обов'язкові"}, status_code=400)
+
+    try:
+        _ = datetime.strptime(start_date, "%Y-%m-%d")
+        _ = datetime.strptime(end_date, "%Y-%m-%d")
+    except ValueError:
+        return JSONResponse({"error": "Невірний формат дати, використовуйте YYYY-MM-DD"}, status_code=400)
+
+    if source == status_snapshots.SOURCE_ALFACRM:
+        stages = status_snapshots.alfacrm_stage_statuses()
+    else:
+        stages = status_snapshots.nethunt_stage_statuses()
+
+    try:
+        with get_db() as db:
+            counts = status_snapshots.count_reached_by_stage(db, source, stages, start_date, end_date)
+
+        return {
+            "source": source,
+            "period": f"{start_date} - {end_date}",
+            "stages": counts
+        }
+    except Exception as e:
+        logger.error(f"Error querying status snapshots: {e}")
+        return JSONResponse({"error": f"Помилка бази даних: {str(e)}"}, status_code=500)
+
+
+@app.get("/api/status-snapshots/{source}/{record_id}")
+@limiter.limit("30/minute")
+def get_status_snapshot_history(request: Request, source: str, record_id: str):
+    """Реальна історія змін статусу одного запису CRM."""
+    try:
+        with get_db() as db:
+            history = status_snapshots.get_record_history(db, source, record_id)
+
+        return {"source": source, "record_id": record_id, "history": history}
+    except Exception as e:
+        logger.error(f"Error querying status history: {e}")
+        return JSONResponse({"error": f"Помилка бази даних: {str(e)}"}, status_code=500)
+
+
+@app.get("/api/campaign-facts")
+@limiter.limit("30/minute")
+def get_campaign_facts(
+    request: Request,
+    start_date: str = None,
+    end_date: str = None,
+    audience: str = None
+):
+    """
+    Підсумки по кампаніях за період з campaign_daily_facts та rollup таблиць
+    (без звернень до Meta API та CRM).
+
+    Query params:
+    - start_date, end_date: Період (YYYY-MM-DD)
+    - audience: 'students' | 'teachers' (опційно)
+    """
+    if not start_date or not end_date:
+        return JSONResponse({"error": "start_date та end_date обов'язкові"}, status_code=400)
+    try:
+        datetime.strptime(start_date, "%Y-%m-%d")
+        datetime.strptime(end_date, "%Y-%m-%d")
+    except ValueError:
+        return JSONResponse({"error": "Невірний формат дати, використовуйте YYYY-MM-DD"}, status_code=400)
+    if audience and audience not in (campaign_facts.AUDIENCE_STUDENTS, campaign_facts.AUDIENCE_TEACHERS):
+        return JSONResponse({"error": "audience має бути 'students' або 'teachers'"}, status_code=400)
+
+    try:
+        with get_db() as db:
+            totals = campaign_facts.query_campaign_totals(db, start_date, end_date, audience=audience)
+
+        return {
+            "period": f"{start_date} - {end_date}",
+            "campaigns": list(totals.values()),
+            "count": len(totals)
+        }
+    except Exception as e:
+        logger.error(f"Error querying campaign facts: {e}")
+        return JSONResponse({"error": f"Помилка бази даних: {str(e)}"}, status_code=500)
+
+
+@app.get("/api/maintenance/retention")
+@limiter.limit("30/minute")
+def get_retention_status(request: Request):
+    """Політика retention та розмір таблиць історії (живі рядки та архіви)."""
+    try:
+        with get_db() as db:
+            return {"policy": vars(retention.RetentionPolicy.from_env()), "tables": retention.retention_stats(db)}
+    except Exception as e:
+        return JSONResponse({"error": f"Помилка бази даних: {str(e)}"}, status_code=500)
+
+
+@app.post("/api/maintenance/retention")
+@limiter.limit("2/minute")
+def run_retention_now(request: Request):
+    """Запускає retention одразу (поза розкладом RETENTION_SCHEDULE)."""
+    try:
+        return retention.run_retention()
+    except Exception as e:
+        logger.error(f"Retention failed: {e}")
+        return JSONResponse({"error": f"Помилка обслуговування бази: {str(e)}"}, status_code=500)
+
+
+@app.get("/api/cache-stats")
+@limiter.limit("30/minute")
+async def get_cache_stats(request: Request):
+    """
+    Статистика кешу звітів, кешу зображень та single-flight (скільки запитів було об'єднано).
+    """
+    return {
+        "meta_data_cache": meta_report_cache.stats(),
+        "single_flight": {
+            flight.name: flight.stats()
+            for flight in (meta_data_flight, export_meta_excel_flight, start_job_flight, image_resize_flight)
+        },
+        "image_cache": image_cache.stats() if image_cache is not None else None,
+    }
+
+
+CACHE_REQUESTS = metrics.gauge("cache_requests", "Cache lookups by result since process start", ("cache", "result"))
+CACHE_HIT_RATIO = metrics.gauge("cache_hit_ratio", "Share of cache lookups served from cache", ("cache",))
+SINGLE_FLIGHT_CALLS = metrics.gauge("single_flight_calls", "Single-flight calls by outcome since process start", ("flight", "outcome"))
+SINGLE_FLIGHT_IN_FLIGHT = metrics.gauge("single_flight_in_flight", "Computations currently running in this process", ("flight",))
+JOB_QUEUE_DEPTH = metrics.gauge("job_queue_depth", "Queued and running jobs in the durable queue", ("job_type", "status"))
+
+
+def _collect_runtime_metrics():
+    """Знімок кешів, single-flight та черги задач перед віддачею /metrics."""
+    report = meta_report_cache.stats()
+    report_hits = report["hits"] + report["stale_hits"]
+    report_lookups = report_hits + report["misses"]
+    CACHE_REQUESTS.set(report["hits"], cache="meta_data", result="hit")
+    CACHE_REQUESTS.set(report["stale_hits"], cache="meta_data", result="stale")
+    CACHE_REQUESTS.set(report["misses"], cache="meta_data", result="miss")
+    CACHE_HIT_RATIO.set(round(report_hits / report_lookups, 3) if report_lookups else 0, cache="meta_data")
+
+    if image_cache is not None:
+        images = image_cache.stats()
+        CACHE_REQUESTS.set(images["hits"], cache="proxy_image", result="hit")
+        CACHE_REQUESTS.set(images["misses"], cache="proxy_image", result="miss")
+        CACHE_HIT_RATIO.set(images["hit_ratio"], cache="proxy_image")
+
+    for flight in (meta_data_flight, export_meta_excel_flight, start_job_flight, image_resize_flight):
+        stats = flight.stats()
+        SINGLE_FLIGHT_CALLS.set(stats["executions"], flight=flight.name, outcome="executed")
+        SINGLE_FLIGHT_CALLS.set(stats["coalesced"], flight=flight.name, outcome="coalesced")
+        SINGLE_FLIGHT_CALLS.set(stats["failures"], flight=flight.name, outcome="failed")
+        SINGLE_FLIGHT_IN_FLIGHT.set(stats["in_flight"], flight=flight.name)
+
+    try:
+        with get_db() as db:
+            depth = job_queue.queue_depth(db)
+    except Exception as e:
+        logger.warning(f"[METRICS] Не вдалося отримати глибину черги: {e}")
+        return
+    JOB_QUEUE_DEPTH.clear()
+    for job_type in (job_queue.JOB_TYPE_PIPELINE, job_queue.JOB_TYPE_ANALYTICS):
+        for status in job_queue.ACTIVE_STATUSES:
+            JOB_QUEUE_DEPTH.set(depth.get(job_type, {}).get(status, 0), job_type=job_type, status=status)
+
+
+@app.get("/metrics")
+def get_metrics():
+    """
+    Метрики у текстовому форматі Prometheus: латентність маршрутів,
+    виклики upstream API, кеші, single-flight та черга задач.
+
+    Звичайний def: queue_depth читає БД, FastAPI виконує endpoint у threadpool.
+    """
+    _collect_runtime_metrics()
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 # Serve index.html for root path
 @app.get("/", response_class=HTMLResponse)
 async def index():
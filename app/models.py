@@ -6,9 +6,9 @@ Uses SQLAlchemy with SQLite for storing run history and logs.
 
 from datetime import datetime
 from typing import Optional
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, create_engine
+from sqlalchemy import Column, Integer, String, DateTime, Date, Float, Text, LargeBinary, ForeignKey, Index, UniqueConstraint, create_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship, Session
+from sqlalchemy.orm import relationship, deferred, Session
 
 Base = declarative_base()
 
@@ -18,7 +18,8 @@ class PipelineRun(Base):
 
     __tablename__ = "pipeline_runs"
     __table_args__ = (
-        # Composite index for efficient filtering by status and time
+        # Keyset pagination of /api/runs filtered by status, newest first
+        Index("ix_pipeline_runs_status_start_time", "status", "start_time", "id"),
         {'sqlite_autoincrement': True}
     )
 
@@ -51,9 +52,13 @@ class RunLog(Base):
     """Model for storing individual log messages from pipeline runs."""
 
     __tablename__ = "run_logs"
+    __table_args__ = (
+        # Logs of a run and cursor paging: WHERE run_id = ? AND id > ? ORDER BY id
+        Index("ix_run_logs_run_id_id", "run_id", "id"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    run_id = Column(Integer, ForeignKey("pipeline_runs.id"), nullable=False, index=True)
+    run_id = Column(Integer, ForeignKey("pipeline_runs.id"), nullable=False)  # indexed by ix_run_logs_run_id_id
     timestamp = Column(DateTime, nullable=False, default=datetime.utcnow)
     level = Column(String(10), nullable=False, default="info")  # info, warning, error
     message = Column(Text, nullable=False)
@@ -90,15 +95,297 @@ class SearchHistory(Base):
     """Model for storing search results from all 3 tabs (ADS, STUDENTS, TEACHERS)."""
 
     __tablename__ = "search_history"
+    __table_args__ = (
+        # Keyset pagination of /api/search-history, with and without tab_type filter
+        Index("ix_search_history_tab_type_created_at", "tab_type", "created_at", "id"),
+        Index("ix_search_history_created_at", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     start_date = Column(String(10), nullable=False, index=True)  # YYYY-MM-DD
     end_date = Column(String(10), nullable=False, index=True)  # YYYY-MM-DD
     tab_type = Column(String(20), nullable=False, index=True)  # 'ads', 'students', 'teachers'
     results_count = Column(Integer, default=0, nullable=False)
-    results_json = Column(Text, nullable=True)  # JSON string with results
+    # JSON string with results; deferred - loaded only when a single search is opened
+    results_json = deferred(Column(Text, nullable=True))
     created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
     updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     def __repr__(self):
         return f"<SearchHistory(id={self.id}, period={self.start_date} - {self.end_date}, tab={self.tab_type}, count={self.results_count})>"
+
+
+class RunLogArchive(Base):
+    """Model for compacted logs of old pipeline runs (one row per run).
+
+    The retention job replaces a run's RunLog rows with a zlib-compressed
+    JSON list of {timestamp, level, message}.
+    """
+
+    __tablename__ = "run_log_archives"
+
+    run_id = Column(Integer, ForeignKey("pipeline_runs.id"), primary_key=True)
+    log_count = Column(Integer, nullable=False, default=0)
+    error_count = Column(Integer, nullable=False, default=0)
+    first_timestamp = Column(DateTime, nullable=True)
+    last_timestamp = Column(DateTime, nullable=True)
+    logs_zlib = Column(LargeBinary, nullable=False)
+    archived_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<RunLogArchive(run_id={self.run_id}, log_count={self.log_count})>"
+
+
+class SearchHistoryArchive(Base):
+    """Model for compressed results of old searches.
+
+    The SearchHistory row keeps its metadata; results_json is cleared and
+    the zlib-compressed JSON is stored here.
+    """
+
+    __tablename__ = "search_history_archives"
+
+    search_id = Column(Integer, ForeignKey("search_history.id"), primary_key=True)
+    original_size = Column(Integer, nullable=False, default=0)  # bytes of results_json
+    results_zlib = Column(LargeBinary, nullable=False)
+    archived_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<SearchHistoryArchive(search_id={self.search_id}, original_size={self.original_size})>"
+
+
+class StatusSnapshot(Base):
+    """Model for storing CRM status changes of NetHunt/AlfaCRM records.
+
+    A row is appended only when a record's status differs from its last
+    observed status, so the table holds the real transition history.
+    """
+
+    __tablename__ = "status_snapshots"
+    __table_args__ = (
+        # Range scans for "ever reached status X within period"
+        Index("ix_status_snapshots_source_status_time", "source", "status", "observed_at"),
+        # Latest known status per record
+        Index("ix_status_snapshots_source_record", "source", "record_id", "id"),
+        {'sqlite_autoincrement': True}
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    source = Column(String(20), nullable=False)  # 'alfacrm', 'nethunt'
+    record_id = Column(String(64), nullable=False)
+    status = Column(String(100), nullable=False)
+    observed_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<StatusSnapshot(source={self.source}, record_id={self.record_id}, status={self.status})>"
+
+
+class CampaignDailyFact(Base):
+    """Model for per-campaign daily Meta Ads metrics (one row per campaign and day).
+
+    Populated by the pipeline; range reports are SUM ... GROUP BY campaign_id.
+    """
+
+    __tablename__ = "campaign_daily_facts"
+    __table_args__ = (
+        UniqueConstraint("campaign_id", "day", name="uq_campaign_daily_facts_campaign_day"),
+        # Range scans by day for all campaigns
+        Index("ix_campaign_daily_facts_day_campaign", "day", "campaign_id"),
+        {'sqlite_autoincrement': True}
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    campaign_id = Column(String(50), nullable=False)
+    day = Column(Date, nullable=False)
+    campaign_name = Column(String(500), nullable=True)
+    audience = Column(String(20), nullable=True)  # 'students', 'teachers' або NULL
+    spend = Column(Float, nullable=False, default=0.0)
+    impressions = Column(Integer, nullable=False, default=0)
+    clicks = Column(Integer, nullable=False, default=0)
+    leads_fb = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<CampaignDailyFact(campaign_id={self.campaign_id}, day={self.day}, spend={self.spend})>"
+
+
+class CampaignDailyFunnel(Base):
+    """Model for per-campaign daily CRM funnel counts per aggregated status.
+
+    Counts are the current CRM status of leads created on that day.
+    """
+
+    __tablename__ = "campaign_daily_funnel"
+    __table_args__ = (
+        UniqueConstraint("campaign_id", "day", "status", name="uq_campaign_daily_funnel_campaign_day_status"),
+        Index("ix_campaign_daily_funnel_day_campaign", "day", "campaign_id"),
+        {'sqlite_autoincrement': True}
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    campaign_id = Column(String(50), nullable=False)
+    day = Column(Date, nullable=False)
+    status = Column(String(100), nullable=False)
+    leads = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<CampaignDailyFunnel(campaign_id={self.campaign_id}, day={self.day}, status={self.status})>"
+
+
+class CampaignRollup(Base):
+    """Model for weekly/monthly pre-aggregated campaign metrics.
+
+    period_start is the Monday of an ISO week (grain='week') or the first
+    day of a month (grain='month').
+    """
+
+    __tablename__ = "campaign_rollups"
+    __table_args__ = (
+        UniqueConstraint("grain", "period_start", "campaign_id", name="uq_campaign_rollups_grain_period_campaign"),
+        {'sqlite_autoincrement': True}
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    grain = Column(String(10), nullable=False)  # 'week', 'month'
+    period_start = Column(Date, nullable=False)
+    campaign_id = Column(String(50), nullable=False)
+    campaign_name = Column(String(500), nullable=True)
+    audience = Column(String(20), nullable=True)
+    spend = Column(Float, nullable=False, default=0.0)
+    impressions = Column(Integer, nullable=False, default=0)
+    clicks = Column(Integer, nullable=False, default=0)
+    leads_fb = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<CampaignRollup(grain={self.grain}, period_start={self.period_start}, campaign_id={self.campaign_id})>"
+
+
+class CampaignFunnelRollup(Base):
+    """Model for weekly/monthly pre-aggregated CRM funnel counts."""
+
+    __tablename__ = "campaign_funnel_rollups"
+    __table_args__ = (
+        UniqueConstraint(
+            "grain", "period_start", "campaign_id", "status",
+            name="uq_campaign_funnel_rollups_grain_period_campaign_status"
+        ),
+        {'sqlite_autoincrement': True}
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    grain = Column(String(10), nullable=False)  # 'week', 'month'
+    period_start = Column(Date, nullable=False)
+    campaign_id = Column(String(50), nullable=False)
+    status = Column(String(100), nullable=False)
+    leads = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<CampaignFunnelRollup(grain={self.grain}, period_start={self.period_start}, status={self.status})>"
+
+
+class Job(Base):
+    """Model for the durable background job queue (pipeline, analytics).
+
+    Workers claim queued jobs by taking a lease; a job whose lease expires
+    without heartbeats is returned to the queue. job_id matches
+    PipelineRun.job_id and the progress/SSE job id.
+    """
+
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # Claim query: next runnable job of a type
+        Index("ix_jobs_status_type_run_after", "status", "job_type", "run_after"),
+        # Active job lookup for de-duplication of identical requests
+        Index("ix_jobs_type_dedupe_status", "job_type", "dedupe_key", "status"),
+        {'sqlite_autoincrement': True}
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    job_id = Column(String(36), unique=True, nullable=False, index=True)
+    job_type = Column(String(20), nullable=False)  # pipeline, analytics
+    payload_json = Column(Text, nullable=False, default="{}")
+    dedupe_key = Column(String(200), nullable=True)
+    status = Column(String(20), nullable=False, default="queued")  # queued, running, succeeded, failed
+
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    run_after = Column(DateTime, nullable=False, default=datetime.utcnow)  # backoff between attempts
+    last_error = Column(Text, nullable=True)
+
+    lease_owner = Column(String(100), nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<Job(job_id={self.job_id}, type={self.job_type}, status={self.status}, attempts={self.attempts})>"
+
+
+class SchedulerLock(Base):
+    """Model for cross-worker locks of in-process cron jobs (prewarm, retention).
+
+    Every uvicorn worker runs its own schedulers; a scheduled run (slot) is
+    executed only by the worker that claims it here first.
+    """
+
+    __tablename__ = "scheduler_locks"
+
+    name = Column(String(100), primary_key=True)  # 'prewarm:yesterday', 'retention:daily'
+    slot = Column(DateTime, nullable=True)  # latest claimed scheduled minute
+    owner = Column(String(100), nullable=True)
+    locked_until = Column(DateTime, nullable=True)  # lease while the run is in progress
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<SchedulerLock(name={self.name}, slot={self.slot}, owner={self.owner})>"
+
+
+class JobProgress(Base):
+    """Model for shared job progress (PROGRESS_BACKEND=database).
+
+    Lets /api/events/{job_id} on any uvicorn worker see jobs started on another.
+    """
+
+    __tablename__ = "job_progress"
+
+    job_id = Column(String(36), primary_key=True)
+    title = Column(String(200), nullable=False, default="Job")
+    percent = Column(Integer, nullable=False, default=0)
+    status = Column(String(20), nullable=False, default="running")  # running, done, error
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<JobProgress(job_id={self.job_id}, percent={self.percent}, status={self.status})>"
+
+
+class JobProgressLog(Base):
+    """Model for progress log lines of a job (ordered by id)."""
+
+    __tablename__ = "job_progress_logs"
+    __table_args__ = (
+        Index("ix_job_progress_logs_job_id_id", "job_id", "id"),
+        {'sqlite_autoincrement': True}
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    job_id = Column(String(36), nullable=False)
+    message = Column(Text, nullable=False)
+
+    def __repr__(self):
+        return f"<JobProgressLog(job_id={self.job_id}, id={self.id})>"
+
+
+class RateLimitCounter(Base):
+    """Model for shared fixed-window rate limit counters (RATE_LIMIT_STORAGE_URI=database://)."""
+
+    __tablename__ = "rate_limit_counters"
+
+    key = Column(String(255), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    expires_at = Column(Float, nullable=False)  # unix timestamp
+
+    def __repr__(self):
+        return f"<RateLimitCounter(key={self.key}, count={self.count})>"
@@ -1,4 +1,12 @@
-from typing import Dict, Any
+import atexit
+import logging
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
 
 
 class ProgressStore:
@@ -36,3 +44,147 @@ class ProgressStore:
             return
         state["status"] = status
 
+
+class DatabaseProgressStore:
+    """
+    ProgressStore у спільній БД (SQLite WAL / PostgreSQL).
+
+    Той самий інтерфейс, що й ProgressStore, але стан бачать всі процеси:
+    uvicorn --workers N та worker'и черги задач.
+
+    init/update/log/set_status викликаються з async run_pipeline, тому не
+    чекають на базу: записи стають у чергу, а окремий потік записує їх
+    пачками (один commit на все, що накопичилось). get() спершу дочікується
+    черги цього процесу - власні записи видно одразу.
+    """
+
+    def __init__(self, session_factory=None):
+        if session_factory is None:
+            from .database import SessionLocal
+            session_factory = SessionLocal
+        self._session_factory = session_factory
+        self._queue: "queue.Queue[Tuple[Callable[..., None], tuple]]" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+
+    @contextmanager
+    def _session(self):
+        db = self._session_factory()
+        try:
+            yield db
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _submit(self, write: Callable[..., None], *args):
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="progress-writer", daemon=True)
+                self._writer.start()
+                # потік daemon - при виході дописуємо чергу
+                atexit.register(self.flush)
+        self._queue.put((write, args))
+
+    def _write_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with self._session() as db:
+                    for write, args in batch:
+                        write(db, *args)
+            except Exception as e:
+                logger.error(f"[PROGRESS] Не вдалося записати {len(batch)} змін прогресу: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def flush(self):
+        """Чекає, доки всі записи з черги цього процесу потраплять у базу."""
+        self._queue.join()
+
+    def init(self, job_id: str, title: str = "Job"):
+        self._submit(_init, job_id, title)
+
+    def get(self, job_id: str):
+        from .models import JobProgress, JobProgressLog
+
+        self.flush()
+        with self._session() as db:
+            state = db.query(JobProgress).filter(JobProgress.job_id == job_id).first()
+            if not state:
+                return None
+            logs = [
+                message for (message,) in
+                db.query(JobProgressLog.message)
+                .filter(JobProgressLog.job_id == job_id)
+                .order_by(JobProgressLog.id)
+                .all()
+            ]
+            return {
+                "title": state.title,
+                "percent": state.percent,
+                "status": state.status,
+                "logs": logs,
+            }
+
+    def update(self, job_id: str, percent: int, message: str):
+        self._submit(_update, job_id, percent, message)
+
+    def log(self, job_id: str, message: str):
+        self._submit(_log, job_id, message)
+
+    def set_status(self, job_id: str, status: str):
+        self._submit(_set_status, job_id, status)
+
+
+def _init(db, job_id: str, title: str):
+    from .models import JobProgress, JobProgressLog
+
+    db.query(JobProgressLog).filter(JobProgressLog.job_id == job_id).delete(synchronize_session=False)
+    db.merge(JobProgress(job_id=job_id, title=title, percent=0, status="running"))
+    db.add(JobProgressLog(job_id=job_id, message="Job started"))
+    db.flush()
+
+
+def _update(db, job_id: str, percent: int, message: str):
+    from .models import JobProgress, JobProgressLog
+
+    updated = db.query(JobProgress).filter(JobProgress.job_id == job_id).update({
+        JobProgress.percent: percent,
+        JobProgress.status: "running" if percent < 100 else "done",
+    }, synchronize_session=False)
+    if updated:
+        db.add(JobProgressLog(job_id=job_id, message=message))
+        db.flush()
+
+
+def _log(db, job_id: str, message: str):
+    from .models import JobProgress, JobProgressLog
+
+    if db.query(JobProgress.job_id).filter(JobProgress.job_id == job_id).first():
+        db.add(JobProgressLog(job_id=job_id, message=message))
+        db.flush()
+
+
+def _set_status(db, job_id: str, status: str):
+    from .models import JobProgress
+
+    db.query(JobProgress).filter(JobProgress.job_id == job_id).update(
+        {JobProgress.status: status}, synchronize_session=False
+    )
+
+
+def create_progress_store():
+    """PROGRESS_BACKEND: memory (за замовчуванням, dev) або database (кілька процесів)."""
+    backend = os.getenv("PROGRESS_BACKEND", "memory").lower()
+    if backend == "database":
+        return DatabaseProgressStore()
+    return ProgressStore()
@@ -0,0 +1,137 @@
+"""
+Спільне сховище лічильників slowapi/limits у базі даних додатку.
+
+RATE_LIMIT_STORAGE_URI=database:// - лічильники в таблиці rate_limit_counters
+(SQLite WAL / PostgreSQL через існуючий engine), тому ліміти спільні для
+всіх uvicorn workers. За замовчуванням memory:// (окремо в кожному процесі).
+
+Підтримується стратегія fixed-window (за замовчуванням у slowapi).
+"""
+import time
+from typing import Optional
+
+from limits.storage import Storage
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+
+class DatabaseStorage(Storage):
+    """limits Storage поверх SQLAlchemy engine (scheme: database://)."""
+
+    STORAGE_SCHEME = ["database"]
+
+    def __init__(self, uri: Optional[str] = None, wrap_exceptions: bool = False, session_factory=None, **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        if session_factory is None:
+            from .database import SessionLocal
+            session_factory = SessionLocal
+        self._session_factory = session_factory
+
+    @property
+    def base_exceptions(self):
+        return SQLAlchemyError
+
+    def incr(self, key: str, expiry: int, elastic_expiry: bool = False, amount: int = 1) -> int:
+        from .models import RateLimitCounter
+
+        now = time.time()
+        db = self._session_factory()
+        try:
+            for _ in range(3):
+                # UPDATE тримає блокування рядка до commit - інкременти з різних процесів не губляться
+                counter = db.query(RateLimitCounter).filter(RateLimitCounter.key == key)
+                updated = counter.filter(RateLimitCounter.expires_at > now).update({
+                    RateLimitCounter.count: RateLimitCounter.count + amount,
+                    **({RateLimitCounter.expires_at: now + expiry} if elastic_expiry else {}),
+                }, synchronize_session=False)
+                if not updated:
+                    # Вікно закінчилось - починаємо нове
+                    updated = counter.update({
+                        RateLimitCounter.count: amount,
+                        RateLimitCounter.expires_at: now + expiry,
+                    }, synchronize_session=False)
+                if not updated:
+                    db.add(RateLimitCounter(key=key, count=amount, expires_at=now + expiry))
+                try:
+                    db.flush()
+                    value = db.query(RateLimitCounter.count).filter(RateLimitCounter.key == key).scalar()
+                    db.commit()
+                    return int(value or 0)
+                except IntegrityError:
+                    # Інший процес щойно створив цей ключ - повторюємо через UPDATE
+                    db.rollback()
+            raise SQLAlchemyError(f"Could not increment rate limit counter {key}")
+        finally:
+            db.close()
+
+    def get(self, key: str) -> int:
+        from .models import RateLimitCounter
+
+        db = self._session_factory()
+        try:
+            value = (
+                db.query(RateLimitCounter.count)
+                .filter(RateLimitCounter.key == key, RateLimitCounter.expires_at > time.time())
+                .scalar()
+            )
+            return int(value or 0)
+        finally:
+            db.close()
+
+    def get_expiry(self, key: str) -> float:
+        from .models import RateLimitCounter
+
+        db = self._session_factory()
+        try:
+            value = db.query(RateLimitCounter.expires_at).filter(RateLimitCounter.key == key).scalar()
+            return float(value) if value else time.time()
+        finally:
+            db.close()
+
+    def check(self) -> bool:
+        from sqlalchemy import text
+
+        db = self._session_factory()
+        try:
+            db.execute(text("SELECT 1"))
+            return True
+        except SQLAlchemyError:
+            return False
+        finally:
+            db.close()
+
+    def reset(self) -> Optional[int]:
+        from .models import RateLimitCounter
+
+        db = self._session_factory()
+        try:
+            deleted = db.query(RateLimitCounter).delete(synchronize_session=False)
+            db.commit()
+            return deleted
+        finally:
+            db.close()
+
+    def clear(self, key: str) -> None:
+        from .models import RateLimitCounter
+
+        db = self._session_factory()
+        try:
+            db.query(RateLimitCounter).filter(RateLimitCounter.key == key).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    def prune_expired(self) -> int:
+        """Видаляє прострочені лічильники (таблиця не росте безмежно)."""
+        from .models import RateLimitCounter
+
+        db = self._session_factory()
+        try:
+            deleted = (
+                db.query(RateLimitCounter)
+                .filter(RateLimitCounter.expires_at <= time.time())
+                .delete(synchronize_session=False)
+            )
+            db.commit()
+            return deleted
+        finally:
+            db.close()
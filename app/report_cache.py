@@ -0,0 +1,113 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ReportCache:
+    """
+    In-memory stale-while-revalidate кеш звітів.
+
+    - fresh: запис молодший за fresh_ttl → віддається одразу
+    - stale: запис молодший за stale_ttl → віддається одразу, а в фоні
+      запускається ОДНЕ оновлення для цього ключа
+    - miss: запису немає або він старший за stale_ttl → рахуємо синхронно
+    """
+
+    def __init__(self, fresh_ttl: int = 300, stale_ttl: int = 3600, max_entries: int = 32):
+        self.fresh_ttl = fresh_ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        # key -> (stored_at, value, fresh_ttl, stale_ttl)
+        self._store: "OrderedDict[Hashable, Tuple[float, Any, float, float]]" = OrderedDict()
+        self._refreshing: Set[Hashable] = set()
+        # Сильні посилання на фонові оновлення: event loop тримає лише слабкі,
+        # і незавершена задача інакше може бути зібрана GC
+        self._refresh_tasks: Set[asyncio.Task] = set()
+        self._stats: Dict[str, int] = {"hits": 0, "stale_hits": 0, "misses": 0, "bypasses": 0, "refreshes": 0}
+
+    def get(self, key: Hashable) -> Tuple[Optional[Any], Optional[str]]:
+        """Повертає (value, state), де state: 'fresh' | 'stale' | None."""
+        entry = self._store.get(key)
+        if entry is None:
+            return None, None
+        stored_at, value, fresh_ttl, stale_ttl = entry
+        age = time.monotonic() - stored_at
+        if age <= fresh_ttl:
+            self._store.move_to_end(key)
+            return value, "fresh"
+        if age <= stale_ttl:
+            self._store.move_to_end(key)
+            return value, "stale"
+        del self._store[key]
+        return None, None
+
+    def set(self, key: Hashable, value: Any, fresh_ttl: Optional[float] = None, stale_ttl: Optional[float] = None):
+        """Зберігає значення; fresh_ttl/stale_ttl перевизначають TTL для цього запису (pre-warm)."""
+        fresh_ttl = self.fresh_ttl if fresh_ttl is None else fresh_ttl
+        stale_ttl = max(self.stale_ttl if stale_ttl is None else stale_ttl, fresh_ttl)
+        self._store[key] = (time.monotonic(), value, fresh_ttl, stale_ttl)
+        self._store.move_to_end(key)
+        while len(self._store) > self.max_entries:
+            self._store.popitem(last=False)
+
+    def clear(self):
+        self._store.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {**self._stats, "entries": len(self._store), "refreshing": len(self._refreshing)}
+
+    async def get_or_compute(
+        self,
+        key: Hashable,
+        compute: Callable[[], Awaitable[Any]],
+        bypass: bool = False,
+        refresh: Optional[Callable[[], Awaitable[Any]]] = None
+    ) -> Tuple[Any, str]:
+        """
+        Повертає (value, cache_status), де cache_status: HIT | STALE | MISS | BYPASS.
+
+        bypass=True завжди рахує заново і оновлює кеш (для "живих" даних).
+        refresh: обчислення для фонового оновлення stale запису (за замовчуванням compute).
+        """
+        if bypass:
+            self._stats["bypasses"] += 1
+            value = await compute()
+            self.set(key, value)
+            return value, "BYPASS"
+
+        value, state = self.get(key)
+        if state == "fresh":
+            self._stats["hits"] += 1
+            return value, "HIT"
+        if state == "stale":
+            self._stats["stale_hits"] += 1
+            self._schedule_refresh(key, refresh or compute)
+            return value, "STALE"
+
+        self._stats["misses"] += 1
+        value = await compute()
+        self.set(key, value)
+        return value, "MISS"
+
+    def _schedule_refresh(self, key: Hashable, compute: Callable[[], Awaitable[Any]]):
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+        task = asyncio.create_task(self._refresh(key, compute))
+        self._refresh_tasks.add(task)
+        task.add_done_callback(self._refresh_tasks.discard)
+
+    async def _refresh(self, key: Hashable, compute: Callable[[], Awaitable[Any]]):
+        try:
+            value = await compute()
+            self.set(key, value)
+            self._stats["refreshes"] += 1
+        except Exception as e:
+            # Залишаємо stale запис - краще старі дані, ніж помилка
+            logger.error(f"Background refresh failed for {key}: {e}")
+        finally:
+            self._refreshing.discard(key)
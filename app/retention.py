@@ -0,0 +1,384 @@
+"""
+Retention політика для історії запусків та пошуків.
+
+Щоденне обслуговування бази (RETENTION_SCHEDULE, за замовчуванням 03:30):
+
+- run_logs: логи запусків, старших за RETENTION_LOG_DAYS, стискаються в один
+  рядок run_log_archives на запуск (zlib JSON); рядки run_logs видаляються.
+  Рядки рівня 'timing' залишаються - їх читає /api/runs/stage-timings.
+- search_history: results_json пошуків, старших за RETENTION_SEARCH_DAYS,
+  переноситься стисненим у search_history_archives; метадані пошуку
+  залишаються в історії, а /api/search-history/{id} читає архів.
+- job_progress / job_progress_logs: прогрес задач, не оновлюваний довше за
+  RETENTION_PROGRESS_DAYS, видаляється; rate_limit_counters: прострочені
+  лічильники (RATE_LIMIT_STORAGE_URI=database://) видаляються.
+- SQLite: ANALYZE та VACUUM, якщо вільні сторінки займають більше
+  RETENTION_VACUUM_FREE_RATIO файлу. PostgreSQL: VACUUM (ANALYZE) таблиць.
+
+Архівовані дані не втрачаються - load_archived_logs / load_archived_results
+повертають їх у тому ж форматі, що й до стиснення.
+"""
+import asyncio
+import json
+import logging
+import os
+import zlib
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import func, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, undefer
+
+from . import database
+from .models import (
+    JobProgress, JobProgressLog, PipelineRun, RateLimitCounter, RunLog, RunLogArchive, SearchHistory,
+    SearchHistoryArchive,
+)
+from .scheduler import CronLoop, CronSchedule
+
+logger = logging.getLogger(__name__)
+
+
+# Рівні логів, які не архівуються (STAGE_TIMINGS_LOG_LEVEL у main)
+KEEP_LOG_LEVELS = ("timing",)
+
+# Таблиці, які змінює retention - їм потрібен ANALYZE/VACUUM після чистки
+MAINTAINED_TABLES = (
+    "run_logs", "run_log_archives", "search_history", "search_history_archives",
+    "job_progress", "job_progress_logs", "rate_limit_counters",
+)
+
+
+@dataclass
+class RetentionPolicy:
+    log_days: int = 30
+    search_days: int = 90
+    progress_days: int = 7
+    batch_size: int = 200
+    vacuum: bool = True
+    vacuum_free_ratio: float = 0.2
+
+    @classmethod
+    def from_env(cls) -> "RetentionPolicy":
+        return cls(
+            log_days=int(os.getenv("RETENTION_LOG_DAYS", "30")),
+            search_days=int(os.getenv("RETENTION_SEARCH_DAYS", "90")),
+            progress_days=int(os.getenv("RETENTION_PROGRESS_DAYS", "7")),
+            batch_size=int(os.getenv("RETENTION_BATCH_SIZE", "200")),
+            vacuum=os.getenv("RETENTION_VACUUM", "true").lower() == "true",
+            vacuum_free_ratio=float(os.getenv("RETENTION_VACUUM_FREE_RATIO", "0.2")),
+        )
+
+
+def _compress(value: Any) -> bytes:
+    return zlib.compress(json.dumps(value, ensure_ascii=False).encode("utf-8"), 9)
+
+
+def _decompress(blob: bytes) -> Any:
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+
+# ============================================================================
+# RUN LOGS
+# ============================================================================
+
+
+def compact_run_logs(
+    db: Session,
+    older_than: datetime,
+    batch_size: int = 200,
+    keep_levels: Sequence[str] = KEEP_LOG_LEVELS
+) -> Dict[str, int]:
+    """
+    Стискає логи завершених запусків, що стартували раніше older_than.
+
+    Повторний запуск дописує нові логи (якщо з'явились) до існуючого архіву.
+
+    Returns:
+        {"runs": кількість запусків, "logs": кількість видалених рядків run_logs}
+    """
+    runs = logs_total = 0
+    while True:
+        run_ids = [
+            run_id for (run_id,) in (
+                db.query(RunLog.run_id)
+                .join(PipelineRun, RunLog.run_id == PipelineRun.id)
+                .filter(
+                    PipelineRun.start_time < older_than,
+                    PipelineRun.status != "running",
+                    RunLog.level.notin_(keep_levels),
+                )
+                .distinct()
+                .limit(batch_size)
+                .all()
+            )
+        ]
+        if not run_ids:
+            break
+
+        logs = (
+            db.query(RunLog)
+            .filter(RunLog.run_id.in_(run_ids), RunLog.level.notin_(keep_levels))
+            .order_by(RunLog.run_id, RunLog.id)
+            .all()
+        )
+        by_run: Dict[int, List[RunLog]] = {}
+        for log in logs:
+            by_run.setdefault(log.run_id, []).append(log)
+        archives = {
+            archive.run_id: archive
+            for archive in db.query(RunLogArchive).filter(RunLogArchive.run_id.in_(run_ids))
+        }
+
+        for run_id, run_logs in by_run.items():
+            entries = [
+                {
+                    "timestamp": log.timestamp.isoformat() if log.timestamp else None,
+                    "level": log.level,
+                    "message": log.message,
+                }
+                for log in run_logs
+            ]
+            archive = archives.get(run_id)
+            if archive is None:
+                archive = RunLogArchive(run_id=run_id)
+                db.add(archive)
+            else:
+                entries = _decompress(archive.logs_zlib) + entries
+            timestamps = [log.timestamp for log in run_logs if log.timestamp]
+            archive.logs_zlib = _compress(entries)
+            archive.log_count = len(entries)
+            archive.error_count = sum(1 for entry in entries if entry["level"] == "error")
+            archive.first_timestamp = min(filter(None, [archive.first_timestamp, *timestamps]), default=None)
+            archive.last_timestamp = max(filter(None, [archive.last_timestamp, *timestamps]), default=None)
+            archive.archived_at = datetime.utcnow()
+
+        db.query(RunLog).filter(RunLog.id.in_([log.id for log in logs])).delete(synchronize_session=False)
+        db.commit()
+        runs += len(by_run)
+        logs_total += len(logs)
+
+    return {"runs": runs, "logs": logs_total}
+
+
+def load_archived_logs(db: Session, run_id: int) -> List[Dict[str, Any]]:
+    """Логи запуску з архіву (timestamp, level, message) або [] якщо архіву немає."""
+    archive = db.query(RunLogArchive).filter(RunLogArchive.run_id == run_id).first()
+    return _decompress(archive.logs_zlib) if archive else []
+
+
+# ============================================================================
+# SEARCH HISTORY
+# ============================================================================
+
+
+def archive_search_results(db: Session, older_than: datetime, batch_size: int = 200) -> Dict[str, int]:
+    """
+    Переносить results_json пошуків, створених раніше older_than, у стиснений архів.
+
+    Returns:
+        {"searches": кількість пошуків, "bytes_before": ..., "bytes_after": ...}
+    """
+    searches = bytes_before = bytes_after = 0
+    while True:
+        records = (
+            db.query(SearchHistory)
+            .options(undefer(SearchHistory.results_json))
+            .filter(SearchHistory.created_at < older_than, SearchHistory.results_json.isnot(None))
+            .order_by(SearchHistory.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not records:
+            break
+
+        for record in records:
+            results = json.loads(record.results_json)
+            blob = _compress(results)
+            db.merge(SearchHistoryArchive(
+                search_id=record.id,
+                original_size=len(record.results_json.encode("utf-8")),
+                results_zlib=blob,
+                archived_at=datetime.utcnow(),
+            ))
+            bytes_before += len(record.results_json.encode("utf-8"))
+            bytes_after += len(blob)
+            record.results_json = None
+        db.commit()
+        searches += len(records)
+
+    return {"searches": searches, "bytes_before": bytes_before, "bytes_after": bytes_after}
+
+
+def load_archived_results(db: Session, search_id: int) -> Optional[List[Any]]:
+    """Результати пошуку з архіву або None якщо пошук не архівувався."""
+    archive = db.query(SearchHistoryArchive).filter(SearchHistoryArchive.search_id == search_id).first()
+    return _decompress(archive.results_zlib) if archive else None
+
+
+# ============================================================================
+# СПІЛЬНИЙ СТАН ПРОЦЕСІВ
+# ============================================================================
+
+
+def prune_job_progress(db: Session, older_than: datetime, batch_size: int = 200) -> Dict[str, int]:
+    """
+    Видаляє прогрес задач (PROGRESS_BACKEND=database), не оновлюваний з older_than.
+
+    Задача, що ще виконується, оновлює прогрес постійно; старіший стан лишили
+    завершені задачі або процеси, що впали.
+
+    Returns:
+        {"jobs": кількість задач, "logs": кількість видалених рядків job_progress_logs}
+    """
+    jobs = logs_total = 0
+    while True:
+        job_ids = [
+            job_id for (job_id,) in (
+                db.query(JobProgress.job_id)
+                .filter(JobProgress.updated_at < older_than)
+                .limit(batch_size)
+                .all()
+            )
+        ]
+        if not job_ids:
+            break
+        logs_total += (
+            db.query(JobProgressLog)
+            .filter(JobProgressLog.job_id.in_(job_ids))
+            .delete(synchronize_session=False)
+        )
+        db.query(JobProgress).filter(JobProgress.job_id.in_(job_ids)).delete(synchronize_session=False)
+        db.commit()
+        jobs += len(job_ids)
+
+    return {"jobs": jobs, "logs": logs_total}
+
+
+def prune_rate_limit_counters(db: Session, now: datetime) -> int:
+    """Видаляє прострочені лічильники rate limit (expires_at - unix time). Returns: кількість рядків."""
+    deleted = (
+        db.query(RateLimitCounter)
+        .filter(RateLimitCounter.expires_at <= (now - datetime(1970, 1, 1)).total_seconds())
+        .delete(synchronize_session=False)
+    )
+    db.commit()
+    return deleted
+
+
+# ============================================================================
+# VACUUM / ANALYZE
+# ============================================================================
+
+
+def optimize_database(engine: Engine, vacuum: bool = True, vacuum_free_ratio: float = 0.2) -> Dict[str, Any]:
+    """
+    Оновлює статистику планувальника та повертає місце після видалення рядків.
+
+    SQLite: ANALYZE завжди, VACUUM - лише коли вільні сторінки займають більше
+    vacuum_free_ratio файлу (VACUUM переписує всю базу та блокує запис).
+    PostgreSQL: VACUUM (ANALYZE) змінених таблиць (поза транзакцією).
+    """
+    result: Dict[str, Any] = {"dialect": engine.dialect.name, "vacuumed": False}
+    if engine.dialect.name == "sqlite":
+        with engine.connect() as conn:
+            conn.exec_driver_sql("ANALYZE")
+            page_count = conn.exec_driver_sql("PRAGMA page_count").scalar() or 0
+            free_pages = conn.exec_driver_sql("PRAGMA freelist_count").scalar() or 0
+            conn.commit()
+        result["free_ratio"] = round(free_pages / page_count, 3) if page_count else 0.0
+        if vacuum and page_count and free_pages / page_count > vacuum_free_ratio:
+            with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                conn.exec_driver_sql("VACUUM")
+            result["vacuumed"] = True
+    elif engine.dialect.name == "postgresql":
+        statement = "VACUUM (ANALYZE) " if vacuum else "ANALYZE "
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text(statement + ", ".join(MAINTAINED_TABLES)))
+        result["vacuumed"] = vacuum
+    return result
+
+
+# ============================================================================
+# ЗАПУСК
+# ============================================================================
+
+
+def run_retention(policy: Optional[RetentionPolicy] = None, now: Optional[datetime] = None) -> Dict[str, Any]:
+    """Повний цикл обслуговування (синхронний - викликати через asyncio.to_thread)."""
+    policy = policy or RetentionPolicy.from_env()
+    now = now or datetime.utcnow()
+
+    with database.get_db() as db:
+        logs = compact_run_logs(db, now - timedelta(days=policy.log_days), policy.batch_size)
+        searches = archive_search_results(db, now - timedelta(days=policy.search_days), policy.batch_size)
+        job_progress = prune_job_progress(db, now - timedelta(days=policy.progress_days), policy.batch_size)
+        rate_limits = prune_rate_limit_counters(db, now)
+
+    optimize = optimize_database(database.engine, policy.vacuum, policy.vacuum_free_ratio)
+    stats = {
+        "run_logs": logs,
+        "search_history": searches,
+        "job_progress": job_progress,
+        "rate_limit_counters": rate_limits,
+        "optimize": optimize,
+    }
+    logger.info(f"[RETENTION] {stats}")
+    return stats
+
+
+def retention_stats(db: Session) -> Dict[str, int]:
+    """Розмір таблиць історії (для /api/maintenance/retention)."""
+    return {
+        "run_logs": db.query(func.count(RunLog.id)).scalar(),
+        "run_log_archives": db.query(func.count(RunLogArchive.run_id)).scalar(),
+        "search_history_with_results": (
+            db.query(func.count(SearchHistory.id)).filter(SearchHistory.results_json.isnot(None)).scalar()
+        ),
+        "search_history_archives": db.query(func.count(SearchHistoryArchive.search_id)).scalar(),
+        "job_progress": db.query(func.count(JobProgress.job_id)).scalar(),
+        "rate_limit_counters": db.query(func.count(RateLimitCounter.key)).scalar(),
+    }
+
+
+class RetentionScheduler(CronLoop):
+    """
+    In-process планувальник обслуговування на спільному CronLoop: пропущені
+    хвилини надолужуються, run_retention виконується в потоці, не блокуючи
+    event loop, і лише на одному worker'і (scheduler_locks).
+    """
+
+    log_prefix = "[RETENTION]"
+    lock_namespace = "retention"
+
+    def __init__(self, schedule: CronSchedule, policy: RetentionPolicy, tick_seconds: float = 60.0):
+        super().__init__([("daily", schedule)], tick_seconds=tick_seconds)
+        self.schedule = schedule
+        self.policy = policy
+        self.last_stats: Optional[Dict[str, Any]] = None
+
+    def start(self) -> bool:
+        started = super().start()
+        if started:
+            logger.info(f"[RETENTION] Розклад: '{self.schedule.expr}', {self.policy}")
+        return started
+
+    async def run_pending(self, today: date) -> List[str]:
+        slot = self._pending.pop("daily", None)
+        if slot is None or not await self.claim("daily", slot):
+            return []
+        try:
+            self.last_stats = await asyncio.to_thread(run_retention, self.policy)
+        finally:
+            await self.release("daily")
+        return ["daily"]
+
+
+def create_retention_scheduler() -> RetentionScheduler:
+    """Створює планувальник з налаштувань оточення (RETENTION_*)."""
+    return RetentionScheduler(
+        schedule=CronSchedule(os.getenv("RETENTION_SCHEDULE", "30 3 * * *")),
+        policy=RetentionPolicy.from_env(),
+    )
@@ -0,0 +1,443 @@
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .connectors.meta import graph_governor
+from .database import get_db
+from .models import PipelineRun, RunLog, SchedulerLock
+
+logger = logging.getLogger(__name__)
+
+
+# Стандартні вікна звітів: що дивляться щоранку
+DEFAULT_PREWARM_WINDOWS = (
+    "yesterday=0 5 * * *;"
+    "last_7_days=5 5 * * *;"
+    "month_to_date=10 5 * * *;"
+    "last_month=15 5 * * *"
+)
+
+
+# ============================================================================
+# CRON
+# ============================================================================
+
+
+def _parse_cron_field(expr: str, low: int, high: int) -> Set[int]:
+    """Розбирає одне поле cron: '*', '*/n', 'a-b', 'a-b/n', 'a,b,c'."""
+    values: Set[int] = set()
+    for part in expr.split(","):
+        step = 1
+        if "/" in part:
+            part, step_str = part.split("/", 1)
+            step = int(step_str)
+            if step <= 0:
+                raise ValueError(f"Невірний крок cron: {expr}")
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start_str, end_str = part.split("-", 1)
+            start, end = int(start_str), int(end_str)
+        else:
+            start = end = int(part)
+        if start < low or end > high or start > end:
+            raise ValueError(f"Значення cron поза межами {low}-{high}: {expr}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+@dataclass
+class CronSchedule:
+    """
+    Розклад у форматі cron з 5 полів: хвилина година день_місяця місяць день_тижня.
+
+    День тижня: 0-6, де 0 = неділя (як у crontab; 7 теж означає неділю).
+    """
+
+    expr: str
+    minutes: Set[int] = field(init=False)
+    hours: Set[int] = field(init=False)
+    days: Set[int] = field(init=False)
+    months: Set[int] = field(init=False)
+    weekdays: Set[int] = field(init=False)
+
+    def __post_init__(self):
+        fields = self.expr.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron вираз повинен мати 5 полів: '{self.expr}'")
+        self.minutes = _parse_cron_field(fields[0], 0, 59)
+        self.hours = _parse_cron_field(fields[1], 0, 23)
+        self.days = _parse_cron_field(fields[2], 1, 31)
+        self.months = _parse_cron_field(fields[3], 1, 12)
+        self.weekdays = {d % 7 for d in _parse_cron_field(fields[4], 0, 7)}
+
+    def matches(self, moment: datetime) -> bool:
+        # crontab: 0 = неділя, datetime.weekday(): 0 = понеділок
+        weekday = (moment.weekday() + 1) % 7
+        return (
+            moment.minute in self.minutes
+            and moment.hour in self.hours
+            and moment.day in self.days
+            and moment.month in self.months
+            and weekday in self.weekdays
+        )
+
+
+# Скільки пропущених хвилин надолужувати після простою (сон, довгий блокуючий виклик)
+MAX_CATCH_UP = timedelta(days=1)
+
+
+def due_minutes(last_check: Optional[datetime], now: datetime) -> List[datetime]:
+    """
+    Хвилини в інтервалі (last_check, now], які треба перевірити за розкладом.
+
+    Перша перевірка (last_check=None) дивиться лише на поточну хвилину.
+    Надолужується не більше MAX_CATCH_UP.
+    """
+    minute = now.replace(second=0, microsecond=0)
+    if last_check is None:
+        return [minute]
+    current = max(last_check.replace(second=0, microsecond=0) + timedelta(minutes=1), minute - MAX_CATCH_UP)
+    minutes = []
+    while current <= minute:
+        minutes.append(current)
+        current += timedelta(minutes=1)
+    return minutes
+
+
+# ============================================================================
+# ВІКНА ЗВІТІВ
+# ============================================================================
+
+
+def resolve_window(name: str, today: date) -> Tuple[str, str]:
+    """
+    Повертає (start_date, end_date) у форматі YYYY-MM-DD для стандартного вікна.
+
+    - yesterday: вчора
+    - last_7_days: 7 повних днів до сьогодні
+    - month_to_date: з 1 числа поточного місяця по сьогодні
+    - last_month: весь попередній місяць
+    """
+    if name == "yesterday":
+        start = end = today - timedelta(days=1)
+    elif name == "last_7_days":
+        start, end = today - timedelta(days=7), today - timedelta(days=1)
+    elif name == "month_to_date":
+        start, end = today.replace(day=1), today
+    elif name == "last_month":
+        end = today.replace(day=1) - timedelta(days=1)
+        start = end.replace(day=1)
+    else:
+        raise ValueError(f"Невідоме вікно звіту: {name}")
+    return start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")
+
+
+def parse_windows(config: str) -> List[Tuple[str, CronSchedule]]:
+    """
+    Розбирає конфіг вікон: "yesterday=0 5 * * *;last_month=15 5 1 * *".
+
+    Невідомі вікна та невірні cron вирази пропускаються з попередженням.
+    """
+    windows = []
+    for item in config.split(";"):
+        item = item.strip()
+        if not item:
+            continue
+        if "=" not in item:
+            logger.warning(f"[SCHEDULER] Пропущено вікно без розкладу: '{item}'")
+            continue
+        name, expr = (part.strip() for part in item.split("=", 1))
+        try:
+            resolve_window(name, date.today())
+            windows.append((name, CronSchedule(expr)))
+        except ValueError as e:
+            logger.warning(f"[SCHEDULER] Пропущено вікно '{item}': {e}")
+    return windows
+
+
+# ============================================================================
+# БЛОКУВАННЯ МІЖ WORKER'АМИ
+# ============================================================================
+
+
+def claim_slot(db: Session, name: str, slot: datetime, owner: str, lease_seconds: int) -> bool:
+    """
+    Забирає запуск задачі name за розкладом slot для цього процесу.
+
+    Один умовний UPDATE рядка scheduler_locks: виграє лише перший worker,
+    решта бачать уже записаний slot. False - цей (або пізніший) запуск вже
+    забрано, або попередній запуск ще триває (lease не прострочено).
+    """
+    now = datetime.utcnow()
+    if db.get(SchedulerLock, name) is None:
+        try:
+            db.add(SchedulerLock(name=name))
+            db.commit()
+        except IntegrityError:
+            # Рядок щойно створив інший worker
+            db.rollback()
+
+    updated = (
+        db.query(SchedulerLock)
+        .filter(
+            SchedulerLock.name == name,
+            or_(SchedulerLock.slot.is_(None), SchedulerLock.slot < slot),
+            or_(SchedulerLock.locked_until.is_(None), SchedulerLock.locked_until < now),
+        )
+        .update({
+            SchedulerLock.slot: slot,
+            SchedulerLock.owner: owner,
+            SchedulerLock.locked_until: now + timedelta(seconds=lease_seconds),
+        }, synchronize_session=False)
+    )
+    db.commit()
+    return bool(updated)
+
+
+def release_slot(db: Session, name: str, owner: str):
+    """Знімає lease після завершення запуску (slot лишається - повтору не буде)."""
+    db.query(SchedulerLock).filter(SchedulerLock.name == name, SchedulerLock.owner == owner).update(
+        {SchedulerLock.locked_until: None}, synchronize_session=False
+    )
+    db.commit()
+
+
+# ============================================================================
+# SCHEDULER
+# ============================================================================
+
+
+class CronLoop:
+    """
+    Спільний in-process cron цикл (pre-warm, retention).
+
+    Раз на tick_seconds ставить у чергу задачі, розклад яких збігся з будь-якою
+    хвилиною після попередньої перевірки (due_minutes) - повільний запуск не
+    з'їдає наступний. Черга виконується окремою задачею (run_pending), не
+    блокуючи перевірки. Кожен uvicorn worker має свій цикл, тому запуск
+    спершу забирається через scheduler_locks (claim) - виконує його лише один
+    процес.
+    """
+
+    log_prefix = "[SCHEDULER]"
+    lock_namespace = "cron"
+
+    def __init__(
+        self,
+        schedules: List[Tuple[str, CronSchedule]],
+        tick_seconds: float = 60.0,
+        lease_seconds: int = 3600
+    ):
+        self.schedules = schedules
+        self.tick_seconds = tick_seconds
+        self.lease_seconds = lease_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        # назва -> остання хвилина розкладу, що збіглася
+        self._pending: Dict[str, datetime] = {}
+        self._last_check: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    def start(self) -> bool:
+        if self._task is None and self.schedules:
+            self._task = asyncio.create_task(self._loop())
+            return True
+        return False
+
+    async def stop(self):
+        for task in (self._task, self._worker):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = self._worker = None
+
+    async def _loop(self):
+        while True:
+            try:
+                self.dispatch(datetime.now())
+            except Exception as e:
+                logger.error(f"{self.log_prefix} Помилка перевірки розкладу: {e}")
+            await asyncio.sleep(self.tick_seconds)
+
+    def dispatch(self, now: datetime) -> Optional[asyncio.Task]:
+        """Ставить задачі в чергу та запускає її виконання, якщо воно ще не працює."""
+        self.tick(now)
+        if self._pending and (self._worker is None or self._worker.done()):
+            self._worker = asyncio.create_task(self._drain(now.date()))
+        return self._worker
+
+    def tick(self, now: datetime) -> List[str]:
+        """
+        Ставить у чергу задачі, розклад яких збігся з хвилиною в (остання перевірка, now].
+
+        Returns:
+            Назви задач, доданих у чергу
+        """
+        minutes = due_minutes(self._last_check, now)
+        self._last_check = now.replace(second=0, microsecond=0)
+
+        queued = []
+        for name, schedule in self.schedules:
+            matched = [minute for minute in minutes if schedule.matches(minute)]
+            if matched:
+                self._pending[name] = matched[-1]
+                queued.append(name)
+        return queued
+
+    async def _drain(self, today: date):
+        try:
+            await self.run_pending(today)
+        except Exception as e:
+            logger.error(f"{self.log_prefix} Помилка виконання черги: {e}")
+
+    async def run_pending(self, today: date) -> List[str]:
+        """Виконує задачі з черги. Returns: назви виконаних задач."""
+        raise NotImplementedError
+
+    async def claim(self, name: str, slot: datetime) -> bool:
+        """Забирає запуск у scheduler_locks (у потоці - запит до бази)."""
+        def _claim():
+            with get_db() as db:
+                return claim_slot(db, f"{self.lock_namespace}:{name}", slot, self.owner, self.lease_seconds)
+
+        if await asyncio.to_thread(_claim):
+            return True
+        logger.info(f"{self.log_prefix} '{name}' ({slot:%Y-%m-%d %H:%M}) вже виконує інший worker")
+        return False
+
+    async def release(self, name: str):
+        def _release():
+            with get_db() as db:
+                release_slot(db, f"{self.lock_namespace}:{name}", self.owner)
+
+        await asyncio.to_thread(_release)
+
+
+class PrewarmScheduler(CronLoop):
+    """
+    In-process планувальник, що заздалегідь рахує звіти для стандартних вікон.
+
+    Якщо Graph API близький до ліміту (graph_governor), вікно лишається в
+    черзі до наступної перевірки. Кожен запуск записується в PipelineRun
+    (storage_backend='prewarm').
+    """
+
+    lock_namespace = "prewarm"
+
+    def __init__(
+        self,
+        windows: List[Tuple[str, CronSchedule]],
+        runner: Callable[[str, str], Awaitable[Dict[str, Any]]],
+        max_graph_usage: float = 50.0,
+        tick_seconds: float = 60.0
+    ):
+        super().__init__(windows, tick_seconds=tick_seconds)
+        self.windows = windows
+        self.runner = runner
+        self.max_graph_usage = max_graph_usage
+
+    def start(self) -> bool:
+        started = super().start()
+        if started:
+            logger.info(f"[SCHEDULER] Pre-warm вікна: {[name for name, _ in self.windows]}")
+        return started
+
+    async def run_pending(self, today: date) -> List[str]:
+        """
+        Виконує вікна з черги по черзі, поки Graph API дозволяє фонову роботу.
+
+        Returns:
+            Назви вікон, що були виконані
+        """
+        executed = []
+        for name, _ in self.windows:
+            if name not in self._pending:
+                continue
+            if not graph_governor.allows_background_work(self.max_graph_usage):
+                logger.info(
+                    f"[SCHEDULER] Відкладено '{name}': Graph usage {graph_governor.usage_percent():.0f}%, "
+                    f"блокування ще {graph_governor.blocked_for():.0f}s"
+                )
+                break
+            slot = self._pending.pop(name)
+            if not await self.claim(name, slot):
+                continue
+            try:
+                await self.run_window(name, today)
+            finally:
+                await self.release(name)
+            executed.append(name)
+        return executed
+
+    async def run_window(self, name: str, today: date) -> Optional[int]:
+        """Виконує одне вікно та записує результат у PipelineRun. Повертає id запуску."""
+        start_date, end_date = resolve_window(name, today)
+        run_id = await asyncio.to_thread(_start_prewarm_run, name, start_date, end_date)
+
+        try:
+            stats = await self.runner(start_date, end_date) or {}
+            status, error = "success", None
+            logger.info(f"[SCHEDULER] '{name}' ({start_date} - {end_date}) прогріто: {stats}")
+        except Exception as e:
+            stats, status, error = {}, "error", str(e)
+            logger.error(f"[SCHEDULER] '{name}' ({start_date} - {end_date}) помилка: {e}")
+
+        await asyncio.to_thread(_finish_prewarm_run, run_id, status, stats, error)
+        return run_id
+
+
+def _start_prewarm_run(name: str, start_date: str, end_date: str) -> int:
+    with get_db() as db:
+        run = PipelineRun(
+            job_id=str(uuid.uuid4()),
+            start_date=start_date,
+            end_date=end_date,
+            storage_backend="prewarm",
+            status="running",
+        )
+        db.add(run)
+        db.commit()
+        db.refresh(run)
+        db.add(RunLog(run_id=run.id, message=f"Pre-warm вікна '{name}': {start_date} - {end_date}"))
+        db.commit()
+        return run.id
+
+
+def _finish_prewarm_run(run_id: int, status: str, stats: Dict[str, Any], error: Optional[str]):
+    with get_db() as db:
+        run = db.query(PipelineRun).filter(PipelineRun.id == run_id).first()
+        if run:
+            run.status = status
+            run.end_time = datetime.utcnow()
+            run.insights_count = stats.get("insights_count", 0)
+            run.students_count = stats.get("students_count", 0)
+            run.teachers_count = stats.get("teachers_count", 0)
+            run.error_message = error
+            db.add(RunLog(
+                run_id=run_id,
+                level="error" if error else "info",
+                message=f"ERROR: {error}" if error else "Pre-warm завершено успішно",
+            ))
+            db.commit()
+
+
+def create_prewarm_scheduler(runner: Callable[[str, str], Awaitable[Dict[str, Any]]]) -> PrewarmScheduler:
+    """Створює планувальник з налаштувань оточення (PREWARM_*)."""
+    return PrewarmScheduler(
+        windows=parse_windows(os.getenv("PREWARM_WINDOWS", DEFAULT_PREWARM_WINDOWS)),
+        runner=runner,
+        max_graph_usage=float(os.getenv("PREWARM_MAX_GRAPH_USAGE", "50")),
+    )
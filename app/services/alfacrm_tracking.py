@@ -8,6 +8,7 @@ AlfaCRM Lead Tracking Service
 Это исключает дублирование лидов в нескольких колонках статусов.
 Гарантирует что сума лидов по статусам = общее количество лидов.
 """
+import asyncio
 import os
 import logging
 from typing import List, Dict, Optional, Any
@@ -105,6 +106,15 @@ TRIAL_FUNNEL_HIERARCHY = {
     "Отримана оплата (ЦА)": 4,
 }
 
+# Cumulative counting: пізніші етапи, ліди яких зараховуються і в цей етап
+# (як у track_campaign_leads - оплата пропускає "Чекає оплату")
+TRIAL_FUNNEL_REACHED_BY = {
+    "Призначено пробне (ЦА)": ["Проведено пробне (ЦА)", "Чекає оплату", "Отримана оплата (ЦА)"],
+    "Проведено пробне (ЦА)": ["Чекає оплату", "Отримана оплата (ЦА)"],
+    "Чекає оплату": [],
+    "Отримана оплата (ЦА)": [],
+}
+
 
 def normalize_contact(contact: Optional[str]) -> Optional[str]:
     """
@@ -405,12 +415,13 @@ def track_campaign_leads(
     return status_counts
 
 
-def get_lead_phones_by_status(
+def get_lead_phone_indexes_by_status(
     campaign_leads: List[Dict[str, Any]],
     student_index: Dict[str, Dict[str, Any]]
-) -> Dict[str, List[str]]:
+) -> Dict[str, Any]:
     """
-    Получить массивы номеров телефонов лидов, сгруппированные по статусам.
+    Компактная форма get_lead_phones_by_status: одна таблица телефонов кампании,
+    списки статусов - индексы в этой таблице (cumulative статусы не копируют строки).
 
     Args:
         campaign_leads: Список лидов одной кампании из Meta API
@@ -418,18 +429,20 @@ def get_lead_phones_by_status(
 
     Returns:
         {
-            "leads_count": ["+380501234567", "+380631234567", ...],
-            "Не розібраний": ["+380509876543", ...],
-            "Встановлено контакт (ЦА)": ["+380661234567", ...],
-            ...
+            "phones": ["+380501234567", "+380631234567", ...],  # все лиды (= leads_count)
+            "statuses": {
+                "Не розібраний": [1, ...],
+                "Встановлено контакт (ЦА)": [0, ...],
+                ...
+            }
         }
     """
-    # Инициализируем массивы для каждого агрегированного статуса
-    status_phones = {status_name: [] for status_name in AGGREGATED_STATUSES}
+    # Инициализируем списки индексов для каждого агрегированного статуса
+    status_indexes = {status_name: [] for status_name in AGGREGATED_STATUSES}
     all_lead_phones = []
 
     # Для cumulative counting: сохраняем всех лидов по trial funnel уровням
-    trial_funnel_phones = {level: [] for level in TRIAL_FUNNEL_HIERARCHY.keys()}
+    trial_funnel_indexes = {level: [] for level in TRIAL_FUNNEL_HIERARCHY.keys()}
 
     for lead in campaign_leads:
         # Извлекаем контакты лида
@@ -444,24 +457,24 @@ def get_lead_phones_by_status(
 
         # Используем телефон из лида (не из студента)
         # Форматируем для вывода: +380501234567
-        display_phone = None
-        if phone:
-            # Добавляем + в начало если это 12-значный номер с 380
-            if phone.startswith('380') and len(phone) == 12:
-                display_phone = '+' + phone
-            else:
-                display_phone = phone
+        if not phone:
+            continue
+        # Добавляем + в начало если это 12-значный номер с 380
+        if phone.startswith('380') and len(phone) == 12:
+            display_phone = '+' + phone
+        else:
+            display_phone = phone
 
         # Добавляем в общий список всех лидов
-        if display_phone:
-            all_lead_phones.append(display_phone)
+        phone_index = len(all_lead_phones)
+        all_lead_phones.append(display_phone)
 
-        if student and display_phone:
+        if student:
             # ПРОВЕРКА НА АРХИВ: Сначала проверяем custom_ads_comp
             custom_ads_comp = student.get("custom_ads_comp", "")
             if custom_ads_comp == "архів":
                 # Архивные лиды добавляются в "Призначено пробне (ЦА)" для cumulative
-                trial_funnel_phones["Призначено пробне (ЦА)"].append(display_phone)
+                trial_funnel_indexes["Призначено пробне (ЦА)"].append(phone_index)
                 continue
 
             # Получаем текущий статус студента
@@ -475,47 +488,57 @@ def get_lead_phones_by_status(
                     # Проверяем - это trial funnel статус или нет
                     if aggregated_group in TRIAL_FUNNEL_HIERARCHY:
                         # Trial funnel: сохраняем для cumulative counting
-                        trial_funnel_phones[aggregated_group].append(display_phone)
+                        trial_funnel_indexes[aggregated_group].append(phone_index)
                         # ТАКОЖ додаємо в "В опрацюванні (ЦА)" (подвійна логіка)
-                        if "В опрацюванні (ЦА)" in status_phones:
-                            status_phones["В опрацюванні (ЦА)"].append(display_phone)
+                        if "В опрацюванні (ЦА)" in status_indexes:
+                            status_indexes["В опрацюванні (ЦА)"].append(phone_index)
                     else:
                         # Не trial funnel: simple counting (current-status-only)
-                        if aggregated_group in status_phones:
-                            status_phones[aggregated_group].append(display_phone)
+                        if aggregated_group in status_indexes:
+                            status_indexes[aggregated_group].append(phone_index)
 
     # CUMULATIVE COUNTING для trial funnel - аналогично track_campaign_leads
-    # Инициализация
-    status_phones["Призначено пробне (ЦА)"] = []
-    status_phones["Проведено пробне (ЦА)"] = []
-    status_phones["Чекає оплату"] = []
-    status_phones["Отримана оплата (ЦА)"] = []
+    prizn = trial_funnel_indexes["Призначено пробне (ЦА)"]
+    prov = trial_funnel_indexes["Проведено пробне (ЦА)"]
+    chek = trial_funnel_indexes["Чекає оплату"]
+    opl = trial_funnel_indexes["Отримана оплата (ЦА)"]
 
-    # Ліди в статусі "Призначено пробне (ЦА)"
-    prizn_phones = trial_funnel_phones["Призначено пробне (ЦА)"]
-    status_phones["Призначено пробне (ЦА)"].extend(prizn_phones)
+    # Кожен етап містить своїх лідів + лідів наступних етапів (+1 на попередні етапи)
+    status_indexes["Призначено пробне (ЦА)"] = prizn + prov + chek + opl
+    status_indexes["Проведено пробне (ЦА)"] = prov + chek + opl
+    status_indexes["Чекає оплату"] = list(chek)
+    # ПРОПУСКАЄМО "Чекає оплату" для оплачених!
+    status_indexes["Отримана оплата (ЦА)"] = list(opl)
 
-    # Ліди в статусі "Проведено пробне (ЦА)"
-    prov_phones = trial_funnel_phones["Проведено пробне (ЦА)"]
-    status_phones["Проведено пробне (ЦА)"].extend(prov_phones)
-    status_phones["Призначено пробне (ЦА)"].extend(prov_phones)  # +1 на попередній етап
+    return {"phones": all_lead_phones, "statuses": status_indexes}
 
-    # Ліди в статусі "Чекає оплату"
-    chek_phones = trial_funnel_phones["Чекає оплату"]
-    status_phones["Чекає оплату"].extend(chek_phones)
-    status_phones["Проведено пробне (ЦА)"].extend(chek_phones)  # +1 на попередній етап
-    status_phones["Призначено пробне (ЦА)"].extend(chek_phones)  # +1 на попередній етап
 
-    # Ліди в статусі "Отримана оплата (ЦА)"
-    opl_phones = trial_funnel_phones["Отримана оплата (ЦА)"]
-    status_phones["Отримана оплата (ЦА)"].extend(opl_phones)
-    # ПРОПУСКАЄМО "Чекає оплату"!
-    status_phones["Проведено пробне (ЦА)"].extend(opl_phones)  # +1 на попередній етап
-    status_phones["Призначено пробне (ЦА)"].extend(opl_phones)  # +1 на попередній етап
+def get_lead_phones_by_status(
+    campaign_leads: List[Dict[str, Any]],
+    student_index: Dict[str, Dict[str, Any]]
+) -> Dict[str, List[str]]:
+    """
+    Получить массивы номеров телефонов лидов, сгруппированные по статусам.
+
+    Args:
+        campaign_leads: Список лидов одной кампании из Meta API
+        student_index: Индекс студентов {normalized_contact: student}
+
+    Returns:
+        {
+            "leads_count": ["+380501234567", "+380631234567", ...],
+            "Не розібраний": ["+380509876543", ...],
+            "Встановлено контакт (ЦА)": ["+380661234567", ...],
+            ...
+        }
+    """
+    compact = get_lead_phone_indexes_by_status(campaign_leads, student_index)
+    phones = compact["phones"]
 
     # Добавляем все телефоны лидов в ключ "leads_count"
-    result = {"leads_count": all_lead_phones}
-    result.update(status_phones)
+    result = {"leads_count": list(phones)}
+    for status_name, indexes in compact["statuses"].items():
+        result[status_name] = [phones[i] for i in indexes]
 
     return result
 
@@ -556,40 +579,35 @@ def extract_contacts_from_campaigns(campaigns_data: Dict[str, Dict[str, Any]], d
     return contacts
 
 
-async def track_leads_by_campaigns(
+def _record_status_snapshots(students: List[Dict[str, Any]]) -> None:
+    """
+    Дописує зміни lead_status_id в status_snapshots.
+
+    Помилки БД не повинні ламати трекінг, тому лише логуються.
+    """
+    if os.getenv("STATUS_SNAPSHOTS_ENABLED", "true").lower() != "true" or not students:
+        return
+
+    try:
+        from app.services.status_snapshots import sync_alfacrm_students
+        sync_alfacrm_students(students)
+    except Exception as e:
+        logger.warning(f"Failed to record AlfaCRM status snapshots: {e}")
+
+
+def load_student_index(
     campaigns_data: Dict[str, Dict[str, Any]],
     page_size: int = 500
-) -> Dict[str, Dict[str, Any]]:
+) -> Optional[Dict[str, Dict[str, Any]]]:
     """
-    Обогатить данные кампаний статистикой по воронке из AlfaCRM.
+    Загрузить студентов AlfaCRM и построить индекс по контактам лидов кампаний.
 
-    ОПТИМИЗАЦИЯ: Загружает только тех студентов, которые есть в лидах кампаний за период.
-
-    Args:
-        campaigns_data: Данные от get_leads_for_period() из meta_leads.py
-            {
-                "campaign_123": {
-                    "campaign_id": "123",
-                    "campaign_name": "Student/...",
-                    "leads": [...]
-                }
-            }
-        page_size: Размер страницы для загрузки студентов
+    ОПТИМИЗАЦИЯ: в индексе остаются только студенты, контакты которых есть
+    в лидах кампаний за период.
 
     Returns:
-        {
-            "campaign_123": {
-                "campaign_id": "123",
-                "campaign_name": "Student/...",
-                "leads_count": 150,
-                "funnel_stats": {
-                    "Кількість лідів": 150,
-                    "Не розібрані": 20,
-                    "Встанов. контакт (ЦА)": 80,
-                    ...
-                }
-            }
-        }
+        {нормализованный контакт: студент} или None, если в лидах нет контактов
+        (сопоставлять нечего, AlfaCRM не загружается)
     """
     # ВРЕМЕННО: Включаем DEBUG режим для диагностики
     DEBUG_MODE = True
@@ -599,7 +617,7 @@ async def track_leads_by_campaigns(
 
     if not lead_contacts:
         logger.warning("No contacts found in Meta leads - skipping AlfaCRM loading")
-        return {}
+        return None
 
     # 2. Загрузить ВСЕХ студентов из AlfaCRM (требуется для сопоставления)
     # Примечание: AlfaCRM API не поддерживает фильтрацию по телефону/email
@@ -632,6 +650,9 @@ async def track_leads_by_campaigns(
 
     logger.info(f"Loaded {len(all_students)} students from AlfaCRM")
 
+    # Зберігаємо зміни статусів для реальної історії воронки
+    _record_status_snapshots(all_students)
+
     # 3. Построить индекс ТОЛЬКО для студентов с контактами из лидов
     student_index = build_student_index(all_students, debug=DEBUG_MODE)
 
@@ -650,17 +671,67 @@ async def track_leads_by_campaigns(
         logger.info(f"[DEBUG] Sample lead contacts: {sample_lead_contacts}")
         logger.info(f"[DEBUG] Sample index contacts: {sample_index_contacts}")
 
-    # 4. Обработать каждую кампанию
+    return filtered_index
+
+
+async def track_leads_by_campaigns(
+    campaigns_data: Dict[str, Dict[str, Any]],
+    page_size: int = 500,
+    daily: bool = False,
+    student_index: Optional[Dict[str, Dict[str, Any]]] = None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Обогатить данные кампаний статистикой по воронке из AlfaCRM.
+
+    ОПТИМИЗАЦИЯ: Загружает только тех студентов, которые есть в лидах кампаний за период.
+
+    Args:
+        campaigns_data: Данные от get_leads_for_period() из meta_leads.py
+            {
+                "campaign_123": {
+                    "campaign_id": "123",
+                    "campaign_name": "Student/...",
+                    "leads": [...]
+                }
+            }
+        page_size: Размер страницы для загрузки студентов
+        daily: Додатково порахувати воронку по днях створення ліда
+            (поле daily_funnel_stats: {"2025-10-01": {...}}) для campaign_daily_facts
+        student_index: Готовый индекс от load_student_index() (тот же индекс
+            нужен для извлечения телефонов лидов); None - загрузить из AlfaCRM
+
+    Returns:
+        {
+            "campaign_123": {
+                "campaign_id": "123",
+                "campaign_name": "Student/...",
+                "leads_count": 150,
+                "funnel_stats": {
+                    "Кількість лідів": 150,
+                    "Не розібрані": 20,
+                    "Встанов. контакт (ЦА)": 80,
+                    ...
+                }
+            }
+        }
+    """
+    if student_index is None:
+        # AlfaCRM API та запис снапшотів статусів - блокуючі, не в event loop
+        student_index = await asyncio.to_thread(load_student_index, campaigns_data, page_size)
+        if student_index is None:
+            return {}
+
+    # Обработать каждую кампанию
     enriched_campaigns = {}
 
     for campaign_id, campaign_data in campaigns_data.items():
         campaign_leads = campaign_data.get("leads", [])
 
         # Подсчитать статусы для этой кампании используя отфильтрованный индекс
-        funnel_stats = track_campaign_leads(campaign_leads, filtered_index)
+        funnel_stats = track_campaign_leads(campaign_leads, student_index)
 
-        # НОВОЕ 2025-10-24: Получить массивы телефонов вместо счетчиков
-        phone_arrays = get_lead_phones_by_status(campaign_leads, filtered_index)
+        # Телефоны по статусам: таблица телефонов + индексы (строки не дублируются)
+        phone_indexes = get_lead_phone_indexes_by_status(campaign_leads, student_index)
 
         enriched_campaigns[campaign_id] = {
             "campaign_id": campaign_data.get("campaign_id"),
@@ -669,9 +740,16 @@ async def track_leads_by_campaigns(
             "location": campaign_data.get("location"),  # ИСПРАВЛЕНО 2025-10-21: Добавлено поле location из Facebook
             "leads_count": len(campaign_leads),
             "funnel_stats": funnel_stats,
-            "phone_arrays": phone_arrays  # НОВОЕ 2025-10-24: Массивы телефонов по статусам
+            "phone_indexes": phone_indexes  # {"phones": [...], "statuses": {статус: [индексы]}}
         }
 
+        if daily:
+            from app.services.campaign_facts import group_leads_by_day
+            enriched_campaigns[campaign_id]["daily_funnel_stats"] = {
+                day: track_campaign_leads(day_leads, student_index)
+                for day, day_leads in group_leads_by_day(campaign_leads).items()
+            }
+
     logger.info(f"Enriched {len(enriched_campaigns)} campaigns with AlfaCRM funnel stats")
 
     return enriched_campaigns
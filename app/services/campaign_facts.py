@@ -0,0 +1,442 @@
+"""
+Campaign Daily Facts
+
+Денні факти по кампаніях (Meta Ads метрики + воронка CRM) та тижневі/місячні
+rollup таблиці.
+
+Pipeline записує:
+- campaign_daily_facts: spend, impressions, clicks, leads_fb по (campaign_id, day)
+- campaign_daily_funnel: кількість лідів по агрегованих статусах CRM
+  (поточний статус лідів, створених у цей день)
+- campaign_rollups / campaign_funnel_rollups: ті ж суми по тижнях та місяцях
+
+Звіт за довільний період - це SUM ... GROUP BY campaign_id: повні місяці
+беруться з місячних rollup, повні тижні - з тижневих, решта днів - з денних
+фактів. Зовнішні API при цьому не викликаються.
+"""
+import logging
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.models import CampaignDailyFact, CampaignDailyFunnel, CampaignRollup, CampaignFunnelRollup
+
+logger = logging.getLogger(__name__)
+
+
+GRAIN_WEEK = "week"
+GRAIN_MONTH = "month"
+
+AUDIENCE_STUDENTS = "students"
+AUDIENCE_TEACHERS = "teachers"
+
+
+# ============================================================================
+# ДОПОМІЖНІ ФУНКЦІЇ
+# ============================================================================
+
+
+def _to_date(value: Any) -> date:
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], "%Y-%m-%d").date()
+
+
+def _month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def _month_end(day: date) -> date:
+    next_month = (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return next_month - timedelta(days=1)
+
+
+def _week_start(day: date) -> date:
+    return day - timedelta(days=day.weekday())
+
+
+def _period_end(grain: str, period_start: date) -> date:
+    if grain == GRAIN_WEEK:
+        return period_start + timedelta(days=6)
+    return _month_end(period_start)
+
+
+def classify_audience(
+    campaign_name: Optional[str],
+    keywords_students: Iterable[str],
+    keywords_teachers: Iterable[str]
+) -> Optional[str]:
+    """Визначає аудиторію кампанії за ключовими словами (як у звіті)."""
+    name = (campaign_name or "").lower()
+    if any(kw.strip() and kw.strip() in name for kw in keywords_teachers):
+        return AUDIENCE_TEACHERS
+    if any(kw.strip() and kw.strip() in name for kw in keywords_students):
+        return AUDIENCE_STUDENTS
+    return None
+
+
+def group_leads_by_day(leads: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Групує ліди Meta за днем створення (created_time, YYYY-MM-DD).
+
+    Ліди без created_time пропускаються.
+    """
+    by_day: Dict[str, List[Dict[str, Any]]] = {}
+    for lead in leads:
+        day = (lead.get("created_time") or "")[:10]
+        if day:
+            by_day.setdefault(day, []).append(lead)
+    return by_day
+
+
+def split_range(start: date, end: date) -> Tuple[List[date], List[date], List[date]]:
+    """
+    Розбиває період [start, end] на повні місяці, повні тижні та окремі дні.
+
+    Returns:
+        (month_starts, week_starts, days) - періоди не перетинаються
+    """
+    months: List[date] = []
+    weeks: List[date] = []
+    days: List[date] = []
+
+    cursor = start
+    while cursor <= end:
+        if cursor.day == 1 and _month_end(cursor) <= end:
+            months.append(cursor)
+            cursor = _month_end(cursor) + timedelta(days=1)
+        elif cursor.weekday() == 0 and cursor + timedelta(days=6) <= end:
+            weeks.append(cursor)
+            cursor += timedelta(days=7)
+        else:
+            days.append(cursor)
+            cursor += timedelta(days=1)
+
+    return months, weeks, days
+
+
+# ============================================================================
+# ЗАПИС ФАКТІВ
+# ============================================================================
+
+
+def store_daily_metrics(
+    db: Session,
+    daily_insights: List[Dict[str, Any]],
+    start_date: str,
+    end_date: str,
+    keywords_students: Iterable[str] = (),
+    keywords_teachers: Iterable[str] = ()
+) -> int:
+    """
+    Замінює денні метрики кампаній за період.
+
+    Args:
+        db: SQLAlchemy session
+        daily_insights: Рядки fetch_insights(..., time_increment=1)
+        start_date: Початок періоду (YYYY-MM-DD)
+        end_date: Кінець періоду (YYYY-MM-DD, включно)
+        keywords_students: Ключові слова кампаній студентів
+        keywords_teachers: Ключові слова кампаній вчителів
+
+    Returns:
+        Кількість записаних рядків
+    """
+    start, end = _to_date(start_date), _to_date(end_date)
+    keywords_students = list(keywords_students)
+    keywords_teachers = list(keywords_teachers)
+
+    rows: Dict[Tuple[str, date], Dict[str, Any]] = {}
+    for insight in daily_insights:
+        campaign_id = insight.get("campaign_id")
+        if not campaign_id or not insight.get("date_start"):
+            continue
+        day = _to_date(insight["date_start"])
+        if day < start or day > end:
+            continue
+
+        leads_fb = 0
+        for action in insight.get("actions") or []:
+            if action.get("action_type") == "lead":
+                leads_fb = int(action.get("value", 0))
+                break
+
+        # Рядки рівня ad/adset теж підтримуються - сумуємо до кампанії
+        row = rows.setdefault((campaign_id, day), {
+            "campaign_id": campaign_id,
+            "day": day,
+            "campaign_name": insight.get("campaign_name"),
+            "audience": classify_audience(insight.get("campaign_name"), keywords_students, keywords_teachers),
+            "spend": 0.0,
+            "impressions": 0,
+            "clicks": 0,
+            "leads_fb": 0,
+        })
+        row["spend"] += float(insight.get("spend") or 0)
+        row["impressions"] += int(insight.get("impressions") or 0)
+        row["clicks"] += int(insight.get("clicks") or 0)
+        row["leads_fb"] += leads_fb
+
+    # Період завантажено з Graph API повністю - відсутній рядок означає нуль
+    db.query(CampaignDailyFact).filter(
+        CampaignDailyFact.day >= start, CampaignDailyFact.day <= end
+    ).delete(synchronize_session=False)
+    if rows:
+        db.bulk_insert_mappings(CampaignDailyFact, list(rows.values()))
+    db.commit()
+
+    logger.info(f"[FACTS] Записано {len(rows)} денних фактів кампаній за {start_date} - {end_date}")
+    return len(rows)
+
+
+def store_daily_funnel(
+    db: Session,
+    enriched_campaigns: Dict[str, Dict[str, Any]],
+    start_date: str,
+    end_date: str
+) -> int:
+    """
+    Замінює денну воронку CRM для кампаній з daily_funnel_stats.
+
+    Args:
+        db: SQLAlchemy session
+        enriched_campaigns: Результат track_leads_by_campaigns(..., daily=True)
+        start_date: Початок періоду (YYYY-MM-DD)
+        end_date: Кінець періоду (YYYY-MM-DD, включно)
+
+    Returns:
+        Кількість записаних рядків
+    """
+    start, end = _to_date(start_date), _to_date(end_date)
+
+    rows = []
+    campaign_ids = set()
+    for campaign_key, campaign in enriched_campaigns.items():
+        daily_stats = campaign.get("daily_funnel_stats")
+        if daily_stats is None:
+            continue
+        campaign_id = str(campaign.get("campaign_id") or campaign_key)
+        campaign_ids.add(campaign_id)
+        for day_str, status_counts in daily_stats.items():
+            day = _to_date(day_str)
+            if day < start or day > end:
+                continue
+            for status, count in status_counts.items():
+                if count:
+                    rows.append({"campaign_id": campaign_id, "day": day, "status": status, "leads": int(count)})
+
+    if not campaign_ids:
+        return 0
+
+    db.query(CampaignDailyFunnel).filter(
+        CampaignDailyFunnel.campaign_id.in_(campaign_ids),
+        CampaignDailyFunnel.day >= start,
+        CampaignDailyFunnel.day <= end,
+    ).delete(synchronize_session=False)
+    if rows:
+        db.bulk_insert_mappings(CampaignDailyFunnel, rows)
+    db.commit()
+
+    logger.info(f"[FACTS] Записано {len(rows)} рядків денної воронки для {len(campaign_ids)} кампаній")
+    return len(rows)
+
+
+def rebuild_rollups(db: Session, start_date: str, end_date: str) -> int:
+    """
+    Перераховує тижневі та місячні rollup, що перетинаються з періодом.
+
+    Returns:
+        Кількість перерахованих періодів
+    """
+    start, end = _to_date(start_date), _to_date(end_date)
+
+    periods: List[Tuple[str, date]] = []
+    week = _week_start(start)
+    while week <= end:
+        periods.append((GRAIN_WEEK, week))
+        week += timedelta(days=7)
+    month = _month_start(start)
+    while month <= end:
+        periods.append((GRAIN_MONTH, month))
+        month = _month_end(month) + timedelta(days=1)
+
+    for grain, period_start in periods:
+        period_end = _period_end(grain, period_start)
+
+        db.query(CampaignRollup).filter(
+            CampaignRollup.grain == grain, CampaignRollup.period_start == period_start
+        ).delete(synchronize_session=False)
+        db.query(CampaignFunnelRollup).filter(
+            CampaignFunnelRollup.grain == grain, CampaignFunnelRollup.period_start == period_start
+        ).delete(synchronize_session=False)
+
+        metrics = (
+            db.query(
+                CampaignDailyFact.campaign_id,
+                func.max(CampaignDailyFact.campaign_name),
+                func.max(CampaignDailyFact.audience),
+                func.sum(CampaignDailyFact.spend),
+                func.sum(CampaignDailyFact.impressions),
+                func.sum(CampaignDailyFact.clicks),
+                func.sum(CampaignDailyFact.leads_fb),
+            )
+            .filter(CampaignDailyFact.day >= period_start, CampaignDailyFact.day <= period_end)
+            .group_by(CampaignDailyFact.campaign_id)
+            .all()
+        )
+        db.bulk_insert_mappings(CampaignRollup, [
+            {
+                "grain": grain, "period_start": period_start, "campaign_id": campaign_id,
+                "campaign_name": name, "audience": audience, "spend": spend or 0.0,
+                "impressions": impressions or 0, "clicks": clicks or 0, "leads_fb": leads_fb or 0,
+            }
+            for campaign_id, name, audience, spend, impressions, clicks, leads_fb in metrics
+        ])
+
+        funnel = (
+            db.query(CampaignDailyFunnel.campaign_id, CampaignDailyFunnel.status, func.sum(CampaignDailyFunnel.leads))
+            .filter(CampaignDailyFunnel.day >= period_start, CampaignDailyFunnel.day <= period_end)
+            .group_by(CampaignDailyFunnel.campaign_id, CampaignDailyFunnel.status)
+            .all()
+        )
+        db.bulk_insert_mappings(CampaignFunnelRollup, [
+            {"grain": grain, "period_start": period_start, "campaign_id": campaign_id, "status": status, "leads": leads}
+            for campaign_id, status, leads in funnel
+        ])
+
+    db.commit()
+    logger.info(f"[FACTS] Перераховано {len(periods)} rollup періодів для {start_date} - {end_date}")
+    return len(periods)
+
+
+# ============================================================================
+# ЗАПИТИ ЗА ПЕРІОД
+# ============================================================================
+
+
+def _sum_metrics(db: Session, model, period_filter) -> List[Tuple]:
+    return (
+        db.query(
+            model.campaign_id,
+            func.max(model.campaign_name),
+            func.max(model.audience),
+            func.sum(model.spend),
+            func.sum(model.impressions),
+            func.sum(model.clicks),
+            func.sum(model.leads_fb),
+        )
+        .filter(period_filter)
+        .group_by(model.campaign_id)
+        .all()
+    )
+
+
+def _sum_funnel(db: Session, model, period_filter) -> List[Tuple]:
+    return (
+        db.query(model.campaign_id, model.status, func.sum(model.leads))
+        .filter(period_filter)
+        .group_by(model.campaign_id, model.status)
+        .all()
+    )
+
+
+def query_campaign_totals(
+    db: Session,
+    start_date: str,
+    end_date: str,
+    audience: Optional[str] = None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Підсумки по кампаніях за період з денних фактів та rollup таблиць.
+
+    Args:
+        db: SQLAlchemy session
+        start_date: Початок періоду (YYYY-MM-DD)
+        end_date: Кінець періоду (YYYY-MM-DD, включно)
+        audience: Опційно - 'students' або 'teachers'
+
+    Returns:
+        {
+            "123": {
+                "campaign_id": "123",
+                "campaign_name": "Student/...",
+                "audience": "students",
+                "spend": 120.5, "impressions": 10000, "clicks": 300, "leads_fb": 25,
+                "funnel": {"Призначено пробне (ЦА)": 4, ...}
+            }
+        }
+    """
+    months, weeks, days = split_range(_to_date(start_date), _to_date(end_date))
+
+    metric_sources = []
+    funnel_sources = []
+    if months:
+        metric_sources.append((CampaignRollup, (CampaignRollup.grain == GRAIN_MONTH) & CampaignRollup.period_start.in_(months)))
+        funnel_sources.append((CampaignFunnelRollup, (CampaignFunnelRollup.grain == GRAIN_MONTH) & CampaignFunnelRollup.period_start.in_(months)))
+    if weeks:
+        metric_sources.append((CampaignRollup, (CampaignRollup.grain == GRAIN_WEEK) & CampaignRollup.period_start.in_(weeks)))
+        funnel_sources.append((CampaignFunnelRollup, (CampaignFunnelRollup.grain == GRAIN_WEEK) & CampaignFunnelRollup.period_start.in_(weeks)))
+    if days:
+        metric_sources.append((CampaignDailyFact, CampaignDailyFact.day.in_(days)))
+        funnel_sources.append((CampaignDailyFunnel, CampaignDailyFunnel.day.in_(days)))
+
+    totals: Dict[str, Dict[str, Any]] = {}
+    for model, period_filter in metric_sources:
+        for campaign_id, name, campaign_audience, spend, impressions, clicks, leads_fb in _sum_metrics(db, model, period_filter):
+            entry = totals.setdefault(campaign_id, {
+                "campaign_id": campaign_id,
+                "campaign_name": name,
+                "audience": campaign_audience,
+                "spend": 0.0,
+                "impressions": 0,
+                "clicks": 0,
+                "leads_fb": 0,
+                "funnel": {},
+            })
+            entry["campaign_name"] = entry["campaign_name"] or name
+            entry["audience"] = entry["audience"] or campaign_audience
+            entry["spend"] += spend or 0.0
+            entry["impressions"] += impressions or 0
+            entry["clicks"] += clicks or 0
+            entry["leads_fb"] += leads_fb or 0
+
+    for model, period_filter in funnel_sources:
+        for campaign_id, status, leads in _sum_funnel(db, model, period_filter):
+            entry = totals.setdefault(campaign_id, {
+                "campaign_id": campaign_id,
+                "campaign_name": None,
+                "audience": None,
+                "spend": 0.0,
+                "impressions": 0,
+                "clicks": 0,
+                "leads_fb": 0,
+                "funnel": {},
+            })
+            entry["funnel"][status] = entry["funnel"].get(status, 0) + (leads or 0)
+
+    for entry in totals.values():
+        entry["spend"] = round(entry["spend"], 2)
+
+    # Кампанії лише з воронкою за період: аудиторія та назва з фактів поза періодом
+    unresolved = [cid for cid, entry in totals.items() if entry["audience"] is None]
+    if unresolved:
+        known = (
+            db.query(
+                CampaignDailyFact.campaign_id,
+                func.max(CampaignDailyFact.campaign_name),
+                func.max(CampaignDailyFact.audience),
+            )
+            .filter(CampaignDailyFact.campaign_id.in_(unresolved))
+            .group_by(CampaignDailyFact.campaign_id)
+            .all()
+        )
+        for campaign_id, name, campaign_audience in known:
+            totals[campaign_id]["campaign_name"] = totals[campaign_id]["campaign_name"] or name
+            totals[campaign_id]["audience"] = campaign_audience
+
+    if audience:
+        totals = {cid: entry for cid, entry in totals.items() if entry["audience"] == audience}
+
+    return totals
@@ -9,11 +9,15 @@ from typing import List, Dict, Optional
 from datetime import datetime
 import httpx
 
+from app.connectors.meta import graph_governor
+from app.metrics import instrument_upstream
+
 logger = logging.getLogger(__name__)
 
-META_API_BASE = "https://graph.facebook.com/v21.0"
+META_API_BASE = os.getenv("META_API_BASE", "https://graph.facebook.com/v21.0").rstrip("/")
 
 
+@instrument_upstream("meta_leadgen_forms")
 async def get_leadgen_forms(page_id: str, page_token: str) -> List[Dict]:
     """
     Получить все лид-формы страницы.
@@ -33,6 +37,7 @@ async def get_leadgen_forms(page_id: str, page_token: str) -> List[Dict]:
 
     async with httpx.AsyncClient(timeout=30.0) as client:
         response = await client.get(url, params=params)
+        graph_governor.record(response.headers)
 
         if response.status_code != 200:
             error_data = response.json() if response.text else {}
@@ -47,6 +52,7 @@ async def get_leadgen_forms(page_id: str, page_token: str) -> List[Dict]:
     return forms
 
 
+@instrument_upstream("meta_leadgen")
 async def get_form_leads(
     form_id: str,
     page_token: str,
@@ -76,6 +82,7 @@ async def get_form_leads(
 
     async with httpx.AsyncClient(timeout=60.0) as client:
         response = await client.get(url, params=params)
+        graph_governor.record(response.headers)
         response.raise_for_status()
         data = response.json()
 
@@ -234,6 +241,7 @@ async def get_leads_for_period(
     return campaigns_dict
 
 
+@instrument_upstream("meta_insights")
 async def get_campaign_statistics(
     campaign_id: str,
     user_token: str,
@@ -267,6 +275,7 @@ async def get_campaign_statistics(
 
     async with httpx.AsyncClient(timeout=30.0) as client:
         response = await client.get(url, params=params)
+        graph_governor.record(response.headers)
         response.raise_for_status()
         data = response.json()
 
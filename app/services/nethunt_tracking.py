@@ -12,7 +12,9 @@ Inference підхід (БЕЗ історії змін):
 3. Індексація вчителів за нормалізованими контактами
 4. Обогащення кампаній з Meta Ads статистикою воронки
 """
+import asyncio
 import logging
+import os
 from typing import Dict, List, Optional, Any, Set
 from collections import defaultdict
 
@@ -113,6 +115,29 @@ def normalize_contact(contact: Optional[str]) -> Optional[str]:
 # ============================================================================
 
 
+def normalize_status(status: Optional[str]) -> str:
+    """Ключ статусу NetHunt: "Interview Target" → "interview_target"."""
+    return (status or "").lower().replace(" ", "_").replace("-", "_")
+
+
+def map_nethunt_status_to_column(status: Optional[str]) -> str:
+    """Назва колонки таблиці для статусу NetHunt (невідомі статуси - "Не розібрані ліди")."""
+    return NETHUNT_STATUS_MAPPING.get(normalize_status(status), "Не розібрані ліди")
+
+
+def extract_status_from_record(teacher: Dict[str, Any]) -> str:
+    """Поточний статус вчителя з індексу build_teacher_index."""
+    return teacher.get("status", "")
+
+
+def extract_lead_contacts(lead: Dict[str, Any]) -> tuple[Optional[str], Optional[str]]:
+    """Нормалізовані (телефон, email) ліда Meta Ads."""
+    return (
+        normalize_contact(lead.get("phone") or lead.get("full_phone_number")),
+        normalize_contact(lead.get("email")),
+    )
+
+
 def build_teacher_index(
     records: List[Dict[str, Any]]
 ) -> Dict[str, Dict[str, Any]]:
@@ -152,8 +177,8 @@ def build_teacher_index(
             continue
 
         # Отримуємо статус з NetHunt
-        status_key = record.get("status", "").lower().replace(" ", "_").replace("-", "_")
-        status_column = NETHUNT_STATUS_MAPPING.get(status_key, "Не розібрані ліди")
+        status_key = normalize_status(record.get("status"))
+        status_column = map_nethunt_status_to_column(status_key)
 
         teacher_data = {
             "id": record_id,
@@ -267,23 +292,18 @@ def track_campaign_leads(
 
     for lead in campaign_leads:
         # Витягуємо контакти ліда
-        phone = lead.get("phone") or lead.get("full_phone_number")
-        email = lead.get("email")
+        phone, email = extract_lead_contacts(lead)
 
         # Шукаємо вчителя в індексі
         teacher = None
 
-        if phone:
-            normalized_phone = normalize_contact(phone)
-            if normalized_phone and normalized_phone in teacher_index:
-                teacher = teacher_index[normalized_phone]
-                logger.debug(f"Знайдено вчителя по телефону: {normalized_phone}")
+        if phone and phone in teacher_index:
+            teacher = teacher_index[phone]
+            logger.debug(f"Знайдено вчителя по телефону: {phone}")
 
-        if not teacher and email:
-            normalized_email = normalize_contact(email)
-            if normalized_email and normalized_email in teacher_index:
-                teacher = teacher_index[normalized_email]
-                logger.debug(f"Знайдено вчителя по email: {normalized_email}")
+        if not teacher and email and email in teacher_index:
+            teacher = teacher_index[email]
+            logger.debug(f"Знайдено вчителя по email: {email}")
 
         # Якщо знайшли вчителя - рахуємо його статус
         if teacher:
@@ -306,48 +326,40 @@ def track_campaign_leads(
     return result
 
 
-async def track_leads_by_campaigns(
+def _record_status_snapshots(records: List[Dict[str, Any]]) -> None:
+    """
+    Дописує зміни статусів записів NetHunt в status_snapshots.
+
+    Помилки БД не повинні ламати трекінг, тому лише логуються.
+    """
+    if os.getenv("STATUS_SNAPSHOTS_ENABLED", "true").lower() != "true":
+        return
+
+    try:
+        from app.services.status_snapshots import sync_nethunt_records
+        sync_nethunt_records(records)
+    except Exception as e:
+        logger.warning(f"Не вдалося зберегти снапшоти статусів NetHunt: {e}")
+
+
+def load_teacher_index(
     campaigns_data: Dict[str, Dict[str, Any]],
     folder_id: Optional[str] = None
 ) -> Dict[str, Dict[str, Any]]:
     """
-    Обогащує дані кампаній Meta Ads статистикою воронки вчителів з NetHunt CRM.
-
-    Inference підхід (БЕЗ історії змін):
-    - Завантажує поточні записи з NetHunt
-    - Рахує ліди в поточному статусі
-    - Зіставляє з лідами Meta Ads за контактами
-
-    Args:
-        campaigns_data: Дані кампаній з Meta Ads
-        folder_id: ID папки NetHunt (за замовчуванням з env)
+    Завантажує записи вчителів з NetHunt і будує індекс за контактами лідів кампаній.
 
     Returns:
-        Збагачені дані кампаній з додатковими полями:
-        {
-            "campaign_id": {
-                ...оригінальні дані...,
-                "funnel_stats": {
-                    "Не розібрані ліди": 3,
-                    "Контакт (ЦА)": 5,
-                    "Співбесіда (ЦА)": 2,
-                    "Вчитель ЦА": 1,
-                    ...
-                },
-                "total_matched_leads": 10,
-                "match_rate": 0.67  # 10/15 лідів знайдено в NetHunt
-            }
-        }
+        {нормалізований контакт: запис NetHunt} лише для контактів з Meta Ads
+        лідів; {} - якщо контактів немає, NetHunt недоступний або збігів немає
     """
-    logger.info(f"Початок обогащення {len(campaigns_data)} кампаній даними з NetHunt")
-
     # 1. Витягуємо всі унікальні контакти з лідів кампаній
     lead_contacts = extract_contacts_from_campaigns(campaigns_data)
     logger.info(f"Витягнуто {len(lead_contacts)} унікальних контактів з Meta Ads лідів")
 
     if not lead_contacts:
         logger.warning("Немає контактів для зіставлення з NetHunt")
-        return campaigns_data
+        return {}
 
     # 2. Завантажуємо всі записи вчителів з NetHunt (поточний стан)
     try:
@@ -355,11 +367,14 @@ async def track_leads_by_campaigns(
         logger.info(f"Завантажено {len(all_records)} записів з NetHunt")
     except Exception as e:
         logger.error(f"Помилка завантаження записів з NetHunt: {e}")
-        return campaigns_data
+        return {}
 
     if not all_records:
         logger.warning("NetHunt не повернув записів вчителів")
-        return campaigns_data
+        return {}
+
+    # Зберігаємо зміни статусів для реальної історії воронки
+    _record_status_snapshots(all_records)
 
     # 3. Будуємо індекс вчителів за нормалізованими контактами
     teacher_index = build_teacher_index(all_records)
@@ -375,8 +390,55 @@ async def track_leads_by_campaigns(
         f"Відфільтровано індекс: {len(filtered_index)}/{len(teacher_index)} вчителів "
         f"знайдено в Meta Ads лідах"
     )
+    return filtered_index
+
+
+async def track_leads_by_campaigns(
+    campaigns_data: Dict[str, Dict[str, Any]],
+    folder_id: Optional[str] = None,
+    daily: bool = False,
+    teacher_index: Optional[Dict[str, Dict[str, Any]]] = None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Обогащує дані кампаній Meta Ads статистикою воронки вчителів з NetHunt CRM.
+
+    Inference підхід (БЕЗ історії змін):
+    - Завантажує поточні записи з NetHunt
+    - Рахує ліди в поточному статусі
+    - Зіставляє з лідами Meta Ads за контактами
+
+    Args:
+        campaigns_data: Дані кампаній з Meta Ads
+        folder_id: ID папки NetHunt (за замовчуванням з env)
+        daily: Додатково порахувати воронку по днях створення ліда
+            (поле daily_funnel_stats) для campaign_daily_facts
+        teacher_index: Готовий індекс від load_teacher_index() (той самий індекс
+            потрібен для витягування телефонів лідів); None - завантажити з NetHunt
 
-    if not filtered_index:
+    Returns:
+        Збагачені дані кампаній з додатковими полями:
+        {
+            "campaign_id": {
+                ...оригінальні дані...,
+                "funnel_stats": {
+                    "Не розібрані ліди": 3,
+                    "Контакт (ЦА)": 5,
+                    "Співбесіда (ЦА)": 2,
+                    "Вчитель ЦА": 1,
+                    ...
+                },
+                "total_matched_leads": 10,
+                "match_rate": 0.67  # 10/15 лідів знайдено в NetHunt
+            }
+        }
+    """
+    logger.info(f"Початок обогащення {len(campaigns_data)} кампаній даними з NetHunt")
+
+    if teacher_index is None:
+        # NetHunt API та запис снапшотів статусів - блокуючі, не в event loop
+        teacher_index = await asyncio.to_thread(load_teacher_index, campaigns_data, folder_id)
+
+    if not teacher_index:
         logger.warning("Жоден вчитель з NetHunt не знайдений серед Meta Ads лідів")
         return campaigns_data
 
@@ -398,7 +460,7 @@ async def track_leads_by_campaigns(
         # Відстежуємо ліди кампанії в NetHunt
         funnel_stats = track_campaign_leads(
             campaign_leads,
-            filtered_index,
+            teacher_index,
             all_status_columns
         )
 
@@ -411,6 +473,13 @@ async def track_leads_by_campaigns(
             if funnel_stats["total_leads"] > 0 else 0.0
         )
 
+        if daily:
+            from app.services.campaign_facts import group_leads_by_day
+            enriched_campaign["daily_funnel_stats"] = {
+                day: track_campaign_leads(day_leads, teacher_index, all_status_columns)["status_counts"]
+                for day, day_leads in group_leads_by_day(campaign_leads).items()
+            }
+
         enriched_campaigns[campaign_id] = enriched_campaign
 
         logger.info(
@@ -0,0 +1,170 @@
+"""
+Версії формату телефонів лідів у звіті /api/meta-data.
+
+payload_version=1 (за замовчуванням, застаріла) - повні рядки телефонів у кожному статусі:
+
+    students[i]:  {"leads_count": ["+380...", ...], "Чекає оплату": ["+380...", ...], ...}
+    lead_phones:  {"students": {"campaign_1": {"Нові": [{"phone": "+380...", "status": "current"}]}}}
+
+payload_version=2 - словникове кодування: одна таблиця телефонів на кампанію,
+статуси - індекси в ній, passed/current - бітова маска (base64, біт i = idx[i],
+молодший біт першим; 1 = current):
+
+    students[i]:  {"phones": ["+380...", ...], "leads_count": 42, "Чекає оплату": [0, 7], ...}
+    lead_phones:  {"students": {"campaign_1": {"phones": [...],
+                                               "statuses": {"Нові": {"idx": [0, 3], "current": "Aw=="}}}}}
+
+payload_version=3 - лише кількості: колонки статусів та leads_count - числа,
+без таблиць телефонів і lead_phones; телефони кампанії віддає
+/api/campaigns/{campaign_id}/leads на запит.
+
+build_meta_report будує та кешує версію 2; expand_report повертає версію 1
+для клієнтів, які її не запросили, counts_report - версію 3.
+
+Версія 1 застаріла. Веб-інтерфейс запитує 3 (таблиці) і 2 (Excel, сервер
+розгортає телефони в /api/export-meta-excel), відповіді версії 1 мають заголовок
+"Deprecation: true". Коли зовнішні клієнти перейдуть на явну payload_version,
+за замовчуванням стане 3, а expand_report лишиться лише для Excel.
+"""
+import base64
+from typing import Any, Dict, Iterable, List, Sequence
+
+PAYLOAD_VERSION_FULL = 1
+PAYLOAD_VERSION_COMPACT = 2
+PAYLOAD_VERSION_COUNTS = 3
+SUPPORTED_PAYLOAD_VERSIONS = (PAYLOAD_VERSION_FULL, PAYLOAD_VERSION_COMPACT, PAYLOAD_VERSION_COUNTS)
+
+# Колонки рядка студентів, що містять телефони лідів (I-R)
+STUDENT_PHONE_COLUMNS = (
+    "Не розібраний",
+    "Недозвон (не ЦА)",
+    "Встановлено контакт (ЦА)",
+    "В опрацюванні (ЦА)",
+    "Призначено пробне (ЦА)",
+    "Проведено пробне (ЦА)",
+    "Чекає оплату",
+    "Отримана оплата (ЦА)",
+    "Архів (ЦА)",
+    "Архів (не ЦА)",
+)
+
+
+def encode_bitmap(flags: Sequence[bool]) -> str:
+    """Список прапорців → base64 бітова маска (молодший біт першим)."""
+    data = bytearray((len(flags) + 7) // 8)
+    for position, flag in enumerate(flags):
+        if flag:
+            data[position >> 3] |= 1 << (position & 7)
+    return base64.b64encode(bytes(data)).decode("ascii")
+
+
+def decode_bitmap(bitmap: str, count: int) -> List[bool]:
+    data = base64.b64decode(bitmap)
+    return [bool(data[position >> 3] >> (position & 7) & 1) for position in range(count)]
+
+
+class StatusPhoneBuilder:
+    """
+    Накопичує телефони кампанії за статусами у версії 2: кожен телефон
+    потрапляє в таблицю один раз, незалежно від кількості статусів.
+    """
+
+    def __init__(self):
+        self.phones: List[str] = []
+        self._positions: Dict[str, int] = {}
+        self._statuses: Dict[str, List[int]] = {}
+        self._current: Dict[str, List[bool]] = {}
+
+    def add(self, status_name: str, phone: str, is_current: bool):
+        position = self._positions.get(phone)
+        if position is None:
+            position = self._positions[phone] = len(self.phones)
+            self.phones.append(phone)
+        if status_name not in self._statuses:
+            self._statuses[status_name] = []
+            self._current[status_name] = []
+        self._statuses[status_name].append(position)
+        self._current[status_name].append(is_current)
+
+    def build(self) -> Dict[str, Any]:
+        return {
+            "phones": self.phones,
+            "statuses": {
+                status_name: {"idx": indexes, "current": encode_bitmap(self._current[status_name])}
+                for status_name, indexes in self._statuses.items()
+            },
+        }
+
+
+def _lookup(phones: Sequence[str], indexes: Iterable[int]) -> List[str]:
+    return [phones[i] for i in indexes]
+
+
+def expand_student_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Рядок студентів версії 2 → версія 1 (індекси → рядки телефонів)."""
+    if "phones" not in row:
+        return row
+    expanded = {key: value for key, value in row.items() if key != "phones"}
+    phones = row["phones"]
+    expanded["leads_count"] = list(phones)
+    for column in STUDENT_PHONE_COLUMNS:
+        if column in expanded:
+            expanded[column] = _lookup(phones, expanded[column])
+    return expanded
+
+
+def student_row_phones(row: Dict[str, Any]) -> Dict[str, List[str]]:
+    """Телефони по колонках статусів рядка студентів (версія 1 або 2)."""
+    phones = row.get("phones")
+    result = {}
+    for column in STUDENT_PHONE_COLUMNS:
+        value = row.get(column)
+        if isinstance(value, list):
+            result[column] = _lookup(phones, value) if phones is not None else list(value)
+    return result
+
+
+def count_student_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Рядок студентів → версія 3 (кількості замість телефонів)."""
+    counted = {key: value for key, value in row.items() if key != "phones"}
+    for column in ("leads_count", *STUDENT_PHONE_COLUMNS):
+        if isinstance(counted.get(column), list):
+            counted[column] = len(counted[column])
+    return counted
+
+
+def expand_campaign_phones(compact: Dict[str, Any]) -> Dict[str, List[Dict[str, str]]]:
+    """lead_phones кампанії версії 2 → {статус: [{"phone", "status"}]} версії 1."""
+    phones = compact["phones"]
+    result = {}
+    for status_name, entry in compact["statuses"].items():
+        indexes = entry["idx"]
+        current = decode_bitmap(entry["current"], len(indexes))
+        result[status_name] = [
+            {"phone": phones[i], "status": "current" if is_current else "passed"}
+            for i, is_current in zip(indexes, current)
+        ]
+    return result
+
+
+def expand_report(report: Dict[str, Any]) -> Dict[str, Any]:
+    """Звіт версії 2 (з кешу) → версія 1. Вхідний звіт не змінюється."""
+    if report.get("payload_version") != PAYLOAD_VERSION_COMPACT:
+        return report
+    expanded = dict(report)
+    expanded["payload_version"] = PAYLOAD_VERSION_FULL
+    expanded["students"] = [expand_student_row(row) for row in report.get("students", [])]
+    lead_phones = report.get("lead_phones") or {}
+    expanded["lead_phones"] = {
+        tab: {campaign_id: expand_campaign_phones(compact) for campaign_id, compact in campaigns.items()}
+        for tab, campaigns in lead_phones.items()
+    }
+    return expanded
+
+
+def counts_report(report: Dict[str, Any]) -> Dict[str, Any]:
+    """Звіт (версія 1 або 2) → версія 3 без телефонів. Вхідний звіт не змінюється."""
+    counted = {key: value for key, value in report.items() if key != "lead_phones"}
+    counted["payload_version"] = PAYLOAD_VERSION_COUNTS
+    counted["students"] = [count_student_row(row) for row in report.get("students", [])]
+    return counted
@@ -0,0 +1,347 @@
+"""
+Status Snapshot Store
+
+Інкрементальне зберігання змін статусів записів NetHunt та AlfaCRM.
+
+Кожна синхронізація передає поточні статуси записів, а в таблицю
+status_snapshots дописуються ТІЛЬКИ ті записи, статус яких змінився
+з моменту попереднього спостереження. Так накопичується реальна історія
+переходів по воронці замість лінійного шляху з lead_journey_recovery.
+
+Запити "чи досяг запис етапу X протягом періоду" виконуються
+індексованими range scan'ами по (source, status, observed_at) - одним
+запитом для всіх статусів воронки, а не окремо для кожного етапу.
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import and_, exists, func
+from sqlalchemy.orm import aliased
+from sqlalchemy.orm import Session
+
+from app.models import StatusSnapshot
+
+logger = logging.getLogger(__name__)
+
+
+SOURCE_ALFACRM = "alfacrm"
+SOURCE_NETHUNT = "nethunt"
+
+
+# ============================================================================
+# ЗАПИС ЗМІН СТАТУСІВ
+# ============================================================================
+
+
+def get_latest_statuses(db: Session, source: str) -> Dict[str, str]:
+    """
+    Отримує останній відомий статус кожного запису джерела.
+
+    Args:
+        db: SQLAlchemy session
+        source: 'alfacrm' або 'nethunt'
+
+    Returns:
+        Словник {record_id: status}
+    """
+    latest_ids = (
+        db.query(func.max(StatusSnapshot.id).label("id"))
+        .filter(StatusSnapshot.source == source)
+        .group_by(StatusSnapshot.record_id)
+        .subquery()
+    )
+    rows = (
+        db.query(StatusSnapshot.record_id, StatusSnapshot.status)
+        .join(latest_ids, StatusSnapshot.id == latest_ids.c.id)
+        .all()
+    )
+    return {record_id: status for record_id, status in rows}
+
+
+def record_status_changes(
+    db: Session,
+    source: str,
+    records: Iterable[Tuple[Any, Any]],
+    observed_at: Optional[datetime] = None
+) -> int:
+    """
+    Дописує снапшоти для записів, статус яких змінився.
+
+    Args:
+        db: SQLAlchemy session
+        source: 'alfacrm' або 'nethunt'
+        records: Пари (record_id, status) з поточної синхронізації
+        observed_at: Час спостереження (за замовчуванням зараз, UTC)
+
+    Returns:
+        Кількість доданих рядків
+    """
+    observed_at = observed_at or datetime.utcnow()
+    latest = get_latest_statuses(db, source)
+
+    new_rows = []
+    seen: Set[str] = set()
+    for record_id, status in records:
+        if record_id is None or status is None or status == "":
+            continue
+        record_id = str(record_id)
+        status = str(status)
+        # Один запис може зустрічатися кілька разів (індекс по телефону і email)
+        if record_id in seen:
+            continue
+        seen.add(record_id)
+
+        if latest.get(record_id) == status:
+            continue
+
+        new_rows.append({
+            "source": source,
+            "record_id": record_id,
+            "status": status,
+            "observed_at": observed_at,
+        })
+
+    if new_rows:
+        db.bulk_insert_mappings(StatusSnapshot, new_rows)
+        db.commit()
+
+    logger.info(
+        f"[SNAPSHOTS] {source}: {len(new_rows)} змін статусів з {len(seen)} записів "
+        f"(відомо раніше: {len(latest)})"
+    )
+    return len(new_rows)
+
+
+def sync_alfacrm_students(students: List[Dict[str, Any]]) -> int:
+    """
+    Зберігає зміни lead_status_id студентів AlfaCRM.
+
+    Args:
+        students: Список студентів з customer/index
+
+    Returns:
+        Кількість доданих снапшотів
+    """
+    from app.database import get_db
+
+    pairs = [(s.get("id"), s.get("lead_status_id")) for s in students]
+    with get_db() as db:
+        return record_status_changes(db, SOURCE_ALFACRM, pairs)
+
+
+def sync_nethunt_records(records: List[Dict[str, Any]]) -> int:
+    """
+    Зберігає зміни статусів записів NetHunt.
+
+    Статус нормалізується так само, як у nethunt_tracking.build_teacher_index.
+
+    Args:
+        records: Записи з NetHunt API
+
+    Returns:
+        Кількість доданих снапшотів
+    """
+    from app.database import get_db
+    from app.services.nethunt_tracking import normalize_status
+
+    pairs = [(record.get("id"), normalize_status(record.get("status"))) for record in records]
+
+    with get_db() as db:
+        return record_status_changes(db, SOURCE_NETHUNT, pairs)
+
+
+# ============================================================================
+# ЗАПИТИ ПО ІСТОРІЇ
+# ============================================================================
+
+
+def _period_bounds(start_date: str, end_date: str) -> Tuple[datetime, datetime]:
+    """Перетворює YYYY-MM-DD період у напіввідкритий інтервал [start, end + 1 день)."""
+    start = datetime.strptime(start_date, "%Y-%m-%d")
+    end = datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1)
+    return start, end
+
+
+def _records_by_status(
+    db: Session,
+    source: str,
+    status_values: List[str],
+    start_date: str,
+    end_date: str
+) -> Dict[str, Set[str]]:
+    """
+    {статус: record_id}, для записів, що перебували в статусі протягом періоду.
+
+    Обидві частини - range scan'и по індексах:
+    - переходи протягом періоду: (source, status, observed_at)
+    - стан на початок періоду: снапшоти статусу до start, після яких до start
+      у запису не було інших змін (NOT EXISTS по (source, record_id, id))
+    """
+    start, end = _period_bounds(start_date, end_date)
+    result: Dict[str, Set[str]] = {}
+
+    # 1) Переходи протягом періоду
+    in_period = (
+        db.query(StatusSnapshot.record_id, StatusSnapshot.status)
+        .filter(
+            StatusSnapshot.source == source,
+            StatusSnapshot.status.in_(status_values),
+            StatusSnapshot.observed_at >= start,
+            StatusSnapshot.observed_at < end,
+        )
+        .distinct()
+    )
+
+    # 2) Стан на початок періоду (останній снапшот до start)
+    later = aliased(StatusSnapshot)
+    carried_in = (
+        db.query(StatusSnapshot.record_id, StatusSnapshot.status)
+        .filter(
+            StatusSnapshot.source == source,
+            StatusSnapshot.status.in_(status_values),
+            StatusSnapshot.observed_at < start,
+            ~exists().where(
+                later.source == StatusSnapshot.source,
+                later.record_id == StatusSnapshot.record_id,
+                later.id > StatusSnapshot.id,
+                later.observed_at < start,
+            ),
+        )
+    )
+
+    for query in (in_period, carried_in):
+        for record_id, status in query.all():
+            result.setdefault(status, set()).add(record_id)
+    return result
+
+
+def reached_records(
+    db: Session,
+    source: str,
+    statuses: Iterable[Any],
+    start_date: str,
+    end_date: str
+) -> Set[str]:
+    """
+    Повертає записи, які хоча б раз перебували в одному зі статусів протягом періоду.
+
+    Запис вважається таким, що досяг етапу, якщо:
+    - протягом періоду для нього зафіксовано перехід у цей статус, або
+    - на початок періоду він вже перебував у цьому статусі.
+
+    Args:
+        db: SQLAlchemy session
+        source: 'alfacrm' або 'nethunt'
+        statuses: Статуси етапу (для AlfaCRM - lead_status_id)
+        start_date: Початок періоду (YYYY-MM-DD)
+        end_date: Кінець періоду (YYYY-MM-DD, включно)
+
+    Returns:
+        Множина record_id
+    """
+    status_values = [str(s) for s in statuses]
+    if not status_values:
+        return set()
+
+    by_status = _records_by_status(db, source, status_values, start_date, end_date)
+    return set().union(*by_status.values())
+
+
+def count_reached_by_stage(
+    db: Session,
+    source: str,
+    stages: Dict[str, Iterable[Any]],
+    start_date: str,
+    end_date: str,
+    record_ids: Optional[Set[str]] = None
+) -> Dict[str, int]:
+    """
+    Рахує кількість записів, що досягли кожного етапу воронки за період.
+
+    Історія читається одним запитом для статусів усіх етапів.
+
+    Args:
+        db: SQLAlchemy session
+        source: 'alfacrm' або 'nethunt'
+        stages: {назва_етапу: [статуси етапу]}
+        start_date: Початок періоду (YYYY-MM-DD)
+        end_date: Кінець періоду (YYYY-MM-DD, включно)
+        record_ids: Опційно - обмежити підрахунок цими записами (наприклад, лідами кампанії)
+
+    Returns:
+        {назва_етапу: кількість_записів}
+    """
+    stage_values = {name: {str(s) for s in statuses} for name, statuses in stages.items()}
+    all_values = sorted(set().union(*stage_values.values())) if stage_values else []
+    by_status = _records_by_status(db, source, all_values, start_date, end_date) if all_values else {}
+    allowed = {str(r) for r in record_ids} if record_ids is not None else None
+
+    counts = {}
+    for stage_name, values in stage_values.items():
+        reached: Set[str] = set()
+        for value in values:
+            reached |= by_status.get(value, set())
+        if allowed is not None:
+            reached &= allowed
+        counts[stage_name] = len(reached)
+    return counts
+
+
+def get_record_history(db: Session, source: str, record_id: Any) -> List[Dict[str, Any]]:
+    """
+    Повертає реальну історію статусів запису в хронологічному порядку.
+
+    Returns:
+        [{"status": "13", "observed_at": "2025-10-01T10:00:00"}, ...]
+    """
+    rows = (
+        db.query(StatusSnapshot)
+        .filter(and_(StatusSnapshot.source == source, StatusSnapshot.record_id == str(record_id)))
+        .order_by(StatusSnapshot.id)
+        .all()
+    )
+    return [
+        {"status": row.status, "observed_at": row.observed_at.isoformat() if row.observed_at else None}
+        for row in rows
+    ]
+
+
+def alfacrm_stage_statuses() -> Dict[str, List[int]]:
+    """
+    Групує lead_status_id AlfaCRM за агрегованими статусами (як у alfacrm_tracking).
+
+    Етапи trial funnel кумулятивні, як у track_campaign_leads: етап досягнуто,
+    якщо запис був у ньому або в пізнішому етапі (TRIAL_FUNNEL_REACHED_BY) -
+    лід, що між синхронізаціями перейшов з "Призначено" одразу в оплату,
+    рахується і в "Проведено пробне".
+
+    Returns:
+        {"Призначено пробне (ЦА)": [2, 35, 3, 37, ...], ...}
+    """
+    from app.services.alfacrm_tracking import ALFACRM_STATUS_TO_GROUP, TRIAL_FUNNEL_REACHED_BY
+
+    stages: Dict[str, List[int]] = {}
+    for status_id, group in ALFACRM_STATUS_TO_GROUP.items():
+        stages.setdefault(group, []).append(status_id)
+
+    own = {group: list(status_ids) for group, status_ids in stages.items()}
+    for group, later_groups in TRIAL_FUNNEL_REACHED_BY.items():
+        for later in later_groups:
+            stages[group].extend(own.get(later, []))
+    return stages
+
+
+def nethunt_stage_statuses() -> Dict[str, List[str]]:
+    """
+    Групує ключі статусів NetHunt за назвами колонок таблиці вчителів.
+
+    Returns:
+        {"Співбесіда (ЦА)": ["interview_target"], ...}
+    """
+    from app.config.settings import NETHUNT_STATUS_MAPPING
+
+    stages: Dict[str, List[str]] = {}
+    for status_key, column in NETHUNT_STATUS_MAPPING.items():
+        stages.setdefault(column, []).append(status_key)
+    return stages
@@ -0,0 +1,74 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Keyed single-flight: одночасні однакові обчислення виконуються ОДИН раз.
+
+    Перший виклик з ключем запускає обчислення як asyncio.Task, а всі
+    наступні виклики з тим самим ключем, поки task не завершився, чекають
+    на той самий результат (або ту саму помилку).
+
+    Task захищений від скасування (asyncio.shield): якщо клієнт, що запустив
+    обчислення, відключився, інші користувачі все одно отримають результат.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._stats: Dict[str, int] = {"calls": 0, "executions": 0, "coalesced": 0, "failures": 0}
+
+    def start(
+        self,
+        key: Hashable,
+        fn: Callable[[], Awaitable[Any]],
+        name: Optional[str] = None
+    ) -> Tuple[asyncio.Task, bool]:
+        """
+        Запускає обчислення (або приєднується до вже запущеного) без очікування.
+
+        Returns:
+            (task, shared), де shared=True якщо caller приєднався до існуючого task
+        """
+        self._stats["calls"] += 1
+        task = self._inflight.get(key)
+        if task is not None and not task.done():
+            self._stats["coalesced"] += 1
+            logger.info(f"[SINGLE-FLIGHT] {self.name}: coalesced caller for {key}")
+            return task, True
+
+        self._stats["executions"] += 1
+        task = asyncio.create_task(fn(), name=name)
+        self._inflight[key] = task
+        task.add_done_callback(lambda t, k=key: self._on_done(k, t))
+        return task, False
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Виконує fn один раз для всіх одночасних викликів з однаковим ключем.
+
+        Returns:
+            (result, shared)
+        """
+        task, shared = self.start(key, fn)
+        return await asyncio.shield(task), shared
+
+    def in_flight(self, key: Hashable) -> bool:
+        task = self._inflight.get(key)
+        return task is not None and not task.done()
+
+    def stats(self) -> Dict[str, int]:
+        return {**self._stats, "in_flight": sum(1 for t in self._inflight.values() if not t.done())}
+
+    def _on_done(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if task.cancelled():
+            self._stats["failures"] += 1
+        elif task.exception() is not None:
+            self._stats["failures"] += 1
+            logger.error(f"[SINGLE-FLIGHT] {self.name}: computation for {key} failed: {task.exception()}")
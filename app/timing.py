@@ -0,0 +1,48 @@
+"""
+Таймер етапів для звітів та pipeline.
+
+    timer = StageTimer()
+    with timer.stage("insights"):
+        insights = meta_conn.fetch_insights(...)
+
+Повторні етапи з тим самим ім'ям сумуються (наприклад meta_leads
+викликається для кожної вкладки). Час поза етапами потрапляє в
+remainder ("formatting") - обробка даних між викликами API.
+"""
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+
+class StageTimer:
+    def __init__(self):
+        self._started = time.perf_counter()
+        self._stages: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._stages[name] = self._stages.get(name, 0.0) + time.perf_counter() - started
+
+    def durations_ms(self, remainder: Optional[str] = None) -> Dict[str, float]:
+        """Тривалість етапів у мс (у порядку першого запуску) + total."""
+        total = time.perf_counter() - self._started
+        durations = {name: round(seconds * 1000, 1) for name, seconds in self._stages.items()}
+        if remainder:
+            durations[remainder] = round(max(total - sum(self._stages.values()), 0.0) * 1000, 1)
+        durations["total"] = round(total * 1000, 1)
+        return durations
+
+
+def server_timing_header(durations_ms: Dict[str, float], **descriptions: str) -> str:
+    """
+    Заголовок Server-Timing: "insights;dur=812.3, creatives;dur=95.1, cache;desc=MISS".
+
+    Видно у DevTools → Network → Timing.
+    """
+    parts = [f"{name};dur={value}" for name, value in durations_ms.items()]
+    parts.extend(f'{name};desc="{value}"' for name, value in descriptions.items())
+    return ", ".join(parts)
@@ -0,0 +1,212 @@
+"""
+Worker процес черги задач.
+
+Запуск (окремо від web процесу, можна кілька екземплярів):
+    python -m app.worker
+    python -m app.worker --types pipeline --max-jobs 1
+
+Налаштування:
+    JOB_CONCURRENCY="pipeline=1,analytics=2"  - глобальні ліміти по типах
+    JOB_LEASE_SECONDS=120, JOB_HEARTBEAT_SECONDS=30, JOB_POLL_SECONDS=2
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import signal
+import socket
+import threading
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from . import job_queue
+from .database import get_db, init_db
+
+logger = logging.getLogger(__name__)
+
+
+Handler = Callable[[str, Dict[str, Any]], Awaitable[None]]
+
+
+class Worker:
+    """
+    Забирає задачі з черги та виконує їх з heartbeat'ом lease.
+
+    Heartbeat надсилається з окремого потоку: run_pipeline робить довгі
+    синхронні виклики (Meta, NetHunt, AlfaCRM, Sheets) прямо в event loop,
+    і heartbeat у вигляді asyncio задачі на цей час зупинявся б - lease
+    прострочувався, і задачу паралельно забирав інший worker.
+
+    Після SIGTERM/SIGINT нові задачі не беруться, а незавершені
+    повертаються в чергу (release) - їх підхопить інший worker.
+    """
+
+    def __init__(
+        self,
+        handlers: Dict[str, Handler],
+        concurrency: Dict[str, int],
+        max_jobs: int = 2,
+        lease_seconds: int = 120,
+        heartbeat_seconds: int = 30,
+        poll_seconds: float = 2.0,
+        worker_id: Optional[str] = None
+    ):
+        self.handlers = handlers
+        self.concurrency = concurrency
+        self.max_jobs = max_jobs
+        self.lease_seconds = lease_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self.poll_seconds = poll_seconds
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._active: Dict[str, asyncio.Task] = {}
+        self._stopping = asyncio.Event()
+
+    def stop(self):
+        self._stopping.set()
+
+    async def run_forever(self):
+        logger.info(f"[WORKER] {self.worker_id} запущено: типи {list(self.handlers)}, ліміти {self.concurrency}")
+        while not self._stopping.is_set():
+            await self.poll_once()
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+        await self._shutdown()
+
+    async def poll_once(self) -> int:
+        """Повертає прострочені задачі в чергу та бере нові в межах max_jobs."""
+        with get_db() as db:
+            job_queue.reclaim_expired(db)
+
+        started = 0
+        while len(self._active) < self.max_jobs:
+            with get_db() as db:
+                job = job_queue.claim_next(
+                    db, self.worker_id, list(self.handlers), self.concurrency, self.lease_seconds
+                )
+                if job is None:
+                    break
+                job_id, job_type, payload = job.job_id, job.job_type, json.loads(job.payload_json or "{}")
+
+            task = asyncio.create_task(self._execute(job_id, job_type, payload))
+            self._active[job_id] = task
+            task.add_done_callback(lambda _t, j=job_id: self._active.pop(j, None))
+            started += 1
+        return started
+
+    async def wait_idle(self):
+        """Чекає завершення всіх поточних задач (для тестів)."""
+        while self._active:
+            await asyncio.gather(*list(self._active.values()), return_exceptions=True)
+
+    async def _execute(self, job_id: str, job_type: str, payload: Dict[str, Any]):
+        stop_heartbeat = threading.Event()
+        threading.Thread(
+            target=self._heartbeat,
+            args=(job_id, stop_heartbeat, asyncio.get_running_loop(), asyncio.current_task()),
+            name=f"heartbeat-{job_id}",
+            daemon=True,
+        ).start()
+        try:
+            await self.handlers[job_type](job_id, payload)
+        except asyncio.CancelledError:
+            with get_db() as db:
+                job_queue.release(db, job_id, self.worker_id)
+            raise
+        except Exception as e:
+            logger.error(f"[WORKER] {job_type} {job_id} помилка: {e}")
+            with get_db() as db:
+                job_queue.fail(db, job_id, self.worker_id, str(e))
+        else:
+            with get_db() as db:
+                job_queue.complete(db, job_id, self.worker_id)
+        finally:
+            stop_heartbeat.set()
+
+    def _heartbeat(self, job_id: str, stop: threading.Event, loop: asyncio.AbstractEventLoop, task: asyncio.Task):
+        """Продовжує lease; якщо його перехопив інший worker - скасовує задачу, щоб не виконувати її двічі."""
+        while not stop.wait(self.heartbeat_seconds):
+            try:
+                with get_db() as db:
+                    if not job_queue.heartbeat(db, job_id, self.worker_id, self.lease_seconds):
+                        logger.warning(f"[WORKER] Lease {job_id} втрачено, скасовуємо задачу")
+                        loop.call_soon_threadsafe(task.cancel)
+                        return
+            except Exception as e:
+                logger.error(f"[WORKER] Heartbeat {job_id} помилка: {e}")
+
+    async def _shutdown(self):
+        if self._active:
+            logger.info(f"[WORKER] Зупинка: повертаємо в чергу {len(self._active)} задач")
+        for task in list(self._active.values()):
+            task.cancel()
+        await asyncio.gather(*list(self._active.values()), return_exceptions=True)
+
+
+def _raise_if_failed(job_id: str):
+    """run_pipeline/run_analytics_task перехоплюють помилки самі - перевіряємо progress."""
+    from .main import progress
+
+    state = progress.get(job_id) or {}
+    if state.get("status") == "error":
+        logs = state.get("logs") or []
+        raise RuntimeError(logs[-1] if logs else "Job failed")
+
+
+async def run_pipeline_job(job_id: str, payload: Dict[str, Any]):
+    from .main import progress, run_pipeline
+
+    progress.init(job_id, title="Pipeline run")
+    await run_pipeline(job_id, payload)
+    await asyncio.to_thread(_raise_if_failed, job_id)
+
+
+async def run_analytics_job(job_id: str, payload: Dict[str, Any]):
+    from .main import progress, run_analytics_task
+
+    progress.init(job_id, title=f"Analytics: {payload.get('campaign_type')}")
+    await run_analytics_task(job_id, payload)
+    await asyncio.to_thread(_raise_if_failed, job_id)
+
+
+JOB_HANDLERS: Dict[str, Handler] = {
+    job_queue.JOB_TYPE_PIPELINE: run_pipeline_job,
+    job_queue.JOB_TYPE_ANALYTICS: run_analytics_job,
+}
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="eCademy job queue worker")
+    parser.add_argument("--types", default=",".join(JOB_HANDLERS), help="Типи задач через кому")
+    parser.add_argument("--max-jobs", type=int, default=int(os.getenv("WORKER_MAX_JOBS", "2")))
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    init_db()
+
+    handlers = {t: JOB_HANDLERS[t] for t in args.types.split(",") if t in JOB_HANDLERS}
+    worker = Worker(
+        handlers=handlers,
+        concurrency=job_queue.parse_concurrency(os.getenv("JOB_CONCURRENCY", "pipeline=1,analytics=2")),
+        max_jobs=args.max_jobs,
+        lease_seconds=int(os.getenv("JOB_LEASE_SECONDS", "120")),
+        heartbeat_seconds=int(os.getenv("JOB_HEARTBEAT_SECONDS", "30")),
+        poll_seconds=float(os.getenv("JOB_POLL_SECONDS", "2")),
+    )
+
+    async def runner():
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(sig, worker.stop)
+            except NotImplementedError:  # Windows
+                pass
+        await worker.run_forever()
+
+    asyncio.run(runner())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Fixtures для бенчмарків.
+
+Масштаби задаються через BENCHMARK_SCALES (за замовчуванням "1k,10k"),
+100k запускається явно: BENCHMARK_SCALES=1k,10k,100k.
+Датасет кожного масштабу генерується один раз на сесію.
+"""
+import asyncio
+import logging
+import os
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from benchmarks.generators import build_dataset, split_scale  # noqa: E402
+
+DEFAULT_SCALES = "1k,10k"
+
+
+def _scale_id(scale: int) -> str:
+    return f"{scale // 1000}k" if scale % 1000 == 0 else str(scale)
+
+
+def pytest_generate_tests(metafunc):
+    if "dataset" in metafunc.fixturenames:
+        scales = split_scale(os.getenv("BENCHMARK_SCALES", DEFAULT_SCALES))
+        metafunc.parametrize("dataset", scales, ids=[_scale_id(s) for s in scales], indirect=True, scope="session")
+
+
+_datasets = {}
+
+
+@pytest.fixture(scope="session")
+def dataset(request):
+    scale = request.param
+    if scale not in _datasets:
+        _datasets[scale] = build_dataset(scale)
+    return _datasets[scale]
+
+
+@pytest.fixture(autouse=True)
+def quiet_tracking(monkeypatch):
+    """Трекінг логує кожну кампанію та пише снапшоти в БД - у бенчмарках це шум."""
+    monkeypatch.setenv("STATUS_SNAPSHOTS_ENABLED", "false")
+    logging.disable(logging.INFO)
+    yield
+    logging.disable(logging.NOTSET)
+
+
+@pytest.fixture
+def nethunt_stub(dataset, monkeypatch):
+    """nethunt_list_records повертає згенеровані записи замість запиту до NetHunt."""
+    from app.services import nethunt_tracking
+
+    monkeypatch.setattr(nethunt_tracking, "nethunt_list_records", lambda folder_id=None, limit=10000: dataset.records)
+
+
+@pytest.fixture
+def enriched_students(dataset):
+    """Те саме, що alfacrm_tracking.track_leads_by_campaigns, без завантаження з AlfaCRM."""
+    from app.services import alfacrm_tracking
+
+    index = alfacrm_tracking.build_student_index(dataset.students)
+    return {
+        campaign_id: {
+            **{key: value for key, value in campaign.items() if key != "leads"},
+            "leads_count": len(campaign["leads"]),
+            "funnel_stats": alfacrm_tracking.track_campaign_leads(campaign["leads"], index),
+            "phone_arrays": alfacrm_tracking.get_lead_phones_by_status(campaign["leads"], index),
+            "phone_indexes": alfacrm_tracking.get_lead_phone_indexes_by_status(campaign["leads"], index),
+        }
+        for campaign_id, campaign in dataset.campaigns.items()
+    }
+
+
+@pytest.fixture
+def enriched_teachers(dataset, nethunt_stub):
+    from app.services import nethunt_tracking
+
+    return asyncio.run(nethunt_tracking.track_leads_by_campaigns(dataset.campaigns))
@@ -0,0 +1,181 @@
+"""
+Генератори синтетичних даних для бенчмарків (seeded - однакові дані при кожному запуску).
+
+- meta_leads: ліди Meta з різними назвами полів field_data та форматами телефонів
+- alfacrm_students / nethunt_records: записи CRM, частина з яких збігається з лідами
+- campaigns: ліди згруповані по кампаніях як у get_leads_for_period()
+- insights: рядки Graph API insights для експорту креативів
+"""
+import random
+from dataclasses import dataclass
+from typing import Any, Dict, List, Tuple
+
+from app.config.settings import NETHUNT_STATUS_MAPPING
+from app.services.alfacrm_tracking import ALFACRM_STATUS_TO_GROUP
+
+SEED = 20251001
+
+LEADS_PER_CAMPAIGN = 50
+
+# Формати, які реально приходять з форм Meta та з CRM
+PHONE_FORMATS = (
+    "+380{n}",
+    "380{n}",
+    "0{n}",
+    "{n}",
+    "+0380{n}",
+    "+38 (0{a}) {b}-{c}-{d}",
+    "38 0{a} {b} {c}{d}",
+)
+
+PHONE_FIELD_NAMES = ("phone_number", "full_phone_number", "Номер телефону", "телефон")
+EMAIL_FIELD_NAMES = ("email", "e-mail", "Електронна адреса")
+
+LOCATIONS = ("Київ", "Львів", "Одеса", "Україна", "Польща")
+
+
+@dataclass
+class Contact:
+    number: str  # 9 цифр без коду країни
+    email: str
+
+
+def format_phone(rng: random.Random, number: str) -> str:
+    template = rng.choice(PHONE_FORMATS)
+    return template.format(n=number, a=number[:2], b=number[2:5], c=number[5:7], d=number[7:])
+
+
+def contacts(count: int, seed: int = SEED) -> List[Contact]:
+    rng = random.Random(seed)
+    operators = (50, 63, 66, 67, 68, 73, 93, 95, 96, 97, 98, 99)
+    suffixes = rng.sample(range(10_000_000), count)
+    return [
+        Contact(number=f"{rng.choice(operators)}{suffix:07d}", email=f"lead{seed}.{i}@example.com")
+        for i, suffix in enumerate(suffixes)
+    ]
+
+
+def meta_leads(people: List[Contact], seed: int = SEED) -> List[Dict[str, Any]]:
+    """Ліди у форматі Graph API + плоскі phone/email (як після extract_lead_contact_info)."""
+    rng = random.Random(seed + 1)
+    leads = []
+    for i, person in enumerate(people):
+        phone = format_phone(rng, person.number)
+        # ~10% лідів залишають тільки email
+        has_phone = rng.random() > 0.1
+        field_data = [{"name": "full_name", "values": [f"Lead {i}"]}]
+        if has_phone:
+            field_data.append({"name": rng.choice(PHONE_FIELD_NAMES), "values": [phone]})
+        field_data.append({"name": rng.choice(EMAIL_FIELD_NAMES), "values": [person.email.upper() if i % 7 == 0 else person.email]})
+        leads.append({
+            "id": str(10**16 + i),
+            "created_time": f"2025-10-{1 + i % 28:02d}T{i % 24:02d}:00:00+0000",
+            "field_data": field_data,
+            "phone": phone if has_phone else None,
+            "email": person.email,
+            "name": f"Lead {i}",
+        })
+    return leads
+
+
+def alfacrm_students(people: List[Contact], seed: int = SEED, match_ratio: float = 0.7) -> List[Dict[str, Any]]:
+    """Студенти AlfaCRM: match_ratio лідів знаходяться в CRM, решта CRM - сторонні записи."""
+    rng = random.Random(seed + 2)
+    status_ids = list(ALFACRM_STATUS_TO_GROUP)
+    matched = [person for person in people if rng.random() < match_ratio]
+    others = contacts(len(people) - len(matched), seed=seed + 3)
+    students = []
+    for i, person in enumerate(matched + others):
+        students.append({
+            "id": i + 1,
+            "name": f"Student {i}",
+            "phone": [format_phone(rng, person.number)],
+            "email": [person.email] if rng.random() > 0.3 else [],
+            "lead_status_id": rng.choice(status_ids),
+            "custom_ads_comp": "архів" if rng.random() < 0.05 else "",
+        })
+    return students
+
+
+def nethunt_records(people: List[Contact], seed: int = SEED, match_ratio: float = 0.7) -> List[Dict[str, Any]]:
+    rng = random.Random(seed + 4)
+    statuses = list(NETHUNT_STATUS_MAPPING)
+    matched = [person for person in people if rng.random() < match_ratio]
+    others = contacts(len(people) - len(matched), seed=seed + 5)
+    return [
+        {
+            "id": f"rec{i}",
+            "name": f"Teacher {i}",
+            "phone": format_phone(rng, person.number),
+            "email": person.email,
+            "status": rng.choice(statuses),
+            "created_at": "2025-10-01T10:00:00Z",
+        }
+        for i, person in enumerate(matched + others)
+    ]
+
+
+def campaigns(leads: List[Dict[str, Any]], seed: int = SEED) -> Dict[str, Dict[str, Any]]:
+    rng = random.Random(seed + 6)
+    result: Dict[str, Dict[str, Any]] = {}
+    for start in range(0, len(leads), LEADS_PER_CAMPAIGN):
+        campaign_id = str(120_000_000_000 + start)
+        result[campaign_id] = {
+            "campaign_id": campaign_id,
+            "campaign_name": f"Student/Campaign {start // LEADS_PER_CAMPAIGN}",
+            "budget": round(rng.uniform(50, 2000), 2),
+            "location": rng.choice(LOCATIONS),
+            "leads": leads[start:start + LEADS_PER_CAMPAIGN],
+        }
+    return result
+
+
+def insights(count: int, seed: int = SEED) -> List[Dict[str, Any]]:
+    rng = random.Random(seed + 7)
+    rows = []
+    for i in range(count):
+        impressions = rng.randint(100, 100_000)
+        clicks = rng.randint(0, impressions // 10)
+        spend = round(rng.uniform(1, 500), 2)
+        rows.append({
+            "date_start": f"2025-10-{1 + i % 28:02d}",
+            "campaign_id": str(120_000_000_000 + i // 10),
+            "campaign_name": f"Student/Campaign {i // 10}",
+            "ad_id": str(6_000_000_000 + i),
+            "ad_name": f"Creative {i}",
+            "impressions": impressions,
+            "clicks": clicks,
+            "spend": spend,
+            "ctr": round(clicks / impressions * 100, 2),
+            "cpc": round(spend / clicks, 2) if clicks else 0.0,
+        })
+    return rows
+
+
+@dataclass
+class Dataset:
+    leads: List[Dict[str, Any]]
+    students: List[Dict[str, Any]]
+    records: List[Dict[str, Any]]
+    campaigns: Dict[str, Dict[str, Any]]
+
+
+def build_dataset(scale: int, seed: int = SEED) -> Dataset:
+    people = contacts(scale, seed=seed)
+    leads = meta_leads(people, seed=seed)
+    return Dataset(
+        leads=leads,
+        students=alfacrm_students(people, seed=seed),
+        records=nethunt_records(people, seed=seed),
+        campaigns=campaigns(leads, seed=seed),
+    )
+
+
+def split_scale(value: str) -> Tuple[int, ...]:
+    """"1k,10k,100k" → (1000, 10000, 100000)."""
+    scales = []
+    for part in value.split(","):
+        part = part.strip().lower()
+        if part:
+            scales.append(int(float(part[:-1]) * 1000) if part.endswith("k") else int(part))
+    return tuple(scales)
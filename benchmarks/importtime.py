@@ -0,0 +1,179 @@
+"""
+Бюджет часу старту: `python -X importtime -c "import app.main"` → звіт та перевірка.
+
+    # Звіт: найважчі прямі імпорти app.main
+    python -m benchmarks.importtime --top 15
+
+    # CI: падає, якщо імпорт довший за бюджет або на старті імпортовано важкі
+    # залежності, які мають завантажуватися лише при першому використанні
+    python -m benchmarks.importtime --budget-ms 1000 --health-budget-ms 1500
+
+Кожен замір - окремий процес у тимчасовій директорії (SQLite база не
+створюється в репозиторії); з кількох запусків береться найкращий, щоб
+прибрати шум холодного дискового кешу.
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TARGET = "app.main"
+
+# Імпортуються в конекторах/експорті при першому використанні, не на старті;
+# app.rate_limit_storage / app.http_cassette - лише з RATE_LIMIT_STORAGE_URI=database:// / HTTP_CASSETTE
+LAZY_MODULES = (
+    "openpyxl", "gspread", "google.oauth2", "google.auth", "pyarrow", "PIL",
+    "app.rate_limit_storage", "app.http_cassette",
+)
+
+
+@dataclass
+class ImportRecord:
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def parse_importtime(stderr: str) -> List[ImportRecord]:
+    """Рядки `import time: self | cumulative | module` (вкладеність - відступом по 2 пробіли)."""
+    records = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # заголовок "self [us] | cumulative | imported package"
+        name = parts[2].rstrip()
+        stripped = name.lstrip()
+        records.append(ImportRecord(
+            module=stripped,
+            self_us=int(parts[0]),
+            cumulative_us=int(parts[1]),
+            depth=(len(name) - len(stripped) - 1) // 2,
+        ))
+    return records
+
+
+def _env() -> Dict[str, str]:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [ROOT, env.get("PYTHONPATH")]))
+    env.setdefault("PREWARM_ENABLED", "false")
+    env.pop("HTTP_CASSETTE", None)
+    env.pop("RATE_LIMIT_STORAGE_URI", None)
+    return env
+
+
+def measure(target: str = TARGET, runs: int = 3) -> List[ImportRecord]:
+    """Найшвидший з `runs` замірів імпорту `target` у свіжому процесі."""
+    best: Optional[List[ImportRecord]] = None
+    with tempfile.TemporaryDirectory() as cwd:
+        for _ in range(runs):
+            result = subprocess.run(
+                [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+                cwd=cwd, env=_env(), capture_output=True, text=True, check=True,
+            )
+            records = parse_importtime(result.stderr)
+            if best is None or total_ms(records, target) < total_ms(best, target):
+                best = records
+    return best or []
+
+
+def total_ms(records: List[ImportRecord], target: str = TARGET) -> float:
+    for record in records:
+        if record.module == target and record.depth == 0:
+            return record.cumulative_us / 1000
+    return 0.0
+
+
+def lazy_violations(records: List[ImportRecord], lazy_modules=LAZY_MODULES) -> List[str]:
+    """Які з lazy_modules (або їх підмодулі) імпортуються на старті."""
+    imported = {record.module for record in records}
+    return [
+        lazy for lazy in lazy_modules
+        if any(module == lazy or module.startswith(lazy + ".") for module in imported)
+    ]
+
+
+def top_imports(records: List[ImportRecord], count: int = 15) -> List[ImportRecord]:
+    """Найважчі прямі імпорти цільового модуля (depth 1) за cumulative часом."""
+    direct = [record for record in records if record.depth == 1]
+    return sorted(direct, key=lambda record: record.cumulative_us, reverse=True)[:count]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_health(timeout: float = 30.0) -> float:
+    """Мілісекунди від запуску uvicorn до першої відповіді 200 на /health."""
+    port = _free_port()
+    with tempfile.TemporaryDirectory() as cwd:
+        started = time.perf_counter()
+        process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", f"{TARGET}:app", "--port", str(port), "--log-level", "warning"],
+            cwd=cwd, env=_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            while time.perf_counter() - started < timeout:
+                try:
+                    if httpx.get(f"http://127.0.0.1:{port}/health", timeout=1.0).status_code == 200:
+                        return (time.perf_counter() - started) * 1000
+                except httpx.TransportError:
+                    pass
+                if process.poll() is not None:
+                    raise RuntimeError(f"uvicorn exited with code {process.returncode}")
+                time.sleep(0.02)
+            raise TimeoutError(f"/health did not respond within {timeout}s")
+        finally:
+            process.terminate()
+            process.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time report and startup budget for app.main")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--budget-ms", type=float, default=None, help="Максимальний час `import app.main`")
+    parser.add_argument("--health-budget-ms", type=float, default=None,
+                        help="Максимальний час від запуску uvicorn до 200 на /health")
+    args = parser.parse_args()
+
+    records = measure(runs=args.runs)
+    report = {
+        "import_ms": round(total_ms(records), 1),
+        "top_imports_ms": {
+            record.module: round(record.cumulative_us / 1000, 1) for record in top_imports(records, args.top)
+        },
+        "lazy_violations": lazy_violations(records),
+    }
+    if args.health_budget_ms is not None:
+        report["health_ms"] = round(measure_health(), 1)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+    failures = []
+    if report["lazy_violations"]:
+        failures.append(f"imported at startup: {', '.join(report['lazy_violations'])}")
+    if args.budget_ms is not None and report["import_ms"] > args.budget_ms:
+        failures.append(f"import {TARGET}: {report['import_ms']} ms > {args.budget_ms} ms")
+    if args.health_budget_ms is not None and report["health_ms"] > args.health_budget_ms:
+        failures.append(f"/health: {report['health_ms']} ms > {args.health_budget_ms} ms")
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
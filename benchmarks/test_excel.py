@@ -0,0 +1,69 @@
+"""
+Бенчмарки XLSX експорту (connectors/excel.py) та колонкового експорту
+(columnar_export.py: csv, parquet, arrow - останні два лише з pyarrow).
+
+Кожен раунд пише у новий файл - інакше _write_by_headers вимірював би
+ще й завантаження книги з попереднього раунду.
+"""
+import itertools
+import os
+
+import pytest
+
+from app import columnar_export
+from app.connectors import excel
+from app.services import campaign_formatter, teachers_formatter
+from benchmarks.generators import insights
+from benchmarks.test_formatting import ADS_URL, ANALYSIS_DATE, DATE_RANGE
+
+ROUNDS = 5
+
+
+def bench_writer(benchmark, tmp_path, writer, rows):
+    counter = itertools.count()
+
+    def setup():
+        return (str(tmp_path / f"export_{next(counter)}.xlsx"), rows), {}
+
+    benchmark.pedantic(writer, setup=setup, rounds=ROUNDS)
+
+
+def test_write_creatives(benchmark, dataset, tmp_path):
+    bench_writer(benchmark, tmp_path, excel.write_creatives, insights(len(dataset.leads) // 10))
+
+
+def test_write_students(benchmark, enriched_students, tmp_path):
+    rows = campaign_formatter.transform_enriched_campaigns_to_excel_rows(
+        enriched_students, ANALYSIS_DATE, DATE_RANGE, ADS_URL
+    )
+
+    bench_writer(benchmark, tmp_path, excel.write_students, rows)
+
+
+def test_write_teachers(benchmark, enriched_teachers, tmp_path):
+    rows = teachers_formatter.transform_enriched_teachers_to_excel_rows(
+        enriched_teachers, ANALYSIS_DATE, DATE_RANGE, ADS_URL
+    )
+
+    bench_writer(benchmark, tmp_path, excel.write_teachers, rows)
+
+
+@pytest.mark.parametrize("fmt", columnar_export.COLUMNAR_FORMATS)
+def test_export_students_columnar(benchmark, enriched_students, tmp_path, fmt):
+    if fmt != "csv":
+        pytest.importorskip("pyarrow")
+    rows = campaign_formatter.transform_enriched_campaigns_to_excel_rows(
+        enriched_students, ANALYSIS_DATE, DATE_RANGE, ADS_URL
+    )
+    for row, campaign in zip(rows, enriched_students.values()):
+        row.update(campaign["phone_arrays"])
+    columns = columnar_export.columns_of(rows)
+    counter = itertools.count()
+
+    def setup():
+        path = str(tmp_path / f"export_{next(counter)}.{fmt}")
+        return (path, fmt, columns, columnar_export.dict_rows(rows, columns)), {}
+
+    benchmark.pedantic(columnar_export.write_table, setup=setup, rounds=ROUNDS)
+
+    benchmark.extra_info["bytes"] = os.path.getsize(str(tmp_path / f"export_0.{fmt}"))
@@ -0,0 +1,42 @@
+"""
+Бенчмарки форматування: рядки студентів/вчителів для Excel та формули студентів.
+"""
+from app.main import calculate_students_formulas
+from app.services import campaign_formatter, teachers_formatter
+
+ANALYSIS_DATE = "07.10.2025"
+DATE_RANGE = "2025-10-01 - 2025-10-07"
+ADS_URL = "https://www.facebook.com/adsmanager"
+
+
+def test_campaign_formatter(benchmark, enriched_students):
+    rows = benchmark(
+        campaign_formatter.transform_enriched_campaigns_to_excel_rows,
+        enriched_students, ANALYSIS_DATE, DATE_RANGE, ADS_URL
+    )
+
+    assert len(rows) == len(enriched_students)
+
+
+def test_teachers_formatter(benchmark, enriched_teachers):
+    rows = benchmark(
+        teachers_formatter.transform_enriched_teachers_to_excel_rows,
+        enriched_teachers, ANALYSIS_DATE, DATE_RANGE, ADS_URL
+    )
+
+    assert len(rows) == len(enriched_teachers)
+
+
+def test_calculate_students_formulas(benchmark, enriched_students):
+    # Рядки у форматі Excel з масивами телефонів (safe_int рахує довжину списку);
+    # функція дописує поля в рядки, тому кожен раунд отримує свіжі
+    def setup():
+        students = [
+            {"budget": campaign["budget"], **campaign["phone_arrays"]}
+            for campaign in enriched_students.values()
+        ]
+        return (students,), {}
+
+    students = benchmark.pedantic(calculate_students_formulas, setup=setup, rounds=10)
+
+    assert all("price_per_lead" in s for s in students)
@@ -0,0 +1,113 @@
+"""
+Бенчмарки серіалізації відповіді /api/meta-data: starlette JSONResponse
+(jsonable_encoder + json.dumps, як до FastJSONResponse) проти FastJSONResponse
+з orjson (fast) та без нього (fast-fallback); компактний payload_version=2.
+
+Піковий обсяг пам'яті серіалізації (tracemalloc) записується в extra_info
+бенчмарку (`peak_kib`) і потрапляє в JSON при --benchmark-save.
+"""
+import tracemalloc
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app import json_response
+from app.main import _extract_lead_phones_with_status_students
+from app.services import campaign_formatter, phone_payload, teachers_formatter
+
+ANALYSIS_DATE = "07.10.2025"
+DATE_RANGE = "2025-10-01 - 2025-10-07"
+ADS_URL = "https://www.facebook.com/adsmanager"
+
+
+def _stdlib_response(payload):
+    # Шлях FastAPI для dict з endpoint'а до FastJSONResponse
+    return JSONResponse(jsonable_encoder(payload)).body
+
+
+def _fast_response(payload):
+    return json_response.FastJSONResponse(payload).body
+
+
+ENCODERS = {"stdlib": _stdlib_response, "fast": _fast_response, "fast-fallback": _fast_response}
+
+
+@pytest.fixture
+def compact_lead_phones(dataset):
+    from app.services import alfacrm_tracking
+
+    index = alfacrm_tracking.build_student_index(dataset.students)
+    return _extract_lead_phones_with_status_students(dataset.campaigns, index, "2025-10-07")
+
+
+@pytest.fixture
+def report_payload(enriched_students, enriched_teachers, compact_lead_phones):
+    """Звіт у форматі /api/meta-data (рядки студентів з масивами телефонів)."""
+    students = campaign_formatter.transform_enriched_campaigns_to_excel_rows(
+        enriched_students, ANALYSIS_DATE, DATE_RANGE, ADS_URL
+    )
+    for row, campaign in zip(students, enriched_students.values()):
+        row.update(campaign["phone_arrays"])
+    teachers = teachers_formatter.transform_enriched_teachers_to_excel_rows(
+        enriched_teachers, ANALYSIS_DATE, DATE_RANGE, ADS_URL
+    )
+    lead_phones = {
+        campaign_id: phone_payload.expand_campaign_phones(compact)
+        for campaign_id, compact in compact_lead_phones.items()
+    }
+    return {
+        "ads": [], "students": students, "teachers": teachers,
+        "lead_phones": {"students": lead_phones, "teachers": {}},
+    }
+
+
+@pytest.fixture
+def compact_report_payload(report_payload, enriched_students, compact_lead_phones):
+    """Той самий звіт у payload_version=2 (таблиця телефонів + індекси статусів)."""
+    students = []
+    for row, campaign in zip(report_payload["students"], enriched_students.values()):
+        compact_row = {key: value for key, value in row.items() if key not in campaign["phone_arrays"]}
+        compact_row["phones"] = campaign["phone_indexes"]["phones"]
+        compact_row["leads_count"] = len(compact_row["phones"])
+        compact_row.update(campaign["phone_indexes"]["statuses"])
+        students.append(compact_row)
+    return {
+        **report_payload,
+        "payload_version": phone_payload.PAYLOAD_VERSION_COMPACT,
+        "students": students,
+        "lead_phones": {"students": compact_lead_phones, "teachers": {}},
+    }
+
+
+def _peak_kib(encoder, payload) -> float:
+    tracemalloc.start()
+    try:
+        encoder(payload)
+        return round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+    finally:
+        tracemalloc.stop()
+
+
+@pytest.mark.parametrize("encoder", list(ENCODERS))
+def test_serialize_meta_report(benchmark, report_payload, encoder, monkeypatch):
+    if encoder == "fast-fallback":
+        monkeypatch.setattr(json_response, "ORJSON_AVAILABLE", False)
+    render = ENCODERS[encoder]
+    benchmark.extra_info["orjson"] = json_response.ORJSON_AVAILABLE
+    benchmark.extra_info["peak_kib"] = _peak_kib(render, report_payload)
+
+    body = benchmark(render, report_payload)
+
+    benchmark.extra_info["bytes"] = len(body)
+    assert body.startswith(b"{")
+
+
+def test_serialize_meta_report_compact(benchmark, compact_report_payload):
+    render = ENCODERS["fast"]
+    benchmark.extra_info["peak_kib"] = _peak_kib(render, compact_report_payload)
+
+    body = benchmark(render, compact_report_payload)
+
+    benchmark.extra_info["bytes"] = len(body)
+    assert body.startswith(b"{")
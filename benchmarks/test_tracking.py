@@ -0,0 +1,83 @@
+"""
+Бенчмарки трекінгу лідів: індекс студентів AlfaCRM, воронка кампаній,
+масиви телефонів по статусах (повні та компактні) та трекінг вчителів NetHunt.
+"""
+import asyncio
+
+from app.main import _extract_lead_phones_with_status_students
+from app.services import alfacrm_tracking, nethunt_tracking, phone_payload
+
+
+def test_build_student_index(benchmark, dataset):
+    index = benchmark(alfacrm_tracking.build_student_index, dataset.students)
+
+    assert len(index) >= len(dataset.students)
+
+
+def test_track_campaign_leads(benchmark, dataset):
+    index = alfacrm_tracking.build_student_index(dataset.students)
+
+    def run():
+        return [
+            alfacrm_tracking.track_campaign_leads(campaign["leads"], index)
+            for campaign in dataset.campaigns.values()
+        ]
+
+    stats = benchmark(run)
+
+    assert sum(s["Кількість лідів"] for s in stats) == len(dataset.leads)
+
+
+def test_get_lead_phones_by_status(benchmark, dataset):
+    index = alfacrm_tracking.build_student_index(dataset.students)
+
+    def run():
+        return [
+            alfacrm_tracking.get_lead_phones_by_status(campaign["leads"], index)
+            for campaign in dataset.campaigns.values()
+        ]
+
+    arrays = benchmark(run)
+
+    assert sum(len(a["leads_count"]) for a in arrays) > 0
+
+
+def test_get_lead_phone_indexes_by_status(benchmark, dataset):
+    index = alfacrm_tracking.build_student_index(dataset.students)
+
+    def run():
+        return [
+            alfacrm_tracking.get_lead_phone_indexes_by_status(campaign["leads"], index)
+            for campaign in dataset.campaigns.values()
+        ]
+
+    compact = benchmark(run)
+
+    assert sum(len(c["phones"]) for c in compact) > 0
+
+
+def test_extract_lead_phones_with_status(benchmark, dataset):
+    index = alfacrm_tracking.build_student_index(dataset.students)
+
+    lead_phones = benchmark(_extract_lead_phones_with_status_students, dataset.campaigns, index, "2025-10-07")
+
+    assert all("phones" in compact for compact in lead_phones.values())
+
+
+def test_expand_lead_phones(benchmark, dataset):
+    # Розгортання у payload_version=1 для клієнтів без компактної форми
+    index = alfacrm_tracking.build_student_index(dataset.students)
+    lead_phones = _extract_lead_phones_with_status_students(dataset.campaigns, index, "2025-10-07")
+
+    expanded = benchmark(lambda: {
+        campaign_id: phone_payload.expand_campaign_phones(compact)
+        for campaign_id, compact in lead_phones.items()
+    })
+
+    assert len(expanded) == len(lead_phones)
+
+
+def test_nethunt_track_leads_by_campaigns(benchmark, dataset, nethunt_stub):
+    enriched = benchmark(lambda: asyncio.run(nethunt_tracking.track_leads_by_campaigns(dataset.campaigns)))
+
+    assert any(c.get("total_matched_leads") for c in enriched.values())
@@ -0,0 +1,322 @@
+"""
+Локальні fake сервери Meta Graph, AlfaCRM та NetHunt для навантажувального тестування.
+
+    python -m loadtest.fake_upstreams --port 9100 --size 10000 --latency-ms 80 --error-rate 0.01 --rate-limit-rate 0.02
+
+Один процес, три застосунки (змонтовані під префіксами):
+
+    GRAPH_URL=http://127.0.0.1:9100/graph
+    META_API_BASE=http://127.0.0.1:9100/graph
+    ALFACRM_BASE_URL=http://127.0.0.1:9100/alfacrm
+    NETHUNT_API_URL=http://127.0.0.1:9100/nethunt
+
+Дані генеруються benchmarks.generators (seeded), тому ліди Meta частково
+збігаються з записами AlfaCRM/NetHunt так само, як у бенчмарках.
+
+Збої змінюються на ходу без перезапуску:
+    curl -X POST localhost:9100/_faults -d '{"latency_ms": 300, "rate_limit_rate": 0.1}'
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter, deque
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from benchmarks.generators import build_dataset
+
+ADS_PER_CAMPAIGN = 3
+FORMS_COUNT = 4
+PAGE_ID = "fake_page"
+NETHUNT_FOLDER_ID = "fake_folder"
+ALFACRM_TOKEN = "fake-alfacrm-token"
+
+
+@dataclass
+class FaultConfig:
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0       # частка відповідей 500
+    rate_limit_rate: float = 0.0  # частка відповідей 429
+    graph_calls_per_minute: int = 6000  # "квота" для X-App-Usage
+
+    def update(self, values: Dict[str, Any]) -> None:
+        for name, value in values.items():
+            if name in self.__dataclass_fields__:
+                setattr(self, name, type(getattr(self, name))(value))
+
+
+class FakeData:
+    """Кампанії, оголошення, форми та ліди Meta + записи CRM з одного датасету."""
+
+    def __init__(self, size: int, seed: Optional[int] = None):
+        dataset = build_dataset(size, **({"seed": seed} if seed is not None else {}))
+        rng = random.Random(size)
+
+        self.campaigns: List[Dict[str, Any]] = []
+        self.ads: List[Dict[str, Any]] = []
+        self.leads_by_form: Dict[str, List[Dict[str, Any]]] = {f"form_{i}": [] for i in range(FORMS_COUNT)}
+
+        for n, (campaign_id, campaign) in enumerate(dataset.campaigns.items()):
+            # Назви з ключовими словами CAMPAIGN_KEYWORDS_* - половина студентів, половина вчителів
+            name = f"{'Student' if n % 2 == 0 else 'Teacher'}/Fake campaign {n}"
+            self.campaigns.append({"id": campaign_id, "name": name})
+            ad_ids = [f"{campaign_id}{a}" for a in range(ADS_PER_CAMPAIGN)]
+            for a, ad_id in enumerate(ad_ids):
+                impressions = rng.randint(1_000, 200_000)
+                clicks = rng.randint(10, impressions // 20)
+                spend = round(rng.uniform(5, 800), 2)
+                self.ads.append({
+                    "campaign_id": campaign_id,
+                    "campaign_name": name,
+                    "adset_id": f"{campaign_id}9",
+                    "adset_name": f"Adset {n}",
+                    "ad_id": ad_id,
+                    "ad_name": f"Creative {n}.{a}",
+                    "impressions": str(impressions),
+                    "clicks": str(clicks),
+                    "spend": str(spend),
+                    "reach": str(impressions * 3 // 4),
+                    "cpc": str(round(spend / clicks, 2)),
+                    "cpm": str(round(spend / impressions * 1000, 2)),
+                    "ctr": str(round(clicks / impressions * 100, 2)),
+                    "objective": "OUTCOME_LEADS",
+                    "actions": [],
+                })
+            for i, lead in enumerate(campaign["leads"]):
+                form_id = f"form_{i % FORMS_COUNT}"
+                self.leads_by_form[form_id].append({
+                    "id": lead["id"],
+                    "created_time": lead["created_time"],
+                    "ad_id": ad_ids[i % ADS_PER_CAMPAIGN],
+                    "ad_name": f"Creative {n}.{i % ADS_PER_CAMPAIGN}",
+                    "adset_id": f"{campaign_id}9",
+                    "adset_name": f"Adset {n}",
+                    "campaign_id": campaign_id,
+                    "campaign_name": name,
+                    "form_id": form_id,
+                    "field_data": lead["field_data"],
+                })
+
+        leads_per_ad = Counter(lead["ad_id"] for leads in self.leads_by_form.values() for lead in leads)
+        for ad in self.ads:
+            ad["actions"] = [{"action_type": "lead", "value": str(leads_per_ad[ad["ad_id"]])}]
+
+        self.students = dataset.students
+        self.records = [
+            {**record, "fields": {"Name": record["name"], "Phone": record["phone"], "Email": record["email"]}}
+            for record in dataset.records
+        ]
+
+
+def _page(items: List[Any], request: Request, default_limit: int = 25) -> Dict[str, Any]:
+    """Cursor-пагінація у стилі Graph API (after = зсув у списку)."""
+    limit = max(int(request.query_params.get("limit", default_limit)), 1)
+    offset = int(request.query_params.get("after", 0) or 0)
+    chunk = items[offset:offset + limit]
+    body: Dict[str, Any] = {"data": chunk}
+    if offset + limit < len(items):
+        after = str(offset + limit)
+        body["paging"] = {
+            "cursors": {"before": str(offset), "after": after},
+            "next": str(request.url.include_query_params(after=after)),
+        }
+    return body
+
+
+def add_fault_injection(app: FastAPI, faults: FaultConfig, stats: Counter, upstream: str, rate_limit_body: Dict[str, Any]):
+    @app.middleware("http")
+    async def inject_faults(request: Request, call_next):
+        stats[f"{upstream}_requests"] += 1
+        delay = faults.latency_ms + random.uniform(0, faults.jitter_ms)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+        roll = random.random()
+        if roll < faults.rate_limit_rate:
+            stats[f"{upstream}_429"] += 1
+            return JSONResponse(rate_limit_body, status_code=429, headers={"Retry-After": "1"})
+        if roll < faults.rate_limit_rate + faults.error_rate:
+            stats[f"{upstream}_500"] += 1
+            return JSONResponse({"error": "Injected failure"}, status_code=500)
+        return await call_next(request)
+
+
+def create_graph_app(data: FakeData, faults: FaultConfig, stats: Counter) -> FastAPI:
+    graph = FastAPI(title="Fake Meta Graph API")
+    calls: deque = deque()
+
+    add_fault_injection(graph, faults, stats, "graph", {
+        "error": {"message": "(#17) User request limit reached", "type": "OAuthException", "code": 17}
+    })
+
+    @graph.middleware("http")
+    async def app_usage(request: Request, call_next):
+        # X-App-Usage як у Graph API - читає GraphRateGovernor
+        now = time.monotonic()
+        calls.append(now)
+        while calls and calls[0] < now - 60:
+            calls.popleft()
+        usage = min(100, len(calls) * 100 // max(faults.graph_calls_per_minute, 1))
+        response = await call_next(request)
+        response.headers["X-App-Usage"] = json.dumps({"call_count": usage, "total_cputime": usage, "total_time": usage})
+        return response
+
+    @graph.get("/{object_id}/insights")
+    async def insights(object_id: str, request: Request):
+        if object_id.startswith("act_"):
+            return _page(data.ads, request)
+        # get_campaign_statistics: одна кампанія, агреговані метрики
+        rows = [ad for ad in data.ads if ad["campaign_id"] == object_id]
+        return {"data": rows}
+
+    @graph.get("/{object_id}/leadgen_forms")
+    async def leadgen_forms(object_id: str):
+        return {"data": [
+            {"id": form_id, "name": f"Fake form {form_id}", "status": "ACTIVE", "leads_count": len(leads)}
+            for form_id, leads in data.leads_by_form.items()
+        ]}
+
+    @graph.get("/{form_id}/leads")
+    async def form_leads(form_id: str, request: Request):
+        leads = data.leads_by_form.get(form_id)
+        if leads is None:
+            return JSONResponse({"error": {"message": "Unknown form", "code": 100}}, status_code=400)
+        return _page(leads, request, default_limit=1000)
+
+    @graph.get("/{object_id}")
+    async def graph_object(object_id: str, fields: str = ""):
+        if "targeting" in fields:
+            return {"id": object_id, "targeting": {"geo_locations": {"countries": ["UA"], "cities": [{"name": "Kyiv"}]}}}
+        return {
+            "id": object_id,
+            "creative": {
+                "id": f"cr{object_id}",
+                "name": f"Creative {object_id}",
+                "title": "Онлайн-школа англійської",
+                "body": "Пробний урок безкоштовно",
+                "image_url": "https://scontent.example/fake.jpg",
+                "thumbnail_url": "https://scontent.example/fake_thumb.jpg",
+            },
+        }
+
+    return graph
+
+
+def create_alfacrm_app(data: FakeData, faults: FaultConfig, stats: Counter) -> FastAPI:
+    alfacrm = FastAPI(title="Fake AlfaCRM API")
+    add_fault_injection(alfacrm, faults, stats, "alfacrm", {"name": "Too Many Requests", "status": 429})
+
+    def authorized(request: Request) -> bool:
+        return request.headers.get("X-ALFACRM-TOKEN") == ALFACRM_TOKEN
+
+    @alfacrm.post("/v2api/auth/login")
+    async def login(payload: Dict[str, Any]):
+        if not payload.get("email") or not payload.get("api_key"):
+            return JSONResponse({"name": "Unauthorized", "status": 401}, status_code=401)
+        return {"token": ALFACRM_TOKEN}
+
+    @alfacrm.post("/v2api/company/index")
+    @alfacrm.get("/v2api/company/index")
+    async def company_index(request: Request):
+        if not authorized(request):
+            return JSONResponse({"name": "Unauthorized", "status": 401}, status_code=401)
+        return {"total": 1, "count": 1, "page": 0, "items": [{"id": 1, "name": "Fake company"}]}
+
+    @alfacrm.post("/v2api/customer/index")
+    async def customer_index(request: Request, payload: Dict[str, Any]):
+        if not authorized(request):
+            return JSONResponse({"name": "Unauthorized", "status": 401}, status_code=401)
+        page = int(payload.get("page", 1))
+        page_size = int(payload.get("page_size", 50))
+        start = max(page - 1, 0) * page_size
+        items = data.students[start:start + page_size]
+        return {"total": len(data.students), "count": len(items), "page": page, "items": items}
+
+    return alfacrm
+
+
+def create_nethunt_app(data: FakeData, faults: FaultConfig, stats: Counter) -> FastAPI:
+    nethunt = FastAPI(title="Fake NetHunt API")
+    add_fault_injection(nethunt, faults, stats, "nethunt", {"error": "Too Many Requests"})
+
+    @nethunt.get("/folders")
+    async def folders():
+        return [{"id": NETHUNT_FOLDER_ID, "name": "Вчителі"}]
+
+    @nethunt.get("/folders/{folder_id}/fields")
+    async def folder_fields(folder_id: str):
+        return [{"name": "Name"}, {"name": "Phone"}, {"name": "Email"}, {"name": "Status"}]
+
+    @nethunt.get("/folders/{folder_id}/records")
+    async def records(folder_id: str, limit: int = 500):
+        return data.records[:limit]
+
+    return nethunt
+
+
+def create_app(size: int = 1000, faults: Optional[FaultConfig] = None, seed: Optional[int] = None) -> FastAPI:
+    faults = faults or FaultConfig()
+    stats: Counter = Counter()
+    data = FakeData(size, seed=seed)
+
+    app = FastAPI(title="Fake upstreams")
+    app.state.faults = faults
+    app.state.stats = stats
+    app.state.data = data
+
+    @app.get("/_faults")
+    async def get_faults():
+        return asdict(faults)
+
+    @app.post("/_faults")
+    async def set_faults(payload: Dict[str, Any]):
+        faults.update(payload)
+        return asdict(faults)
+
+    @app.get("/_stats")
+    async def get_stats():
+        return dict(stats)
+
+    app.mount("/graph", create_graph_app(data, faults, stats))
+    app.mount("/alfacrm", create_alfacrm_app(data, faults, stats))
+    app.mount("/nethunt", create_nethunt_app(data, faults, stats))
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Fake Meta Graph / AlfaCRM / NetHunt servers")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--size", type=int, default=1000, help="Кількість лідів у датасеті")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    faults = FaultConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+    )
+    base = f"http://{args.host}:{args.port}"
+    print("Export for the app under test:")
+    print(f"  GRAPH_URL={base}/graph")
+    print(f"  META_API_BASE={base}/graph")
+    print(f"  ALFACRM_BASE_URL={base}/alfacrm")
+    print(f"  NETHUNT_API_URL={base}/nethunt")
+    print(f"  META_PAGE_ID={PAGE_ID} NETHUNT_FOLDER_ID={NETHUNT_FOLDER_ID}")
+    uvicorn.run(create_app(args.size, faults, seed=args.seed), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
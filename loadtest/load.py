@@ -0,0 +1,152 @@
+"""
+Генератор навантаження для /api/meta-data та run_pipeline (/api/start-job).
+
+    # N паралельних клієнтів, M запитів; --refresh обходить кеш звітів
+    python -m loadtest.load meta-data --base-url http://127.0.0.1:8000 --concurrency 8 --requests 200 --refresh
+
+    # K pipeline запусків з різними періодами (інакше вони об'єднуються в один)
+    python -m loadtest.load pipeline --base-url http://127.0.0.1:8000 --jobs 5 --concurrency 2
+
+Застосунок має бути запущений з RATE_LIMIT_ENABLED=false та base URL на
+fake сервери (python -m loadtest.fake_upstreams), інакше limiter поверне 429
+після 30 запитів на хвилину.
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+import httpx
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def summarize(name: str, latencies: List[float], statuses: Counter, elapsed: float, extra: Optional[Dict] = None) -> Dict:
+    total = sum(statuses.values())
+    summary = {
+        "scenario": name,
+        "requests": total,
+        "elapsed_s": round(elapsed, 2),
+        "throughput_per_s": round(total / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 1),
+            "p90": round(percentile(latencies, 90) * 1000, 1),
+            "p99": round(percentile(latencies, 99) * 1000, 1),
+            "max": round(max(latencies) * 1000, 1) if latencies else 0.0,
+        },
+        "statuses": dict(statuses),
+    }
+    if extra:
+        summary.update(extra)
+    return summary
+
+
+def _cache_status(server_timing: str) -> str:
+    # Server-Timing: ..., cache;desc="HIT"
+    for part in server_timing.split(","):
+        part = part.strip()
+        if part.startswith("cache;desc="):
+            return part.split("=", 1)[1].strip('"')
+    return "unknown"
+
+
+async def run_meta_data(args) -> Dict:
+    params = {"start_date": args.start_date, "end_date": args.end_date}
+    if args.refresh:
+        params["refresh"] = 1
+
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    cache: Counter = Counter()
+    remaining = iter(range(args.requests))
+
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout) as client:
+        async def worker():
+            for _ in remaining:
+                started = time.perf_counter()
+                try:
+                    response = await client.get("/api/meta-data", params=params)
+                except httpx.HTTPError as e:
+                    statuses[type(e).__name__] += 1
+                    continue
+                latencies.append(time.perf_counter() - started)
+                statuses[response.status_code] += 1
+                cache[_cache_status(response.headers.get("server-timing", ""))] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return summarize("meta-data", latencies, statuses, elapsed, {"cache": dict(cache)})
+
+
+async def _wait_for_job(client: httpx.AsyncClient, job_id: str) -> str:
+    """Читає SSE /api/events/{job_id} до status done/error."""
+    status = "unknown"
+    async with client.stream("GET", f"/api/events/{job_id}") as response:
+        async for line in response.aiter_lines():
+            if line.startswith("data: {"):
+                status = json.loads(line[len("data: "):]).get("status", status)
+    return status
+
+
+async def run_pipeline(args) -> Dict:
+    start = date.fromisoformat(args.start_date)
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    remaining = iter(range(args.jobs))
+
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout) as client:
+        async def worker():
+            for i in remaining:
+                payload = {
+                    "start_date": start.isoformat(),
+                    "end_date": (start + timedelta(days=i)).isoformat(),
+                    "sheet_id": args.sheet_id,
+                }
+                started = time.perf_counter()
+                response = await client.post("/api/start-job", json=payload)
+                if response.status_code != 200:
+                    statuses[response.status_code] += 1
+                    continue
+                statuses[await _wait_for_job(client, response.json()["job_id"])] += 1
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+    summary = summarize("pipeline", latencies, statuses, elapsed)
+    summary["jobs_per_min"] = round(len(latencies) / elapsed * 60, 2) if elapsed else 0.0
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load generator for /api/meta-data and run_pipeline")
+    parser.add_argument("scenario", choices=["meta-data", "pipeline"])
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=100, help="meta-data: кількість запитів")
+    parser.add_argument("--jobs", type=int, default=3, help="pipeline: кількість запусків")
+    parser.add_argument("--start-date", default="2025-10-01")
+    parser.add_argument("--end-date", default="2025-10-07")
+    parser.add_argument("--refresh", action="store_true", help="meta-data: обійти кеш звітів")
+    parser.add_argument("--sheet-id", default=None)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    args = parser.parse_args()
+
+    runner = run_meta_data if args.scenario == "meta-data" else run_pipeline
+    print(json.dumps(asyncio.run(runner(args)), indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
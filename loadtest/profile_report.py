@@ -0,0 +1,75 @@
+"""
+Профілювання повної побудови звіту /api/meta-data з касети (без мережі).
+
+    # 1. Записати відповіді (реальні API або loadtest.fake_upstreams)
+    python -m loadtest.profile_report --cassette cassettes/week.jsonl.gz --mode record
+
+    # 2. Відтворити на максимальній швидкості під cProfile
+    python -m loadtest.profile_report --cassette cassettes/week.jsonl.gz --speed max --top 30
+
+Облікові дані (META_ACCESS_TOKEN, ALFACRM_* ...) при відтворенні можуть бути
+будь-якими непорожніми - токени в касеті замінені на REDACTED і не
+впливають на зіставлення запитів.
+"""
+import argparse
+import asyncio
+import cProfile
+import io
+import json
+import os
+import pstats
+import time
+
+
+async def build(start_date: str, end_date: str):
+    from app.database import get_db, init_db
+    from app.main import _read_campaign_keywords, build_meta_report
+    from app.timing import StageTimer
+
+    init_db()
+    keywords_teachers, keywords_students = _read_campaign_keywords()
+    timer = StageTimer()
+    with get_db() as db:
+        report = await build_meta_report(
+            db, os.getenv("META_ACCESS_TOKEN", "replay"), os.getenv("META_AD_ACCOUNT_ID", "act_replay"),
+            start_date, end_date, keywords_teachers, keywords_students, timer=timer
+        )
+    return report, timer.durations_ms(remainder="formatting")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile build_meta_report against an HTTP cassette")
+    parser.add_argument("--cassette", required=True)
+    parser.add_argument("--mode", choices=["record", "replay"], default="replay")
+    parser.add_argument("--speed", default="max", help="replay: original | max | прискорення (2.0)")
+    parser.add_argument("--start-date", default="2025-10-01")
+    parser.add_argument("--end-date", default="2025-10-07")
+    parser.add_argument("--top", type=int, default=25, help="Кількість функцій у звіті cProfile")
+    parser.add_argument("--sort", default="cumulative")
+    args = parser.parse_args()
+
+    os.environ.setdefault("PREWARM_ENABLED", "false")
+    from app import http_cassette
+
+    with http_cassette.cassette(args.cassette, mode=args.mode, speed=args.speed):
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        profiler.enable()
+        report, timings = asyncio.run(build(args.start_date, args.end_date))
+        profiler.disable()
+        elapsed = time.perf_counter() - started
+
+    print(json.dumps({
+        "elapsed_s": round(elapsed, 3),
+        "rows": {tab: len(report.get(tab, [])) for tab in ("ads", "students", "teachers")},
+        "timings_ms": timings,
+    }, indent=2, ensure_ascii=False))
+
+    if args.mode == "replay":
+        output = io.StringIO()
+        pstats.Stats(profiler, stream=output).sort_stats(args.sort).print_stats(args.top)
+        print(output.getvalue())
+
+
+if __name__ == "__main__":
+    main()
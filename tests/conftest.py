@@ -4,7 +4,13 @@ Pytest configuration та загальні fixtures для тестів eCademy.
 
 import os
 import pytest
+from contextlib import contextmanager
 from unittest.mock import Mock
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.models import Base
 
 
 @pytest.fixture
@@ -90,3 +96,41 @@ def mock_forms_response():
         ],
         "paging": {}
     }
+
+
+@pytest.fixture
+def db_engine():
+    """
+    In-memory SQLite з усіма таблицями.
+
+    StaticPool тримає одне з'єднання, тож ту саму базу бачать і потоки
+    asyncio.to_thread / writer-потоки.
+    """
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def Session(db_engine):
+    """sessionmaker над db_engine."""
+    return sessionmaker(bind=db_engine)
+
+
+@pytest.fixture
+def patched_get_db(Session):
+    """Замінник app.database.get_db над тестовою базою (підставляється через monkeypatch)."""
+    @contextmanager
+    def fake_get_db():
+        session = Session()
+        try:
+            yield session
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    return fake_get_db
@@ -323,7 +323,7 @@ class TestDownloadExcelEndpoint:
 
     @patch.dict('os.environ', {'EXCEL_STUDENTS_PATH': 'test_students.xlsx'})
     @patch('app.main.os.path.exists')
-    @patch('app.main.openpyxl.load_workbook')
+    @patch('openpyxl.load_workbook')
     def test_download_excel_students_success(self, mock_load_wb, mock_exists, client):
         """Тест успішного експорту студентів в Excel."""
         # Arrange
@@ -0,0 +1,204 @@
+"""
+Unit тести для денних фактів кампаній та rollup таблиць (app/services/campaign_facts.py).
+
+Використовуємо SQLite in-memory базу.
+"""
+
+import pytest
+from datetime import date
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models import Base, CampaignDailyFact, CampaignRollup
+from app.services import campaign_facts
+
+
+@pytest.fixture
+def db():
+    """Створює сесію до порожньої in-memory бази."""
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+def _daily_insight(campaign_id, day, spend, leads=0, name="Student/Kyiv"):
+    return {
+        "campaign_id": campaign_id,
+        "campaign_name": name,
+        "date_start": day,
+        "date_stop": day,
+        "spend": str(spend),
+        "impressions": "100",
+        "clicks": "10",
+        "actions": [{"action_type": "lead", "value": str(leads)}],
+    }
+
+
+def _fill_october(db):
+    """Заповнює жовтень 2025: кампанія 1 витрачає $1 та отримує 1 лід щодня."""
+    insights = [_daily_insight("1", f"2025-10-{d:02d}", 1.0, leads=1) for d in range(1, 32)]
+    campaign_facts.store_daily_metrics(
+        db, insights, "2025-10-01", "2025-10-31",
+        keywords_students=["student"], keywords_teachers=["teacher"]
+    )
+    campaign_facts.rebuild_rollups(db, "2025-10-01", "2025-10-31")
+
+
+class TestSplitRange:
+    """Тести для розбиття періоду на місяці, тижні та дні."""
+
+    def test_full_month(self):
+        """Тест що повний місяць береться з місячного rollup."""
+        months, weeks, days = campaign_facts.split_range(date(2025, 10, 1), date(2025, 10, 31))
+
+        assert months == [date(2025, 10, 1)]
+        assert weeks == []
+        assert days == []
+
+    def test_partial_range_uses_weeks_and_days(self):
+        """Тест що неповний період розбивається на повні тижні та окремі дні."""
+        # 2025-10-06 - понеділок
+        months, weeks, days = campaign_facts.split_range(date(2025, 10, 4), date(2025, 10, 20))
+
+        assert months == []
+        assert weeks == [date(2025, 10, 6), date(2025, 10, 13)]
+        assert days == [date(2025, 10, 4), date(2025, 10, 5), date(2025, 10, 20)]
+
+    def test_periods_cover_range_without_overlap(self):
+        """Тест що кожен день періоду покривається рівно один раз."""
+        start, end = date(2025, 9, 17), date(2025, 12, 3)
+        months, weeks, days = campaign_facts.split_range(start, end)
+
+        covered = list(days)
+        for week in weeks:
+            covered += [date.fromordinal(week.toordinal() + i) for i in range(7)]
+        for month in months:
+            cursor = month
+            while cursor.month == month.month:
+                covered.append(cursor)
+                cursor = date.fromordinal(cursor.toordinal() + 1)
+
+        assert sorted(covered) == [date.fromordinal(o) for o in range(start.toordinal(), end.toordinal() + 1)]
+
+
+class TestStoreDailyMetrics:
+    """Тести для запису денних метрик."""
+
+    def test_rerun_replaces_period(self, db):
+        """Тест що повторний запуск pipeline не дублює факти."""
+        # Act
+        _fill_october(db)
+        _fill_october(db)
+
+        # Assert
+        assert db.query(CampaignDailyFact).count() == 31
+        assert db.query(CampaignRollup).filter(CampaignRollup.grain == "month").count() == 1
+
+    def test_ad_level_rows_are_summed_per_campaign(self, db):
+        """Тест що рядки рівня оголошень сумуються до кампанії."""
+        # Arrange
+        insights = [_daily_insight("1", "2025-10-01", 2.5), _daily_insight("1", "2025-10-01", 1.5)]
+
+        # Act
+        campaign_facts.store_daily_metrics(db, insights, "2025-10-01", "2025-10-01")
+
+        # Assert
+        fact = db.query(CampaignDailyFact).one()
+        assert fact.spend == 4.0
+        assert fact.impressions == 200
+
+
+class TestQueryCampaignTotals:
+    """Тести для підсумків за період."""
+
+    def test_month_and_partial_ranges(self, db):
+        """Тест що суми з rollup та денних фактів збігаються."""
+        # Arrange
+        _fill_october(db)
+
+        # Act
+        month = campaign_facts.query_campaign_totals(db, "2025-10-01", "2025-10-31")
+        partial = campaign_facts.query_campaign_totals(db, "2025-10-04", "2025-10-20")
+
+        # Assert
+        assert month["1"]["spend"] == 31.0
+        assert month["1"]["leads_fb"] == 31
+        assert month["1"]["audience"] == "students"
+        assert partial["1"]["spend"] == 17.0
+        assert partial["1"]["clicks"] == 170
+
+    def test_funnel_is_summed_by_status(self, db):
+        """Тест підсумків воронки CRM по статусах."""
+        # Arrange
+        _fill_october(db)
+        enriched = {
+            "1": {
+                "campaign_id": "1",
+                "daily_funnel_stats": {
+                    "2025-10-01": {"Призначено пробне (ЦА)": 2, "Архів (ЦА)": 0},
+                    "2025-10-15": {"Призначено пробне (ЦА)": 1},
+                }
+            }
+        }
+        campaign_facts.store_daily_funnel(db, enriched, "2025-10-01", "2025-10-31")
+        campaign_facts.rebuild_rollups(db, "2025-10-01", "2025-10-31")
+
+        # Act
+        totals = campaign_facts.query_campaign_totals(db, "2025-10-01", "2025-10-31")
+
+        # Assert
+        assert totals["1"]["funnel"] == {"Призначено пробне (ЦА)": 3}
+
+    def test_audience_filter(self, db):
+        """Тест фільтрації по аудиторії."""
+        # Arrange
+        insights = [
+            _daily_insight("1", "2025-10-01", 1.0, name="Student/Kyiv"),
+            _daily_insight("2", "2025-10-01", 1.0, name="Teacher/Lviv"),
+        ]
+        campaign_facts.store_daily_metrics(
+            db, insights, "2025-10-01", "2025-10-01",
+            keywords_students=["student"], keywords_teachers=["teacher"]
+        )
+
+        # Act
+        teachers = campaign_facts.query_campaign_totals(db, "2025-10-01", "2025-10-01", audience="teachers")
+
+        # Assert
+        assert list(teachers.keys()) == ["2"]
+
+    def test_audience_filter_keeps_funnel_only_campaign(self, db):
+        """Тест що кампанія лише з воронкою за період не губиться фільтром."""
+        # Arrange
+        campaign_facts.store_daily_metrics(
+            db, [_daily_insight("2", "2025-10-01", 1.0, name="Teacher/Lviv")], "2025-10-01", "2025-10-01",
+            keywords_students=["student"], keywords_teachers=["teacher"]
+        )
+        enriched = {"2": {"campaign_id": "2", "daily_funnel_stats": {"2025-10-05": {"Призначено пробне (ЦА)": 1}}}}
+        campaign_facts.store_daily_funnel(db, enriched, "2025-10-05", "2025-10-05")
+
+        # Act
+        teachers = campaign_facts.query_campaign_totals(db, "2025-10-05", "2025-10-05", audience="teachers")
+
+        # Assert
+        assert teachers["2"]["audience"] == "teachers"
+        assert teachers["2"]["campaign_name"] == "Teacher/Lviv"
+        assert teachers["2"]["funnel"] == {"Призначено пробне (ЦА)": 1}
+
+
+class TestGroupLeadsByDay:
+    """Тести для групування лідів по днях."""
+
+    def test_groups_by_created_time(self):
+        leads = [
+            {"id": "a", "created_time": "2025-10-08T09:09:27+0000"},
+            {"id": "b", "created_time": "2025-10-08T19:00:00+0000"},
+            {"id": "c", "created_time": "2025-10-09T01:00:00+0000"},
+            {"id": "d"},
+        ]
+
+        grouped = campaign_facts.group_leads_by_day(leads)
+
+        assert {day: len(v) for day, v in grouped.items()} == {"2025-10-08": 2, "2025-10-09": 1}
@@ -0,0 +1,285 @@
+"""
+Unit тести для відкладеного витягування телефонів лідів (LeadPhoneSource),
+payload_version=3 та drill-down /api/campaigns/{campaign_id}/leads.
+"""
+
+
+import pytest
+
+from app.services import alfacrm_tracking, nethunt_tracking, phone_payload
+from app.services.phone_payload import counts_report
+
+
+PERIOD = "2025-10-01 - 2025-10-07"
+
+
+def _lead(phone):
+    return {"field_data": [{"name": "phone_number", "values": [phone]}]}
+
+
+# Ключі - сирі id кампаній Meta, як у meta_leads.get_leads_for_period
+ENGLISH_ID = "120210000000001"
+GERMAN_ID = "120210000000002"
+TEACHERS_ID = "120210000000077"
+
+STUDENT_CAMPAIGNS = {
+    ENGLISH_ID: {"campaign_id": ENGLISH_ID, "campaign_name": "Англійська",
+                 "leads": [_lead("+380501111111"), _lead("+380502222222")]},
+    GERMAN_ID: {"campaign_id": GERMAN_ID, "campaign_name": "Німецька", "leads": [_lead("+380503333333")]},
+}
+STUDENT_INDEX = {
+    "380501111111": {"lead_status_id": 4},  # Отримана оплата (ЦА)
+    "380503333333": {"lead_status_id": 4},
+}
+TEACHER_CAMPAIGNS = {
+    TEACHERS_ID: {"campaign_id": TEACHERS_ID, "campaign_name": "Вчителі",
+                  "leads": [{"phone": "+380507777777"}, {"phone": "+380508888888"}]},
+}
+TEACHER_INDEX = {
+    "380507777777": {"id": "nh_1", "status": "interview_target", "status_column": "Співбесіда (ЦА)"},
+}
+
+
+def _report():
+    return {
+        "payload_version": 2,
+        "ads": [],
+        "students": [
+            {
+                "campaign_id": ENGLISH_ID,
+                "campaign_name": "Англійська",
+                "phones": ["+380501111111", "+380502222222"],
+                "leads_count": 2,
+                "Не розібраний": [1],
+                "Отримана оплата (ЦА)": [0],
+            },
+            {"campaign_id": GERMAN_ID, "campaign_name": "Німецька", "phones": ["+380503333333"], "leads_count": 1},
+        ],
+        "teachers": [{"campaign_id": TEACHERS_ID, "campaign_name": "Вчителі", "leads_count": 2}],
+        "period": PERIOD,
+    }
+
+
+@pytest.fixture
+def lead_source():
+    from app.main import LeadPhoneSource
+
+    return LeadPhoneSource("2025-10-07", STUDENT_CAMPAIGNS, STUDENT_INDEX, TEACHER_CAMPAIGNS, TEACHER_INDEX, {})
+
+
+class TestLeadPhoneSource:
+    """Тести для LeadPhoneSource."""
+
+    def test_extracts_only_requested_campaign(self, lead_source):
+        # Act
+        phones = lead_source.campaign_phones("students", ENGLISH_ID)
+
+        # Assert
+        assert phones["phones"] == ["380501111111", "380502222222"]
+        assert list(lead_source._phones) == [("students", ENGLISH_ID)]
+        assert lead_source.campaign_phones("students", ENGLISH_ID) is phones
+
+    def test_teachers_without_history_use_current_status(self, lead_source):
+        # Act
+        phones = phone_payload.expand_campaign_phones(lead_source.campaign_phones("teachers", TEACHERS_ID))
+
+        # Assert
+        assert phones["Співбесіда (ЦА)"] == [{"phone": "380507777777", "status": "current"}]
+        assert phones["Нові"] == [{"phone": "380508888888", "status": "current"}]
+
+    def test_missing_index_returns_none(self):
+        # Arrange
+        from app.main import LeadPhoneSource
+        source = LeadPhoneSource("2025-10-07", STUDENT_CAMPAIGNS, {}, TEACHER_CAMPAIGNS, {}, {})
+
+        # Act & Assert
+        assert source.campaign_phones("students", ENGLISH_ID) is None
+        assert source.campaign_phones("teachers", TEACHERS_ID) is None
+
+    def test_keeps_only_records_of_report_leads(self):
+        """Тест що запис кешу не тримає повні індекси CRM."""
+        # Arrange
+        from app.main import LeadPhoneSource
+        student_index = {**STUDENT_INDEX, "380509999999": {"lead_status_id": 4, "name": "Не лід звіту"}}
+        teacher_index = {**TEACHER_INDEX, "380506666666": {"id": "nh_2"}}
+        histories = {"nh_1": [], "nh_2": [{"new_status": "teacher"}]}
+
+        # Act
+        source = LeadPhoneSource(
+            "2025-10-07", STUDENT_CAMPAIGNS, student_index, TEACHER_CAMPAIGNS, teacher_index, histories
+        )
+
+        # Assert
+        assert source.student_index == {
+            "380501111111": {"lead_status_id": 4}, "380503333333": {"lead_status_id": 4},
+        }
+        assert set(source.teacher_index) == {"380507777777"}
+        assert source.teacher_status_histories == {"nh_1": []}
+        assert source.all_phones() == LeadPhoneSource(
+            "2025-10-07", STUDENT_CAMPAIGNS, STUDENT_INDEX, TEACHER_CAMPAIGNS, TEACHER_INDEX, {}
+        ).all_phones()
+
+    def test_all_phones(self, lead_source):
+        # Act
+        lead_phones = lead_source.all_phones()
+
+        # Assert
+        assert set(lead_phones["students"]) == {ENGLISH_ID, GERMAN_ID}
+        assert set(lead_phones["teachers"]) == {TEACHERS_ID}
+
+
+class TestCountsReport:
+    """Тести для payload_version=3."""
+
+    def test_counts_only(self):
+        # Act
+        report = counts_report({**_report(), "lead_phones": {"students": {}, "teachers": {}}})
+
+        # Assert
+        assert report["payload_version"] == 3
+        assert "lead_phones" not in report
+        assert "phones" not in report["students"][0]
+        assert report["students"][0]["leads_count"] == 2
+        assert report["students"][0]["Отримана оплата (ЦА)"] == 1
+
+
+class TestCampaignLeadsEndpoint:
+    """Тести для /api/campaigns/{campaign_id}/leads."""
+
+    @pytest.fixture
+    def client(self, lead_source, patched_get_db, monkeypatch):
+        from fastapi.testclient import TestClient
+        from app import main
+
+        async def fake_build(db, *args, timer=None, defer_lead_phones=False, **kwargs):
+            report = _report()
+            report["lead_phones"] = None
+            report["_lead_source"] = lead_source
+            return report
+
+        monkeypatch.setenv("META_ACCESS_TOKEN", "token")
+        monkeypatch.setenv("META_AD_ACCOUNT_ID", "act_1")
+        monkeypatch.setattr(main, "get_db", patched_get_db)
+        monkeypatch.setattr(main, "meta_report_cache", main.ReportCache())
+        monkeypatch.setattr(main, "build_meta_report", fake_build)
+        return TestClient(main.app, base_url="http://localhost")
+
+    def test_counts_report_defers_phones(self, client, lead_source):
+        # Act
+        response = client.get(
+            "/api/meta-data", params={"start_date": "2025-10-01", "end_date": "2025-10-07", "payload_version": 3}
+        )
+
+        # Assert
+        body = response.json()
+        assert body["students"][0]["leads_count"] == 2
+        assert "lead_phones" not in body
+        assert lead_source._phones == {}
+
+    def test_lead_source_cached_with_report(self, client, lead_source):
+        # Arrange
+        from app import main
+        params = {"start_date": "2025-10-01", "end_date": "2025-10-07"}
+
+        # Act
+        counts = client.get("/api/meta-data", params={**params, "payload_version": 3}).json()
+        full = client.get("/api/meta-data", params=params)
+
+        # Assert
+        (_, cached, _, _), = main.meta_report_cache._store.values()
+        assert cached["_lead_source"] is lead_source
+        assert "_lead_source" not in counts
+        assert "_lead_source" not in full.json()
+        assert full.headers["X-Cache"] == "HIT"
+        assert set(full.json()["lead_phones"]["students"]) == {ENGLISH_ID, GERMAN_ID}
+
+    def test_drilldown_single_campaign(self, client, lead_source):
+        # Act
+        response = client.get(f"/api/campaigns/{ENGLISH_ID}/leads", params={"period": PERIOD})
+
+        # Assert
+        assert response.status_code == 200
+        body = response.json()
+        assert body["tab"] == "students"
+        assert body["status_phones"]["Отримана оплата (ЦА)"] == ["+380501111111"]
+        assert body["status_phones"]["Не розібраний"] == ["+380502222222"]
+        assert {"phone": "380502222222", "status": "current"} in body["lead_phones"]["Не розібраний"]
+        assert list(lead_source._phones) == [("students", ENGLISH_ID)]
+
+    def test_status_filter(self, client):
+        # Act
+        response = client.get(
+            f"/api/campaigns/campaign_{ENGLISH_ID}/leads",
+            params={"start_date": "2025-10-01", "end_date": "2025-10-07", "status": "Не розібраний"},
+        )
+
+        # Assert
+        body = response.json()
+        assert body["campaign_id"] == ENGLISH_ID
+        assert body["status_phones"] == {"Не розібраний": ["+380502222222"]}
+        assert list(body["lead_phones"]) == ["Не розібраний"]
+
+    def test_teacher_campaign(self, client):
+        # Act
+        response = client.get(f"/api/campaigns/{TEACHERS_ID}/leads", params={"period": PERIOD})
+
+        # Assert
+        assert response.status_code == 200
+        body = response.json()
+        assert body["tab"] == "teachers"
+        assert body["status_phones"] == {}
+        assert body["lead_phones"]["Співбесіда (ЦА)"] == [{"phone": "380507777777", "status": "current"}]
+
+    def test_unknown_campaign(self, client):
+        # Act
+        response = client.get("/api/campaigns/campaign_404/leads", params={"period": PERIOD})
+
+        # Assert
+        assert response.status_code == 404
+
+    def test_full_payload_extracts_on_request(self, client, lead_source):
+        # Act
+        response = client.get("/api/meta-data", params={"start_date": "2025-10-01", "end_date": "2025-10-07"})
+
+        # Assert
+        lead_phones = response.json()["lead_phones"]["students"]
+        assert set(lead_phones) == {ENGLISH_ID, GERMAN_ID}
+        assert lead_phones[GERMAN_ID]["Отримана оплата"] == [{"phone": "380503333333", "status": "current"}]
+
+
+class TestTrackingIndexes:
+    """Індекс контактів для телефонів лідів - той самий, що й для трекінгу воронки."""
+
+    def test_load_teacher_index_keeps_only_lead_contacts(self, monkeypatch):
+        # Arrange
+        records = [
+            {"id": "nh_1", "phone": "0507777777", "status": "Interview Target"},
+            {"id": "nh_2", "phone": "0509999999", "status": "unprocessed"},
+        ]
+        monkeypatch.setattr(nethunt_tracking, "nethunt_list_records", lambda **kwargs: records)
+        monkeypatch.setattr(nethunt_tracking, "_record_status_snapshots", lambda records: None)
+
+        # Act
+        index = nethunt_tracking.load_teacher_index(TEACHER_CAMPAIGNS)
+
+        # Assert
+        assert list(index) == ["380507777777"]
+        assert index["380507777777"]["status_column"] == "Співбесіда (ЦА)"
+
+    async def test_student_tracking_reuses_loaded_index(self, monkeypatch):
+        # Arrange
+        def fail_load(**kwargs):
+            raise AssertionError("AlfaCRM не повинен завантажуватись повторно")
+
+        monkeypatch.setattr(alfacrm_tracking, "alfacrm_list_all_leads", fail_load)
+
+        # Act
+        enriched = await alfacrm_tracking.track_leads_by_campaigns(STUDENT_CAMPAIGNS, student_index=STUDENT_INDEX)
+
+        # Assert
+        assert enriched[ENGLISH_ID]["leads_count"] == 2
+        assert enriched[GERMAN_ID]["phone_indexes"]["phones"]
+
+    def test_no_lead_contacts_skips_alfacrm(self):
+        # Act & Assert
+        assert alfacrm_tracking.load_student_index({ENGLISH_ID: {"leads": []}}) is None
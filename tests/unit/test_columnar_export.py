@@ -0,0 +1,309 @@
+"""
+Unit тести для колонкового експорту (app/columnar_export.py), format=...
+у /api/export-meta-excel та потокового /api/export/{tab}.csv|.ndjson.
+"""
+
+import csv
+import datetime
+import io
+import json
+import zipfile
+
+import pytest
+
+from app import columnar_export
+from app.columnar_export import coerce_numeric, columns_of, dict_rows, export_tables, infer_kind
+
+
+STUDENTS = [
+    {"campaign_name": "Англійська", "leads_count": ["+380501111111", "+380502222222"], "budget": 10, "ctr": 1.5},
+    {"campaign_name": "Німецька", "leads_count": [], "budget": 7.25, "ctr": None},
+]
+
+
+class TestInferKind:
+    """Тести для визначення типу колонки."""
+
+    @pytest.mark.parametrize("values, kind", [
+        ([1, 2, None], "int64"),
+        ([1, 2.5], "float64"),
+        ([True, None], "bool"),
+        ([datetime.datetime(2025, 10, 1)], "timestamp"),
+        ([datetime.date(2025, 10, 1)], "date"),
+        ([1, "a"], "string"),
+        ([True, 1], "string"),
+        ([None, None], "string"),
+    ])
+    def test_kinds(self, values, kind):
+        # Act & Assert
+        assert infer_kind(values) == kind
+
+    def test_coerce_numeric_strings(self):
+        # Act & Assert
+        assert coerce_numeric(["12", "", None, "3.0"], "int64") == [12, None, None, 3]
+        assert coerce_numeric(["1.5", "2"], "float64") == [1.5, 2.0]
+        assert coerce_numeric(["1.5", "n/a"], "float64") is None
+
+
+class TestCsvExport:
+    """CSV працює без pyarrow."""
+
+    def test_single_table(self):
+        # Arrange
+        columns = columns_of(STUDENTS)
+
+        # Act
+        path, filename, media_type = export_tables(
+            [("students", columns, dict_rows(STUDENTS, columns))], "csv", "students_export"
+        )
+
+        # Assert
+        with open(path, encoding="utf-8", newline="") as f:
+            rows = list(csv.reader(f))
+        assert filename == "students_export.csv"
+        assert media_type.startswith("text/csv")
+        assert rows[0] == ["campaign_name", "leads_count", "budget", "ctr"]
+        assert rows[1] == ["Англійська", "+380501111111\n+380502222222", "10", "1.5"]
+        assert rows[2][3] == ""
+
+    def test_several_tables_zipped(self):
+        # Act
+        path, filename, media_type = export_tables(
+            [("ads", ["ad_name"], [["A"]]), ("teachers", [], [])], "csv", "meta"
+        )
+
+        # Assert
+        with zipfile.ZipFile(path) as zf:
+            assert zf.namelist() == ["ads.csv", "teachers.csv"]
+            assert zf.read("ads.csv").decode("utf-8").splitlines() == ["ad_name", "A"]
+        assert filename == "meta.zip"
+        assert media_type == "application/zip"
+
+
+class TestArrowExport:
+    """parquet/arrow з типізованими колонками (потребує pyarrow)."""
+
+    def test_parquet_dtypes(self):
+        # Arrange
+        pa = pytest.importorskip("pyarrow")
+        import pyarrow.parquet as pq
+        columns = ["ad_name", "spend", "clicks", "leads_count"]
+        rows = [["A", "1.5", "3", ["+380501111111"]], ["B", None, "4", []]]
+
+        # Act
+        path, _, _ = export_tables(
+            [("ads", columns, rows)], "parquet", "ads", dtypes={"spend": "float64", "clicks": "int64"}
+        )
+
+        # Assert
+        table = pq.read_table(path)
+        assert table.schema.field("spend").type == pa.float64()
+        assert table.schema.field("clicks").type == pa.int64()
+        assert table.column("spend").to_pylist() == [1.5, None]
+        assert table.column("leads_count").to_pylist() == ["+380501111111", ""]
+
+    def test_arrow_ipc(self):
+        # Arrange
+        pa = pytest.importorskip("pyarrow")
+        columns = columns_of(STUDENTS)
+
+        # Act
+        path, filename, _ = export_tables([("students", columns, dict_rows(STUDENTS, columns))], "arrow", "s")
+
+        # Assert
+        with pa.memory_map(path) as source:
+            table = pa.ipc.open_file(source).read_all()
+        assert filename == "s.arrow"
+        assert table.schema.field("budget").type == pa.float64()
+        assert table.num_rows == 2
+
+    def test_missing_pyarrow(self, monkeypatch):
+        # Arrange
+        import builtins
+        real_import = builtins.__import__
+
+        def fake_import(name, *args, **kwargs):
+            if name.startswith("pyarrow"):
+                raise ImportError(name)
+            return real_import(name, *args, **kwargs)
+
+        monkeypatch.setattr(builtins, "__import__", fake_import)
+
+        # Act & Assert
+        with pytest.raises(columnar_export.PyArrowUnavailable):
+            export_tables([("ads", ["a"], [[1]])], "parquet", "ads")
+
+
+class TestExportMetaExcelFormat:
+    """Тести для format=... у /api/export-meta-excel."""
+
+    @pytest.fixture
+    def client(self):
+        from fastapi.testclient import TestClient
+        from app import main
+
+        return TestClient(main.app, base_url="http://localhost")
+
+    def test_csv_zip(self, client):
+        # Act
+        response = client.post(
+            "/api/export-meta-excel", params={"format": "csv"},
+            json={"ads": [{"ad_name": "A", "spend": 1.5}], "students": STUDENTS, "teachers": []},
+        )
+
+        # Assert
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/zip"
+        with zipfile.ZipFile(io.BytesIO(response.content)) as zf:
+            assert zf.namelist() == ["ads.csv", "students.csv", "teachers.csv"]
+            students = list(csv.DictReader(io.StringIO(zf.read("students.csv").decode("utf-8"))))
+        assert students[0]["campaign_name"] == "Англійська"
+
+    def test_compact_payload_is_expanded(self, client):
+        """Тест що телефони з payload_version=2 потрапляють у файл рядками."""
+        # Act
+        response = client.post("/api/export-meta-excel", params={"format": "csv"}, json=COMPACT_REPORT)
+
+        # Assert
+        assert response.status_code == 200
+        with zipfile.ZipFile(io.BytesIO(response.content)) as zf:
+            students = list(csv.DictReader(io.StringIO(zf.read("students.csv").decode("utf-8"))))
+        assert students[0]["leads_count"] == "+380501111111\n+380502222222"
+        assert students[0]["Чекає оплату"] == "+380502222222"
+
+    def test_unknown_format(self, client):
+        # Act
+        response = client.post("/api/export-meta-excel", params={"format": "xls"}, json={})
+
+        # Assert
+        assert response.status_code == 400
+
+    def test_parquet_without_pyarrow(self, client, monkeypatch):
+        # Arrange
+        monkeypatch.setattr(columnar_export, "pyarrow_available", lambda: False)
+
+        # Act
+        response = client.post("/api/export-meta-excel", params={"format": "parquet"}, json={})
+
+        # Assert
+        assert response.status_code == 501
+
+
+class TestStreamChunks:
+    """Тести для csv_chunks / ndjson_chunks."""
+
+    def test_csv_chunked_by_rows(self):
+        # Act
+        chunks = list(columnar_export.csv_chunks([["a", "b"], [1, ["x", "y"]], [2, None]], chunk_rows=2))
+
+        # Assert
+        assert chunks == [b'a,b\r\n1,"x\ny"\r\n', b"2,\r\n"]
+
+    def test_ndjson_keeps_arrays(self):
+        # Act
+        chunks = list(columnar_export.ndjson_chunks(["a", "b"], [[1, ["x"]], [2, None]], chunk_rows=5))
+
+        # Assert
+        assert chunks == [b'{"a":1,"b":["x"]}\n{"a":2,"b":null}\n']
+
+
+COMPACT_REPORT = {
+    "payload_version": 2,
+    "ads": [],
+    "students": [
+        {"campaign_name": "Англійська", "phones": ["+380501111111", "+380502222222"], "leads_count": 2,
+         "Чекає оплату": [1], "budget": 10.0},
+        {"campaign_name": "Німецька", "phones": [], "leads_count": 0, "budget": 5.0},
+    ],
+    "teachers": [{"Назва реклами": "Вчителі", "Кількість лідів": 3}],
+    "lead_phones": {"students": {}, "teachers": {}},
+}
+
+
+class TestStreamExportEndpoint:
+    """Тести для /api/export/{tab}.csv|.ndjson."""
+
+    @pytest.fixture
+    def app_with_report(self, patched_get_db, monkeypatch):
+        from app import main
+
+        builds = []
+
+        async def fake_build(db, *args, timer=None, **kwargs):
+            builds.append(1)
+            return json.loads(json.dumps(COMPACT_REPORT))
+
+        monkeypatch.setenv("META_ACCESS_TOKEN", "token")
+        monkeypatch.setenv("META_AD_ACCOUNT_ID", "act_1")
+        monkeypatch.setattr(main, "get_db", patched_get_db)
+        monkeypatch.setattr(main, "meta_report_cache", main.ReportCache())
+        monkeypatch.setattr(main, "build_meta_report", fake_build)
+        main.app.builds = builds
+        return main.app
+
+    def test_csv_projection(self, app_with_report):
+        # Arrange
+        from fastapi.testclient import TestClient
+        client = TestClient(app_with_report, base_url="http://localhost")
+
+        # Act
+        response = client.get("/api/export/students.csv", params={
+            "start_date": "2025-10-01", "end_date": "2025-10-07", "columns": "campaign_name,Чекає оплату,leads_count",
+        })
+
+        # Assert
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+        assert "attachment" in response.headers["content-disposition"]
+        rows = list(csv.reader(io.StringIO(response.text)))
+        assert rows == [
+            ["campaign_name", "Чекає оплату", "leads_count"],
+            ["Англійська", "+380502222222", "+380501111111\n+380502222222"],
+            ["Німецька", "", ""],
+        ]
+
+    def test_ndjson_teachers(self, app_with_report):
+        # Arrange
+        from fastapi.testclient import TestClient
+        client = TestClient(app_with_report, base_url="http://localhost")
+
+        # Act
+        response = client.get("/api/export/teachers.ndjson", params={"start_date": "2025-10-01", "end_date": "2025-10-07"})
+
+        # Assert
+        assert response.headers["content-type"] == "application/x-ndjson"
+        assert [json.loads(line) for line in response.text.splitlines()] == COMPACT_REPORT["teachers"]
+
+    def test_invalid_requests(self, app_with_report):
+        # Arrange
+        from fastapi.testclient import TestClient
+        client = TestClient(app_with_report, base_url="http://localhost")
+        params = {"start_date": "2025-10-01", "end_date": "2025-10-07"}
+
+        # Act & Assert
+        assert client.get("/api/export/leads.csv", params=params).status_code == 404
+        assert client.get("/api/export/ads.xml", params=params).status_code == 400
+        assert client.get("/api/export/ads.csv").status_code == 400
+        assert app_with_report.builds == []
+
+    def test_report_failure_is_server_error(self, app_with_report, monkeypatch):
+        """Тест що помилка звіту - 500, а не порожній CSV зі статусом 200."""
+        # Arrange
+        from fastapi.testclient import TestClient
+        from app import main
+
+        async def failing_build(*args, **kwargs):
+            raise RuntimeError("Graph API down")
+
+        monkeypatch.setattr(main, "build_meta_report", failing_build)
+        client = TestClient(app_with_report, base_url="http://localhost")
+
+        # Act
+        response = client.get(
+            "/api/export/students.csv",
+            params={"start_date": "2025-10-01", "end_date": "2025-10-07", "columns": "campaign_name,budget"}
+        )
+
+        # Assert
+        assert response.status_code == 500
+        assert "Graph API down" in response.json()["error"]
@@ -0,0 +1,190 @@
+"""
+Unit тести для стиснення відповідей та ETag/304 (app/compression.py).
+"""
+
+import gzip
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+from app import compression
+from app.compression import CompressionMiddleware, etag_for, etag_matches, negotiate_encoding
+
+
+REPORT = {"students": [{"campaign_name": "Англійська", "lead_phones": ["+380501234567"] * 50}] * 20}
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=500)
+
+    @app.get("/report")
+    def report():
+        return REPORT
+
+    @app.get("/small")
+    def small():
+        return {"ok": True}
+
+    @app.get("/image")
+    def image():
+        return Response(b"\x89PNG" + b"\x00" * 2000, media_type="image/png")
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse(iter([b'{"a":1}\n'] * 200), media_type="application/x-ndjson")
+
+    @app.get("/tagged")
+    def tagged():
+        return PlainTextResponse("x" * 1000, headers={"ETag": '"fixed"'})
+
+    return TestClient(app, base_url="http://localhost")
+
+
+def _get_raw(client, url, **headers):
+    """Запит без автоматичного розпакування - перевіряємо байти, які йдуть по мережі."""
+    with client.stream("GET", url, headers=headers) as response:
+        return response, b"".join(response.iter_raw())
+
+
+class TestHelpers:
+    """Тести для ETag та вибору кодування."""
+
+    def test_etag_is_content_hash(self):
+        # Act
+        first = etag_for(b'{"a":1}')
+        second = etag_for(b'{"a":1}')
+        other = etag_for(b'{"a":2}')
+
+        # Assert
+        assert first == second
+        assert first != other
+        assert first.startswith('W/"')
+
+    def test_etag_matches_list_weak_and_wildcard(self):
+        # Arrange
+        etag = etag_for(b"body")
+        opaque = etag[2:]
+
+        # Act & Assert
+        assert etag_matches(f'"other", {opaque}', etag)
+        assert etag_matches(etag, etag)
+        assert etag_matches("*", etag)
+        assert not etag_matches('"other"', etag)
+        assert not etag_matches(None, etag)
+
+    def test_negotiate_encoding(self, monkeypatch):
+        # Arrange
+        monkeypatch.setattr(compression, "BROTLI_AVAILABLE", False)
+
+        # Act & Assert
+        assert negotiate_encoding("gzip, deflate, br") == "gzip"
+        assert negotiate_encoding("gzip;q=0, deflate") is None
+        assert negotiate_encoding("*") == "gzip"
+        assert negotiate_encoding(None) is None
+
+    def test_brotli_preferred_when_installed(self):
+        # Arrange
+        pytest.importorskip("brotli")
+
+        # Act & Assert
+        assert negotiate_encoding("gzip, br") == "br"
+        assert negotiate_encoding("gzip, br;q=0") == "gzip"
+
+
+class TestCompressionMiddleware:
+    """Тести для CompressionMiddleware."""
+
+    def test_gzip_large_json(self, client):
+        # Act
+        response, raw = _get_raw(client, "/report", **{"Accept-Encoding": "gzip"})
+
+        # Assert
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["vary"] == "Accept-Encoding"
+        assert int(response.headers["content-length"]) == len(raw)
+        assert json.loads(gzip.decompress(raw)) == REPORT
+        assert len(raw) < len(json.dumps(REPORT)) / 10
+
+    def test_small_and_binary_not_compressed(self, client):
+        # Act
+        small, _ = _get_raw(client, "/small", **{"Accept-Encoding": "gzip"})
+        image, raw = _get_raw(client, "/image", **{"Accept-Encoding": "gzip"})
+
+        # Assert
+        assert "content-encoding" not in small.headers
+        assert "content-encoding" not in image.headers
+        assert "etag" not in image.headers
+        assert raw.startswith(b"\x89PNG")
+
+    def test_identity_without_accept_encoding(self, client):
+        # Act
+        response, raw = _get_raw(client, "/report", **{"Accept-Encoding": "identity"})
+
+        # Assert
+        assert "content-encoding" not in response.headers
+        assert json.loads(raw) == REPORT
+
+    def test_not_modified(self, client):
+        # Arrange
+        etag = client.get("/report").headers["etag"]
+
+        # Act
+        response = client.get("/report", headers={"If-None-Match": etag})
+        changed = client.get("/report", headers={"If-None-Match": '"stale"'})
+
+        # Assert
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["etag"] == etag
+        assert changed.status_code == 200
+        assert changed.json() == REPORT
+
+    def test_existing_etag_kept(self, client):
+        # Act
+        response = client.get("/tagged", headers={"If-None-Match": '"fixed"'})
+
+        # Assert
+        assert response.status_code == 304
+
+    def test_streaming_passthrough(self, client):
+        # Act
+        response, raw = _get_raw(client, "/stream", **{"Accept-Encoding": "gzip"})
+
+        # Assert
+        assert "content-encoding" not in response.headers
+        assert "etag" not in response.headers
+        assert raw.count(b"\n") == 200
+
+
+class TestReportEndpoints:
+    """ETag/304 на endpoint'ах застосунку."""
+
+    def test_search_results_revalidation(self, Session, patched_get_db, monkeypatch):
+        # Arrange
+        from app import main
+        from app.models import SearchHistory
+
+        session = Session()
+        session.add(SearchHistory(
+            id=1, start_date="2025-10-01", end_date="2025-10-07", tab_type="students",
+            results_count=20, results_json=json.dumps(REPORT["students"], ensure_ascii=False),
+        ))
+        session.commit()
+        session.close()
+        monkeypatch.setattr(main, "get_db", patched_get_db)
+        client = TestClient(main.app, base_url="http://localhost")
+
+        # Act
+        first, raw = _get_raw(client, "/api/search-history/1", **{"Accept-Encoding": "gzip"})
+        second = client.get("/api/search-history/1", headers={"If-None-Match": first.headers["etag"]})
+
+        # Assert
+        assert first.headers["content-encoding"] == "gzip"
+        assert json.loads(gzip.decompress(raw))["results"] == REPORT["students"]
+        assert second.status_code == 304
+        assert second.content == b""
@@ -14,7 +14,7 @@ class TestEnsureBook:
     """Тести для функції _ensure_book."""
 
     @patch('app.connectors.excel.os.path.exists')
-    @patch('app.connectors.excel.load_workbook')
+    @patch('openpyxl.load_workbook')
     def test_ensure_book_file_exists(self, mock_load, mock_exists):
         """Тест відкриття існуючого файлу."""
         # Arrange
@@ -30,7 +30,7 @@ class TestEnsureBook:
         mock_load.assert_called_once_with("test.xlsx")
 
     @patch('app.connectors.excel.os.path.exists')
-    @patch('app.connectors.excel.Workbook')
+    @patch('openpyxl.Workbook')
     def test_ensure_book_file_not_exists(self, mock_wb_class, mock_exists):
         """Тест створення нового файлу."""
         # Arrange
@@ -46,8 +46,8 @@ class TestEnsureBook:
         mock_wb.save.assert_called_once_with("new_file.xlsx")
 
     @patch('app.connectors.excel.os.path.exists')
-    @patch('app.connectors.excel.load_workbook')
-    @patch('app.connectors.excel.Workbook')
+    @patch('openpyxl.load_workbook')
+    @patch('openpyxl.Workbook')
     def test_ensure_book_corrupted_file(self, mock_wb_class, mock_load, mock_exists):
         """Тест відновлення пошкодженого файлу."""
         # Arrange
@@ -0,0 +1,133 @@
+"""
+Unit тести для fake серверів Meta Graph / AlfaCRM / NetHunt (loadtest/fake_upstreams.py).
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from loadtest.fake_upstreams import ALFACRM_TOKEN, FaultConfig, create_app
+from loadtest.load import percentile
+
+
+@pytest.fixture(scope="module")
+def faults():
+    return FaultConfig()
+
+
+@pytest.fixture(scope="module")
+def client(faults):
+    return TestClient(create_app(size=200, faults=faults))
+
+
+@pytest.fixture(autouse=True)
+def reset_faults(faults):
+    yield
+    faults.update({"latency_ms": 0, "error_rate": 0, "rate_limit_rate": 0})
+
+
+class TestFakeGraph:
+    """Тести для fake Graph API."""
+
+    def test_insights_paging_follows_next(self, client):
+        # Arrange
+        url = "/graph/act_1/insights?limit=5"
+        rows = []
+
+        # Act
+        while url:
+            body = client.get(url).json()
+            rows.extend(body["data"])
+            url = body.get("paging", {}).get("next")
+
+        # Assert
+        assert len(rows) == len({row["ad_id"] for row in rows}) == 12
+        assert "x-app-usage" in client.get("/graph/act_1/insights").headers
+
+    def test_leads_of_all_forms_cover_dataset(self, client):
+        # Act
+        forms = client.get("/graph/fake_page/leadgen_forms").json()["data"]
+        leads = [lead for form in forms for lead in client.get(f"/graph/{form['id']}/leads").json()["data"]]
+
+        # Assert
+        assert len(leads) == 200
+        assert all(lead["campaign_id"] and lead["field_data"] for lead in leads)
+
+    def test_ad_creative_and_targeting(self, client):
+        # Act
+        creative = client.get("/graph/123", params={"fields": "creative{name,body}"}).json()
+        targeting = client.get("/graph/456", params={"fields": "targeting"}).json()
+
+        # Assert
+        assert creative["creative"]["body"]
+        assert targeting["targeting"]["geo_locations"]["countries"] == ["UA"]
+
+
+class TestFaultInjection:
+    """Тести для інжекції затримок та помилок."""
+
+    def test_rate_limit_injection_updated_at_runtime(self, client):
+        # Act
+        client.post("/_faults", json={"rate_limit_rate": 1.0})
+        limited = client.get("/graph/act_1/insights")
+        client.post("/_faults", json={"rate_limit_rate": 0})
+        ok = client.get("/graph/act_1/insights")
+
+        # Assert
+        assert limited.status_code == 429
+        assert limited.json()["error"]["code"] == 17
+        assert ok.status_code == 200
+        assert client.get("/_stats").json()["graph_429"] >= 1
+
+    def test_error_injection_for_crm(self, client, faults):
+        # Arrange
+        faults.update({"error_rate": 1.0})
+
+        # Act
+        response = client.get("/nethunt/folders")
+
+        # Assert
+        assert response.status_code == 500
+
+
+class TestFakeCrm:
+    """Тести для fake AlfaCRM та NetHunt."""
+
+    def test_alfacrm_requires_token_and_paginates(self, client):
+        # Arrange
+        token = client.post("/alfacrm/v2api/auth/login", json={"email": "a@b.c", "api_key": "k"}).json()["token"]
+
+        # Act
+        unauthorized = client.post("/alfacrm/v2api/customer/index", json={"page": 1})
+        first = client.post(
+            "/alfacrm/v2api/customer/index", json={"page": 1, "page_size": 150},
+            headers={"X-ALFACRM-TOKEN": token}
+        ).json()
+        second = client.post(
+            "/alfacrm/v2api/customer/index", json={"page": 2, "page_size": 150},
+            headers={"X-ALFACRM-TOKEN": token}
+        ).json()
+
+        # Assert
+        assert token == ALFACRM_TOKEN
+        assert unauthorized.status_code == 401
+        assert first["total"] == 200
+        assert len(first["items"]) + len(second["items"]) == 200
+
+    def test_nethunt_records_match_teacher_index(self, client):
+        # Arrange
+        from app.services.nethunt_tracking import build_teacher_index
+
+        # Act
+        records = client.get("/nethunt/folders/fake_folder/records", params={"limit": 1000}).json()
+
+        # Assert
+        assert len(build_teacher_index(records)) >= len(records)
+
+
+class TestLoadScript:
+    """Тести для loadtest/load.py."""
+
+    def test_percentile(self):
+        # Act & Assert
+        assert percentile([0.3, 0.1, 0.2], 50) == 0.2
+        assert percentile([], 99) == 0.0
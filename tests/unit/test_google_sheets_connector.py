@@ -14,8 +14,8 @@ class TestGetClient:
 
     @patch.dict('os.environ', {'GOOGLE_APPLICATION_CREDENTIALS': '/path/to/creds.json'})
     @patch('app.connectors.google_sheets.os.path.exists')
-    @patch('app.connectors.google_sheets.Credentials.from_service_account_file')
-    @patch('app.connectors.google_sheets.gspread.authorize')
+    @patch('google.oauth2.service_account.Credentials.from_service_account_file')
+    @patch('gspread.authorize')
     def test_get_client_success(self, mock_authorize, mock_creds, mock_exists):
         """Тест успішного створення Google Sheets клієнта."""
         # Arrange
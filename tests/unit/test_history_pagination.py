@@ -0,0 +1,153 @@
+"""
+Unit тести для keyset пагінації /api/runs та /api/search-history,
+відкладеного завантаження results_json та композитних індексів.
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+
+from app.models import PipelineRun, SearchHistory
+
+
+BASE_TIME = datetime(2025, 10, 1, 12, 0, 0)
+
+
+@pytest.fixture
+def client(patched_get_db, monkeypatch):
+    from fastapi.testclient import TestClient
+    from app import main
+
+    monkeypatch.setattr(main, "get_db", patched_get_db)
+    return TestClient(main.app, base_url="http://localhost")
+
+
+def _seed_runs(Session, count=7):
+    session = Session()
+    for i in range(count):
+        session.add(PipelineRun(
+            job_id=f"job-{i}",
+            # Пари з однаковим start_time - курсор має розрізняти їх по id
+            start_time=BASE_TIME + timedelta(minutes=i // 2),
+            start_date="2025-10-01",
+            end_date="2025-10-07",
+            status="success" if i % 3 else "error",
+        ))
+    session.commit()
+    session.close()
+
+
+class TestRunsKeyset:
+    """Тести для keyset пагінації /api/runs."""
+
+    def test_pages_cover_all_runs_without_duplicates(self, client, Session):
+        # Arrange
+        _seed_runs(Session)
+        ids, params = [], {"limit": 3}
+
+        # Act
+        while True:
+            data = client.get("/api/runs", params=params).json()
+            ids.extend(run["id"] for run in data["runs"])
+            if not data["next_cursor"]:
+                break
+            params = {"limit": 3, **data["next_cursor"]}
+
+        # Assert
+        assert ids == [7, 6, 5, 4, 3, 2, 1]
+
+    def test_status_filter_with_cursor(self, client, Session):
+        # Arrange
+        _seed_runs(Session)
+        first = client.get("/api/runs", params={"status": "success", "limit": 2}).json()
+
+        # Act
+        second = client.get("/api/runs", params={"status": "success", "limit": 2, **first["next_cursor"]}).json()
+
+        # Assert
+        assert [run["id"] for run in first["runs"]] == [6, 5]
+        assert [run["id"] for run in second["runs"]] == [3, 2]
+        assert all(run["status"] == "success" for run in second["runs"])
+
+    def test_invalid_cursor_returns_400(self, client):
+        # Act
+        response = client.get("/api/runs", params={"before_time": "2025-10-01T12:00:00"})
+
+        # Assert
+        assert response.status_code == 400
+
+
+class TestSearchHistoryKeyset:
+    """Тести для /api/search-history."""
+
+    def test_listing_paginates_and_defers_results_json(self, client, Session):
+        # Arrange
+        session = Session()
+        for i in range(5):
+            session.add(SearchHistory(
+                start_date="2025-10-01", end_date="2025-10-07", tab_type="ads",
+                results_count=1, results_json='[{"campaign_id": "1"}]',
+                created_at=BASE_TIME + timedelta(minutes=i)
+            ))
+        session.commit()
+        record = session.query(SearchHistory).first()
+        unloaded = inspect(record).unloaded
+        session.close()
+
+        # Act
+        first = client.get("/api/search-history", params={"tab_type": "ads", "limit": 3}).json()
+        second = client.get("/api/search-history", params={"tab_type": "ads", "limit": 3, **first["next_cursor"]}).json()
+        detail = client.get(f"/api/search-history/{first['history'][0]['id']}").json()
+
+        # Assert
+        assert "results_json" in unloaded
+        assert [item["id"] for item in first["history"]] == [5, 4, 3]
+        assert [item["id"] for item in second["history"]] == [2, 1]
+        assert second["next_cursor"] is None
+        assert detail["results"] == [{"campaign_id": "1"}]
+
+
+class TestHistoryIndexes:
+    """План запиту використовує композитні індекси (без повного сканування та сортування)."""
+
+    @pytest.mark.parametrize("sql, index", [
+        (
+            "SELECT id FROM pipeline_runs WHERE status = 'success' AND start_time < '2025-10-02' "
+            "ORDER BY start_time DESC, id DESC LIMIT 50",
+            "ix_pipeline_runs_status_start_time",
+        ),
+        (
+            "SELECT id FROM search_history WHERE tab_type = 'ads' "
+            "ORDER BY created_at DESC, id DESC LIMIT 100",
+            "ix_search_history_tab_type_created_at",
+        ),
+    ])
+    def test_query_plan_uses_index(self, db_engine, sql, index):
+        # Act
+        with db_engine.connect() as conn:
+            plan = " ".join(row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}")))
+
+        # Assert
+        assert index in plan
+        assert "TEMP B-TREE" not in plan
+
+    def test_init_db_adds_indexes_to_existing_tables(self, tmp_path, monkeypatch):
+        # Arrange: таблиця створена старою версією схеми, без нових індексів
+        from app import database
+
+        engine = create_engine(f"sqlite:///{tmp_path}/old.db")
+        with engine.begin() as conn:
+            conn.execute(text(
+                "CREATE TABLE search_history (id INTEGER PRIMARY KEY, start_date VARCHAR(10), end_date VARCHAR(10), "
+                "tab_type VARCHAR(20), results_count INTEGER, results_json TEXT, created_at DATETIME, updated_at DATETIME)"
+            ))
+        monkeypatch.setattr(database, "engine", engine)
+
+        # Act
+        database.init_db()
+
+        # Assert
+        names = {index["name"] for index in inspect(engine).get_indexes("search_history")}
+        assert {"ix_search_history_tab_type_created_at", "ix_search_history_created_at"} <= names
+        engine.dispose()
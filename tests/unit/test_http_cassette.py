@@ -0,0 +1,165 @@
+"""
+Unit тести для запису/відтворення HTTP відповідей (app/http_cassette.py).
+"""
+
+import gzip
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import httpx
+import pytest
+import requests
+
+from app import http_cassette
+from app.http_cassette import CassetteMiss, request_key, scrub_text, scrub_url
+
+
+class _Handler(BaseHTTPRequestHandler):
+    calls = 0
+
+    def do_GET(self):
+        type(self).calls += 1
+        body = json.dumps({
+            "data": [{"phone": "+380501234567", "email": "Lead@Mail.com", "n": type(self).calls}],
+            "token": "secret-token",
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Set-Cookie", "session=abc")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    _Handler.calls = 0
+    httpd = HTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_port}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+class TestScrubbing:
+    """Тести для очищення токенів та персональних даних."""
+
+    def test_url_secrets_redacted_and_key_ignores_token(self):
+        # Act
+        url = scrub_url("https://graph.facebook.com/v19.0/act_1/insights?access_token=EAAB123&limit=500")
+        key_a = request_key("get", "https://x/api?access_token=aaa&page=1")
+        key_b = request_key("GET", "https://x/api?access_token=bbb&page=1")
+
+        # Assert
+        assert "EAAB123" not in url
+        assert "access_token=REDACTED" in url and "limit=500" in url
+        assert key_a == key_b
+
+    def test_phone_pseudonym_is_consistent_across_formats(self):
+        # Act
+        full = scrub_text("+380501234567")
+        local = scrub_text("0501234567")
+        spaced = scrub_text("+38 (050) 123-45-67")
+
+        # Assert
+        assert full != "+380501234567"
+        assert full.startswith("+380")
+        assert full[-9:] == local[-9:] == "".join(c for c in spaced if c.isdigit())[-9:]
+        assert spaced.startswith("+38 (0")
+
+    def test_email_replaced_deterministically(self):
+        # Act
+        first = scrub_text("contact: Lead@Mail.com")
+        second = scrub_text("lead@mail.com")
+
+        # Assert
+        assert "mail.com" not in first.lower()
+        assert first.endswith(second)
+
+
+class TestRequestsCassette:
+    """Тести для запису та відтворення запитів через requests."""
+
+    def test_record_then_replay_offline(self, server, tmp_path):
+        # Arrange
+        path = str(tmp_path / "c.jsonl.gz")
+        url = f"{server}/records?access_token=real-secret"
+
+        # Act
+        with http_cassette.cassette(path, mode="record"):
+            recorded = requests.get(url).json()
+        with http_cassette.cassette(path, mode="replay", speed="max"):
+            replayed = requests.get(f"{server}/records?access_token=other").json()
+
+        # Assert
+        raw = gzip.open(path, "rt", encoding="utf-8").read()
+        assert "real-secret" not in raw and "secret-token" not in raw
+        assert "Lead@Mail.com" not in raw and "session=abc" not in raw
+        assert recorded["data"][0]["phone"] == "+380501234567"
+        assert replayed["token"] == "REDACTED"
+        assert replayed["data"][0]["phone"] == scrub_text("+380501234567")
+        assert _Handler.calls == 1
+
+    def test_repeated_requests_replayed_in_order(self, server, tmp_path):
+        # Arrange
+        path = str(tmp_path / "c.jsonl.gz")
+        with http_cassette.cassette(path, mode="record"):
+            requests.get(f"{server}/page")
+            requests.get(f"{server}/page")
+
+        # Act
+        with http_cassette.cassette(path, mode="replay", speed="max"):
+            numbers = [requests.get(f"{server}/page").json()["data"][0]["n"] for _ in range(3)]
+
+        # Assert
+        assert numbers == [1, 2, 2]
+
+    def test_unknown_request_raises_miss(self, server, tmp_path):
+        # Arrange
+        path = str(tmp_path / "c.jsonl.gz")
+        with http_cassette.cassette(path, mode="record"):
+            requests.get(f"{server}/known")
+
+        # Act / Assert
+        with http_cassette.cassette(path, mode="replay", speed="max"):
+            with pytest.raises(CassetteMiss):
+                requests.get(f"{server}/unknown")
+        assert requests.adapters.HTTPAdapter.send is not http_cassette._requests_send
+
+
+class TestHttpxCassette:
+    """Тести для httpx (sync та async транспорт)."""
+
+    async def test_async_client_replays_sync_recording(self, server, tmp_path):
+        # Arrange
+        path = str(tmp_path / "c.jsonl.gz")
+        with http_cassette.cassette(path, mode="record"):
+            with httpx.Client() as client:
+                client.get(f"{server}/ads", params={"api_key": "k1"})
+
+        # Act
+        with http_cassette.cassette(path, mode="replay", speed="max"):
+            async with httpx.AsyncClient() as client:
+                response = await client.get(f"{server}/ads", params={"api_key": "k2"})
+
+        # Assert
+        assert response.status_code == 200
+        assert response.json()["data"][0]["n"] == 1
+        assert _Handler.calls == 1
+
+
+class TestInstallFromEnv:
+    """Тести для увімкнення касети через змінні оточення."""
+
+    def test_disabled_without_mode(self, monkeypatch, tmp_path):
+        # Arrange
+        monkeypatch.setenv("HTTP_CASSETTE", str(tmp_path / "c.jsonl.gz"))
+        monkeypatch.delenv("HTTP_CASSETTE_MODE", raising=False)
+
+        # Act / Assert
+        assert http_cassette.install_from_env() is None
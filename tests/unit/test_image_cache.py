@@ -0,0 +1,244 @@
+"""
+Unit тести для дискового кешу зображень (app/image_cache.py) та /api/proxy-image.
+"""
+
+import os
+
+import httpx
+import pytest
+
+from app.image_cache import ImageCache
+
+JPEG = b"\xff\xd8\xff" + b"x" * 100
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ImageCache(str(tmp_path / "images"), max_bytes=1024)
+
+
+class TestImageCache:
+    """Тести для content-addressed LRU кешу."""
+
+    def test_put_and_get(self, cache):
+        # Act
+        stored = cache.put("https://scontent.fbcdn.net/a.jpg", JPEG, "image/jpeg")
+        cached = cache.get("https://scontent.fbcdn.net/a.jpg")
+
+        # Assert
+        assert cached == stored
+        assert cached.content_type == "image/jpeg"
+        with open(cached.path, "rb") as f:
+            assert f.read() == JPEG
+        assert cache.get("https://scontent.fbcdn.net/other.jpg") is None
+        assert cache.stats()["hit_ratio"] == 0.5
+
+    def test_same_content_stored_once(self, cache):
+        """Тест що однаковий креатив з різних підписаних URL зберігається один раз."""
+        # Act
+        first = cache.put("https://scontent.fbcdn.net/a.jpg?oh=1", JPEG, "image/jpeg")
+        second = cache.put("https://scontent.fbcdn.net/a.jpg?oh=2", JPEG, "image/jpeg")
+
+        # Assert
+        assert first.etag == second.etag
+        stats = cache.stats()
+        assert stats["entries"] == 2
+        assert stats["blobs"] == 1
+        assert stats["bytes"] == len(JPEG)
+
+    def test_lru_eviction_by_size(self, cache):
+        """Тест що при перевищенні розміру видаляється найдавніше використане зображення."""
+        # Arrange
+        cache.put("a", b"a" * 400, "image/jpeg")
+        cache.put("b", b"b" * 400, "image/jpeg")
+        cache.get("a")
+
+        # Act
+        cache.put("c", b"c" * 400, "image/jpeg")
+
+        # Assert
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.get("c") is not None
+        assert cache.stats()["bytes"] <= cache.max_bytes
+
+    def test_aborted_write_not_cached(self, cache):
+        """Тест що обірване завантаження не потрапляє в кеш і не лишає тимчасових файлів."""
+        # Arrange
+        writer = cache.writer("a", "image/jpeg")
+        writer.write(b"partial")
+
+        # Act
+        writer.abort()
+
+        # Assert
+        assert cache.get("a") is None
+        assert not [name for name in os.listdir(cache.root) if name.endswith(".part")]
+
+    def test_oversized_item_skipped(self, cache):
+        # Act
+        result = cache.put("big", b"x" * 2048, "image/png")
+
+        # Assert
+        assert result is None
+        assert cache.stats()["bytes"] == 0
+
+    def test_index_survives_restart(self, cache):
+        # Arrange
+        cache.put("a", JPEG, "image/png")
+
+        # Act
+        reopened = ImageCache(cache.root, max_bytes=cache.max_bytes)
+
+        # Assert
+        cached = reopened.get("a")
+        assert cached is not None
+        assert cached.content_type == "image/png"
+
+
+class TestProxyImageEndpoint:
+    """Тести для /api/proxy-image з кешем."""
+
+    @pytest.fixture
+    def client(self, tmp_path, monkeypatch):
+        from fastapi.testclient import TestClient
+        from app import main
+
+        calls = []
+
+        def handler(request):
+            calls.append(str(request.url))
+            return httpx.Response(200, content=JPEG, headers={"content-type": "image/jpeg"})
+
+        upstream = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        monkeypatch.setattr(main, "image_cache", ImageCache(str(tmp_path / "images")))
+        monkeypatch.setattr(main, "get_http_client", lambda: upstream)
+        return TestClient(main.app, base_url="http://localhost"), calls
+
+    def test_miss_then_hit_with_etag(self, client):
+        # Arrange
+        http, calls = client
+        params = {"url": "https://scontent.fbcdn.net/creative.jpg"}
+
+        # Act
+        miss = http.get("/api/proxy-image", params=params)
+        hit = http.get("/api/proxy-image", params=params)
+        not_modified = http.get(
+            "/api/proxy-image", params=params, headers={"If-None-Match": hit.headers["etag"]}
+        )
+
+        # Assert
+        assert miss.status_code == 200 and miss.content == JPEG
+        assert miss.headers["x-cache"] == "MISS"
+        assert hit.headers["x-cache"] == "HIT" and hit.content == JPEG
+        assert "max-age" in hit.headers["cache-control"]
+        assert not_modified.status_code == 304
+        assert len(calls) == 1
+
+
+class TestProxyImageUpstream:
+    """Тести обмежень upstream /api/proxy-image: allowlist хостів і розмір."""
+
+    @pytest.fixture
+    def client(self, tmp_path, monkeypatch):
+        from fastapi.testclient import TestClient
+        from app import main
+
+        routes = {}
+        calls = []
+
+        def handler(request):
+            calls.append(str(request.url))
+            return routes[str(request.url)]()
+
+        upstream = httpx.AsyncClient(transport=httpx.MockTransport(handler), follow_redirects=True)
+        monkeypatch.setattr(main, "image_cache", ImageCache(str(tmp_path / "images")))
+        monkeypatch.setattr(main, "get_http_client", lambda: upstream)
+        return TestClient(main.app, base_url="http://localhost"), routes, calls
+
+    @pytest.mark.parametrize("url", [
+        "http://scontent.fbcdn.net/creative.jpg",
+        "https://169.254.169.254/latest/meta-data",
+        "https://evilfbcdn.net/creative.jpg",
+        "https://scontent.fbcdn.net@internal.local/creative.jpg",
+        "file:///etc/passwd",
+    ])
+    def test_disallowed_host_rejected(self, client, url):
+        # Arrange
+        http, _, calls = client
+
+        # Act
+        response = http.get("/api/proxy-image", params={"url": url, "w": 100})
+
+        # Assert
+        assert response.status_code == 400
+        assert calls == []
+
+    def test_redirect_checked_before_request(self, client):
+        # Arrange
+        http, routes, calls = client
+        routes["https://scontent.fbcdn.net/creative.jpg"] = lambda: httpx.Response(
+            302, headers={"location": "http://127.0.0.1:8000/admin"}
+        )
+
+        # Act
+        response = http.get("/api/proxy-image", params={"url": "https://scontent.fbcdn.net/creative.jpg"})
+
+        # Assert
+        assert response.status_code == 400
+        assert calls == ["https://scontent.fbcdn.net/creative.jpg"]
+
+    def test_redirect_within_cdn_followed(self, client):
+        # Arrange
+        http, routes, calls = client
+        routes["https://graph.facebook.com/123/picture"] = lambda: httpx.Response(
+            302, headers={"location": "https://scontent.fbcdn.net/creative.jpg"}
+        )
+        routes["https://scontent.fbcdn.net/creative.jpg"] = lambda: httpx.Response(
+            200, content=JPEG, headers={"content-type": "image/jpeg"}
+        )
+
+        # Act
+        response = http.get("/api/proxy-image", params={"url": "https://graph.facebook.com/123/picture"})
+
+        # Assert
+        assert response.status_code == 200 and response.content == JPEG
+        assert len(calls) == 2
+
+    def test_declared_size_over_limit(self, client, monkeypatch):
+        # Arrange
+        from app import main
+        http, routes, _ = client
+        monkeypatch.setattr(main, "IMAGE_PROXY_MAX_BYTES", 50)
+        routes["https://scontent.fbcdn.net/big.jpg"] = lambda: httpx.Response(
+            200, content=JPEG, headers={"content-type": "image/jpeg"}
+        )
+
+        # Act
+        response = http.get("/api/proxy-image", params={"url": "https://scontent.fbcdn.net/big.jpg"})
+
+        # Assert
+        assert response.status_code == 502
+
+    def test_streamed_size_over_limit(self, client, monkeypatch):
+        # Arrange
+        pytest.importorskip("PIL")
+        from app import main
+        http, routes, _ = client
+        monkeypatch.setattr(main, "IMAGE_PROXY_MAX_BYTES", 50)
+
+        async def body():
+            for _ in range(4):
+                yield b"x" * 20
+
+        # Без Content-Length розмір видно лише під час читання
+        routes["https://scontent.fbcdn.net/big.jpg"] = lambda: httpx.Response(
+            200, content=body(), headers={"content-type": "image/jpeg"}
+        )
+
+        # Act
+        response = http.get("/api/proxy-image", params={"url": "https://scontent.fbcdn.net/big.jpg", "w": 100})
+
+        # Assert
+        assert response.status_code == 502
+        assert main.image_cache.get("https://scontent.fbcdn.net/big.jpg") is None
@@ -0,0 +1,136 @@
+"""
+Unit тести для зменшення креативів (app/image_resize.py) та /api/proxy-image?w=&h=.
+"""
+
+import io
+
+import httpx
+import pytest
+
+from app import image_resize
+from app.image_cache import ImageCache
+
+PIL = pytest.importorskip("PIL")
+from PIL import Image  # noqa: E402
+
+
+def make_png(width=800, height=400, mode="RGBA") -> bytes:
+    output = io.BytesIO()
+    Image.new(mode, (width, height), (200, 30, 30, 128) if mode == "RGBA" else (200, 30, 30)).save(output, format="PNG")
+    return output.getvalue()
+
+
+class TestNegotiation:
+    """Тести для вибору формату та розмірів."""
+
+    def test_webp_when_accepted(self):
+        # Act & Assert
+        assert image_resize.negotiate_format("image/avif,image/webp,image/apng,*/*;q=0.8") == "webp"
+        assert image_resize.negotiate_format("image/jpeg,*/*") == "jpeg"
+        assert image_resize.negotiate_format(None) == "jpeg"
+
+    def test_clamp_size(self):
+        # Act & Assert
+        assert image_resize.clamp_size(200, None) == (200, None)
+        assert image_resize.clamp_size(0, -5) == (None, None)
+        assert image_resize.clamp_size(100000, 50) == (image_resize.MAX_DIMENSION, 50)
+
+    def test_variant_key_differs_by_format(self):
+        # Act
+        webp = image_resize.variant_key("https://cdn/a.jpg", 200, 120, "webp")
+        jpeg = image_resize.variant_key("https://cdn/a.jpg", 200, 120, "jpeg")
+
+        # Assert
+        assert webp != jpeg
+        assert webp != "https://cdn/a.jpg"
+
+
+class TestResizeImage:
+    """Тести для resize_image."""
+
+    def test_fits_box_keeping_aspect_ratio(self):
+        # Act
+        data = image_resize.resize_image(make_png(800, 400), 200, 120, "webp")
+
+        # Assert
+        with Image.open(io.BytesIO(data)) as image:
+            assert image.format == "WEBP"
+            assert image.size == (200, 100)
+
+    def test_jpeg_flattens_transparency(self):
+        # Act
+        data = image_resize.resize_image(make_png(300, 300), 100, None, "jpeg")
+
+        # Assert
+        with Image.open(io.BytesIO(data)) as image:
+            assert image.format == "JPEG"
+            assert image.mode == "RGB"
+            assert image.size == (100, 100)
+
+    def test_never_upscales(self):
+        # Act
+        data = image_resize.resize_image(make_png(50, 40, mode="RGB"), 500, 500, "jpeg")
+
+        # Assert
+        with Image.open(io.BytesIO(data)) as image:
+            assert image.size == (50, 40)
+
+    def test_invalid_data_raises(self):
+        # Act & Assert
+        with pytest.raises(OSError):
+            image_resize.resize_image(b"<svg></svg>", 100, 100, "jpeg")
+
+
+class TestProxyImageResize:
+    """Тести для /api/proxy-image?w=&h=."""
+
+    @pytest.fixture
+    def client(self, tmp_path, monkeypatch):
+        from fastapi.testclient import TestClient
+        from app import main
+
+        original = make_png(800, 400)
+        calls = []
+
+        def handler(request):
+            calls.append(str(request.url))
+            return httpx.Response(200, content=original, headers={"content-type": "image/png"})
+
+        upstream = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        cache = ImageCache(str(tmp_path / "images"))
+        monkeypatch.setattr(main, "image_cache", cache)
+        monkeypatch.setattr(main, "get_http_client", lambda: upstream)
+        return TestClient(main.app, base_url="http://localhost"), calls, cache, original
+
+    def test_variants_cached_per_format(self, client):
+        """Тест що WebP та JPEG варіанти кешуються окремо, а оригінал завантажується один раз."""
+        # Arrange
+        http, calls, cache, original = client
+        params = {"url": "https://scontent.fbcdn.net/creative.png", "w": 200, "h": 120}
+
+        # Act
+        webp = http.get("/api/proxy-image", params=params, headers={"Accept": "image/webp,*/*"})
+        jpeg = http.get("/api/proxy-image", params=params, headers={"Accept": "image/jpeg"})
+        webp_again = http.get("/api/proxy-image", params=params, headers={"Accept": "image/webp,*/*"})
+
+        # Assert
+        assert webp.headers["content-type"] == "image/webp"
+        assert jpeg.headers["content-type"] == "image/jpeg"
+        assert webp.headers["vary"] == "Accept"
+        assert webp.headers["x-cache"] == "MISS"
+        assert webp_again.headers["x-cache"] == "HIT"
+        assert webp_again.content == webp.content
+        assert len(webp.content) < len(original)
+        assert len(calls) == 1
+        assert cache.stats()["entries"] == 3
+
+    def test_without_size_returns_original(self, client):
+        # Arrange
+        http, calls, _, _ = client
+
+        # Act
+        response = http.get("/api/proxy-image", params={"url": "https://scontent.fbcdn.net/creative.png"})
+
+        # Assert
+        assert response.headers["content-type"] == "image/png"
+        assert "vary" not in response.headers
@@ -0,0 +1,73 @@
+"""
+Unit тести для бюджету часу старту (benchmarks/importtime.py) та lazy імпортів
+важких залежностей (openpyxl, gspread, google-auth).
+"""
+
+from unittest.mock import Mock
+
+import pytest
+
+from benchmarks.importtime import lazy_violations, measure, parse_importtime, top_imports, total_ms
+
+
+IMPORTTIME_OUTPUT = """\
+import time: self [us] | cumulative | imported package
+import time:       120 |        120 |   _io
+import time:      2000 |       5000 |     sqlalchemy.sql
+import time:      1000 |       6000 |   sqlalchemy
+import time:       300 |        300 |     openpyxl.workbook
+import time:       500 |        800 |   openpyxl
+import time:      4000 |      10920 | app.main
+"""
+
+
+class TestParseImporttime:
+    """Тести для розбору виводу `python -X importtime`."""
+
+    def test_records_depth_and_total(self):
+        # Act
+        records = parse_importtime(IMPORTTIME_OUTPUT)
+
+        # Assert
+        assert len(records) == 6
+        assert records[1].module == "sqlalchemy.sql"
+        assert records[1].depth == 2
+        assert total_ms(records) == pytest.approx(10.92)
+
+    def test_top_imports_only_direct(self):
+        # Act
+        top = top_imports(parse_importtime(IMPORTTIME_OUTPUT), count=2)
+
+        # Assert
+        assert [record.module for record in top] == ["sqlalchemy", "openpyxl"]
+
+    def test_lazy_violations_match_submodules(self):
+        # Act
+        violations = lazy_violations(parse_importtime(IMPORTTIME_OUTPUT), ("openpyxl", "gspread"))
+
+        # Assert
+        assert violations == ["openpyxl"]
+
+
+class TestLazyImports:
+    """Важкі залежності не імпортуються разом з app.main."""
+
+    def test_app_main_does_not_import_lazy_modules(self):
+        # Act
+        records = measure(runs=1)
+
+        # Assert
+        assert total_ms(records) > 0
+        assert lazy_violations(records) == []
+
+    def test_gspread_api_error_still_retried(self):
+        # Arrange
+        import gspread
+        from app.connectors.google_sheets import _is_api_error
+
+        response = Mock()
+        response.json.return_value = {"error": {"code": 429, "message": "Quota exceeded", "status": "RESOURCE_EXHAUSTED"}}
+
+        # Act / Assert
+        assert _is_api_error(gspread.exceptions.APIError(response))
+        assert not _is_api_error(ValueError("bad range"))
@@ -0,0 +1,299 @@
+"""
+Unit тести для черги задач (app/job_queue.py) та worker'а (app/worker.py).
+
+Використовуємо SQLite in-memory базу.
+"""
+
+import asyncio
+import logging
+import time
+import pytest
+from datetime import datetime, timedelta
+
+from app import job_queue, worker as worker_module
+from app.models import Job, PipelineRun
+from app.worker import Worker
+
+
+@pytest.fixture
+def db(Session):
+    session = Session()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def worker_db(Session, patched_get_db, monkeypatch):
+    """Підміняє get_db worker'а на in-memory базу."""
+    monkeypatch.setattr(worker_module, "get_db", patched_get_db)
+    return Session
+
+
+PIPELINE_PAYLOAD = {"start_date": "2025-10-01", "end_date": "2025-10-31", "sheet_id": None}
+
+
+class TestEnqueue:
+    """Тести для постановки задач у чергу."""
+
+    def test_creates_queued_pipeline_run(self, db):
+        """Тест що задача одразу видна в історії запусків."""
+        # Act
+        job, created = job_queue.enqueue(db, "pipeline", PIPELINE_PAYLOAD)
+
+        # Assert
+        assert created is True
+        run = db.query(PipelineRun).filter(PipelineRun.job_id == job.job_id).one()
+        assert run.status == "queued"
+        assert run.start_date == "2025-10-01"
+
+    def test_dedupe_returns_active_job(self, db):
+        """Тест що однакова активна задача не дублюється."""
+        # Act
+        first, _ = job_queue.enqueue(db, "pipeline", PIPELINE_PAYLOAD, dedupe_key="2025-10")
+        second, created = job_queue.enqueue(db, "pipeline", PIPELINE_PAYLOAD, dedupe_key="2025-10")
+
+        # Assert
+        assert created is False
+        assert second.job_id == first.job_id
+        assert db.query(Job).count() == 1
+
+
+class TestClaim:
+    """Тести для лізингу задач."""
+
+    def test_concurrency_limit_per_type(self, db):
+        """Тест що ліміт одночасних задач типу не перевищується."""
+        # Arrange
+        for _ in range(3):
+            job_queue.enqueue(db, "pipeline", PIPELINE_PAYLOAD)
+        limits = {"pipeline": 2}
+
+        # Act
+        claimed = [job_queue.claim_next(db, "w1", ["pipeline"], limits, 60) for _ in range(3)]
+
+        # Assert
+        assert claimed[0] is not None and claimed[1] is not None
+        assert claimed[2] is None
+        assert db.query(PipelineRun).filter(PipelineRun.status == "running").count() == 2
+
+    def test_failure_retries_with_backoff_then_fails(self, db, monkeypatch):
+        """Тест повторів з backoff та остаточної помилки."""
+        # Arrange
+        monkeypatch.setattr(job_queue, "RETRY_BASE_SECONDS", 0)
+        job, _ = job_queue.enqueue(db, "pipeline", PIPELINE_PAYLOAD, max_attempts=2)
+
+        # Act
+        job_queue.claim_next(db, "w1", ["pipeline"], {}, 60)
+        job_queue.fail(db, job.job_id, "w1", "Graph API timeout")
+        db.expire_all()
+        after_first = job_queue.get_job(db, job.job_id).status
+
+        job_queue.claim_next(db, "w1", ["pipeline"], {}, 60)
+        job_queue.fail(db, job.job_id, "w1", "Graph API timeout")
+        db.expire_all()
+
+        # Assert
+        assert after_first == "queued"
+        final = job_queue.get_job(db, job.job_id)
+        assert final.status == "failed"
+        assert final.attempts == 2
+        run = db.query(PipelineRun).filter(PipelineRun.job_id == job.job_id).one()
+        assert run.status == "error"
+        assert run.error_message == "Graph API timeout"
+
+    def test_backoff_delays_next_attempt(self, db):
+        """Тест що задача після помилки не береться до run_after."""
+        # Arrange
+        job, _ = job_queue.enqueue(db, "pipeline", PIPELINE_PAYLOAD)
+        job_queue.claim_next(db, "w1", ["pipeline"], {}, 60)
+
+        # Act
+        job_queue.fail(db, job.job_id, "w1", "boom")
+
+        # Assert
+        assert job_queue.claim_next(db, "w1", ["pipeline"], {}, 60) is None
+        assert job_queue.retry_delay(1) == job_queue.RETRY_BASE_SECONDS
+        assert job_queue.retry_delay(3) == job_queue.RETRY_BASE_SECONDS * 4
+
+    def test_expired_lease_is_reclaimed(self, db):
+        """Тест що задача впалого worker'а повертається в чергу."""
+        # Arrange
+        job, _ = job_queue.enqueue(db, "pipeline", PIPELINE_PAYLOAD)
+        job_queue.claim_next(db, "dead-worker", ["pipeline"], {}, 60)
+        db.query(Job).update({Job.lease_expires_at: datetime.utcnow() - timedelta(seconds=1)})
+        db.commit()
+
+        # Act
+        reclaimed = job_queue.reclaim_expired(db)
+
+        # Assert
+        assert reclaimed == 1
+        assert job_queue.get_job(db, job.job_id).status == "queued"
+        assert not job_queue.heartbeat(db, job.job_id, "dead-worker", 60)
+
+
+class TestClaimLocking:
+    """claim_next на PostgreSQL: SKIP LOCKED та advisory lock типу."""
+
+    def test_candidate_skips_locked_rows(self):
+        # Arrange
+        from sqlalchemy.dialects import postgresql
+
+        # Act
+        sql = str(job_queue._candidate_stmt("pipeline", datetime.utcnow()).compile(dialect=postgresql.dialect()))
+
+        # Assert
+        assert "FOR UPDATE SKIP LOCKED" in sql
+
+    def test_advisory_lock_only_on_postgresql(self, db):
+        # Arrange
+        from unittest.mock import Mock
+        pg_session = Mock()
+        pg_session.get_bind.return_value.dialect.name = "postgresql"
+
+        # Act
+        job_queue._lock_job_type(pg_session, "pipeline")
+        job_queue._lock_job_type(db, "pipeline")
+
+        # Assert
+        statement, params = pg_session.execute.call_args.args
+        assert "pg_advisory_xact_lock" in str(statement)
+        assert params["job_type"] == "pipeline"
+
+
+class TestLostLease:
+    """Тести для complete/fail після втрати lease."""
+
+    def test_complete_and_fail_report_lost_lease(self, db, caplog):
+        # Arrange
+        job, _ = job_queue.enqueue(db, "pipeline", PIPELINE_PAYLOAD)
+        job_queue.claim_next(db, "worker-b", ["pipeline"], {}, 60)
+
+        # Act
+        with caplog.at_level(logging.WARNING, logger="app.job_queue"):
+            completed = job_queue.complete(db, job.job_id, "worker-a")
+            failed = job_queue.fail(db, job.job_id, "worker-a", "boom")
+
+        # Assert
+        assert not completed and not failed
+        assert caplog.text.count("lease втрачено") == 2
+        assert job_queue.get_job(db, job.job_id).status == "running"
+        assert job_queue.complete(db, job.job_id, "worker-b")
+
+
+class TestWorker:
+    """Тести для виконання задач worker'ом."""
+
+    async def test_runs_handler_and_completes(self, db, worker_db):
+        # Arrange
+        job, _ = job_queue.enqueue(db, "analytics", {"campaign_type": "students"})
+        seen = []
+
+        async def handler(job_id, payload):
+            seen.append((job_id, payload["campaign_type"]))
+
+        w = Worker({"analytics": handler}, {"analytics": 1}, poll_seconds=0)
+
+        # Act
+        started = await w.poll_once()
+        await w.wait_idle()
+
+        # Assert
+        assert started == 1
+        assert seen == [(job.job_id, "students")]
+        db.expire_all()
+        assert job_queue.get_job(db, job.job_id).status == "succeeded"
+
+    async def test_handler_error_schedules_retry(self, db, worker_db):
+        # Arrange
+        job, _ = job_queue.enqueue(db, "pipeline", PIPELINE_PAYLOAD)
+
+        async def handler(job_id, payload):
+            raise RuntimeError("AlfaCRM недоступна")
+
+        w = Worker({"pipeline": handler}, {"pipeline": 1}, poll_seconds=0)
+
+        # Act
+        await w.poll_once()
+        await w.wait_idle()
+
+        # Assert
+        db.expire_all()
+        stored = job_queue.get_job(db, job.job_id)
+        assert stored.status == "queued"
+        assert stored.last_error == "AlfaCRM недоступна"
+
+    async def test_heartbeat_survives_blocking_handler(self, db, worker_db):
+        """Тест що lease подовжується, поки handler блокує event loop синхронним викликом."""
+        # Arrange
+        job, _ = job_queue.enqueue(db, "pipeline", PIPELINE_PAYLOAD)
+        lease_alive = []
+
+        async def handler(job_id, payload):
+            time.sleep(0.6)  # як meta_conn.fetch_insights у run_pipeline
+            session = worker_db()
+            try:
+                stored = session.query(Job).filter(Job.job_id == job_id).one()
+                lease_alive.append(stored.lease_expires_at > datetime.utcnow())
+            finally:
+                session.close()
+
+        w = Worker({"pipeline": handler}, {"pipeline": 1}, lease_seconds=0.3, heartbeat_seconds=0.05, poll_seconds=0)
+
+        # Act
+        await w.poll_once()
+        await w.wait_idle()
+
+        # Assert
+        assert lease_alive == [True]
+        db.expire_all()
+        assert job_queue.get_job(db, job.job_id).status == "succeeded"
+
+    async def test_lost_lease_cancels_handler(self, db, worker_db):
+        """Тест що handler скасовується, коли lease перехопив інший worker."""
+        # Arrange
+        job, _ = job_queue.enqueue(db, "pipeline", PIPELINE_PAYLOAD)
+        cancelled = []
+
+        async def handler(job_id, payload):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(job_id)
+                raise
+
+        w = Worker({"pipeline": handler}, {"pipeline": 1}, lease_seconds=0.3, heartbeat_seconds=0.05, poll_seconds=0)
+        await w.poll_once()
+        db.query(Job).filter(Job.job_id == job.job_id).update({Job.lease_owner: "worker-b"})
+        db.commit()
+
+        # Act
+        await asyncio.wait_for(w.wait_idle(), timeout=2)
+
+        # Assert
+        assert cancelled == [job.job_id]
+        db.expire_all()
+        stored = job_queue.get_job(db, job.job_id)
+        assert stored.status == "running"
+        assert stored.lease_owner == "worker-b"
+
+    async def test_shutdown_releases_running_jobs(self, db, worker_db):
+        """Тест що при зупинці worker'а задача повертається в чергу без витрати спроби."""
+        # Arrange
+        job, _ = job_queue.enqueue(db, "pipeline", PIPELINE_PAYLOAD)
+
+        async def handler(job_id, payload):
+            await asyncio.sleep(10)
+
+        w = Worker({"pipeline": handler}, {"pipeline": 1}, poll_seconds=0)
+        await w.poll_once()
+        await asyncio.sleep(0)
+
+        # Act
+        await w._shutdown()
+
+        # Assert
+        db.expire_all()
+        stored = job_queue.get_job(db, job.job_id)
+        assert stored.status == "queued"
+        assert stored.attempts == 0
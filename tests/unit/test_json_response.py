@@ -0,0 +1,114 @@
+"""
+Unit тести для швидкої JSON серіалізації (app/json_response.py) та
+відповідей endpoint'ів з великими звітами.
+"""
+
+import json
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from app import json_response
+from app.json_response import FastJSONResponse, dumps
+from app.models import SearchHistory
+
+
+REPORT = {
+    "students": [
+        {
+            "campaign_name": "Англійська для дітей",
+            "budget": 123.45,
+            "lead_phones": ["+380501234567", "+380671112233"],
+        }
+    ],
+    "count": 1,
+    "created_at": datetime(2025, 10, 7, 12, 30),
+}
+
+
+@pytest.fixture(params=["orjson", "fallback"])
+def backend(request, monkeypatch):
+    if request.param == "orjson" and not json_response.ORJSON_AVAILABLE:
+        pytest.skip("orjson не встановлено")
+    if request.param == "fallback":
+        monkeypatch.setattr(json_response, "ORJSON_AVAILABLE", False)
+    return request.param
+
+
+class TestDumps:
+    """Тести для dumps з orjson та stdlib json."""
+
+    def test_matches_jsonable_encoder(self, backend):
+        # Arrange
+        from fastapi.encoders import jsonable_encoder
+
+        # Act
+        body = dumps(REPORT)
+
+        # Assert
+        assert json.loads(body) == jsonable_encoder(REPORT)
+
+    def test_cyrillic_not_escaped(self, backend):
+        # Act
+        body = dumps({"name": "Англійська"})
+
+        # Assert
+        assert "Англійська".encode("utf-8") in body
+        assert b" " not in body
+
+    def test_non_string_keys_and_decimal(self, backend):
+        # Act
+        body = dumps({1: Decimal("2.5"), "set": {"a"}})
+
+        # Assert
+        assert json.loads(body) == {"1": 2.5, "set": ["a"]}
+
+    def test_backends_produce_same_document(self, monkeypatch):
+        # Arrange
+        if not json_response.ORJSON_AVAILABLE:
+            pytest.skip("orjson не встановлено")
+        fast = dumps(REPORT)
+        monkeypatch.setattr(json_response, "ORJSON_AVAILABLE", False)
+
+        # Act
+        fallback = dumps(REPORT)
+
+        # Assert
+        assert json.loads(fast) == json.loads(fallback)
+
+
+class TestFastJSONResponse:
+    """Тести для FastJSONResponse."""
+
+    def test_headers_and_body(self, backend):
+        # Act
+        response = FastJSONResponse(REPORT, headers={"X-Cache": "HIT"})
+
+        # Assert
+        assert response.media_type == "application/json"
+        assert response.headers["X-Cache"] == "HIT"
+        assert response.headers["content-length"] == str(len(response.body))
+        assert json.loads(response.body)["created_at"] == "2025-10-07T12:30:00"
+
+    def test_search_results_endpoint(self, Session, patched_get_db, monkeypatch):
+        # Arrange
+        from fastapi.testclient import TestClient
+        from app import main
+
+        session = Session()
+        session.add(SearchHistory(
+            id=1, start_date="2025-10-01", end_date="2025-10-07", tab_type="students",
+            results_count=1, results_json=json.dumps(REPORT["students"], ensure_ascii=False),
+        ))
+        session.commit()
+        session.close()
+        monkeypatch.setattr(main, "get_db", patched_get_db)
+        client = TestClient(main.app, base_url="http://localhost")
+
+        # Act
+        response = client.get("/api/search-history/1")
+
+        # Assert
+        assert response.status_code == 200
+        assert response.json()["results"] == REPORT["students"]
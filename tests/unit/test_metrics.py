@@ -0,0 +1,166 @@
+"""
+Unit тести для метрик (app/metrics.py) та endpoint'а /metrics.
+"""
+
+import pytest
+
+from app import metrics
+from app.metrics import Counter, Gauge, Histogram, instrument_upstream
+
+
+class TestMetricTypes:
+    """Тести для формату Prometheus."""
+
+    def test_histogram_cumulative_buckets(self):
+        # Arrange
+        histogram = Histogram("test_latency_seconds", "Test latency", ("route",), buckets=(0.1, 1.0))
+
+        # Act
+        for value in (0.05, 0.5, 5.0):
+            histogram.observe(value, route="/api/meta-data")
+
+        # Assert
+        lines = histogram.render()
+        assert "# TYPE test_latency_seconds histogram" in lines
+        assert 'test_latency_seconds_bucket{route="/api/meta-data",le="0.1"} 1' in lines
+        assert 'test_latency_seconds_bucket{route="/api/meta-data",le="1"} 2' in lines
+        assert 'test_latency_seconds_bucket{route="/api/meta-data",le="+Inf"} 3' in lines
+        assert 'test_latency_seconds_count{route="/api/meta-data"} 3' in lines
+        assert 'test_latency_seconds_sum{route="/api/meta-data"} 5.55' in lines
+
+    def test_counter_escapes_label_values(self):
+        # Arrange
+        counter = Counter("test_total", "Test", ("error",))
+
+        # Act
+        counter.inc(error='bad "quote"')
+        counter.inc(2, error='bad "quote"')
+
+        # Assert
+        assert 'test_total{error="bad \\"quote\\""} 3' in counter.render()
+
+    def test_gauge_clear_drops_stale_labels(self):
+        # Arrange
+        gauge = Gauge("test_depth", "Test", ("status",))
+        gauge.set(3, status="queued")
+
+        # Act
+        gauge.clear()
+        gauge.set(1, status="running")
+
+        # Assert
+        samples = [line for line in gauge.render() if not line.startswith("#")]
+        assert samples == ['test_depth{status="running"} 1']
+
+
+class TestInstrumentUpstream:
+    """Тести для декоратора конекторів."""
+
+    def test_sync_success_and_error(self):
+        # Arrange
+        @instrument_upstream("test_sync_upstream")
+        def call(fail: bool):
+            if fail:
+                raise TimeoutError("slow")
+            return "ok"
+
+        # Act
+        result = call(False)
+        with pytest.raises(TimeoutError):
+            call(True)
+
+        # Assert
+        assert result == "ok"
+        assert metrics.UPSTREAM_REQUESTS.value(upstream="test_sync_upstream", outcome="success") == 1
+        assert metrics.UPSTREAM_REQUESTS.value(upstream="test_sync_upstream", outcome="error") == 1
+        assert metrics.UPSTREAM_ERRORS.value(upstream="test_sync_upstream", error="TimeoutError") == 1
+        assert metrics.UPSTREAM_LATENCY.count(upstream="test_sync_upstream") == 2
+
+    async def test_async_function_stays_coroutine(self):
+        # Arrange
+        @instrument_upstream("test_async_upstream")
+        async def call():
+            return 42
+
+        # Act
+        result = await call()
+
+        # Assert
+        assert result == 42
+        assert call.__name__ == "call"
+        assert metrics.UPSTREAM_LATENCY.count(upstream="test_async_upstream") == 1
+
+    def test_connectors_are_instrumented(self):
+        """Тест що функції конекторів обгорнуті під @retry (кожна спроба - окремий виклик)."""
+        # Arrange
+        from app.connectors import crm, meta
+
+        # Assert
+        assert crm.alfacrm_list_students.retry_with is not None
+        assert hasattr(crm.alfacrm_list_students.__wrapped__, "__wrapped__")
+        assert meta._make_meta_request.retry_with is not None
+
+    def test_meta_pages_counted_per_request(self, monkeypatch):
+        """Тест що кожна сторінка Graph API - окремий виклик meta_insights."""
+        # Arrange
+        from app.connectors import meta
+
+        class FakeResponse:
+            headers = {}
+
+            def __init__(self, payload):
+                self.payload = payload
+
+            def raise_for_status(self):
+                pass
+
+            def json(self):
+                return self.payload
+
+        pages = [
+            {"data": [{"campaign_id": "1"}], "paging": {"next": "https://graph.example/page2"}},
+            {"data": [{"campaign_id": "2"}], "paging": {}},
+        ]
+        monkeypatch.setattr(meta.requests, "get", lambda url, params=None, timeout=None: FakeResponse(pages.pop(0)))
+        before = metrics.UPSTREAM_LATENCY.count(upstream="meta_insights")
+
+        # Act
+        rows = meta.fetch_insights("act_1", "token", "2025-10-01", "2025-10-07")
+
+        # Assert
+        assert [row["campaign_id"] for row in rows] == ["1", "2"]
+        assert metrics.UPSTREAM_LATENCY.count(upstream="meta_insights") - before == 2
+
+
+class TestMetricsEndpoint:
+    """Тести для GET /metrics."""
+
+    def test_endpoint_runs_in_threadpool(self):
+        # Arrange
+        import asyncio
+        from app import main
+
+        # Act / Assert: queue_depth читає БД - sync def виконується поза event loop
+        assert not asyncio.iscoroutinefunction(main.get_metrics)
+
+    def test_exposes_route_latency_and_queue_depth(self, patched_get_db, monkeypatch):
+        # Arrange
+        from fastapi.testclient import TestClient
+        from app import main
+
+        monkeypatch.setattr(main, "get_db", patched_get_db)
+        monkeypatch.setattr(main.job_queue, "queue_depth", lambda db: {"pipeline": {"queued": 2}})
+        client = TestClient(main.app, base_url="http://localhost")
+
+        # Act
+        client.get("/api/cache-stats")
+        response = client.get("/metrics")
+
+        # Assert
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        body = response.text
+        assert 'http_request_duration_seconds_count{method="GET",route="/api/cache-stats"}' in body
+        assert 'job_queue_depth{job_type="pipeline",status="queued"} 2' in body
+        assert 'cache_hit_ratio{cache="meta_data"}' in body
+        assert "upstream_request_duration_seconds" in body
@@ -0,0 +1,212 @@
+"""
+Unit тести для компактної форми телефонів лідів (app/services/phone_payload.py)
+та payload_version у /api/meta-data.
+"""
+
+import json
+
+import pytest
+
+from app.services import alfacrm_tracking
+from app.services.phone_payload import (
+    StatusPhoneBuilder,
+    decode_bitmap,
+    encode_bitmap,
+    expand_campaign_phones,
+    expand_report,
+    expand_student_row,
+)
+
+
+def _lead(phone):
+    return {"field_data": [{"name": "phone_number", "values": [phone]}]}
+
+
+class TestBitmap:
+    """Тести для бітової маски passed/current."""
+
+    @pytest.mark.parametrize("flags", [[], [True], [False, True, True], [True] * 9 + [False] * 7 + [True]])
+    def test_roundtrip(self, flags):
+        # Act
+        decoded = decode_bitmap(encode_bitmap(flags), len(flags))
+
+        # Assert
+        assert decoded == flags
+
+    def test_lsb_first(self):
+        # Act
+        bitmap = encode_bitmap([True, False, False, False, False, False, False, False, True])
+
+        # Assert
+        assert bitmap == "AQE="
+
+
+class TestStatusPhoneBuilder:
+    """Тести для StatusPhoneBuilder та розгортання у версію 1."""
+
+    def test_phone_stored_once(self):
+        # Arrange
+        builder = StatusPhoneBuilder()
+
+        # Act
+        builder.add("Нові", "+380501111111", is_current=False)
+        builder.add("Співбесіда", "+380501111111", is_current=True)
+        builder.add("Нові", "+380502222222", is_current=True)
+        compact = builder.build()
+
+        # Assert
+        assert compact["phones"] == ["+380501111111", "+380502222222"]
+        assert compact["statuses"]["Нові"]["idx"] == [0, 1]
+        assert expand_campaign_phones(compact) == {
+            "Нові": [
+                {"phone": "+380501111111", "status": "passed"},
+                {"phone": "+380502222222", "status": "current"},
+            ],
+            "Співбесіда": [{"phone": "+380501111111", "status": "current"}],
+        }
+
+    def test_compact_is_smaller(self):
+        # Arrange
+        builder = StatusPhoneBuilder()
+        full = {}
+        for i in range(200):
+            phone = f"+38050{i:07d}"
+            for status in ("Призначено пробне (ЦА)", "Проведено пробне (ЦА)", "Чекає оплату"):
+                builder.add(status, phone, is_current=status == "Чекає оплату")
+                full.setdefault(status, []).append({"phone": phone, "status": "passed"})
+
+        # Act
+        compact_size = len(json.dumps(builder.build()))
+        full_size = len(json.dumps(full))
+
+        # Assert
+        assert compact_size * 3 < full_size
+
+
+class TestLeadPhoneIndexes:
+    """Тести для alfacrm_tracking.get_lead_phone_indexes_by_status."""
+
+    def test_cumulative_statuses_share_indexes(self):
+        # Arrange
+        leads = [_lead("+380501111111"), _lead("+380502222222"), _lead("+380503333333")]
+        index = {
+            "380501111111": {"lead_status_id": 2},   # Призначено пробне (ЦА)
+            "380502222222": {"lead_status_id": 4},   # Отримана оплата (ЦА)
+        }
+
+        # Act
+        compact = alfacrm_tracking.get_lead_phone_indexes_by_status(leads, index)
+        full = alfacrm_tracking.get_lead_phones_by_status(leads, index)
+
+        # Assert
+        assert compact["phones"] == ["+380501111111", "+380502222222", "+380503333333"]
+        assert compact["statuses"]["Призначено пробне (ЦА)"] == [0, 1]
+        assert compact["statuses"]["Отримана оплата (ЦА)"] == [1]
+        assert full["leads_count"] == compact["phones"]
+        assert full["Призначено пробне (ЦА)"] == ["+380501111111", "+380502222222"]
+
+
+class TestExpandReport:
+    """Тести для розгортання звіту версії 2 у версію 1."""
+
+    REPORT = {
+        "payload_version": 2,
+        "students": [{
+            "campaign_name": "Англійська",
+            "phones": ["+380501111111", "+380502222222"],
+            "leads_count": 2,
+            "Чекає оплату": [1],
+            "Не розібраний": [0],
+            "budget": 10.0,
+        }],
+        "teachers": [{"campaign_name": "Вчителі", "leads_count": 5}],
+        "lead_phones": {
+            "students": {"c1": {"phones": ["+380501111111"], "statuses": {"Не розібраний": {"idx": [0], "current": "AQ=="}}}},
+            "teachers": {},
+        },
+    }
+
+    def test_expand_student_row(self):
+        # Act
+        row = expand_student_row(self.REPORT["students"][0])
+
+        # Assert
+        assert "phones" not in row
+        assert row["leads_count"] == ["+380501111111", "+380502222222"]
+        assert row["Чекає оплату"] == ["+380502222222"]
+        assert row["budget"] == 10.0
+
+    def test_expand_report_keeps_cached_report(self):
+        # Arrange
+        snapshot = json.dumps(self.REPORT, sort_keys=True)
+
+        # Act
+        expanded = expand_report(self.REPORT)
+
+        # Assert
+        assert expanded["payload_version"] == 1
+        assert expanded["teachers"] == self.REPORT["teachers"]
+        assert expanded["lead_phones"]["students"]["c1"] == {
+            "Не розібраний": [{"phone": "+380501111111", "status": "current"}]
+        }
+        assert json.dumps(self.REPORT, sort_keys=True) == snapshot
+
+
+class TestMetaDataPayloadVersion:
+    """Тести для payload_version у /api/meta-data."""
+
+    @pytest.fixture
+    def client(self, patched_get_db, monkeypatch):
+        from fastapi.testclient import TestClient
+        from app import main
+
+        builds = []
+
+        async def fake_build(db, *args, timer=None, **kwargs):
+            builds.append(1)
+            return json.loads(json.dumps(TestExpandReport.REPORT))
+
+        monkeypatch.setenv("META_ACCESS_TOKEN", "token")
+        monkeypatch.setenv("META_AD_ACCOUNT_ID", "act_1")
+        monkeypatch.setattr(main, "get_db", patched_get_db)
+        monkeypatch.setattr(main, "meta_report_cache", main.ReportCache())
+        monkeypatch.setattr(main, "build_meta_report", fake_build)
+        client = TestClient(main.app, base_url="http://localhost")
+        client.builds = builds
+        return client
+
+    def test_versions_share_cached_report(self, client):
+        # Arrange
+        params = {"start_date": "2025-10-01", "end_date": "2025-10-07"}
+
+        # Act
+        full = client.get("/api/meta-data", params=params).json()
+        compact = client.get("/api/meta-data", params={**params, "payload_version": 2}).json()
+
+        # Assert
+        assert len(client.builds) == 1
+        assert full["payload_version"] == 1
+        assert full["students"][0]["leads_count"] == ["+380501111111", "+380502222222"]
+        assert compact["payload_version"] == 2
+        assert compact["students"][0]["Чекає оплату"] == [1]
+
+    def test_only_full_version_is_deprecated(self, client):
+        # Arrange
+        params = {"start_date": "2025-10-01", "end_date": "2025-10-07"}
+
+        # Act
+        full = client.get("/api/meta-data", params=params)
+        counts = client.get("/api/meta-data", params={**params, "payload_version": 3})
+
+        # Assert
+        assert full.headers["Deprecation"] == "true"
+        assert "Deprecation" not in counts.headers
+
+    def test_unknown_version_rejected(self, client):
+        # Act
+        response = client.get(
+            "/api/meta-data", params={"start_date": "2025-10-01", "end_date": "2025-10-07", "payload_version": 9}
+        )
+
+        # Assert
+        assert response.status_code == 400
@@ -0,0 +1,169 @@
+"""
+Unit тести для stale-while-revalidate кешу звітів (app/report_cache.py).
+"""
+
+import asyncio
+from unittest.mock import patch
+
+from app.report_cache import ReportCache
+
+
+class Counter:
+    """Допоміжна функція-обчислювач, яка рахує виклики."""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        return {"version": self.calls}
+
+
+class TestReportCache:
+    """Тести для ReportCache.get_or_compute."""
+
+    async def test_miss_then_hit(self):
+        """Тест що повторний запит не перераховує звіт."""
+        # Arrange
+        cache = ReportCache(fresh_ttl=60, stale_ttl=600)
+        compute = Counter()
+
+        # Act
+        first, first_status = await cache.get_or_compute("k", compute)
+        second, second_status = await cache.get_or_compute("k", compute)
+
+        # Assert
+        assert first_status == "MISS"
+        assert second_status == "HIT"
+        assert first == second == {"version": 1}
+        assert compute.calls == 1
+
+    async def test_stale_served_with_single_background_refresh(self):
+        """Тест що stale запис віддається одразу, а оновлення запускається один раз."""
+        # Arrange
+        cache = ReportCache(fresh_ttl=10, stale_ttl=600)
+        compute = Counter()
+        with patch("app.report_cache.time.monotonic", return_value=1000.0):
+            await cache.get_or_compute("k", compute)
+
+        # Act: 5 користувачів відкривають звіт, коли він вже застарів
+        with patch("app.report_cache.time.monotonic", return_value=1100.0):
+            results = [await cache.get_or_compute("k", compute) for _ in range(5)]
+            await asyncio.sleep(0)
+
+        # Assert
+        assert all(status == "STALE" for _, status in results)
+        assert all(value == {"version": 1} for value, _ in results)
+        assert compute.calls == 2
+        assert cache.stats()["refreshes"] == 1
+
+    async def test_refresh_task_referenced_until_done(self):
+        """Тест що фонове оновлення тримається в кеші, доки не завершиться."""
+        # Arrange
+        cache = ReportCache(fresh_ttl=10, stale_ttl=600)
+        release = asyncio.Event()
+
+        async def slow_compute():
+            await release.wait()
+            return {"version": 2}
+
+        with patch("app.report_cache.time.monotonic", return_value=1000.0):
+            await cache.get_or_compute("k", Counter())
+
+        # Act
+        with patch("app.report_cache.time.monotonic", return_value=1100.0):
+            await cache.get_or_compute("k", slow_compute)
+        (task,) = cache._refresh_tasks
+        release.set()
+        await task
+
+        # Assert
+        assert cache._refresh_tasks == set()
+        assert cache.get("k")[0] == {"version": 2}
+
+    async def test_stale_refresh_uses_refresh_callable(self):
+        """Тест що фонове оновлення рахується через refresh, а не compute."""
+        # Arrange
+        cache = ReportCache(fresh_ttl=10, stale_ttl=600)
+        compute, refresh = Counter(), Counter()
+        with patch("app.report_cache.time.monotonic", return_value=1000.0):
+            cache.set("k", {"version": 1})
+
+        # Act
+        with patch("app.report_cache.time.monotonic", return_value=1100.0):
+            await cache.get_or_compute("k", compute, refresh=refresh)
+        (task,) = cache._refresh_tasks
+        await task
+
+        # Assert
+        assert compute.calls == 0
+        assert refresh.calls == 1
+
+    async def test_expired_entry_is_recomputed(self):
+        """Тест що запис старший за stale_ttl рахується заново."""
+        # Arrange
+        cache = ReportCache(fresh_ttl=10, stale_ttl=100)
+        compute = Counter()
+        with patch("app.report_cache.time.monotonic", return_value=1000.0):
+            await cache.get_or_compute("k", compute)
+
+        # Act
+        with patch("app.report_cache.time.monotonic", return_value=2000.0):
+            value, status = await cache.get_or_compute("k", compute)
+
+        # Assert
+        assert status == "MISS"
+        assert value == {"version": 2}
+
+    async def test_bypass_recomputes_and_updates_cache(self):
+        """Тест що bypass (refresh=1) завжди рахує заново."""
+        # Arrange
+        cache = ReportCache()
+        compute = Counter()
+        await cache.get_or_compute("k", compute)
+
+        # Act
+        value, status = await cache.get_or_compute("k", compute, bypass=True)
+        cached, cached_status = await cache.get_or_compute("k", compute)
+
+        # Assert
+        assert status == "BYPASS"
+        assert value == cached == {"version": 2}
+        assert cached_status == "HIT"
+
+    async def test_failed_refresh_keeps_stale_entry(self):
+        """Тест що помилка фонового оновлення не видаляє stale запис."""
+        # Arrange
+        cache = ReportCache(fresh_ttl=10, stale_ttl=600)
+        with patch("app.report_cache.time.monotonic", return_value=1000.0):
+            cache.set("k", {"version": 1})
+
+        async def failing():
+            raise RuntimeError("Graph API down")
+
+        # Act
+        with patch("app.report_cache.time.monotonic", return_value=1100.0):
+            value, status = await cache.get_or_compute("k", failing)
+            await asyncio.sleep(0)
+            again, _ = await cache.get_or_compute("k", failing)
+            await asyncio.sleep(0)
+
+        # Assert
+        assert status == "STALE"
+        assert value == again == {"version": 1}
+
+    def test_max_entries_evicts_least_recent(self):
+        """Тест обмеження кількості записів."""
+        # Arrange
+        cache = ReportCache(max_entries=2)
+
+        # Act
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        # Assert
+        assert cache.get("b") == (None, None)
+        assert cache.get("a")[0] == 1
+        assert cache.get("c")[0] == 3
@@ -0,0 +1,281 @@
+"""
+Unit тести для retention політики (app/retention.py): стиснення старих
+логів запусків, архівування результатів пошуку та VACUUM/ANALYZE.
+"""
+
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from app import retention, scheduler
+from app.models import (
+    Base, JobProgress, JobProgressLog, PipelineRun, RateLimitCounter, RunLog, RunLogArchive, SearchHistory,
+)
+from app.scheduler import CronSchedule
+
+
+NOW = datetime(2025, 12, 1, 3, 30)
+
+
+@pytest.fixture
+def db_engine(tmp_path):
+    """Файлова база замість in-memory з conftest - VACUUM і freelist потребують файлу."""
+    engine = create_engine(f"sqlite:///{tmp_path}/history.db", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def patched_db(patched_get_db, db_engine, monkeypatch):
+    monkeypatch.setattr(retention.database, "get_db", patched_get_db)
+    monkeypatch.setattr(retention.database, "engine", db_engine)
+    return patched_get_db
+
+
+def _add_run(session, job_id, days_ago, status="success", logs=3):
+    run = PipelineRun(
+        job_id=job_id, start_time=NOW - timedelta(days=days_ago),
+        start_date="2025-10-01", end_date="2025-10-07", status=status
+    )
+    session.add(run)
+    session.flush()
+    for i in range(logs):
+        session.add(RunLog(
+            run_id=run.id, timestamp=run.start_time + timedelta(seconds=i),
+            level="error" if i == logs - 1 else "info", message=f"{job_id} крок {i}"
+        ))
+    session.add(RunLog(run_id=run.id, timestamp=run.start_time, level="timing", message='{"total": 1.0}'))
+    return run.id
+
+
+class TestCompactRunLogs:
+    """Тести для compact_run_logs."""
+
+    def test_old_finished_runs_are_compacted(self, Session):
+        # Arrange
+        session = Session()
+        old_id = _add_run(session, "old", days_ago=40)
+        recent_id = _add_run(session, "recent", days_ago=5)
+        running_id = _add_run(session, "running", days_ago=40, status="running")
+        session.commit()
+
+        # Act
+        stats = retention.compact_run_logs(session, NOW - timedelta(days=30))
+
+        # Assert
+        assert stats == {"runs": 1, "logs": 3}
+        remaining = {(log.run_id, log.level) for log in session.query(RunLog)}
+        assert (old_id, "timing") in remaining and (old_id, "info") not in remaining
+        assert (recent_id, "info") in remaining and (running_id, "info") in remaining
+        archive = session.query(RunLogArchive).one()
+        assert (archive.run_id, archive.log_count, archive.error_count) == (old_id, 3, 1)
+        assert [entry["message"] for entry in retention.load_archived_logs(session, old_id)] == [
+            "old крок 0", "old крок 1", "old крок 2"
+        ]
+        session.close()
+
+    def test_late_logs_appended_to_existing_archive(self, Session):
+        # Arrange
+        session = Session()
+        run_id = _add_run(session, "old", days_ago=40, logs=2)
+        session.commit()
+        retention.compact_run_logs(session, NOW - timedelta(days=30))
+        session.add(RunLog(run_id=run_id, timestamp=NOW, level="info", message="пізній лог"))
+        session.commit()
+
+        # Act
+        retention.compact_run_logs(session, NOW - timedelta(days=30))
+
+        # Assert
+        logs = retention.load_archived_logs(session, run_id)
+        assert len(logs) == 3
+        assert logs[-1]["message"] == "пізній лог"
+        assert session.query(RunLogArchive).one().last_timestamp == NOW
+        session.close()
+
+
+class TestArchiveSearchResults:
+    """Тести для archive_search_results."""
+
+    def test_results_moved_to_compressed_archive(self, Session):
+        # Arrange
+        session = Session()
+        results = [{"campaign_id": str(i), "name": "Кампанія для студентів"} for i in range(200)]
+        old = SearchHistory(start_date="2025-08-01", end_date="2025-08-07", tab_type="ads", results_count=200,
+                            results_json=json.dumps(results, ensure_ascii=False), created_at=NOW - timedelta(days=100))
+        recent = SearchHistory(start_date="2025-11-01", end_date="2025-11-07", tab_type="ads", results_count=1,
+                               results_json="[]", created_at=NOW - timedelta(days=1))
+        session.add_all([old, recent])
+        session.commit()
+
+        # Act
+        stats = retention.archive_search_results(session, NOW - timedelta(days=90))
+
+        # Assert
+        assert stats["searches"] == 1
+        assert stats["bytes_after"] < stats["bytes_before"] / 5
+        assert session.query(SearchHistory.results_json).filter(SearchHistory.id == old.id).scalar() is None
+        assert session.query(SearchHistory.results_json).filter(SearchHistory.id == recent.id).scalar() == "[]"
+        assert retention.load_archived_results(session, old.id) == results
+        assert retention.load_archived_results(session, recent.id) is None
+        session.close()
+
+
+class TestPruneSharedState:
+    """Тести для чистки прогресу задач та лічильників rate limit."""
+
+    def test_stale_job_progress_is_deleted(self, Session):
+        # Arrange
+        session = Session()
+        session.add_all([
+            JobProgress(job_id="old", status="done", updated_at=NOW - timedelta(days=10)),
+            JobProgress(job_id="crashed", status="running", updated_at=NOW - timedelta(days=8)),
+            JobProgress(job_id="recent", status="running", updated_at=NOW - timedelta(hours=1)),
+        ])
+        session.add_all([JobProgressLog(job_id=job_id, message="крок") for job_id in ("old", "old", "crashed", "recent")])
+        session.commit()
+
+        # Act
+        stats = retention.prune_job_progress(session, NOW - timedelta(days=7), batch_size=1)
+
+        # Assert
+        assert stats == {"jobs": 2, "logs": 3}
+        assert [job_id for (job_id,) in session.query(JobProgress.job_id)] == ["recent"]
+        assert session.query(JobProgressLog).count() == 1
+        session.close()
+
+    def test_expired_rate_limit_counters_are_deleted(self, Session):
+        # Arrange
+        session = Session()
+        now_ts = (NOW - datetime(1970, 1, 1)).total_seconds()
+        session.add_all([
+            RateLimitCounter(key="expired", count=5, expires_at=now_ts - 1),
+            RateLimitCounter(key="active", count=1, expires_at=now_ts + 60),
+        ])
+        session.commit()
+
+        # Act
+        deleted = retention.prune_rate_limit_counters(session, NOW)
+
+        # Assert
+        assert deleted == 1
+        assert [key for (key,) in session.query(RateLimitCounter.key)] == ["active"]
+        session.close()
+
+
+class TestRunRetention:
+    """Тести для повного циклу та endpoint'ів."""
+
+    def test_run_retention_and_archived_data_via_api(self, Session, patched_db, monkeypatch):
+        # Arrange
+        from fastapi.testclient import TestClient
+        from app import main
+
+        session = Session()
+        run_id = _add_run(session, "old", days_ago=40)
+        search = SearchHistory(start_date="2025-08-01", end_date="2025-08-07", tab_type="students",
+                               results_count=1, results_json='[{"phone": "380501234567"}]',
+                               created_at=NOW - timedelta(days=100))
+        session.add(search)
+        session.commit()
+        search_id = search.id
+        session.close()
+        monkeypatch.setattr(main, "get_db", patched_db)
+        client = TestClient(main.app, base_url="http://localhost")
+
+        # Act
+        stats = retention.run_retention(retention.RetentionPolicy(vacuum_free_ratio=0.0), now=NOW)
+        run = client.get(f"/api/runs/{run_id}").json()
+        results = client.get(f"/api/search-history/{search_id}").json()
+
+        # Assert
+        assert stats["run_logs"]["runs"] == 1 and stats["search_history"]["searches"] == 1
+        assert stats["job_progress"] == {"jobs": 0, "logs": 0} and stats["rate_limit_counters"] == 0
+        assert stats["optimize"]["dialect"] == "sqlite"
+        assert run["logs_archived"] is True
+        assert [log["level"] for log in run["logs"]].count("info") == 2
+        assert results["results"] == [{"phone": "380501234567"}]
+
+    def test_vacuum_only_above_free_ratio(self, db_engine, Session):
+        # Arrange
+        session = Session()
+        session.add_all(
+            SearchHistory(start_date="2025-08-01", end_date="2025-08-07", tab_type="ads", results_json="x" * 4000)
+            for _ in range(200)
+        )
+        session.commit()
+        session.query(SearchHistory).delete()
+        session.commit()
+        session.close()
+
+        # Act
+        skipped = retention.optimize_database(db_engine, vacuum_free_ratio=0.99)
+        vacuumed = retention.optimize_database(db_engine, vacuum_free_ratio=0.2)
+
+        # Assert
+        assert skipped["vacuumed"] is False and skipped["free_ratio"] > 0.2
+        assert vacuumed["vacuumed"] is True
+        with db_engine.connect() as conn:
+            assert conn.execute(text("PRAGMA freelist_count")).scalar() == 0
+
+
+class TestRetentionScheduler:
+    """Тести для RetentionScheduler."""
+
+    @pytest.fixture(autouse=True)
+    def lock_db(self, patched_db, monkeypatch):
+        monkeypatch.setattr(scheduler, "get_db", patched_db)
+
+    async def test_fires_once_per_matching_minute(self, monkeypatch):
+        # Arrange
+        calls = []
+        monkeypatch.setattr(retention, "run_retention", lambda policy: calls.append(policy) or {"ok": True})
+        sched = retention.RetentionScheduler(CronSchedule("30 3 * * *"), retention.RetentionPolicy())
+
+        # Act
+        first = sched.tick(NOW)
+        executed = await sched.run_pending(NOW.date())
+        repeated = sched.tick(NOW + timedelta(seconds=20))
+        other = sched.tick(NOW + timedelta(minutes=1))
+
+        # Assert
+        assert first == ["daily"] and executed == ["daily"]
+        assert repeated == [] and other == []
+        assert sched.last_stats == {"ok": True}
+        assert len(calls) == 1
+
+    async def test_missed_minute_is_caught_up(self, monkeypatch):
+        """Тест що 03:30 не губиться, якщо перевірка затрималась."""
+        # Arrange
+        monkeypatch.setattr(retention, "run_retention", lambda policy: {"ok": True})
+        sched = retention.RetentionScheduler(CronSchedule("30 3 * * *"), retention.RetentionPolicy())
+        sched.tick(NOW - timedelta(minutes=1))
+
+        # Act
+        queued = sched.tick(NOW + timedelta(minutes=2))
+
+        # Assert
+        assert queued == ["daily"]
+
+    async def test_runs_on_one_worker(self, monkeypatch):
+        """Тест що кожен uvicorn worker має свій планувальник, але чистка йде один раз."""
+        # Arrange
+        calls = []
+        monkeypatch.setattr(retention, "run_retention", lambda policy: calls.append(policy) or {"ok": True})
+        workers = [
+            retention.RetentionScheduler(CronSchedule("30 3 * * *"), retention.RetentionPolicy())
+            for _ in range(2)
+        ]
+
+        # Act
+        executed = []
+        for sched in workers:
+            sched.tick(NOW)
+            executed.append(await sched.run_pending(NOW.date()))
+
+        # Assert
+        assert executed == [["daily"], []]
+        assert len(calls) == 1
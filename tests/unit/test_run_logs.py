@@ -0,0 +1,140 @@
+"""
+Unit тести для курсорних логів запуску /api/runs/{run_id}/logs (JSON сторінки та NDJSON потік).
+"""
+
+import json
+import zlib
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import text
+
+from app.models import PipelineRun, RunLog, RunLogArchive
+
+
+@pytest.fixture
+def main_module(patched_get_db, monkeypatch):
+    from app import main
+
+    monkeypatch.setattr(main, "get_db", patched_get_db)
+    return main
+
+
+@pytest.fixture
+def client(main_module):
+    from fastapi.testclient import TestClient
+
+    return TestClient(main_module.app, base_url="http://localhost")
+
+
+@pytest.fixture
+def run_id(Session):
+    session = Session()
+    run = PipelineRun(job_id="job-logs", start_date="2025-10-01", end_date="2025-10-07", status="success")
+    session.add(run)
+    session.flush()
+    started = datetime(2025, 10, 8, 9, 0)
+    for i in range(10):
+        session.add(RunLog(
+            run_id=run.id, timestamp=started + timedelta(seconds=i),
+            level="error" if i % 4 == 3 else "info", message=f"Кампанія {i}"
+        ))
+    session.commit()
+    run_id = run.id
+    session.close()
+    return run_id
+
+
+class TestRunLogsPages:
+    """Тести для JSON сторінок логів."""
+
+    def test_pages_by_after_id(self, client, run_id):
+        # Arrange
+        messages, params = [], {"limit": 4}
+
+        # Act
+        while True:
+            page = client.get(f"/api/runs/{run_id}/logs", params=params).json()
+            messages.extend(log["message"] for log in page["logs"])
+            if page["next_after_id"] is None:
+                break
+            params = {"limit": 4, "after_id": page["next_after_id"]}
+
+        # Assert
+        assert messages == [f"Кампанія {i}" for i in range(10)]
+
+    def test_level_filter_and_tail(self, client, run_id, Session):
+        # Arrange
+        errors = client.get(f"/api/runs/{run_id}/logs", params={"level": "error"}).json()
+        session = Session()
+        session.add(RunLog(run_id=run_id, level="error", message="Новий збій"))
+        session.commit()
+        session.close()
+
+        # Act
+        tail = client.get(f"/api/runs/{run_id}/logs", params={"level": "error", "after_id": errors["last_id"]}).json()
+
+        # Assert
+        assert [log["message"] for log in errors["logs"]] == ["Кампанія 3", "Кампанія 7"]
+        assert [log["message"] for log in tail["logs"]] == ["Новий збій"]
+        assert tail["next_after_id"] is None
+
+    def test_unknown_run_and_format(self, client, run_id):
+        # Act
+        missing = client.get("/api/runs/999/logs")
+        bad_format = client.get(f"/api/runs/{run_id}/logs", params={"format": "xml"})
+
+        # Assert
+        assert missing.status_code == 404
+        assert bad_format.status_code == 400
+
+    def test_run_details_caps_logs(self, client, run_id, main_module, monkeypatch):
+        # Arrange
+        monkeypatch.setattr(main_module, "RUN_DETAILS_LOG_LIMIT", 3)
+
+        # Act
+        data = client.get(f"/api/runs/{run_id}").json()
+
+        # Assert
+        assert len(data["logs"]) == 3
+        assert data["logs_next_after_id"] == data["logs"][-1]["id"]
+
+
+class TestRunLogsNdjson:
+    """Тести для NDJSON потоку."""
+
+    def test_stream_includes_archived_logs_first(self, client, run_id, Session):
+        # Arrange
+        session = Session()
+        archived = [{"timestamp": "2025-10-08T08:59:00", "level": "info", "message": "Архівний лог"}]
+        session.add(RunLogArchive(run_id=run_id, log_count=1, logs_zlib=zlib.compress(json.dumps(archived).encode())))
+        session.commit()
+        session.close()
+
+        # Act
+        with client.stream("GET", f"/api/runs/{run_id}/logs", params={"format": "ndjson"}) as response:
+            lines = [json.loads(line) for line in response.iter_lines() if line]
+
+        # Assert
+        assert response.headers["content-type"] == "application/x-ndjson"
+        assert lines[0] == {"id": None, **archived[0]}
+        assert [line["message"] for line in lines[1:]] == [f"Кампанія {i}" for i in range(10)]
+
+    def test_stream_after_id_with_level(self, client, run_id):
+        # Act
+        response = client.get(f"/api/runs/{run_id}/logs", params={"format": "ndjson", "after_id": 4, "level": "error"})
+
+        # Assert
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert [line["message"] for line in lines] == ["Кампанія 7"]
+
+    def test_query_plan_uses_run_id_id_index(self, db_engine):
+        # Act
+        with db_engine.connect() as conn:
+            plan = " ".join(row[-1] for row in conn.execute(text(
+                "EXPLAIN QUERY PLAN SELECT * FROM run_logs WHERE run_id = 1 AND id > 100 ORDER BY id LIMIT 500"
+            )))
+
+        # Assert
+        assert "ix_run_logs_run_id_id" in plan
+        assert "TEMP B-TREE" not in plan
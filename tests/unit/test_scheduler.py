@@ -0,0 +1,288 @@
+"""
+Unit тести для планувальника pre-warm звітів (app/scheduler.py).
+"""
+
+import asyncio
+import pytest
+from datetime import date, datetime, timedelta
+
+from app import scheduler
+from app.connectors.meta import GraphRateGovernor
+from app.models import PipelineRun, RunLog, SchedulerLock
+from app.scheduler import (
+    CronSchedule, PrewarmScheduler, claim_slot, due_minutes, parse_windows, release_slot, resolve_window
+)
+
+
+@pytest.fixture
+def session_factory(Session, patched_get_db, monkeypatch):
+    """Підміняє get_db планувальника на in-memory базу."""
+    monkeypatch.setattr(scheduler, "get_db", patched_get_db)
+    return Session
+
+
+@pytest.fixture
+def governor(monkeypatch):
+    """Окремий governor для кожного тесту."""
+    gov = GraphRateGovernor()
+    monkeypatch.setattr(scheduler, "graph_governor", gov)
+    return gov
+
+
+class TestCronSchedule:
+    """Тести для розбору cron виразів."""
+
+    def test_daily_at_five(self):
+        schedule = CronSchedule("0 5 * * *")
+
+        assert schedule.matches(datetime(2025, 10, 15, 5, 0))
+        assert not schedule.matches(datetime(2025, 10, 15, 5, 1))
+        assert not schedule.matches(datetime(2025, 10, 15, 6, 0))
+
+    def test_steps_ranges_and_weekdays(self):
+        """Тест '*/15' та днів тижня (1-5 = пн-пт)."""
+        schedule = CronSchedule("*/15 6-8 * * 1-5")
+
+        assert schedule.matches(datetime(2025, 10, 13, 7, 45))  # понеділок
+        assert not schedule.matches(datetime(2025, 10, 12, 7, 45))  # неділя
+        assert not schedule.matches(datetime(2025, 10, 13, 7, 10))
+
+    def test_invalid_expression(self):
+        with pytest.raises(ValueError):
+            CronSchedule("0 25 * * *")
+        with pytest.raises(ValueError):
+            CronSchedule("0 5 * *")
+
+
+class TestWindows:
+    """Тести для стандартних вікон звітів."""
+
+    def test_resolve_windows(self):
+        today = date(2025, 10, 15)
+
+        assert resolve_window("yesterday", today) == ("2025-10-14", "2025-10-14")
+        assert resolve_window("last_7_days", today) == ("2025-10-08", "2025-10-14")
+        assert resolve_window("month_to_date", today) == ("2025-10-01", "2025-10-15")
+        assert resolve_window("last_month", date(2025, 1, 10)) == ("2024-12-01", "2024-12-31")
+
+    def test_parse_windows_skips_invalid(self):
+        windows = parse_windows("yesterday=0 5 * * *;unknown=0 5 * * *;last_month=bad")
+
+        assert [name for name, _ in windows] == ["yesterday"]
+
+
+class TestDueMinutes:
+    """Тести для хвилин, що перевіряються за розкладом."""
+
+    def test_first_check_looks_at_current_minute(self):
+        assert due_minutes(None, datetime(2025, 10, 15, 5, 0, 40)) == [datetime(2025, 10, 15, 5, 0)]
+
+    def test_missed_minutes_are_caught_up(self):
+        """Тест що хвилини між перевірками не губляться."""
+        minutes = due_minutes(datetime(2025, 10, 15, 5, 0), datetime(2025, 10, 15, 5, 3, 10))
+
+        assert minutes == [datetime(2025, 10, 15, 5, m) for m in (1, 2, 3)]
+
+    def test_same_minute_is_not_repeated(self):
+        assert due_minutes(datetime(2025, 10, 15, 5, 0), datetime(2025, 10, 15, 5, 0, 50)) == []
+
+    def test_catch_up_is_bounded(self):
+        minutes = due_minutes(datetime(2025, 10, 1, 5, 0), datetime(2025, 10, 15, 5, 0))
+
+        assert minutes[0] == datetime(2025, 10, 14, 5, 0)
+        assert len(minutes) == 24 * 60 + 1
+
+
+class TestSchedulerLock:
+    """Тести для claim_slot / release_slot."""
+
+    def test_slot_is_claimed_once(self, session_factory):
+        """Тест що запуск за розкладом забирає лише один worker."""
+        # Arrange
+        db = session_factory()
+        slot = datetime(2025, 10, 15, 5, 0)
+
+        # Act
+        first = claim_slot(db, "prewarm:yesterday", slot, "worker-a", 60)
+        release_slot(db, "prewarm:yesterday", "worker-a")
+        second = claim_slot(db, "prewarm:yesterday", slot, "worker-b", 60)
+        next_day = claim_slot(db, "prewarm:yesterday", slot + timedelta(days=1), "worker-b", 60)
+
+        # Assert
+        assert first is True
+        assert second is False
+        assert next_day is True
+        assert db.query(SchedulerLock).one().owner == "worker-b"
+
+    def test_running_lease_blocks_next_slot(self, session_factory):
+        """Тест що поки запуск триває (lease), наступний не стартує."""
+        # Arrange
+        db = session_factory()
+        slot = datetime(2025, 10, 15, 5, 0)
+        claim_slot(db, "retention:daily", slot, "worker-a", 3600)
+
+        # Act
+        blocked = claim_slot(db, "retention:daily", slot + timedelta(minutes=1), "worker-b", 3600)
+
+        # Assert
+        assert blocked is False
+
+
+class TestPrewarmScheduler:
+    """Тести для PrewarmScheduler.tick та run_pending."""
+
+    async def test_due_window_runs_and_is_recorded(self, session_factory, governor):
+        """Тест що вікно виконується за розкладом та записується в PipelineRun."""
+        # Arrange
+        calls = []
+
+        async def runner(start_date, end_date):
+            calls.append((start_date, end_date))
+            return {"insights_count": 12, "students_count": 3, "teachers_count": 2}
+
+        sched = PrewarmScheduler(parse_windows("yesterday=0 5 * * *"), runner)
+
+        # Act
+        queued = sched.tick(datetime(2025, 10, 15, 5, 0, 20))
+        again = sched.tick(datetime(2025, 10, 15, 5, 0, 50))
+        executed = await sched.run_pending(date(2025, 10, 15))
+
+        # Assert
+        assert queued == ["yesterday"]
+        assert again == []
+        assert executed == ["yesterday"]
+        assert calls == [("2025-10-14", "2025-10-14")]
+        db = session_factory()
+        run = db.query(PipelineRun).one()
+        assert run.status == "success"
+        assert run.storage_backend == "prewarm"
+        assert run.insights_count == 12
+        assert db.query(RunLog).filter(RunLog.run_id == run.id).count() == 2
+
+    async def test_deferred_while_graph_usage_is_high(self, session_factory, governor):
+        """Тест що вікно відкладається, поки Graph API близький до ліміту."""
+        # Arrange
+        async def runner(start_date, end_date):
+            return {}
+
+        sched = PrewarmScheduler(parse_windows("last_month=0 5 * * *"), runner, max_graph_usage=50)
+        governor.record({"x-app-usage": '{"call_count": 80, "total_cputime": 10, "total_time": 12}'})
+
+        # Act
+        sched.tick(datetime(2025, 10, 15, 5, 0))
+        deferred = await sched.run_pending(date(2025, 10, 15))
+        governor.record({"x-app-usage": '{"call_count": 10, "total_cputime": 5, "total_time": 5}'})
+        sched.tick(datetime(2025, 10, 15, 5, 1))
+        resumed = await sched.run_pending(date(2025, 10, 15))
+
+        # Assert
+        assert deferred == []
+        assert resumed == ["last_month"]
+
+    async def test_runner_error_is_recorded(self, session_factory, governor):
+        """Тест що помилка обчислення записується в PipelineRun."""
+        # Arrange
+        async def runner(start_date, end_date):
+            raise RuntimeError("META_ACCESS_TOKEN не налаштований")
+
+        sched = PrewarmScheduler(parse_windows("yesterday=0 5 * * *"), runner)
+
+        # Act
+        sched.tick(datetime(2025, 10, 15, 5, 0))
+        await sched.run_pending(date(2025, 10, 15))
+
+        # Assert
+        run = session_factory().query(PipelineRun).one()
+        assert run.status == "error"
+        assert "META_ACCESS_TOKEN" in run.error_message
+
+    async def test_window_runs_on_one_worker(self, session_factory, governor):
+        """Тест що при кількох uvicorn worker'ах вікно виконується один раз."""
+        # Arrange
+        calls = []
+
+        async def runner(start_date, end_date):
+            calls.append(start_date)
+            return {}
+
+        workers = [PrewarmScheduler(parse_windows("yesterday=0 5 * * *"), runner) for _ in range(2)]
+
+        # Act
+        executed = []
+        for sched in workers:
+            sched.tick(datetime(2025, 10, 15, 5, 0, 10))
+            executed.append(await sched.run_pending(date(2025, 10, 15)))
+
+        # Assert
+        assert executed == [["yesterday"], []]
+        assert calls == ["2025-10-14"]
+
+    async def test_slow_window_does_not_skip_next(self, session_factory, governor):
+        """Тест що вікно, чия хвилина минула під час повільного вікна, все одно виконується."""
+        # Arrange
+        calls = []
+
+        async def runner(start_date, end_date):
+            calls.append((start_date, end_date))
+            return {}
+
+        sched = PrewarmScheduler(parse_windows("yesterday=0 5 * * *;last_7_days=5 5 * * *"), runner)
+        start = datetime(2025, 10, 15, 5, 0, 30)
+
+        # Act
+        first = sched.tick(start)
+        # наступна перевірка прийшла вже після 5:05
+        second = sched.tick(start + timedelta(minutes=7))
+
+        # Assert
+        assert first == ["yesterday"]
+        assert second == ["last_7_days"]
+
+    async def test_dispatch_runs_windows_in_background(self, session_factory, governor):
+        """Тест що dispatch не чекає на виконання вікна."""
+        # Arrange
+        release = asyncio.Event()
+        calls = []
+
+        async def runner(start_date, end_date):
+            calls.append(start_date)
+            await release.wait()
+            return {}
+
+        sched = PrewarmScheduler(parse_windows("yesterday=0 5 * * *"), runner)
+
+        # Act
+        worker = sched.dispatch(datetime(2025, 10, 15, 5, 0))
+        await asyncio.sleep(0)
+        running = not worker.done()
+        release.set()
+        await worker
+
+        # Assert
+        assert running
+        assert calls == ["2025-10-14"]
+
+
+class TestGraphRateGovernor:
+    """Тести для розбору заголовків використання Graph API."""
+
+    def test_business_use_case_usage(self):
+        gov = GraphRateGovernor()
+
+        gov.record({
+            "x-business-use-case-usage": (
+                '{"123": [{"type": "ads_insights", "call_count": 96, "total_cputime": 20, '
+                '"total_time": 30, "estimated_time_to_regain_access": 5}]}'
+            )
+        })
+
+        assert gov.usage_percent() == 96
+        assert gov.blocked_for() > 0
+        assert not gov.allows_background_work(50)
+
+    def test_no_headers_allows_work(self):
+        gov = GraphRateGovernor()
+
+        gov.record({})
+
+        assert gov.allows_background_work(50)
@@ -0,0 +1,167 @@
+"""
+Unit тести для спільного стану між процесами:
+DatabaseProgressStore (app/progress.py) та DatabaseStorage (app/rate_limit_storage.py).
+
+Використовуємо SQLite in-memory базу.
+"""
+
+import threading
+
+from limits import parse
+from limits.strategies import FixedWindowRateLimiter
+
+from app.models import RateLimitCounter
+from app.progress import DatabaseProgressStore, ProgressStore, create_progress_store
+from app.rate_limit_storage import DatabaseStorage
+
+
+class TestDatabaseProgressStore:
+    """Тести для progress у спільній БД."""
+
+    def test_state_visible_to_other_instance(self, Session):
+        """Тест що стан, записаний одним процесом, бачить інший."""
+        # Arrange
+        writer = DatabaseProgressStore(Session)
+        reader = DatabaseProgressStore(Session)
+
+        # Act
+        writer.init("job-1", title="Pipeline run")
+        writer.update("job-1", 40, "Fetching Meta insights")
+        writer.log("job-1", "Processed 10 campaigns")
+        writer.flush()
+
+        # Assert
+        assert reader.get("job-1") == {
+            "title": "Pipeline run",
+            "percent": 40,
+            "status": "running",
+            "logs": ["Job started", "Fetching Meta insights", "Processed 10 campaigns"],
+        }
+
+    def test_matches_memory_store_semantics(self, Session):
+        """Тест що статуси змінюються так само, як у ProgressStore."""
+        # Arrange
+        stores = [ProgressStore(), DatabaseProgressStore(Session)]
+
+        # Act
+        for store in stores:
+            store.init("job-2")
+            store.update("job-2", 100, "Done")
+            store.log("missing-job", "ignored")
+            store.set_status("job-2", "error")
+
+        # Assert
+        memory_state, db_state = (store.get("job-2") for store in stores)
+        assert db_state == memory_state
+        assert stores[1].get("missing-job") is None
+
+    def test_reinit_clears_logs(self, Session):
+        """Тест що повторний init з тим самим job_id починає з чистого стану."""
+        # Arrange
+        store = DatabaseProgressStore(Session)
+        store.init("job-3")
+        store.log("job-3", "old")
+
+        # Act
+        store.init("job-3", title="Retry")
+
+        # Assert
+        state = store.get("job-3")
+        assert state["title"] == "Retry"
+        assert state["logs"] == ["Job started"]
+
+    def test_writes_do_not_touch_db_in_caller_thread(self, Session):
+        """Тест що update/log з async run_pipeline не роблять commit у потоці event loop."""
+        # Arrange
+        threads = []
+
+        def tracking_session():
+            threads.append(threading.current_thread().name)
+            return Session()
+
+        store = DatabaseProgressStore(tracking_session)
+
+        # Act
+        store.init("job-4")
+        for i in range(20):
+            store.update("job-4", i, f"step {i}")
+        store.flush()
+
+        # Assert
+        assert threads and set(threads) == {"progress-writer"}
+        assert len(store.get("job-4")["logs"]) == 21
+
+    def test_factory_uses_env(self, monkeypatch):
+        """Тест вибору backend через PROGRESS_BACKEND."""
+        # Arrange
+        monkeypatch.setenv("PROGRESS_BACKEND", "database")
+
+        # Act
+        store = create_progress_store()
+
+        # Assert
+        assert isinstance(store, DatabaseProgressStore)
+        monkeypatch.setenv("PROGRESS_BACKEND", "memory")
+        assert isinstance(create_progress_store(), ProgressStore)
+
+
+class TestDatabaseRateLimitStorage:
+    """Тести для сховища лічильників rate limit у БД."""
+
+    def test_incr_counts_within_window(self, Session):
+        # Arrange
+        storage = DatabaseStorage(session_factory=Session)
+
+        # Act
+        values = [storage.incr("LIMITER/1.2.3.4/api", 60) for _ in range(3)]
+
+        # Assert
+        assert values == [1, 2, 3]
+        assert storage.get("LIMITER/1.2.3.4/api") == 3
+
+    def test_expired_window_restarts(self, Session):
+        """Тест що після закінчення вікна лічильник починається з нуля."""
+        # Arrange
+        storage = DatabaseStorage(session_factory=Session)
+        storage.incr("key", 60, amount=5)
+        db = Session()
+        db.query(RateLimitCounter).update({RateLimitCounter.expires_at: 0})
+        db.commit()
+        db.close()
+
+        # Act
+        assert storage.get("key") == 0
+        value = storage.incr("key", 60)
+
+        # Assert
+        assert value == 1
+        assert storage.prune_expired() == 0
+
+    def test_limit_shared_between_instances(self, Session):
+        """Тест що два процеси (два екземпляри storage) ділять один ліміт."""
+        # Arrange
+        limit = parse("2/minute")
+        first = FixedWindowRateLimiter(DatabaseStorage(session_factory=Session))
+        second = FixedWindowRateLimiter(DatabaseStorage(session_factory=Session))
+
+        # Act
+        results = [first.hit(limit, "1.2.3.4"), second.hit(limit, "1.2.3.4"), first.hit(limit, "1.2.3.4")]
+
+        # Assert
+        assert results == [True, True, False]
+        assert second.hit(limit, "5.6.7.8") is True
+
+    def test_clear_and_reset(self, Session):
+        # Arrange
+        storage = DatabaseStorage(session_factory=Session)
+        storage.incr("a", 60)
+        storage.incr("b", 60)
+
+        # Act
+        storage.clear("a")
+
+        # Assert
+        assert storage.get("a") == 0
+        assert storage.get("b") == 1
+        assert storage.check() is True
+        assert storage.reset() == 1
@@ -0,0 +1,125 @@
+"""
+Unit тести для keyed single-flight (app/singleflight.py).
+"""
+
+import asyncio
+
+from app.singleflight import SingleFlight
+
+
+class TestSingleFlight:
+    """Тести для SingleFlight.do та SingleFlight.start."""
+
+    async def test_concurrent_identical_calls_share_one_execution(self):
+        """Тест що одночасні виклики з однаковим ключем виконуються один раз."""
+        # Arrange
+        flight = SingleFlight("test")
+        calls = 0
+
+        async def build():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return {"ads": [1, 2, 3]}
+
+        # Act
+        results = await asyncio.gather(*[flight.do("2025-10-01:2025-10-31", build) for _ in range(5)])
+
+        # Assert
+        assert calls == 1
+        assert all(value == {"ads": [1, 2, 3]} for value, _ in results)
+        assert [shared for _, shared in results].count(False) == 1
+        stats = flight.stats()
+        assert stats["executions"] == 1
+        assert stats["coalesced"] == 4
+        assert stats["in_flight"] == 0
+
+    async def test_different_keys_run_independently(self):
+        """Тест що різні ключі не об'єднуються."""
+        # Arrange
+        flight = SingleFlight("test")
+
+        async def build():
+            await asyncio.sleep(0)
+            return "ok"
+
+        # Act
+        await asyncio.gather(flight.do("a", build), flight.do("b", build))
+
+        # Assert
+        assert flight.stats()["executions"] == 2
+        assert flight.stats()["coalesced"] == 0
+
+    async def test_sequential_calls_are_not_coalesced(self):
+        """Тест що після завершення обчислення наступний виклик запускає нове."""
+        # Arrange
+        flight = SingleFlight("test")
+
+        async def build():
+            return "ok"
+
+        # Act
+        await flight.do("k", build)
+        await flight.do("k", build)
+
+        # Assert
+        assert flight.stats()["executions"] == 2
+
+    async def test_error_is_propagated_to_all_callers(self):
+        """Тест що помилка обчислення отримують всі об'єднані виклики."""
+        # Arrange
+        flight = SingleFlight("test")
+
+        async def build():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("Graph API quota exceeded")
+
+        # Act
+        results = await asyncio.gather(
+            flight.do("k", build), flight.do("k", build), return_exceptions=True
+        )
+
+        # Assert
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert flight.stats()["failures"] == 1
+        assert not flight.in_flight("k")
+
+    async def test_cancelled_caller_does_not_cancel_shared_computation(self):
+        """Тест що відключення першого клієнта не скасовує обчислення для інших."""
+        # Arrange
+        flight = SingleFlight("test")
+
+        async def build():
+            await asyncio.sleep(0.02)
+            return "report"
+
+        first = asyncio.create_task(flight.do("k", build))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(flight.do("k", build))
+        await asyncio.sleep(0)
+
+        # Act
+        first.cancel()
+        value, shared = await second
+
+        # Assert
+        assert value == "report"
+        assert shared is True
+
+    async def test_start_returns_named_task_for_background_jobs(self):
+        """Тест що start() повертає існуючий task (з job_id в імені) для однакових параметрів."""
+        # Arrange
+        flight = SingleFlight("start-job")
+
+        async def pipeline():
+            await asyncio.sleep(0.01)
+
+        # Act
+        task, shared = flight.start(("2025-10-01", "2025-10-31"), pipeline, name="job-1")
+        again, again_shared = flight.start(("2025-10-01", "2025-10-31"), pipeline, name="job-2")
+        await task
+
+        # Assert
+        assert shared is False
+        assert again_shared is True
+        assert again.get_name() == "job-1"
@@ -0,0 +1,178 @@
+"""
+Unit тести для сховища снапшотів статусів (app/services/status_snapshots.py).
+
+Використовуємо SQLite in-memory базу.
+"""
+
+import pytest
+from datetime import datetime
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models import Base, StatusSnapshot
+from app.services import status_snapshots
+
+
+@pytest.fixture
+def db():
+    """Створює сесію до порожньої in-memory бази."""
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+class TestRecordStatusChanges:
+    """Тести для функції record_status_changes."""
+
+    def test_appends_only_changed_statuses(self, db):
+        """Тест що незмінні статуси не дублюються."""
+        # Arrange
+        first_sync = datetime(2025, 10, 1, 10, 0)
+        second_sync = datetime(2025, 10, 2, 10, 0)
+
+        # Act
+        added_first = status_snapshots.record_status_changes(
+            db, "alfacrm", [(1, 13), (2, 13)], observed_at=first_sync
+        )
+        added_second = status_snapshots.record_status_changes(
+            db, "alfacrm", [(1, 13), (2, 2)], observed_at=second_sync
+        )
+
+        # Assert
+        assert added_first == 2
+        assert added_second == 1
+        assert db.query(StatusSnapshot).count() == 3
+        assert status_snapshots.get_latest_statuses(db, "alfacrm") == {"1": "13", "2": "2"}
+
+    def test_skips_records_without_status_and_duplicates(self, db):
+        """Тест пропуску записів без статусу та повторів одного запису."""
+        # Act
+        added = status_snapshots.record_status_changes(
+            db, "nethunt", [("a", "in_work"), ("a", "in_work"), ("b", None), (None, "teacher")]
+        )
+
+        # Assert
+        assert added == 1
+
+    def test_sources_are_independent(self, db):
+        """Тест що однакові record_id різних джерел не змішуються."""
+        # Act
+        status_snapshots.record_status_changes(db, "alfacrm", [("1", "13")])
+        added = status_snapshots.record_status_changes(db, "nethunt", [("1", "13")])
+
+        # Assert
+        assert added == 1
+
+
+class TestReachedRecords:
+    """Тести для запитів 'досяг етапу протягом періоду'."""
+
+    def test_transition_inside_period(self, db):
+        """Тест переходу в статус всередині періоду."""
+        # Arrange
+        status_snapshots.record_status_changes(db, "alfacrm", [(1, 13)], observed_at=datetime(2025, 10, 1))
+        status_snapshots.record_status_changes(db, "alfacrm", [(1, 2)], observed_at=datetime(2025, 10, 5))
+        status_snapshots.record_status_changes(db, "alfacrm", [(1, 3)], observed_at=datetime(2025, 10, 7))
+
+        # Act
+        reached = status_snapshots.reached_records(db, "alfacrm", [2, 35], "2025-10-04", "2025-10-06")
+        not_reached = status_snapshots.reached_records(db, "alfacrm", [2, 35], "2025-10-08", "2025-10-10")
+
+        # Assert
+        assert reached == {"1"}
+        assert not_reached == set()
+
+    def test_status_carried_into_period(self, db):
+        """Тест що запис, який вже був у статусі на початок періоду, враховується."""
+        # Arrange
+        status_snapshots.record_status_changes(db, "alfacrm", [(1, 2)], observed_at=datetime(2025, 9, 20))
+
+        # Act
+        reached = status_snapshots.reached_records(db, "alfacrm", [2], "2025-10-01", "2025-10-31")
+
+        # Assert
+        assert reached == {"1"}
+
+    def test_status_left_before_period_not_carried(self, db):
+        """Тест що на початок періоду береться лише останній статус запису."""
+        # Arrange
+        status_snapshots.record_status_changes(db, "alfacrm", [(1, 2), (2, 2)], observed_at=datetime(2025, 9, 20))
+        status_snapshots.record_status_changes(db, "alfacrm", [(1, 5)], observed_at=datetime(2025, 9, 25))
+
+        # Act
+        reached = status_snapshots.reached_records(db, "alfacrm", [2], "2025-10-01", "2025-10-31")
+
+        # Assert
+        assert reached == {"2"}
+
+    def test_end_date_is_inclusive(self, db):
+        """Тест що кінцева дата періоду включається повністю."""
+        # Arrange
+        status_snapshots.record_status_changes(db, "nethunt", [("x", "teacher")], observed_at=datetime(2025, 10, 31, 23, 30))
+
+        # Act
+        reached = status_snapshots.reached_records(db, "nethunt", ["teacher"], "2025-10-01", "2025-10-31")
+
+        # Assert
+        assert reached == {"x"}
+
+    def test_count_reached_by_stage_with_record_filter(self, db):
+        """Тест підрахунку по етапах з обмеженням на записи кампанії."""
+        # Arrange
+        status_snapshots.record_status_changes(
+            db, "alfacrm", [(1, 2), (2, 2), (3, 4)], observed_at=datetime(2025, 10, 2)
+        )
+        stages = {"Призначено пробне (ЦА)": [2, 35], "Отримана оплата (ЦА)": [4, 39]}
+
+        # Act
+        counts = status_snapshots.count_reached_by_stage(
+            db, "alfacrm", stages, "2025-10-01", "2025-10-31", record_ids={"1", "3"}
+        )
+
+        # Assert
+        assert counts == {"Призначено пробне (ЦА)": 1, "Отримана оплата (ЦА)": 1}
+
+
+    def test_skipped_stages_counted_cumulatively(self, db):
+        """Тест що перехід "Призначено" → оплата між синхронізаціями зараховує і "Проведено"."""
+        # Arrange
+        status_snapshots.record_status_changes(db, "alfacrm", [(1, 2), (2, 2)], observed_at=datetime(2025, 10, 2))
+        status_snapshots.record_status_changes(db, "alfacrm", [(1, 4)], observed_at=datetime(2025, 10, 9))
+
+        # Act
+        counts = status_snapshots.count_reached_by_stage(
+            db, "alfacrm", status_snapshots.alfacrm_stage_statuses(), "2025-10-01", "2025-10-31"
+        )
+
+        # Assert
+        assert counts["Призначено пробне (ЦА)"] == 2
+        assert counts["Проведено пробне (ЦА)"] == 1
+        assert counts["Отримана оплата (ЦА)"] == 1
+        assert counts["Чекає оплату"] == 0
+
+
+class TestStageStatuses:
+    """Тести для групування статусів по етапах."""
+
+    def test_alfacrm_groups_both_funnels(self):
+        """Тест що агреговані групи містять статуси обох воронок AlfaCRM."""
+        stages = status_snapshots.alfacrm_stage_statuses()
+
+        assert sorted(stages["Отримана оплата (ЦА)"]) == [4, 39]
+        assert sorted(stages["Чекає оплату"]) == [9, 38]
+
+    def test_alfacrm_trial_funnel_is_cumulative(self):
+        """Тест що етапи trial funnel включають статуси пізніших етапів (як у трекері)."""
+        stages = status_snapshots.alfacrm_stage_statuses()
+
+        assert sorted(stages["Призначено пробне (ЦА)"]) == [2, 3, 4, 9, 35, 37, 38, 39]
+        assert sorted(stages["Проведено пробне (ЦА)"]) == [3, 4, 9, 37, 38, 39]
+        assert sorted(stages["В опрацюванні (ЦА)"]) == [5, 6, 8, 12, 24, 34, 36, 49]
+
+    def test_nethunt_groups_by_column(self):
+        """Тест групування ключів NetHunt по колонках таблиці."""
+        stages = status_snapshots.nethunt_stage_statuses()
+
+        assert stages["Вчитель ЦА"] == ["teacher"]
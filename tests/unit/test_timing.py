@@ -0,0 +1,165 @@
+"""
+Unit тести для таймера етапів (app/timing.py), Server-Timing у /api/meta-data
+та збереження тривалості етапів pipeline.
+"""
+
+import json
+import time
+
+import pytest
+
+from app.models import PipelineRun, RunLog
+from app.timing import StageTimer, server_timing_header
+
+
+class TestStageTimer:
+    """Тести для StageTimer."""
+
+    def test_repeated_stages_are_summed(self):
+        # Arrange
+        timer = StageTimer()
+
+        # Act
+        for _ in range(2):
+            with timer.stage("meta_leads"):
+                time.sleep(0.01)
+
+        # Assert
+        durations = timer.durations_ms()
+        assert durations["meta_leads"] >= 20
+        assert durations["total"] >= durations["meta_leads"]
+
+    def test_stage_recorded_on_exception(self):
+        # Arrange
+        timer = StageTimer()
+
+        # Act
+        with pytest.raises(RuntimeError):
+            with timer.stage("alfacrm_tracking"):
+                raise RuntimeError("AlfaCRM недоступна")
+
+        # Assert
+        assert "alfacrm_tracking" in timer.durations_ms()
+
+    def test_remainder_covers_time_outside_stages(self):
+        # Arrange
+        timer = StageTimer()
+        with timer.stage("insights"):
+            pass
+        time.sleep(0.01)
+
+        # Act
+        durations = timer.durations_ms(remainder="formatting")
+
+        # Assert
+        assert list(durations) == ["insights", "formatting", "total"]
+        assert durations["formatting"] >= 10
+
+    def test_server_timing_header_format(self):
+        # Act
+        header = server_timing_header({"insights": 812.3, "total": 900.0}, cache="MISS")
+
+        # Assert
+        assert header == 'insights;dur=812.3, total;dur=900.0, cache;desc="MISS"'
+
+
+@pytest.fixture
+def main_module(patched_get_db, monkeypatch):
+    """main з in-memory базою та порожнім кешем звітів."""
+    from app import main
+
+    monkeypatch.setattr(main, "get_db", patched_get_db)
+    monkeypatch.setattr(main, "meta_report_cache", main.ReportCache())
+    return main
+
+
+class TestMetaDataTimings:
+    """Тести для Server-Timing та metadata.timings у /api/meta-data."""
+
+    @pytest.fixture
+    def client(self, main_module, monkeypatch):
+        from fastapi.testclient import TestClient
+
+        async def fake_build(db, *args, timer=None, **kwargs):
+            with timer.stage("insights"):
+                pass
+            return {"ads": [], "students": [], "teachers": []}
+
+        monkeypatch.setenv("META_ACCESS_TOKEN", "token")
+        monkeypatch.setenv("META_AD_ACCOUNT_ID", "act_1")
+        monkeypatch.setattr(main_module, "build_meta_report", fake_build)
+        return TestClient(main_module.app, base_url="http://localhost")
+
+    def test_server_timing_on_miss_and_hit(self, client):
+        # Arrange
+        params = {"start_date": "2025-10-01", "end_date": "2025-10-07"}
+
+        # Act
+        miss = client.get("/api/meta-data", params=params)
+        hit = client.get("/api/meta-data", params=params)
+
+        # Assert
+        assert "insights;dur=" in miss.headers["server-timing"]
+        assert 'cache;desc="MISS"' in miss.headers["server-timing"]
+        assert "insights" not in hit.headers["server-timing"]
+        assert "total;dur=" in hit.headers["server-timing"]
+        assert "metadata" not in miss.json()
+
+    def test_timings_in_metadata_on_request(self, client):
+        # Act
+        response = client.get(
+            "/api/meta-data", params={"start_date": "2025-10-01", "end_date": "2025-10-07", "timings": 1}
+        )
+
+        # Assert
+        timings = response.json()["metadata"]["timings"]
+        assert set(timings) == {"insights", "formatting", "total"}
+
+
+class TestPipelineStageTimings:
+    """Тести для збереження тривалості етапів у RunLog."""
+
+    async def test_failed_run_persists_timings(self, main_module, Session, monkeypatch):
+        # Arrange
+        monkeypatch.setenv("META_ACCESS_TOKEN", "token")
+        monkeypatch.setenv("META_AD_ACCOUNT_ID", "act_1")
+        monkeypatch.setenv("STORAGE_BACKEND", "excel")
+
+        def failing_insights(**kwargs):
+            raise RuntimeError("Graph API timeout")
+
+        monkeypatch.setattr(main_module.meta_conn, "fetch_insights", failing_insights)
+        main_module.progress.init("job-timings")
+
+        # Act
+        await main_module.run_pipeline("job-timings", {"start_date": "2025-10-01", "end_date": "2025-10-07"})
+
+        # Assert
+        session = Session()
+        log = session.query(RunLog).filter(RunLog.level == main_module.STAGE_TIMINGS_LOG_LEVEL).one()
+        timings = json.loads(log.message)
+        assert "insights" in timings and "total" in timings
+        assert session.query(PipelineRun).one().status == "error"
+        session.close()
+
+    def test_stage_timings_endpoint(self, main_module, Session):
+        # Arrange
+        from fastapi.testclient import TestClient
+
+        session = Session()
+        for ms in (100.0, 300.0):
+            run = PipelineRun(job_id=f"job-{ms}", start_date="2025-10-01", end_date="2025-10-07", status="success")
+            session.add(run)
+            session.flush()
+            session.add(RunLog(run_id=run.id, level="timing", message=json.dumps({"insights": ms, "total": ms * 2})))
+            session.add(RunLog(run_id=run.id, level="info", message="Pipeline завершено успішно"))
+        session.commit()
+        session.close()
+        client = TestClient(main_module.app, base_url="http://localhost")
+
+        # Act
+        data = client.get("/api/runs/stage-timings").json()
+
+        # Assert
+        assert data["count"] == 2
+        assert data["average_ms"] == {"insights": 200.0, "total": 400.0}
@@ -9,7 +9,7 @@ import FolderOpenIcon from '@mui/icons-material/FolderOpen'
 import { AdapterDayjs } from '@mui/x-date-pickers/AdapterDayjs'
 import { DatePicker, LocalizationProvider } from '@mui/x-date-pickers'
 import dayjs, { Dayjs } from 'dayjs'
-import { ConfigMap, getConfig, inspectExcelHeaders, listAlfaCompanies, listNetHuntFolders, openEventStream, startJob, runAnalytics, updateConfig, getMetaData, exportMetaExcel, saveRunHistory, saveSearchResults, getSearchHistory, SearchHistoryItem, getSearchResults, SearchResultsResponse } from './api'
+import { ConfigMap, getConfig, inspectExcelHeaders, listAlfaCompanies, listNetHuntFolders, openEventStream, startJob, runAnalytics, updateConfig, getMetaData, exportMetaExcel, saveRunHistory, saveSearchResults, getSearchHistory, SearchHistoryItem, getSearchResults, SearchResultsResponse, proxyImageUrl } from './api'
 import StudentsTable from './StudentsTable'
 
 type TabKey = 'instructions' | 'run' | 'settings' | 'history'
@@ -271,9 +271,11 @@ export default function App() {
       setLogs(l => [...l, `Завантаження даних з Meta API за період ${startDate} - ${endDate}...`])
       setProgress(20)
 
+      // Таблиці показують кількості; телефони - getCampaignLeads при відкритті drill-down
       const metaData = await getMetaData({
         start_date: startDate,
-        end_date: endDate
+        end_date: endDate,
+        payload_version: 3
       })
 
       setProgress(60)
@@ -410,10 +412,18 @@ export default function App() {
       return
     }
     try {
+      // У таблицях лише кількості (payload_version 3); телефони для Excel - звіт
+      // версії 2 за той самий період, зазвичай з кешу сервера
+      const metaData = await getMetaData({
+        start_date: start?.format('YYYY-MM-DD') || '',
+        end_date: end?.format('YYYY-MM-DD') || '',
+        payload_version: 2
+      })
       await exportMetaExcel({
-        ads: adsData,
-        students: studentsData,
-        teachers: teachersData
+        payload_version: metaData.payload_version,
+        ads: metaData.ads,
+        students: metaData.students,
+        teachers: metaData.teachers
       })
       setSnack('Excel файл завантажено')
     } catch (e: any) {
@@ -435,9 +445,11 @@ export default function App() {
       setSnack(loadingSnack)
 
       // Перезавантажуємо дані з Meta API за той самий період
+      // Excel містить телефони у колонках статусів - беремо компактну версію 2
       const metaData = await getMetaData({
         start_date: run.start_date,
-        end_date: run.end_date
+        end_date: run.end_date,
+        payload_version: 2
       })
 
       console.log('Meta data received:', metaData)
@@ -454,6 +466,7 @@ export default function App() {
 
       // Експортуємо в Excel - це завантажить файл автоматично
       await exportMetaExcel({
+        payload_version: metaData.payload_version,
         ads: metaData.ads || [],
         students: metaData.students || [],
         teachers: metaData.teachers || []
@@ -588,7 +601,7 @@ export default function App() {
                           <TableCell>{row.ad_name || '-'}</TableCell>
                           <TableCell>
                             {row.creative_image || row.image_url ? (
-                              <img src={row.creative_image || row.image_url} alt="Creative" style={{ maxWidth: '100px', maxHeight: '60px', objectFit: 'contain' }} />
+                              <img src={proxyImageUrl(row.creative_image || row.image_url, { w: 200, h: 120 })} alt="Creative" style={{ maxWidth: '100px', maxHeight: '60px', objectFit: 'contain' }} />
                             ) : '-'}
                           </TableCell>
                           <TableCell>{row.creative_text || row.creative_body || '-'}</TableCell>
@@ -1,4 +1,4 @@
-import React from 'react'
+import React, { useEffect, useState } from 'react'
 import {
   Table,
   TableBody,
@@ -8,9 +8,15 @@ import {
   TableRow,
   Paper,
   Alert,
-  Link
+  Link,
+  Button,
+  CircularProgress,
+  Dialog,
+  DialogActions,
+  DialogContent,
+  DialogTitle
 } from '@mui/material'
-import { MetaStudent } from './api'
+import { CampaignLeadsResponse, MetaStudent, getCampaignLeads } from './api'
 
 interface StudentsTableProps {
   students: MetaStudent[]
@@ -31,7 +37,43 @@ const COLOR_BRIGHT_YELLOW = '#FFFF00'   // 8. Ярко-жовта - AD нота
 // Синхронізовано з backend AGGREGATED_STATUSES (alfacrm_tracking.py)
 // Порядок столбців I-R + додаткові статуси згідно зі специфікацією
 
+// Drill-down: телефони однієї колонки статусу (/api/meta-data віддає лише кількості)
+interface LeadsDrillDown {
+  student: MetaStudent
+  status: string
+}
+
 export default function StudentsTable({ students, filterInfo }: StudentsTableProps) {
+  const [drillDown, setDrillDown] = useState<LeadsDrillDown | null>(null)
+  const [leads, setLeads] = useState<CampaignLeadsResponse | null>(null)
+  const [leadsError, setLeadsError] = useState<string | null>(null)
+
+  useEffect(() => {
+    if (!drillDown) return
+    let cancelled = false
+    setLeads(null)
+    setLeadsError(null)
+    getCampaignLeads(drillDown.student.campaign_id, { period: drillDown.student.period, status: drillDown.status })
+      .then(data => { if (!cancelled) setLeads(data) })
+      .catch(e => { if (!cancelled) setLeadsError(e?.message || 'Не вдалося завантажити телефони') })
+    return () => { cancelled = true }
+  }, [drillDown])
+
+  // Кількість у колонці статусу; клік відкриває телефони цього статусу
+  const statusCell = (s: MetaStudent, status: string) => {
+    const count = Number(s[status as keyof MetaStudent]) || 0
+    if (!count || !s.campaign_id) return <TableCell>{count}</TableCell>
+    return (
+      <TableCell>
+        <Link component="button" onClick={() => setDrillDown({ student: s, status })}>
+          {count}
+        </Link>
+      </TableCell>
+    )
+  }
+
+  const drillDownPhones = drillDown && leads ? leads.status_phones[drillDown.status] || [] : []
+
   // Отримуємо повідомлення з filter_info або використовуємо fallback
   const getMessage = () => {
     if (!filterInfo || !filterInfo.students) {
@@ -150,17 +192,17 @@ export default function StudentsTable({ students, filterInfo }: StudentsTablePro
                 <TableCell>{s.leads_check || 0}</TableCell>
 
                 {/* I-R: CRM статуси */}
-                <TableCell>{s["Не розібраний"] || 0}</TableCell>
-                <TableCell>{s["Вст контакт невідомо"] || 0}</TableCell>
-                <TableCell>{s["Вст контакт зацікавлений (ЦА)"] || 0}</TableCell>
-                <TableCell>{s["В опрацюванні (ЦА)"] || 0}</TableCell>
-                <TableCell>{s["Призначено пробне (ЦА)"] || 0}</TableCell>
-                <TableCell>{s["Проведено пробне (ЦА)"] || 0}</TableCell>
-                <TableCell>{s["Чекає оплату"] || 0}</TableCell>
-                <TableCell>{s["Отримана оплата (ЦА)"] || 0}</TableCell>
-                <TableCell>{s["Архів (ЦА)"] || 0}</TableCell>
-                <TableCell>{s["Недозвон (не ЦА)"] || 0}</TableCell>
-                <TableCell>{s["Архів (не ЦА)"] || 0}</TableCell>
+                {statusCell(s, "Не розібраний")}
+                {statusCell(s, "Вст контакт невідомо")}
+                {statusCell(s, "Вст контакт зацікавлений (ЦА)")}
+                {statusCell(s, "В опрацюванні (ЦА)")}
+                {statusCell(s, "Призначено пробне (ЦА)")}
+                {statusCell(s, "Проведено пробне (ЦА)")}
+                {statusCell(s, "Чекає оплату")}
+                {statusCell(s, "Отримана оплата (ЦА)")}
+                {statusCell(s, "Архів (ЦА)")}
+                {statusCell(s, "Недозвон (не ЦА)")}
+                {statusCell(s, "Архів (не ЦА)")}
 
                 {/* S-T: Кількість (розрахунки) */}
                 <TableCell>{s.target_leads || 0}</TableCell>
@@ -195,6 +237,19 @@ export default function StudentsTable({ students, filterInfo }: StudentsTablePro
           </TableBody>
         </Table>
       </TableContainer>
+
+      <Dialog open={!!drillDown} onClose={() => setDrillDown(null)} maxWidth="xs" fullWidth>
+        <DialogTitle>{drillDown ? `${drillDown.student.campaign_name}: ${drillDown.status}` : ''}</DialogTitle>
+        <DialogContent dividers>
+          {leadsError && <Alert severity="error">{leadsError}</Alert>}
+          {!leads && !leadsError && <CircularProgress size={24} />}
+          {leads && drillDownPhones.length === 0 && 'Телефонів немає'}
+          {drillDownPhones.map(phone => <div key={phone}>{phone}</div>)}
+        </DialogContent>
+        <DialogActions>
+          <Button onClick={() => setDrillDown(null)}>Закрити</Button>
+        </DialogActions>
+      </Dialog>
     </>
   )
 }
@@ -1,5 +1,46 @@
 const API_BASE = ''
 
+// Креативи йдуть через кешуючий proxy (дисковий кеш + ETag), а не напряму на Facebook CDN
+// size - зменшена копія (сервер вписує в w×h і віддає WebP/JPEG за Accept)
+export function proxyImageUrl(url: string, size?: { w?: number; h?: number }): string {
+  if (!url || url.startsWith('data:')) return url
+  const params = new URLSearchParams({ url })
+  if (size?.w) params.set('w', String(size.w))
+  if (size?.h) params.set('h', String(size.h))
+  return `${API_BASE}/api/proxy-image?${params.toString()}`
+}
+
+// Умовні GET для великих звітів: сервер віддає ETag (хеш вмісту), повторний
+// запит з If-None-Match отримує 304 без тіла і використовує збережену відповідь
+const ETAG_CACHE_MAX_ENTRIES = 20
+const etagCache = new Map<string, { etag: string; data: any }>()
+
+async function fetchJsonWithETag<T>(url: string, errorMessage: string): Promise<T> {
+  const cached = etagCache.get(url)
+  // no-store: ревалідацією керуємо тут, HTTP кеш браузера не дублює відповіді
+  const r = await fetch(url, {
+    cache: 'no-store',
+    headers: cached ? { 'If-None-Match': cached.etag } : undefined
+  })
+  if (r.status === 304 && cached) {
+    // Оновлюємо позицію в LRU
+    etagCache.delete(url)
+    etagCache.set(url, cached)
+    return cached.data as T
+  }
+  if (!r.ok) throw new Error(errorMessage)
+  const data = await r.json()
+  const etag = r.headers.get('ETag')
+  etagCache.delete(url)
+  if (etag) {
+    etagCache.set(url, { etag, data })
+    if (etagCache.size > ETAG_CACHE_MAX_ENTRIES) {
+      etagCache.delete(etagCache.keys().next().value as string)
+    }
+  }
+  return data as T
+}
+
 export type ConfigMap = Record<string, { value: string; has_value: boolean; secret: boolean }>
 
 export async function getConfig(): Promise<ConfigMap> {
@@ -158,6 +199,7 @@ export interface MetaAd {
 // Порядок відповідає специфікації "Анализ РК Студенти - Структура таблицы.md"
 export interface MetaStudent {
   // ============ ОСНОВНА ІНФОРМАЦІЯ (A-F) - біла заливка ============
+  campaign_id: string                        // Не колонка: ключ для getCampaignLeads
   campaign_name: string                      // A: Назва РК
   campaign_link: string                      // B: Посилання на РК
   analysis_date: string                      // C: Дата аналізу
@@ -251,6 +293,7 @@ export interface MetaTeacher {
 }
 
 export interface MetaDataResponse {
+  payload_version?: 1 | 2 | 3
   ads: MetaAd[]
   students: MetaStudent[]
   teachers: MetaTeacher[]
@@ -258,19 +301,69 @@ export interface MetaDataResponse {
   period: string
 }
 
+// payload_version=2: одна таблиця телефонів на кампанію, статуси - індекси в ній
+// (рядки студентів: phones + індекси в колонках статусів, leads_count - число)
+export interface CompactCampaignPhones {
+  phones: string[]
+  // current - base64 бітова маска: біт i (молодший першим) = idx[i] поточний статус
+  statuses: Record<string, { idx: number[]; current: string }>
+}
+
+export interface LeadPhoneEntry {
+  phone: string
+  status: 'passed' | 'current'
+}
+
+export function decodeStatusPhones(compact: CompactCampaignPhones, status: string): LeadPhoneEntry[] {
+  const entry = compact.statuses[status]
+  if (!entry) return []
+  const bits = Uint8Array.from(atob(entry.current), c => c.charCodeAt(0))
+  return entry.idx.map((phoneIndex, i) => ({
+    phone: compact.phones[phoneIndex],
+    status: (bits[i >> 3] >> (i & 7)) & 1 ? 'current' : 'passed'
+  }))
+}
+
+export function phonesByIndex(phones: string[], indexes: number[]): string[] {
+  return indexes.map(i => phones[i])
+}
+
 export async function getMetaData(params: {
   start_date: string
   end_date: string
+  // 3 - лише кількості; телефони кампанії - getCampaignLeads при відкритті drill-down
+  payload_version?: 1 | 2 | 3
 }): Promise<MetaDataResponse> {
   const queryParams = new URLSearchParams({
     start_date: params.start_date,
     end_date: params.end_date
   })
+  if (params.payload_version) queryParams.append('payload_version', String(params.payload_version))
 
   const url = `${API_BASE}/api/meta-data?${queryParams.toString()}`
-  const r = await fetch(url)
-  if (!r.ok) throw new Error('Failed to load Meta data')
-  return r.json()
+  return fetchJsonWithETag<MetaDataResponse>(url, 'Failed to load Meta data')
+}
+
+export interface CampaignLeadsResponse {
+  campaign_id: string
+  campaign_name: string
+  tab: 'students' | 'teachers'
+  period: string
+  payload_version: 1
+  status_phones: Record<string, string[]>
+  lead_phones: Record<string, LeadPhoneEntry[]>
+}
+
+export async function getCampaignLeads(campaignId: string, params: {
+  period: string
+  status?: string
+}): Promise<CampaignLeadsResponse> {
+  const queryParams = new URLSearchParams({ period: params.period })
+  if (params.status) queryParams.append('status', params.status)
+  return fetchJsonWithETag<CampaignLeadsResponse>(
+    `${API_BASE}/api/campaigns/${encodeURIComponent(campaignId)}/leads?${queryParams.toString()}`,
+    'Failed to load campaign leads'
+  )
 }
 
 export async function saveRunHistory(params: {
@@ -291,12 +384,29 @@ export async function saveRunHistory(params: {
   return r.json()
 }
 
+// Потоковий експорт рядків вкладки (для інтеграцій): пряме посилання для завантаження
+export function streamExportUrl(
+  tab: 'ads' | 'students' | 'teachers',
+  format: 'csv' | 'ndjson',
+  range: { start_date: string; end_date: string },
+  columns?: string[]
+): string {
+  const params = new URLSearchParams(range)
+  if (columns?.length) params.set('columns', columns.join(','))
+  return `${API_BASE}/api/export/${tab}.${format}?${params.toString()}`
+}
+
+// xlsx - стилізована книга; parquet/arrow/csv - ZIP з файлом на вкладку (для BI)
+export type ExportFormat = 'xlsx' | 'parquet' | 'arrow' | 'csv'
+
 export async function exportMetaExcel(data: {
+  // 2 - компактні рядки студентів, сервер розгортає телефони перед записом
+  payload_version?: 1 | 2 | 3
   ads: MetaAd[]
   students: MetaStudent[]
   teachers: MetaTeacher[]
-}): Promise<void> {
-  const r = await fetch(`${API_BASE}/api/export-meta-excel`, {
+}, format: ExportFormat = 'xlsx'): Promise<void> {
+  const r = await fetch(`${API_BASE}/api/export-meta-excel?format=${format}`, {
     method: 'POST',
     headers: { 'Content-Type': 'application/json' },
     body: JSON.stringify(data)
@@ -307,7 +417,7 @@ export async function exportMetaExcel(data: {
   const url = window.URL.createObjectURL(blob)
   const a = document.createElement('a')
   a.href = url
-  a.download = `ecademy_meta_data_${new Date().toISOString().slice(0, 10)}.xlsx`
+  a.download = `ecademy_meta_data_${new Date().toISOString().slice(0, 10)}.${format === 'xlsx' ? 'xlsx' : 'zip'}`
   document.body.appendChild(a)
   a.click()
   document.body.removeChild(a)
@@ -353,9 +463,7 @@ export async function getStudentsWithJourney(params?: {
   if (params?.end_date) queryParams.append('end_date', params.end_date)
 
   const url = `${API_BASE}/api/students-with-journey${queryParams.toString() ? '?' + queryParams.toString() : ''}`
-  const r = await fetch(url)
-  if (!r.ok) throw new Error('Failed to load students with journey data')
-  return r.json()
+  return fetchJsonWithETag<StudentsWithJourneyResponse>(url, 'Failed to load students with journey data')
 }
 
 // Search History API
@@ -383,19 +491,31 @@ export interface SearchHistoryItem {
   created_at: string
 }
 
+export interface HistoryCursor {
+  before_time: string | null
+  before_id: number
+}
+
 export interface SearchHistoryResponse {
   success: boolean
   count: number
   history: SearchHistoryItem[]
+  // null - це остання сторінка
+  next_cursor: HistoryCursor | null
 }
 
 export async function getSearchHistory(params?: {
   limit?: number
   tab_type?: 'ads' | 'students' | 'teachers'
+  cursor?: HistoryCursor
 }): Promise<SearchHistoryResponse> {
   const queryParams = new URLSearchParams()
   if (params?.limit) queryParams.append('limit', String(params.limit))
   if (params?.tab_type) queryParams.append('tab_type', params.tab_type)
+  if (params?.cursor) {
+    if (params.cursor.before_time) queryParams.append('before_time', params.cursor.before_time)
+    queryParams.append('before_id', String(params.cursor.before_id))
+  }
 
   const url = `${API_BASE}/api/search-history${queryParams.toString() ? '?' + queryParams.toString() : ''}`
   const r = await fetch(url)
@@ -415,8 +535,69 @@ export interface SearchResultsResponse {
 }
 
 export async function getSearchResults(searchId: number): Promise<SearchResultsResponse> {
-  const r = await fetch(`${API_BASE}/api/search-history/${searchId}`)
-  if (!r.ok) throw new Error('Failed to load search results')
+  return fetchJsonWithETag<SearchResultsResponse>(
+    `${API_BASE}/api/search-history/${searchId}`, 'Failed to load search results'
+  )
+}
+
+
+export interface RunLogEntry {
+  id: number | null  // null - лог з архіву retention
+  timestamp: string | null
+  level: string
+  message: string
+}
+
+export interface RunLogsPage {
+  run_id: number
+  logs: RunLogEntry[]
+  count: number
+  next_after_id: number | null
+  last_id: number
+}
+
+function runLogsParams(params?: { afterId?: number; limit?: number; level?: string }): URLSearchParams {
+  const queryParams = new URLSearchParams()
+  if (params?.afterId) queryParams.append('after_id', String(params.afterId))
+  if (params?.limit) queryParams.append('limit', String(params.limit))
+  if (params?.level) queryParams.append('level', params.level)
+  return queryParams
+}
+
+// Сторінка логів запуску; для tail запуску, що триває - повторювати з afterId = last_id
+export async function getRunLogs(runId: number, params?: {
+  afterId?: number
+  limit?: number
+  level?: string
+}): Promise<RunLogsPage> {
+  const r = await fetch(`${API_BASE}/api/runs/${runId}/logs?${runLogsParams(params).toString()}`)
+  if (!r.ok) throw new Error('Failed to load run logs')
   return r.json()
 }
 
+// Усі логи запуску потоком NDJSON: onLog викликається для кожного рядка по мірі отримання
+export async function streamRunLogs(
+  runId: number,
+  onLog: (log: RunLogEntry) => void,
+  params?: { afterId?: number; level?: string }
+): Promise<void> {
+  const queryParams = runLogsParams(params)
+  queryParams.append('format', 'ndjson')
+  const r = await fetch(`${API_BASE}/api/runs/${runId}/logs?${queryParams.toString()}`)
+  if (!r.ok || !r.body) throw new Error('Failed to stream run logs')
+
+  const reader = r.body.getReader()
+  const decoder = new TextDecoder()
+  let buffer = ''
+  while (true) {
+    const { done, value } = await reader.read()
+    if (done) break
+    buffer += decoder.decode(value, { stream: true })
+    const lines = buffer.split('\n')
+    buffer = lines.pop() ?? ''
+    for (const line of lines) {
+      if (line) onLog(JSON.parse(line))
+    }
+  }
+  if (buffer) onLog(JSON.parse(buffer))
+}